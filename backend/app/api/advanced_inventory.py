@@ -1,11 +1,14 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 from app.core.database import get_db
 from app.core.dependencies import get_current_user, AuthUser
-from app.services.advanced_inventory_service import AdvancedInventoryService
-from pydantic import BaseModel
+from app.services.advanced_inventory_service import (
+    AdvancedInventoryService, barcode_index, MAX_SERIALS_PER_REQUEST, MAX_SERIAL_WIDTH
+)
+from app.services.mrp_service import MRPService
+from pydantic import BaseModel, Field
 from datetime import date
-from typing import Optional
+from typing import List, Optional
 import uuid
 
 router = APIRouter(prefix="/inventory-advanced", tags=["inventory-advanced"])
@@ -36,6 +39,44 @@ async def create_serial_number(
         "status": sn.status
     }
 
+class SerialNumberBulkCreate(BaseModel):
+    product_id: str
+    warehouse_id: Optional[str] = None
+    serial_numbers: Optional[List[str]] = Field(None, max_length=MAX_SERIALS_PER_REQUEST)
+    # Or a range: prefix + counter from start, zero-padded to width digits
+    prefix: str = Field("", max_length=100)
+    start: int = Field(1, ge=0)
+    count: Optional[int] = Field(None, gt=0, le=MAX_SERIALS_PER_REQUEST)
+    width: int = Field(0, ge=0, le=MAX_SERIAL_WIDTH)
+
+@router.post("/serial-numbers/bulk")
+async def create_serial_numbers(
+    data: SerialNumberBulkCreate,
+    db: Session = Depends(get_db),
+    user: AuthUser = Depends(get_current_user)
+):
+    """Register a list or range of serial numbers at once"""
+    try:
+        if (data.serial_numbers is None) == (data.count is None):
+            raise ValueError("Give either serial_numbers or a range count")
+        serials = data.serial_numbers
+        if serials is None:
+            serials = AdvancedInventoryService.serial_range(data.prefix, data.start, data.count, data.width)
+        created = AdvancedInventoryService.create_serial_numbers(
+            db,
+            user.workspace_id,
+            uuid.UUID(data.product_id),
+            serials,
+            uuid.UUID(data.warehouse_id) if data.warehouse_id else None
+        )
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+    return {
+        "created": created,
+        "first": serials[0] if serials else None,
+        "last": serials[-1] if serials else None
+    }
+
 @router.get("/serial-numbers/{product_id}")
 async def get_available_serials(
     product_id: str,
@@ -132,21 +173,48 @@ async def register_barcode(
         "product_id": str(mapping.product_id)
     }
 
+class BarcodeBatch(BaseModel):
+    barcodes: List[str]
+
+@router.post("/barcodes/lookup")
+async def lookup_barcodes(
+    data: BarcodeBatch,
+    cached: bool = True,
+    db: Session = Depends(get_db),
+    user: AuthUser = Depends(get_current_user)
+):
+    """Resolve a batch of scanned barcodes at once"""
+    if cached:
+        entries = barcode_index.lookup_many(db, user.workspace_id, data.barcodes)
+    else:
+        entries = AdvancedInventoryService.lookup_barcodes(db, user.workspace_id, data.barcodes)
+    return {
+        "products": {
+            barcode: {"id": str(e.product_id), "code": e.code, "name": e.name, "type": e.type}
+            for barcode, e in entries.items()
+        },
+        "missing": [barcode for barcode in data.barcodes if barcode not in entries]
+    }
+
 @router.get("/barcodes/{barcode}")
 async def lookup_barcode(
     barcode: str,
+    cached: bool = True,
     db: Session = Depends(get_db),
     user: AuthUser = Depends(get_current_user)
 ):
     """Lookup product by barcode"""
-    product = AdvancedInventoryService.lookup_by_barcode(db, user.workspace_id, barcode)
+    if cached:
+        product = barcode_index.lookup(db, user.workspace_id, barcode)
+    else:
+        product = AdvancedInventoryService.lookup_barcodes(db, user.workspace_id, [barcode]).get(barcode)
     if not product:
         return {"error": "Product not found"}
     
     return {
         "barcode": barcode,
         "product": {
-            "id": str(product.id),
+            "id": str(product.product_id),
             "code": product.code,
             "name": product.name,
             "type": product.type
@@ -186,11 +254,16 @@ async def create_reorder_rule(
 
 @router.get("/reorder-suggestions")
 async def get_reorder_suggestions(
+    include_mrp: bool = False,
     db: Session = Depends(get_db),
     user: AuthUser = Depends(get_current_user)
 ):
-    """Get products that need reordering"""
-    suggestions = AdvancedInventoryService.check_reorder_points(db, user.workspace_id)
+    """Get products that need reordering (include_mrp: account for planned job order demand)"""
+    try:
+        plan = MRPService.run(db, user.workspace_id) if include_mrp else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    suggestions = AdvancedInventoryService.check_reorder_points(db, user.workspace_id, plan)
     return {
         "count": len(suggestions),
         "suggestions": suggestions
@@ -1,12 +1,13 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 from app.core.database import get_db
 from app.core.dependencies import get_current_user, AuthUser
+from app.models.currency_tax import TaxType
 from app.services.currency_service import CurrencyService
 from app.services.tax_service import TaxService
 from pydantic import BaseModel
 from decimal import Decimal
-from typing import Optional
+from typing import List, Optional
 from datetime import date
 
 router = APIRouter(prefix="/currency-tax", tags=["currency-tax"])
@@ -86,14 +87,53 @@ async def seed_tax_rates(
     TaxService.seed_tax_rates(db, user.workspace_id)
     return {"message": "Tax rates seeded successfully"}
 
+@router.get("/tax/rates/{tax_type}")
+async def get_tax_rate(
+    tax_type: str,
+    on_date: Optional[str] = None,
+    db: Session = Depends(get_db),
+    user: AuthUser = Depends(get_current_user)
+):
+    """Get the tax rate in force on a date (defaults to today)"""
+    try:
+        date_obj = date.fromisoformat(on_date) if on_date else date.today()
+    except ValueError:
+        raise HTTPException(status_code=400, detail="on_date must be an ISO date (YYYY-MM-DD)")
+    rate = TaxService.get_tax_rate(db, user.workspace_id, tax_type, date_obj)
+    return {
+        "tax_type": tax_type,
+        "rate_percentage": float(rate) if rate is not None else None,
+        "date": str(date_obj)
+    }
+
+@router.get("/tax/summary/{year}/{month}")
+async def get_monthly_tax_summary(
+    year: int,
+    month: int,
+    db: Session = Depends(get_db),
+    user: AuthUser = Depends(get_current_user)
+):
+    """Monthly tax report per tax type and NPWP"""
+    rows = TaxService.get_monthly_tax_summary(db, user.workspace_id, year, month)
+    return {
+        "period": f"{year}-{month:02d}",
+        "count": len(rows),
+        "summary": [{k: float(v) if isinstance(v, Decimal) else v for k, v in r.items()} for r in rows]
+    }
+
 class PPNRequest(BaseModel):
     amount: float
     include_tax: bool = False
 
 @router.post("/tax/ppn/calculate")
-async def calculate_ppn(request: PPNRequest):
-    """Calculate PPN (VAT) 11%"""
-    result = TaxService.calculate_ppn(Decimal(str(request.amount)), request.include_tax)
+async def calculate_ppn(
+    request: PPNRequest,
+    db: Session = Depends(get_db),
+    user: AuthUser = Depends(get_current_user)
+):
+    """Calculate PPN (VAT) at the workspace rate in force today (11% if none is configured)"""
+    rate = TaxService.get_tax_rate(db, user.workspace_id, TaxType.PPN.value)
+    result = TaxService.calculate_ppn(Decimal(str(request.amount)), request.include_tax, rate)
     return {k: float(v) if isinstance(v, Decimal) else v for k, v in result.items()}
 
 class PPh21Request(BaseModel):
@@ -111,9 +151,14 @@ class PPh23Request(BaseModel):
     has_npwp: bool = True
 
 @router.post("/tax/pph23/calculate")
-async def calculate_pph_23(request: PPh23Request):
-    """Calculate PPh 23 (Withholding Tax)"""
-    result = TaxService.calculate_pph_23(Decimal(str(request.amount)), request.has_npwp)
+async def calculate_pph_23(
+    request: PPh23Request,
+    db: Session = Depends(get_db),
+    user: AuthUser = Depends(get_current_user)
+):
+    """Calculate PPh 23 (Withholding Tax) at the workspace rate in force today (2% if none is configured)"""
+    rate = TaxService.get_tax_rate(db, user.workspace_id, TaxType.PPH_23.value)
+    result = TaxService.calculate_pph_23(Decimal(str(request.amount)), request.has_npwp, rate)
     return {k: float(v) if isinstance(v, Decimal) else v for k, v in result.items()}
 
 class PPh42Request(BaseModel):
@@ -125,3 +170,84 @@ async def calculate_pph_4_2(request: PPh42Request):
     """Calculate PPh 4(2) (Final Tax)"""
     result = TaxService.calculate_pph_4_2(Decimal(str(request.amount)), request.service_type)
     return {k: float(v) if isinstance(v, Decimal) else v for k, v in result.items()}
+
+# ===== BATCH TAX ENDPOINTS =====
+
+def _cents_to_floats(values) -> list:
+    return [c / 100 for c in values.tolist()]
+
+class PPNBatchRequest(BaseModel):
+    amounts: List[float]
+    include_tax: bool = False
+
+@router.post("/tax/ppn/calculate-batch")
+async def calculate_ppn_batch(
+    request: PPNBatchRequest,
+    db: Session = Depends(get_db),
+    user: AuthUser = Depends(get_current_user)
+):
+    """Calculate PPN (VAT) at the workspace rate for many amounts at once"""
+    try:
+        result = TaxService.calculate_ppn_batch(
+            TaxService.to_cents(request.amounts), request.include_tax,
+            TaxService.get_tax_rate(db, user.workspace_id, TaxType.PPN.value)
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {
+        "count": len(request.amounts),
+        "base_amount": _cents_to_floats(result["base_amount_cents"]),
+        "ppn_amount": _cents_to_floats(result["ppn_amount_cents"]),
+        "total_amount": _cents_to_floats(result["total_amount_cents"]),
+        "ppn_rate": float(result["ppn_rate"])
+    }
+
+class PPh23BatchRequest(BaseModel):
+    amounts: List[float]
+    has_npwp: Optional[List[bool]] = None
+
+@router.post("/tax/pph23/calculate-batch")
+async def calculate_pph_23_batch(
+    request: PPh23BatchRequest,
+    db: Session = Depends(get_db),
+    user: AuthUser = Depends(get_current_user)
+):
+    """Calculate PPh 23 at the workspace rate for many amounts at once"""
+    try:
+        result = TaxService.calculate_pph_23_batch(
+            TaxService.to_cents(request.amounts), request.has_npwp,
+            TaxService.get_tax_rate(db, user.workspace_id, TaxType.PPH_23.value)
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {
+        "count": len(request.amounts),
+        "tax_amount": _cents_to_floats(result["tax_amount_cents"]),
+        "net_amount": _cents_to_floats(result["net_amount_cents"]),
+        "tax_rate": result["tax_rate"].tolist()
+    }
+
+class PPh21BatchRequest(BaseModel):
+    annual_incomes: List[float]
+    has_npwp: Optional[List[bool]] = None
+
+@router.post("/tax/pph21/calculate-batch")
+async def calculate_pph_21_batch(
+    request: PPh21BatchRequest,
+    db: Session = Depends(get_db),
+    user: AuthUser = Depends(get_current_user)
+):
+    """Calculate PPh 21 for a whole payroll run"""
+    try:
+        result = TaxService.calculate_pph_21_batch(
+            TaxService.to_cents(request.annual_incomes), request.has_npwp
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {
+        "count": len(request.annual_incomes),
+        "taxable_income": _cents_to_floats(result["taxable_income_cents"]),
+        "tax_amount": _cents_to_floats(result["tax_amount_cents"]),
+        "effective_rate": result["effective_rate"].tolist(),
+        "total_tax": sum(result["tax_amount_cents"].tolist()) / 100
+    }
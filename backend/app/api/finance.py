@@ -6,6 +6,7 @@ from app.models.finance import CashTransaction, BankTransaction, CashTransaction
 from app.models.accounting import CashAccount, BankAccount
 from app.services.sequence_service import SequenceService
 from app.services.journal_service import JournalEngine
+from app.core.events import event_bus, CASH_TRANSACTION_CREATED
 from pydantic import BaseModel
 import uuid
 
@@ -42,6 +43,13 @@ async def create_cash_transaction(tx_in: CashTransactionCreate, db: Session = De
     db_tx.journal_id = journal.id
     db.commit()
     
+    event_bus.publish(CASH_TRANSACTION_CREATED, workspace_id, {
+        "document_id": str(db_tx.id),
+        "ref_no": ref_no,
+        "transaction_type": tx_in.transaction_type.value,
+        "amount": tx_in.amount
+    })
+    
     return {"message": "Cash transaction recorded", "ref": ref_no}
 
 @router.get("/cash-accounts")
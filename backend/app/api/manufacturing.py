@@ -1,8 +1,12 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 from app.core.database import get_db
-from app.models.manufacturing import JobOrder, JobOrderStatus, ApprovalStatus
+from app.core.dependencies import get_current_user, AuthUser
+from app.models.manufacturing import JobOrder, JobOrderStatus, ApprovalStatus, WorkCenter
+from app.services.bom_service import BOMService
+from app.services.mrp_service import MRPService
+from app.services.scheduling_service import SchedulingService
 from pydantic import BaseModel
 import uuid
 from datetime import datetime
@@ -13,9 +17,13 @@ class JobOrderBase(BaseModel):
     jo_number: str
     type: str # 'manufacturing' or 'service'
     product_id: uuid.UUID = None
+    quantity: float = 1
     partner_id: uuid.UUID = None
     start_date: datetime
     end_date: datetime
+    due_date: Optional[datetime] = None
+    work_center_id: Optional[uuid.UUID] = None
+    processing_hours: float = 0
     tax_rate: float = 0
 
 class JobOrderCreate(JobOrderBase):
@@ -30,6 +38,19 @@ class JobOrderOut(JobOrderBase):
     class Config:
         from_attributes = True
 
+class ExplodeRequest(BaseModel):
+    job_order_ids: List[uuid.UUID]
+
+class WorkCenterCreate(BaseModel):
+    code: str
+    name: str
+    weekly_hours: List[float] = [8, 8, 8, 8, 8, 0, 0]
+
+class RescheduleRequest(BaseModel):
+    processing_hours: Optional[float] = None
+    due_date: Optional[datetime] = None
+    work_center_id: Optional[uuid.UUID] = None
+
 @router.get("/", response_model=List[JobOrderOut])
 async def list_job_orders(db: Session = Depends(get_db)):
     return db.query(JobOrder).all()
@@ -49,3 +70,105 @@ async def create_job_order(jo_in: JobOrderCreate, db: Session = Depends(get_db))
     db.commit()
     db.refresh(db_jo)
     return db_jo
+
+@router.post("/explode")
+async def explode_job_orders(
+    data: ExplodeRequest,
+    db: Session = Depends(get_db),
+    user: AuthUser = Depends(get_current_user)
+):
+    """Component requirements of job orders through every BOM level"""
+    requested = set(data.job_order_ids)
+    found = db.query(JobOrder.id).filter(
+        JobOrder.workspace_id == user.workspace_id, JobOrder.id.in_(list(requested))
+    ).count() if requested else 0
+    if found != len(requested):
+        raise HTTPException(status_code=404, detail="Job order not found")
+    try:
+        requirements = BOMService.explode_job_orders(db, user.workspace_id, requested)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {
+        "count": len(requirements),
+        "requirements": [{"product_id": str(p), "qty": float(q)} for p, q in requirements.items()]
+    }
+
+@router.get("/standard-costs")
+async def standard_costs(db: Session = Depends(get_db), user: AuthUser = Depends(get_current_user)):
+    """Standard unit cost of BOM products rolled up from component prices"""
+    try:
+        costs = BOMService.standard_costs(db, user.workspace_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"count": len(costs), "costs": {str(p): float(c) for p, c in costs.items()}}
+
+@router.post("/mrp")
+async def run_mrp(
+    bucket_days: int = Query(7, ge=1, le=31),
+    horizon: int = Query(26, ge=1, le=104),
+    db: Session = Depends(get_db),
+    user: AuthUser = Depends(get_current_user)
+):
+    """Plan material requirements of scheduled job orders into purchase and production suggestions"""
+    try:
+        plan = MRPService.run(db, user.workspace_id, bucket_days=bucket_days, horizon=horizon)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    suggestions = plan.suggestions()
+    return {
+        "start": plan.start.isoformat(),
+        "bucket_days": bucket_days,
+        "horizon": horizon,
+        "count": len(suggestions),
+        "suggestions": suggestions
+    }
+
+@router.post("/work-centers")
+async def create_work_center(data: WorkCenterCreate, db: Session = Depends(get_db), user: AuthUser = Depends(get_current_user)):
+    """Create a work center with weekly capacity hours (Monday..Sunday)"""
+    if len(data.weekly_hours) != 7 or any(h < 0 or h > 24 for h in data.weekly_hours):
+        raise HTTPException(status_code=400, detail="weekly_hours needs 7 values between 0 and 24")
+    center = WorkCenter(workspace_id=user.workspace_id, code=data.code, name=data.name, weekly_hours=data.weekly_hours)
+    db.add(center)
+    db.commit()
+    return {"id": str(center.id), "code": center.code, "weekly_hours": center.weekly_hours}
+
+@router.get("/work-centers")
+async def list_work_centers(db: Session = Depends(get_db), user: AuthUser = Depends(get_current_user)):
+    centers = db.query(WorkCenter).filter(WorkCenter.workspace_id == user.workspace_id, WorkCenter.is_active == True).all()
+    return [{"id": str(c.id), "code": c.code, "name": c.name, "weekly_hours": c.weekly_hours} for c in centers]
+
+@router.post("/schedule")
+async def schedule_job_orders(
+    rule: str = Query("edd", pattern="^(edd|cr)$"),
+    db: Session = Depends(get_db),
+    user: AuthUser = Depends(get_current_user)
+):
+    """Schedule open job orders on work centers by earliest due date or critical ratio"""
+    try:
+        return SchedulingService.schedule(db, user.workspace_id, rule=rule)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/schedule")
+async def schedule_report(db: Session = Depends(get_db), user: AuthUser = Depends(get_current_user)):
+    """Makespan and on-time rate of the current schedule"""
+    return SchedulingService.report(db, user.workspace_id)
+
+@router.post("/{job_order_id}/reschedule")
+async def reschedule_job_order(
+    job_order_id: uuid.UUID,
+    data: RescheduleRequest,
+    db: Session = Depends(get_db),
+    user: AuthUser = Depends(get_current_user)
+):
+    """Change one scheduled job order under the rule it was scheduled with; only the orders queued behind it move"""
+    job_order = db.get(JobOrder, job_order_id)
+    if job_order is None or job_order.workspace_id != user.workspace_id:
+        raise HTTPException(status_code=404, detail="Job order not found")
+    try:
+        return SchedulingService.reschedule(
+            db, job_order_id, data.processing_hours, data.due_date, data.work_center_id
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
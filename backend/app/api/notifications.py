@@ -1,8 +1,10 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from sqlalchemy.orm import Session
-from typing import List
+from datetime import datetime
+from typing import List, Optional
 from app.core.database import get_db
-from app.models.notifications import Notification
+from app.core.dependencies import get_current_admin, get_current_user, AuthUser
+from app.models.notifications import Notification, NotificationType, NotificationPriority
 from app.models.workflow import ApprovalRequest
 from app.services.notification_service import NotificationService
 from pydantic import BaseModel
@@ -22,6 +24,17 @@ class NotificationOut(BaseModel):
     class Config:
         from_attributes = True
 
+class NotificationBroadcast(BaseModel):
+    # Recipients: any combination of explicit users, a role name and a department
+    user_ids: List[uuid.UUID] = []
+    role: Optional[str] = None
+    department_id: Optional[uuid.UUID] = None
+    type: NotificationType = NotificationType.SYSTEM_ALERT
+    priority: NotificationPriority = NotificationPriority.MEDIUM
+    title: str
+    message: str
+    link: Optional[str] = None
+
 class ApprovalOut(BaseModel):
     id: uuid.UUID
     document_type: str
@@ -32,10 +45,28 @@ class ApprovalOut(BaseModel):
         from_attributes = True
 
 @router.get("/", response_model=List[NotificationOut])
-async def get_notifications(db: Session = Depends(get_db)):
-    """Get all notifications for current user"""
-    # In production, filter by current user from token
-    notifications = db.query(Notification).order_by(Notification.created_at.desc()).limit(50).all()
+async def get_notifications(
+    response: Response,
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None,
+    unread_only: bool = False,
+    since: Optional[datetime] = None,
+    db: Session = Depends(get_db),
+    user: AuthUser = Depends(get_current_user)
+):
+    """
+    Get the current user's notifications, newest first. Pass the X-Next-Cursor
+    response header back as `cursor` for the next page; `since` returns only
+    notifications created after it.
+    """
+    try:
+        notifications, next_cursor = NotificationService.list_notifications(
+            db, user.user_id, limit, cursor, unread_only, since
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
     return [NotificationOut(
         id=n.id,
         type=n.type,
@@ -47,26 +78,68 @@ async def get_notifications(db: Session = Depends(get_db)):
     ) for n in notifications]
 
 @router.get("/unread-count")
-async def get_unread_count(db: Session = Depends(get_db)):
-    """Get count of unread notifications"""
-    count = db.query(Notification).filter(Notification.is_read == False).count()
+async def get_unread_count(db: Session = Depends(get_db), user: AuthUser = Depends(get_current_user)):
+    """
+    Get count of unread notifications. Changes are also pushed as notification /
+    notifications_read events to realtime sockets, but the /ws router is not
+    mounted yet, so clients keep polling this endpoint for now.
+    """
+    count = NotificationService.get_unread_count(db, user.workspace_id, user.user_id)
     return {"unread_count": count}
 
+@router.post("/mark-all-read")
+async def mark_all_read(db: Session = Depends(get_db), user: AuthUser = Depends(get_current_user)):
+    """Mark all of the current user's notifications as read"""
+    marked = NotificationService.mark_all_as_read(db, user.workspace_id, user.user_id)
+    return {"message": "Notifications marked as read", "count": marked}
+
+@router.post("/broadcast")
+async def broadcast_notification(
+    data: NotificationBroadcast,
+    db: Session = Depends(get_db),
+    user: AuthUser = Depends(get_current_admin)
+):
+    """Notify many users at once (e.g. a department or every holder of a role); administrators only"""
+    recipients = NotificationService.resolve_recipients(
+        db, user.workspace_id, data.user_ids, data.role, data.department_id
+    )
+    count = NotificationService.create_notifications(
+        db, user.workspace_id, recipients, data.type, data.title, data.message, data.priority, data.link
+    )
+    return {"message": "Notifications sent", "count": count}
+
 @router.post("/{notification_id}/mark-read")
-async def mark_notification_read(notification_id: uuid.UUID, db: Session = Depends(get_db)):
-    """Mark a notification as read"""
-    NotificationService.mark_as_read(db, notification_id)
+async def mark_notification_read(
+    notification_id: uuid.UUID,
+    db: Session = Depends(get_db),
+    user: AuthUser = Depends(get_current_user)
+):
+    """Mark one of the current user's notifications as read"""
+    if NotificationService.mark_as_read(db, notification_id, user.user_id) is None:
+        raise HTTPException(status_code=404, detail="Notification not found")
     return {"message": "Notification marked as read"}
 
 @router.get("/approvals", response_model=List[ApprovalOut])
-async def get_approval_requests(db: Session = Depends(get_db)):
-    """Get pending approval requests for current user"""
-    approvals = db.query(ApprovalRequest).filter(ApprovalRequest.status == "pending").all()
+async def get_approval_requests(
+    response: Response,
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None,
+    since: Optional[datetime] = None,
+    db: Session = Depends(get_db),
+    user: AuthUser = Depends(get_current_user)
+):
+    """Get pending approval requests for current user (paged like the notification list)"""
+    try:
+        approvals, next_cursor = NotificationService.list_pending_approvals(db, user.user_id, limit, cursor, since)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
     return [ApprovalOut(
         id=a.id,
         document_type=a.document_type,
         status=a.status,
-        requested_at=str(a.requested_at)
+        requested_at=str(a.created_at)
     ) for a in approvals]
 
 @router.post("/approvals/{approval_id}/approve")
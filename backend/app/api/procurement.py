@@ -6,6 +6,9 @@ from app.models.procurement import PurchaseOrder, POLine, GoodsReceipt, POStatus
 from app.models.ledger import StockLedger, ReferenceType
 from app.services.sequence_service import SequenceService
 from app.services.journal_service import JournalEngine
+from app.services.costing_service import CostingService
+from app.services.uom_service import UOMService
+from app.core.events import event_bus, PURCHASE_ORDER_CREATED, GOODS_RECEIVED
 from pydantic import BaseModel
 import uuid
 
@@ -46,6 +49,13 @@ async def create_po(po_in: POCreate, db: Session = Depends(get_db)):
     db_po.total_amount = total
     db.commit()
     db.refresh(db_po)
+    
+    event_bus.publish(PURCHASE_ORDER_CREATED, workspace_id, {
+        "document_id": str(db_po.id),
+        "po_number": po_number,
+        "partner_id": str(po_in.partner_id),
+        "amount": float(total)
+    })
     return db_po
 
 @router.post("/grn/{po_id}")
@@ -53,6 +63,12 @@ async def receive_goods(po_id: uuid.UUID, warehouse_id: uuid.UUID, db: Session =
     po = db.query(PurchaseOrder).filter(PurchaseOrder.id == po_id).first()
     if not po: raise HTTPException(404, "PO not found")
     
+    lines = db.query(POLine).filter(POLine.po_id == po_id).all()
+    try:
+        base = UOMService.to_base(db, lines)  # Ledger quantities and costs are per base UOM
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+    
     grn_number = SequenceService.get_next_number(db, po.workspace_id, "GRN", "GRN")
     
     grn = GoodsReceipt(
@@ -63,21 +79,22 @@ async def receive_goods(po_id: uuid.UUID, warehouse_id: uuid.UUID, db: Session =
         received_by=uuid.uuid4() # Mock user
     )
     db.add(grn)
+    db.flush()
     
     # Update Stock & Trigger Journal
     journal_entries = []
-    for line in db.query(POLine).filter(POLine.po_id == po_id).all():
+    for line, (qty, unit_cost) in zip(lines, base):
         # Stock Ledger (IN)
         movement = StockLedger(
             product_id=line.product_id,
             warehouse_id=warehouse_id,
-            qty=line.qty,
+            qty=qty,
             uom_used=line.uom,
-            unit_cost=line.unit_price,
+            unit_cost=unit_cost,
             reference_type=ReferenceType.PO,
             reference_id=grn.id
         )
-        db.add(movement)
+        CostingService.post_movement(db, movement)  # Opens a cost layer
         
         # Prepare Journal (Debit Inventory, Credit Accrual)
         journal_entries.append({'coa_code': '1103', 'debit': float(line.qty * line.unit_price), 'credit': 0}) # Inventory
@@ -89,7 +106,15 @@ async def receive_goods(po_id: uuid.UUID, warehouse_id: uuid.UUID, db: Session =
     # Auto-Journal
     JournalEngine.create_journal_entry(
         db, po.workspace_id, grn_number, 
-        f"Inventory Receipt from {po_number}", "GRN", grn.id, journal_entries
+        f"Inventory Receipt from {po.po_number}", "GRN", grn.id, journal_entries
     )
     
+    event_bus.publish(GOODS_RECEIVED, po.workspace_id, {
+        "document_id": str(grn.id),
+        "grn_number": grn_number,
+        "po_id": str(po_id),
+        "warehouse_id": str(warehouse_id),
+        "amount": sum(e['debit'] for e in journal_entries)
+    })
+    
     return {"message": "Goods received and journaled", "grn": grn_number}
@@ -3,7 +3,7 @@ from sqlalchemy.orm import Session
 from typing import List
 from app.core.database import get_db
 from app.core.dependencies import get_current_user, AuthUser
-from app.models.inventory import Product, ProductType, ValuationMethod
+from app.models.inventory import Product, ProductType, ValuationMethod, UOMConversion
 from pydantic import BaseModel
 import uuid
 
@@ -16,6 +16,7 @@ class ProductBase(BaseModel):
     type: ProductType
     valuation_method: ValuationMethod = ValuationMethod.AVERAGE
     base_price: float = 0
+    lead_time_days: int = 0
 
 class ProductCreate(ProductBase):
     pass
@@ -27,6 +28,18 @@ class ProductOut(ProductBase):
     class Config:
         from_attributes = True
 
+class UOMConversionCreate(BaseModel):
+    from_uom: str
+    to_uom: str
+    ratio: float # 1 from_uom = ratio to_uom
+
+class UOMConversionOut(UOMConversionCreate):
+    id: uuid.UUID
+    product_id: uuid.UUID
+
+    class Config:
+        from_attributes = True
+
 @router.get("/", response_model=List[ProductOut])
 async def list_products(db: Session = Depends(get_db), user: AuthUser = Depends(get_current_user)):
     products = db.query(Product).filter(Product.workspace_id == user.workspace_id).all()
@@ -39,3 +52,22 @@ async def create_product(product_in: ProductCreate, db: Session = Depends(get_db
     db.commit()
     db.refresh(db_product)
     return db_product
+
+@router.get("/{product_id}/uom-conversions", response_model=List[UOMConversionOut])
+async def list_uom_conversions(product_id: uuid.UUID, db: Session = Depends(get_db), user: AuthUser = Depends(get_current_user)):
+    return db.query(UOMConversion).join(Product, UOMConversion.product_id == Product.id).filter(
+        Product.id == product_id, Product.workspace_id == user.workspace_id
+    ).all()
+
+@router.post("/{product_id}/uom-conversions", response_model=UOMConversionOut)
+async def create_uom_conversion(product_id: uuid.UUID, conversion_in: UOMConversionCreate, db: Session = Depends(get_db), user: AuthUser = Depends(get_current_user)):
+    product = db.query(Product).filter(Product.id == product_id, Product.workspace_id == user.workspace_id).first()
+    if not product:
+        raise HTTPException(status.HTTP_404_NOT_FOUND, "Product not found")
+    if conversion_in.ratio <= 0:
+        raise HTTPException(status.HTTP_400_BAD_REQUEST, "Ratio must be positive")
+    conversion = UOMConversion(**conversion_in.dict(), product_id=product_id)
+    db.add(conversion)
+    db.commit()
+    db.refresh(conversion)
+    return conversion
@@ -30,15 +30,16 @@ async def websocket_endpoint(
         return
     
     # Connect
+    await manager.start()
     connection_id = await manager.connect(websocket, workspace_id, user_id, user_email)
     
     # Send welcome message
-    await manager.send_personal_message({
+    manager.send_to_connection(connection_id, {
         "type": "connection_established",
         "connection_id": connection_id,
         "workspace_id": workspace_id,
-        "online_users": manager.get_online_users(workspace_id)
-    }, websocket)
+        "online_users": await manager.get_workspace_presence(workspace_id)
+    })
     
     try:
         while True:
@@ -48,6 +49,15 @@ async def websocket_endpoint(
             
             message_type = message.get("type")
             
+            if message_type != "ping" and not manager.allow_inbound(connection_id):
+                # Over the per-connection rate; cursor/typing updates are simply dropped
+                if message_type == "document_update":
+                    manager.send_to_connection(connection_id, {
+                        "type": "rate_limited",
+                        "document_id": message.get("document_id")
+                    })
+                continue
+            
             if message_type == "document_update":
                 # Broadcast document update to all users
                 await manager.broadcast_to_workspace(workspace_id, {
@@ -60,35 +70,44 @@ async def websocket_endpoint(
                 }, exclude_websocket=websocket)
             
             elif message_type == "typing":
-                # Broadcast typing indicator
-                await manager.broadcast_to_workspace(workspace_id, {
+                # Broadcast typing indicator (coalesced per tick)
+                manager.broadcast_ephemeral(workspace_id, {
                     "type": "user_typing",
                     "user_email": user_email,
                     "location": message.get("location")
-                }, exclude_websocket=websocket)
+                }, ("typing", user_email), exclude_websocket=websocket)
             
             elif message_type == "cursor_position":
-                # Broadcast cursor position for collaborative editing
-                await manager.broadcast_to_workspace(workspace_id, {
+                # Broadcast cursor position for collaborative editing (coalesced per tick)
+                manager.broadcast_ephemeral(workspace_id, {
                     "type": "cursor_moved",
                     "user_email": user_email,
                     "position": message.get("position")
-                }, exclude_websocket=websocket)
+                }, ("cursor", user_email), exclude_websocket=websocket)
             
             elif message_type == "ping":
                 # Keepalive ping
-                await manager.send_personal_message({
+                manager.send_to_connection(connection_id, {
                     "type": "pong"
-                }, websocket)
+                })
     
     except WebSocketDisconnect:
         manager.disconnect(connection_id)
 
 @router.get("/realtime/online-users/{workspace_id}")
 async def get_online_users(workspace_id: str):
-    """Get currently online users (HTTP endpoint)"""
+    """Get currently online users across all workers (HTTP endpoint)"""
+    users = await manager.get_workspace_presence(workspace_id)
+    return {
+        "workspace_id": workspace_id,
+        "count": len(users),
+        "users": users
+    }
+
+@router.get("/realtime/connections/{workspace_id}")
+async def get_connection_stats(workspace_id: str):
+    """Outbound queue depth and slow-consumer drops for a workspace"""
     return {
         "workspace_id": workspace_id,
-        "count": len(manager.get_online_users(workspace_id)),
-        "users": manager.get_online_users(workspace_id)
+        **manager.get_connection_stats(workspace_id)
     }
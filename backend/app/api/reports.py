@@ -1,12 +1,14 @@
-from fastapi import APIRouter, Depends, Response
+from fastapi import APIRouter, Depends, HTTPException, Response
 from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from app.core.database import get_db
-from app.core.dependencies import get_current_user, AuthUser
+from app.core.dependencies import get_current_user, get_current_admin, AuthUser
 from app.services.reporting_service import ReportingService
+from app.services.valuation_service import ValuationService
 from app.models.reporting import CustomReport
 from pydantic import BaseModel
 from typing import List, Dict, Optional
+from datetime import datetime, timezone
 import uuid
 
 router = APIRouter(prefix="/reports", tags=["reports"])
@@ -23,6 +25,36 @@ async def get_report_templates():
     templates = ReportingService.get_report_templates()
     return {"count": len(templates), "templates": templates}
 
+@router.get("/inventory-valuation")
+async def inventory_valuation(
+    as_of: Optional[datetime] = None,
+    warehouse_id: Optional[uuid.UUID] = None,
+    db: Session = Depends(get_db),
+    user: AuthUser = Depends(get_current_user)
+):
+    """Stock quantity and value per product at a date (default: now)"""
+    as_of = as_of or datetime.now(timezone.utc)
+    rows = ValuationService.inventory_valuation(db, user.workspace_id, as_of, warehouse_id)
+    return {
+        "as_of": as_of.isoformat(),
+        "total_value": round(sum(r["value"] for r in rows), 4),
+        "count": len(rows),
+        "data": rows
+    }
+
+@router.post("/inventory-valuation/snapshots")
+async def close_inventory_period(
+    closed_at: datetime,
+    db: Session = Depends(get_db),
+    user: AuthUser = Depends(get_current_admin)
+):
+    """Store closing stock balances (run at each period end; administrators only)"""
+    try:
+        count = ValuationService.close_period(db, user.workspace_id, closed_at)
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+    return {"closed_at": closed_at.isoformat(), "balances": count}
+
 @router.post("")
 async def create_report(
     data: ReportCreate,
@@ -99,9 +131,12 @@ async def execute_report(
     user: AuthUser = Depends(get_current_user)
 ):
     """Execute report and return data"""
-    data = ReportingService.execute_report(
-        db, uuid.UUID(report_id), parameters
-    )
+    try:
+        data = ReportingService.execute_report(
+            db, uuid.UUID(report_id), parameters
+        )
+    except ValueError as e:
+        raise HTTPException(400, str(e))
     return {
         "report_id": report_id,
         "row_count": len(data),
@@ -6,6 +6,9 @@ from app.models.sales import SalesOrder, SOLine, DeliveryOrder, SOStatus
 from app.models.ledger import StockLedger, ReferenceType
 from app.services.sequence_service import SequenceService
 from app.services.journal_service import JournalEngine
+from app.services.costing_service import CostingService
+from app.services.uom_service import UOMService
+from app.core.events import event_bus, SALES_ORDER_CREATED, GOODS_SHIPPED
 from pydantic import BaseModel
 import uuid
 
@@ -38,6 +41,13 @@ async def create_so(so_in: SOCreate, db: Session = Depends(get_db)):
     
     db_so.total_amount = total
     db.commit()
+    
+    event_bus.publish(SALES_ORDER_CREATED, workspace_id, {
+        "document_id": str(db_so.id),
+        "so_number": so_number,
+        "partner_id": str(so_in.partner_id),
+        "amount": float(total)
+    })
     return db_so
 
 @router.post("/do/{so_id}")
@@ -45,23 +55,30 @@ async def ship_goods(so_id: uuid.UUID, warehouse_id: uuid.UUID, db: Session = De
     so = db.query(SalesOrder).filter(SalesOrder.id == so_id).first()
     if not so: raise HTTPException(404, "SO not found")
     
+    lines = db.query(SOLine).filter(SOLine.so_id == so_id).all()
+    try:
+        base = UOMService.to_base(db, lines)
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+    
     do_number = SequenceService.get_next_number(db, so.workspace_id, "DO", "DO")
     do = DeliveryOrder(workspace_id=so.workspace_id, do_number=do_number, so_id=so_id, warehouse_id=warehouse_id)
     db.add(do)
+    db.flush()
     
     journal_entries = []
-    for line in db.query(SOLine).filter(SOLine.so_id == so_id).all():
+    for line, (qty, _) in zip(lines, base):
         # Stock Ledger (OUT)
         movement = StockLedger(
             product_id=line.product_id,
             warehouse_id=warehouse_id,
-            qty=-line.qty, # Negative for OUT
+            qty=-qty, # Negative for OUT, in base UOM
             uom_used=line.uom,
-            unit_cost=line.unit_price, # In production, use valuation method FIFO/Avg
             reference_type=ReferenceType.SO,
             reference_id=do.id
         )
-        db.add(movement)
+        # Costed from the product's FIFO layers or moving average
+        CostingService.post_movement(db, movement)
         
         # Journal (Debit AR, Credit Sales / Debit COGS, Credit Inventory)
         amount = float(line.qty * line.unit_price)
@@ -76,4 +93,12 @@ async def ship_goods(so_id: uuid.UUID, warehouse_id: uuid.UUID, db: Session = De
         f"Shipment for {so.so_number}", "DO", do.id, journal_entries
     )
     
+    event_bus.publish(GOODS_SHIPPED, so.workspace_id, {
+        "document_id": str(do.id),
+        "do_number": do_number,
+        "so_id": str(so_id),
+        "warehouse_id": str(warehouse_id),
+        "amount": sum(e['debit'] for e in journal_entries)
+    })
+    
     return {"message": "Goods shipped and sales journaled", "do": do_number}
@@ -1,9 +1,10 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 from app.core.database import get_db
 from app.core.dependencies import get_current_user, AuthUser
 from app.services.workflow_service import WorkflowEngine
-from app.models.workflow import Workflow, WorkflowExecution
+from app.services import workflow_queue
+from app.models.workflow import Workflow, WorkflowExecution, WorkflowExecutionStep
 from pydantic import BaseModel
 from typing import Optional, Dict
 import uuid
@@ -14,6 +15,7 @@ class WorkflowCreate(BaseModel):
     name: str
     description: str
     trigger_type: str = "manual"
+    trigger_config: dict = {}  # e.g. {"events": ["purchase_order.created"]} for event triggers
 
 class FlowDataUpdate(BaseModel):
     flow_data: dict
@@ -37,7 +39,8 @@ async def create_workflow(
         data.name,
         data.description,
         data.trigger_type,
-        user.user_id
+        user.user_id,
+        data.trigger_config
     )
     return {
         "id": str(workflow.id),
@@ -116,7 +119,10 @@ async def activate_workflow(
     user: AuthUser = Depends(get_current_user)
 ):
     """Activate workflow"""
-    success = WorkflowEngine.activate_workflow(db, uuid.UUID(workflow_id))
+    try:
+        success = WorkflowEngine.activate_workflow(db, uuid.UUID(workflow_id))
+    except ValueError as e:
+        raise HTTPException(400, f"Invalid workflow graph: {e}")
     return {"success": success, "message": "Workflow activated"}
 
 @router.post("/{workflow_id}/execute")
@@ -126,17 +132,31 @@ async def execute_workflow(
     db: Session = Depends(get_db),
     user: AuthUser = Depends(get_current_user)
 ):
-    """Execute workflow manually"""
-    execution = await WorkflowEngine.execute_workflow(
-        db,
-        uuid.UUID(workflow_id),
-        str(user.user_id),
-        context_data
-    )
+    """Queue workflow for execution by the background workers"""
+    try:
+        execution = WorkflowEngine.enqueue_workflow(
+            db,
+            uuid.UUID(workflow_id),
+            str(user.user_id),
+            context_data
+        )
+    except ValueError as e:
+        raise HTTPException(404, str(e))
     return {
         "execution_id": str(execution.id),
         "status": execution.status,
-        "started_at": execution.started_at.isoformat()
+        "queued_at": execution.started_at.isoformat()
+    }
+
+@router.get("/queue/metrics")
+async def get_queue_metrics(
+    db: Session = Depends(get_db),
+    user: AuthUser = Depends(get_current_user)
+):
+    """Workflow queue depth and running jobs per worker, read from the jobs table"""
+    return {
+        "queue": workflow_queue.WorkflowQueue.get_queue_depth(db, user.workspace_id),
+        "workers": workflow_queue.WorkflowQueue.get_running_by_worker(db, user.workspace_id)
     }
 
 @router.get("/{workflow_id}/executions")
@@ -161,5 +181,37 @@ async def get_workflow_executions(
                 "error_message": e.error_message
             }
             for e in executions
+        ],
+        "node_stats": WorkflowEngine.get_node_stats(db, uuid.UUID(workflow_id))
+    }
+
+@router.get("/executions/{execution_id}/steps")
+async def get_execution_steps(
+    execution_id: str,
+    db: Session = Depends(get_db),
+    user: AuthUser = Depends(get_current_user)
+):
+    """Per-node trace of one execution"""
+    steps = db.query(WorkflowExecutionStep).join(
+        WorkflowExecution, WorkflowExecution.id == WorkflowExecutionStep.execution_id
+    ).filter(
+        WorkflowExecutionStep.execution_id == uuid.UUID(execution_id),
+        WorkflowExecution.workspace_id == user.workspace_id
+    ).order_by(WorkflowExecutionStep.attempt, WorkflowExecutionStep.seq).all()
+    
+    return {
+        "execution_id": execution_id,
+        "steps": [
+            {
+                "attempt": s.attempt,
+                "seq": s.seq,
+                "node_id": s.node_id,
+                "type": s.node_type,
+                "status": s.status,
+                "result": s.result,
+                "offset_ms": round(s.offset_ns / 1e6, 3),
+                "duration_ms": round(s.duration_ns / 1e6, 3)
+            }
+            for s in steps
         ]
     }
@@ -14,6 +14,14 @@ SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
 
+def dialect_insert(db, model):
+    """INSERT for the session's dialect, supporting .on_conflict_do_update()"""
+    if db.get_bind().dialect.name == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        from sqlalchemy.dialects.postgresql import insert
+    return insert(model)
+
 def get_db():
     db = SessionLocal()
     try:
@@ -68,3 +68,16 @@ async def get_current_active_user(
 ) -> AuthUser:
     """Additional check for active user (can be extended for premium features)"""
     return current_user
+
+async def get_current_admin(
+    current_user: AuthUser = Depends(get_current_user),
+    db: Session = Depends(get_db)
+) -> AuthUser:
+    """Restrict an endpoint to administrators"""
+    user = db.query(User).filter(User.id == current_user.user_id).first()
+    if not user or not user.is_admin:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Administrator access required",
+        )
+    return current_user
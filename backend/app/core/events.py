@@ -0,0 +1,63 @@
+"""
+In-process domain event bus.
+
+API handlers publish an event after their transaction commits; subscribers
+(e.g. the workflow trigger dispatcher) must be cheap and non-blocking, since
+they run on the request path. Subscriber errors are logged, never raised back
+into the document write.
+"""
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+import logging
+import uuid
+
+logger = logging.getLogger(__name__)
+
+# Event types
+PURCHASE_ORDER_CREATED = "purchase_order.created"
+GOODS_RECEIVED = "goods_receipt.created"
+SALES_ORDER_CREATED = "sales_order.created"
+GOODS_SHIPPED = "delivery_order.created"
+CASH_TRANSACTION_CREATED = "cash_transaction.created"
+
+class DomainEvent:
+    """Something that happened to a document in a workspace"""
+    __slots__ = ("event_type", "workspace_id", "payload", "occurred_at")
+    
+    def __init__(self, event_type: str, workspace_id: uuid.UUID, payload: dict):
+        self.event_type = event_type
+        self.workspace_id = workspace_id
+        self.payload = payload
+        self.occurred_at = datetime.now()
+
+EventHandler = Callable[[DomainEvent], None]
+
+class EventBus:
+    """Synchronous publish/subscribe keyed by event type"""
+    
+    def __init__(self):
+        # event_type -> handlers; None key holds handlers for every event
+        self._handlers: Dict[Optional[str], List[EventHandler]] = {}
+    
+    def subscribe(self, handler: EventHandler, event_types: Optional[List[str]] = None):
+        for event_type in event_types or [None]:
+            handlers = self._handlers.setdefault(event_type, [])
+            if handler not in handlers:
+                handlers.append(handler)
+    
+    def unsubscribe(self, handler: EventHandler):
+        for handlers in self._handlers.values():
+            if handler in handlers:
+                handlers.remove(handler)
+    
+    def publish(self, event_type: str, workspace_id: uuid.UUID, payload: dict = None) -> DomainEvent:
+        event = DomainEvent(event_type, workspace_id, payload or {})
+        for handler in self._handlers.get(event_type, []) + self._handlers.get(None, []):
+            try:
+                handler(event)
+            except Exception:
+                logger.exception("Event handler failed for %s", event_type)
+        return event
+
+# Global event bus instance
+event_bus = EventBus()
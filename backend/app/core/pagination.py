@@ -0,0 +1,55 @@
+"""
+Keyset (seek) pagination helpers.
+
+Pages are ordered newest first by (created_at, id) and continue from an opaque
+cursor holding the last row's key, so fetching page N costs the same as page 1
+given an index ending in (created_at, id).
+"""
+from datetime import datetime
+from typing import Optional, Tuple
+from sqlalchemy import literal, tuple_
+import base64
+import uuid
+
+def encode_cursor(created_at: datetime, row_id: uuid.UUID) -> str:
+    raw = f"{created_at.isoformat()}|{row_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[datetime, uuid.UUID]:
+    """Raises ValueError for a malformed cursor"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        created_at, row_id = raw.split("|")
+        return datetime.fromisoformat(created_at), uuid.UUID(row_id)
+    except Exception:
+        raise ValueError("Invalid pagination cursor")
+
+def keyset_page(
+    query,
+    created_at_column,
+    id_column,
+    limit: int,
+    cursor: Optional[str] = None,
+    since: Optional[datetime] = None
+):
+    """
+    Apply newest-first keyset pagination to a query. Returns (rows, next_cursor);
+    next_cursor is None on the last page. `since` keeps only rows created after
+    it, for clients syncing what's new since their last fetch.
+    """
+    if since is not None:
+        query = query.filter(created_at_column > since)
+    if cursor:
+        created_at, row_id = decode_cursor(cursor)
+        # Bind with the column types so the row value compares like the stored key
+        query = query.filter(tuple_(created_at_column, id_column) < tuple_(
+            literal(created_at, created_at_column.type), literal(row_id, id_column.type)
+        ))
+    
+    # One extra row tells whether another page exists
+    rows = query.order_by(created_at_column.desc(), id_column.desc()).limit(limit + 1).all()
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    last = rows[-1]
+    return rows, encode_cursor(getattr(last, created_at_column.key), getattr(last, id_column.key))
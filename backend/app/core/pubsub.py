@@ -0,0 +1,163 @@
+"""
+Cross-worker backplane for realtime WebSocket traffic.
+
+Each uvicorn worker holds its own sockets in a ConnectionManager. Broadcasts are
+delivered to local sockets directly and published on the backplane, where every
+other worker picks them up and delivers to its own sockets. Presence lives on
+the backplane too, with a TTL the workers refresh by heartbeat, so sessions of
+a worker that died disappear on their own.
+
+RedisBackplane is used when REDIS_URL is set; InMemoryBackplane stands in for
+it in tests (several managers sharing one instance behave like several workers).
+"""
+from abc import ABC, abstractmethod
+from typing import Callable, Dict, List, Optional, Tuple
+import asyncio
+import json
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+MessageHandler = Callable[[str], None]
+
+class Backplane(ABC):
+    """Pub/sub channel plus TTL'd presence shared by all workers"""
+    
+    @abstractmethod
+    async def publish(self, data: str):
+        ...
+    
+    @abstractmethod
+    async def subscribe(self, handler: MessageHandler):
+        """Call handler with every published payload (including this worker's own)"""
+    
+    @abstractmethod
+    async def set_presence(self, workspace_id: str, sessions: Dict[str, dict], ttl: float):
+        """Add or refresh sessions (connection_id -> info) for ttl seconds"""
+    
+    @abstractmethod
+    async def remove_presence(self, workspace_id: str, connection_id: str):
+        ...
+    
+    @abstractmethod
+    async def get_presence(self, workspace_id: str) -> List[dict]:
+        """Live sessions in a workspace across all workers"""
+    
+    async def close(self):
+        pass
+
+class InMemoryBackplane(Backplane):
+    """Process-local backplane for tests and single-worker development"""
+    
+    def __init__(self):
+        self._handlers: List[MessageHandler] = []
+        # workspace_id -> connection_id -> (expires_at, info)
+        self._presence: Dict[str, Dict[str, Tuple[float, dict]]] = {}
+    
+    async def publish(self, data: str):
+        for handler in list(self._handlers):
+            try:
+                handler(data)
+            except Exception:
+                logger.exception("Backplane handler failed")
+    
+    async def subscribe(self, handler: MessageHandler):
+        self._handlers.append(handler)
+    
+    async def set_presence(self, workspace_id: str, sessions: Dict[str, dict], ttl: float):
+        expires_at = time.monotonic() + ttl
+        entries = self._presence.setdefault(workspace_id, {})
+        for connection_id, info in sessions.items():
+            entries[connection_id] = (expires_at, info)
+    
+    async def remove_presence(self, workspace_id: str, connection_id: str):
+        self._presence.get(workspace_id, {}).pop(connection_id, None)
+    
+    async def get_presence(self, workspace_id: str) -> List[dict]:
+        entries = self._presence.get(workspace_id, {})
+        now = time.monotonic()
+        for connection_id in [c for c, (expires_at, _) in entries.items() if expires_at <= now]:
+            del entries[connection_id]
+        return [info for _, info in entries.values()]
+
+class RedisBackplane(Backplane):
+    """
+    Redis pub/sub on one channel; presence as a hash of session info plus a
+    sorted set of expiry times per workspace (hash fields can't carry a TTL).
+    """
+    
+    CHANNEL = "nexerp:realtime"
+    PRESENCE_KEY = "nexerp:presence:{}"
+    EXPIRY_KEY = "nexerp:presence:{}:expires"
+    
+    def __init__(self, url: str):
+        import redis.asyncio as redis
+        
+        self.client = redis.from_url(url, decode_responses=True)
+        self._listener: Optional[asyncio.Task] = None
+    
+    async def publish(self, data: str):
+        await self.client.publish(self.CHANNEL, data)
+    
+    async def subscribe(self, handler: MessageHandler):
+        pubsub = self.client.pubsub()
+        await pubsub.subscribe(self.CHANNEL)
+        self._listener = asyncio.create_task(self._listen(pubsub, handler))
+    
+    async def _listen(self, pubsub, handler: MessageHandler):
+        while True:
+            try:
+                message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+                if message is not None:
+                    handler(message["data"])
+            except asyncio.CancelledError:
+                await pubsub.close()
+                raise
+            except Exception:
+                logger.exception("Realtime backplane listener error; resubscribing")
+                await asyncio.sleep(1.0)
+                try:
+                    await pubsub.subscribe(self.CHANNEL)
+                except Exception:
+                    pass
+    
+    async def set_presence(self, workspace_id: str, sessions: Dict[str, dict], ttl: float):
+        if not sessions:
+            return
+        expires_at = time.time() + ttl
+        presence_key = self.PRESENCE_KEY.format(workspace_id)
+        expiry_key = self.EXPIRY_KEY.format(workspace_id)
+        async with self.client.pipeline(transaction=False) as pipe:
+            pipe.hset(presence_key, mapping={c: json.dumps(info) for c, info in sessions.items()})
+            pipe.zadd(expiry_key, {c: expires_at for c in sessions})
+            # The keys outlive any single session, but not an idle workspace
+            pipe.expire(presence_key, int(ttl) + 60)
+            pipe.expire(expiry_key, int(ttl) + 60)
+            await pipe.execute()
+    
+    async def remove_presence(self, workspace_id: str, connection_id: str):
+        async with self.client.pipeline(transaction=False) as pipe:
+            pipe.hdel(self.PRESENCE_KEY.format(workspace_id), connection_id)
+            pipe.zrem(self.EXPIRY_KEY.format(workspace_id), connection_id)
+            await pipe.execute()
+    
+    async def get_presence(self, workspace_id: str) -> List[dict]:
+        presence_key = self.PRESENCE_KEY.format(workspace_id)
+        expiry_key = self.EXPIRY_KEY.format(workspace_id)
+        expired = await self.client.zrangebyscore(expiry_key, "-inf", time.time())
+        if expired:
+            async with self.client.pipeline(transaction=False) as pipe:
+                pipe.hdel(presence_key, *expired)
+                pipe.zrem(expiry_key, *expired)
+                await pipe.execute()
+        return [json.loads(info) for info in (await self.client.hgetall(presence_key)).values()]
+    
+    async def close(self):
+        if self._listener is not None:
+            self._listener.cancel()
+        await self.client.aclose()
+
+def create_backplane(redis_url: Optional[str]) -> Optional[Backplane]:
+    """RedisBackplane when a URL is configured, otherwise no backplane (single worker)"""
+    return RedisBackplane(redis_url) if redis_url else None
@@ -1,37 +1,216 @@
 from fastapi import WebSocket, WebSocketDisconnect
-from typing import Dict, List
+from collections import OrderedDict
+from typing import Dict, Hashable, List, Optional
+from app.core.pubsub import Backplane, create_backplane
+import asyncio
+import itertools
 import uuid
 import json
+import logging
+import os
+import time
 from datetime import datetime
 
+logger = logging.getLogger(__name__)
+
+class ClientConnection:
+    """
+    One WebSocket with a bounded outbound queue drained by its own writer task,
+    so a slow client only ever delays itself. Messages carrying a coalesce key
+    (cursor moves, typing) replace their pending predecessor instead of queueing;
+    when the queue is full the oldest pending message is dropped.
+    """
+    
+    __slots__ = ("connection_id", "websocket", "max_queue", "send_timeout",
+                 "pending", "dropped", "coalesced", "sent", "closed", "_wakeup", "_task")
+    
+    _seq = itertools.count()
+    
+    def __init__(self, connection_id: str, websocket: WebSocket, max_queue: int = 256, send_timeout: float = 10.0):
+        self.connection_id = connection_id
+        self.websocket = websocket
+        self.max_queue = max_queue
+        self.send_timeout = send_timeout
+        # coalesce key (or unique sequence number) -> serialized message
+        self.pending: "OrderedDict[Hashable, str]" = OrderedDict()
+        self.dropped = 0
+        self.coalesced = 0
+        self.sent = 0
+        self.closed = False
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+    
+    def start(self):
+        self._task = asyncio.create_task(self._writer())
+    
+    def enqueue(self, text: str, coalesce_key: Hashable = None):
+        """Queue a serialized message without waiting on the socket"""
+        if self.closed:
+            return
+        if coalesce_key is not None and coalesce_key in self.pending:
+            # Latest state wins, keeping the original position in the queue
+            self.pending[coalesce_key] = text
+            self.coalesced += 1
+            return
+        if len(self.pending) >= self.max_queue:
+            self.pending.popitem(last=False)
+            self.dropped += 1
+        self.pending[coalesce_key if coalesce_key is not None else next(self._seq)] = text
+        self._wakeup.set()
+    
+    async def _writer(self):
+        try:
+            while not self.closed:
+                if not self.pending:
+                    self._wakeup.clear()
+                    await self._wakeup.wait()
+                    continue
+                _, text = self.pending.popitem(last=False)
+                async with asyncio.timeout(self.send_timeout):
+                    await self.websocket.send_text(text)
+                self.sent += 1
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            # Closed socket or a client too slow to take a frame within send_timeout
+            logger.debug("WebSocket %s writer stopped: %s", self.connection_id, e)
+        finally:
+            self.closed = True
+            self.pending.clear()
+    
+    def close(self):
+        self.closed = True
+        self.pending.clear()
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+    
+    async def drain(self):
+        """Wait until everything queued so far has been written (or the connection closed)"""
+        while self.pending and not self.closed:
+            await asyncio.sleep(0)
+
+class TokenBucket:
+    """Allows `rate` events per second on average, with bursts up to `capacity`"""
+    
+    __slots__ = ("rate", "capacity", "tokens", "updated")
+    
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+    
+    def allow(self, cost: float = 1.0) -> bool:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens < cost:
+            return False
+        self.tokens -= cost
+        return True
+
+class UserSession:
+    """Who is behind a connection; indexed by connection id, workspace and websocket"""
+    
+    __slots__ = ("connection_id", "workspace_id", "user_id", "user_email", "connected_at",
+                 "connection", "inbound", "rate_limited")
+    
+    def __init__(self, connection: ClientConnection, workspace_id: str, user_id: str, user_email: str, inbound: TokenBucket):
+        self.connection_id = connection.connection_id
+        self.workspace_id = workspace_id
+        self.user_id = user_id
+        self.user_email = user_email
+        self.connected_at = datetime.now().isoformat()
+        self.connection = connection
+        # Limits messages this client may send us
+        self.inbound = inbound
+        self.rate_limited = 0
+    
+    @property
+    def websocket(self) -> WebSocket:
+        return self.connection.websocket
+    
+    def to_presence(self) -> dict:
+        return {
+            "user_id": self.user_id,
+            "user_email": self.user_email,
+            "connected_at": self.connected_at,
+            "connection_id": self.connection_id
+        }
+
 class ConnectionManager:
     """Manage WebSocket connections for real-time features"""
     
-    def __init__(self):
-        # workspace_id -> list of WebSocket connections
-        self.active_connections: Dict[str, List[WebSocket]] = {}
-        # connection_id -> user_info
-        self.user_sessions: Dict[str, dict] = {}
+    # Connections queued per event-loop turn by broadcast_to_workspace
+    BROADCAST_SHARD = 1000
+    # Presence is refreshed every HEARTBEAT_INTERVAL and expires after SESSION_TTL
+    HEARTBEAT_INTERVAL = 20.0
+    SESSION_TTL = 60.0
+    # Cursor/typing updates are broadcast at most once per tick per user (latest wins)
+    EPHEMERAL_TICK = 0.05
+    # Inbound messages per connection: sustained rate per second and burst
+    INBOUND_RATE = 30.0
+    INBOUND_BURST = 60.0
+    
+    def __init__(self, max_queue: int = 256, send_timeout: float = 10.0, backplane: Optional[Backplane] = None):
+        self.max_queue = max_queue
+        self.send_timeout = send_timeout
+        # Shared with other workers; None keeps broadcasts and presence in this process
+        self.backplane = backplane
+        self.worker_id = uuid.uuid4().hex
+        # workspace_id -> {connection_id: ClientConnection}
+        self.active_connections: Dict[str, Dict[str, ClientConnection]] = {}
+        # connection_id -> session
+        self.user_sessions: Dict[str, UserSession] = {}
+        # websocket -> session, for callers that only hold the socket
+        self.sessions_by_websocket: Dict[WebSocket, UserSession] = {}
+        # workspace_id -> {user_id: {connection_id}}, for per-user pushes and O(1) user counts
+        self.workspace_users: Dict[str, Dict[str, set]] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._heartbeat_task: Optional[asyncio.Task] = None
+        self._background: set = set()
+        # workspace_id -> {coalesce key: (message, sender websocket)} awaiting the next tick
+        self._ephemeral: Dict[str, Dict[Hashable, tuple]] = {}
+        self._ephemeral_timer: Optional[asyncio.TimerHandle] = None
+        self.ephemeral_received = 0
+        self.ephemeral_broadcast = 0
+    
+    async def start(self):
+        """Subscribe to the backplane and start the presence heartbeat (idempotent)"""
+        if self._heartbeat_task is not None:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._heartbeat_task = asyncio.create_task(self._heartbeat())
+        if self.backplane is not None:
+            await self.backplane.subscribe(self._on_backplane_message)
+    
+    async def stop(self):
+        if self._heartbeat_task is not None:
+            self._heartbeat_task.cancel()
+            self._heartbeat_task = None
+        if self.backplane is not None:
+            await self.backplane.close()
     
     async def connect(self, websocket: WebSocket, workspace_id: str, user_id: str, user_email: str):
         """Accept new WebSocket connection"""
         await websocket.accept()
         
         connection_id = str(uuid.uuid4())
+        connection = ClientConnection(connection_id, websocket, self.max_queue, self.send_timeout)
+        connection.start()
         
         # Store connection
-        if workspace_id not in self.active_connections:
-            self.active_connections[workspace_id] = []
-        self.active_connections[workspace_id].append(websocket)
+        self.active_connections.setdefault(workspace_id, {})[connection_id] = connection
         
         # Store user session
-        self.user_sessions[connection_id] = {
-            "websocket": websocket,
-            "workspace_id": workspace_id,
-            "user_id": user_id,
-            "user_email": user_email,
-            "connected_at": datetime.now().isoformat()
-        }
+        session = UserSession(
+            connection, workspace_id, user_id, user_email, TokenBucket(self.INBOUND_RATE, self.INBOUND_BURST)
+        )
+        self.user_sessions[connection_id] = session
+        self.sessions_by_websocket[websocket] = session
+        self.workspace_users.setdefault(workspace_id, {}).setdefault(user_id, set()).add(connection_id)
+        if self.backplane is not None:
+            await self.backplane.set_presence(workspace_id, {connection_id: session.to_presence()}, self.SESSION_TTL)
         
         # Notify others of new connection
         await self.broadcast_to_workspace(workspace_id, {
@@ -45,63 +224,263 @@ class ConnectionManager:
     
     def disconnect(self, connection_id: str):
         """Remove WebSocket connection"""
-        if connection_id in self.user_sessions:
-            session = self.user_sessions[connection_id]
-            workspace_id = session["workspace_id"]
-            websocket = session["websocket"]
+        session = self.user_sessions.pop(connection_id, None)
+        if session is not None:
+            workspace_id = session.workspace_id
+            session.connection.close()
+            self.sessions_by_websocket.pop(session.websocket, None)
             
             # Remove from active connections
-            if workspace_id in self.active_connections:
-                self.active_connections[workspace_id].remove(websocket)
-                
-                if len(self.active_connections[workspace_id]) == 0:
-                    del self.active_connections[workspace_id]
+            connections = self.active_connections[workspace_id]
+            del connections[connection_id]
+            if not connections:
+                del self.active_connections[workspace_id]
+            users = self.workspace_users[workspace_id]
+            users[session.user_id].discard(connection_id)
+            if not users[session.user_id]:
+                del users[session.user_id]
+                if not users:
+                    del self.workspace_users[workspace_id]
             
             # Notify others of disconnection
             self.broadcast_to_workspace_sync(workspace_id, {
                 "type": "user_disconnected",
-                "user_id": session["user_id"],
-                "user_email": session["user_email"],
+                "user_id": session.user_id,
+                "user_email": session.user_email,
                 "timestamp": datetime.now().isoformat()
             })
             
-            del self.user_sessions[connection_id]
+            if self.backplane is not None:
+                self._run_in_background(self.backplane.remove_presence(workspace_id, connection_id))
     
     async def send_personal_message(self, message: dict, websocket: WebSocket):
         """Send message to specific connection"""
-        await websocket.send_json(message)
-    
-    async def broadcast_to_workspace(self, workspace_id: str, message: dict, exclude_websocket: WebSocket = None):
-        """Broadcast message to all connections in workspace"""
-        if workspace_id in self.active_connections:
-            for connection in self.active_connections[workspace_id]:
-                if connection != exclude_websocket:
-                    try:
-                        await connection.send_json(message)
-                    except:
-                        pass  # Connection might be closed
-    
-    def broadcast_to_workspace_sync(self, workspace_id: str, message: dict):
-        """Synchronous broadcast (for disconnect)"""
-        import asyncio
-        if workspace_id in self.active_connections:
-            for connection in self.active_connections[workspace_id]:
-                try:
-                    asyncio.create_task(connection.send_json(message))
-                except:
-                    pass
+        session = self.sessions_by_websocket.get(websocket)
+        if session is not None:
+            session.connection.enqueue(json.dumps(message))
+        else:
+            await websocket.send_json(message)
+    
+    def send_to_connection(self, connection_id: str, message: dict):
+        """Queue a message for one managed connection, behind anything already queued"""
+        session = self.user_sessions.get(connection_id)
+        if session is not None:
+            session.connection.enqueue(json.dumps(message))
+    
+    async def broadcast_to_workspace(
+        self,
+        workspace_id: str,
+        message: dict,
+        exclude_websocket: WebSocket = None,
+        coalesce_key: Hashable = None
+    ) -> int:
+        """
+        Broadcast message to all connections in workspace. Serializes once and
+        queues in shards of BROADCAST_SHARD connections, yielding to the event
+        loop between shards so a large workspace can't stall other tasks.
+        """
+        connections = list(self.active_connections.get(workspace_id, {}).values())
+        if not connections:
+            return 0
+        
+        text = json.dumps(message)
+        queued = 0
+        for start in range(0, len(connections), self.BROADCAST_SHARD):
+            if start:
+                await asyncio.sleep(0)
+            queued += self._enqueue_all(connections[start:start + self.BROADCAST_SHARD], text, exclude_websocket, coalesce_key)
+        if self.backplane is not None:
+            await self.backplane.publish(self._envelope(workspace_id, text, coalesce_key))
+        return queued
+    
+    def broadcast_to_workspace_sync(
+        self,
+        workspace_id: str,
+        message: dict,
+        exclude_websocket: WebSocket = None,
+        coalesce_key: Hashable = None
+    ) -> int:
+        """Broadcast without awaiting (for disconnect); queues on every connection at once"""
+        text = json.dumps(message)
+        if self.backplane is not None:
+            self._run_in_background(self.backplane.publish(self._envelope(workspace_id, text, coalesce_key)))
+        connections = self.active_connections.get(workspace_id)
+        if not connections:
+            return 0
+        return self._enqueue_all(list(connections.values()), text, exclude_websocket, coalesce_key)
+    
+    @staticmethod
+    def _enqueue_all(connections: List[ClientConnection], text: str, exclude_websocket, coalesce_key) -> int:
+        queued = 0
+        for connection in connections:
+            if not connection.closed and connection.websocket is not exclude_websocket:
+                connection.enqueue(text, coalesce_key)
+                queued += 1
+        return queued
+    
+    def allow_inbound(self, connection_id: str) -> bool:
+        """Charge one inbound message to the connection's token bucket"""
+        session = self.user_sessions.get(connection_id)
+        if session is None:
+            return False
+        if session.inbound.allow():
+            return True
+        session.rate_limited += 1
+        return False
+    
+    def broadcast_ephemeral(
+        self,
+        workspace_id: str,
+        message: dict,
+        coalesce_key: Hashable,
+        exclude_websocket: WebSocket = None
+    ):
+        """
+        Broadcast state that only matters in its latest form (cursor, typing).
+        Updates with the same key within one EPHEMERAL_TICK collapse into one
+        broadcast of the newest, sent at the end of the tick.
+        """
+        self.ephemeral_received += 1
+        self._ephemeral.setdefault(workspace_id, {})[coalesce_key] = (message, exclude_websocket)
+        if self._ephemeral_timer is None:
+            self._ephemeral_timer = asyncio.get_running_loop().call_later(self.EPHEMERAL_TICK, self.flush_ephemeral)
+    
+    def flush_ephemeral(self):
+        """Broadcast everything coalesced since the last tick"""
+        self._ephemeral_timer = None
+        pending, self._ephemeral = self._ephemeral, {}
+        for workspace_id, updates in pending.items():
+            for coalesce_key, (message, exclude_websocket) in updates.items():
+                self.broadcast_to_workspace_sync(workspace_id, message, exclude_websocket, coalesce_key)
+                self.ephemeral_broadcast += 1
+    
+    def send_to_user(self, workspace_id, user_id, message: dict):
+        """
+        Push a message to every connection of one user, on any worker. Safe to
+        call from request threads: delivery is handed to the event loop.
+        """
+        self.send_to_users(workspace_id, [user_id], message)
+    
+    def send_to_users(self, workspace_id, user_ids: List, message: dict):
+        """Push one message to many users: serialized once, one backplane publish"""
+        workspace_id = str(workspace_id)
+        user_ids = [str(u) for u in user_ids]
+        text = json.dumps(message, default=str)
+        
+        try:
+            in_loop = asyncio.get_running_loop() is self._loop
+        except RuntimeError:
+            in_loop = False
+        if in_loop or self._loop is None:
+            self._send_to_users(workspace_id, user_ids, text)
+        elif self._loop.is_running():
+            self._loop.call_soon_threadsafe(self._send_to_users, workspace_id, user_ids, text)
+    
+    def _send_to_users(self, workspace_id: str, user_ids: List[str], text: str):
+        if self.backplane is not None:
+            self._run_in_background(self.backplane.publish(self._envelope(workspace_id, text, None, user_ids)))
+        self._deliver_to_users(workspace_id, user_ids, text)
+    
+    def _deliver_to_users(self, workspace_id: str, user_ids: List[str], text: str):
+        users = self.workspace_users.get(workspace_id)
+        if not users:
+            return
+        for user_id in user_ids:
+            for connection_id in users.get(user_id, ()):
+                self.user_sessions[connection_id].connection.enqueue(text)
+    
+    def _envelope(self, workspace_id: str, text: str, coalesce_key: Hashable, user_ids: List[str] = None) -> str:
+        # The frame travels pre-serialized, so receiving workers don't re-encode it
+        return json.dumps({
+            "worker_id": self.worker_id,
+            "workspace_id": workspace_id,
+            "user_ids": user_ids,
+            "coalesce_key": list(coalesce_key) if isinstance(coalesce_key, tuple) else coalesce_key,
+            "frame": text
+        })
+    
+    def _on_backplane_message(self, data: str):
+        """Deliver a broadcast published by another worker to local sockets"""
+        envelope = json.loads(data)
+        if envelope["worker_id"] == self.worker_id:
+            return  # Already delivered locally
+        if envelope.get("user_ids") is not None:
+            self._deliver_to_users(envelope["workspace_id"], envelope["user_ids"], envelope["frame"])
+            return
+        connections = self.active_connections.get(envelope["workspace_id"])
+        if connections:
+            coalesce_key = envelope["coalesce_key"]
+            if isinstance(coalesce_key, list):
+                coalesce_key = tuple(coalesce_key)
+            self._enqueue_all(list(connections.values()), envelope["frame"], None, coalesce_key)
+    
+    def _run_in_background(self, coro):
+        try:
+            task = asyncio.get_running_loop().create_task(coro)
+        except RuntimeError:
+            coro.close()  # No event loop (e.g. called from sync code at shutdown)
+            return
+        # Keep a reference until done so the task isn't garbage collected mid-flight
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+    
+    async def _heartbeat(self):
+        """Drop sessions whose writer died and refresh presence for the rest"""
+        while True:
+            await asyncio.sleep(self.HEARTBEAT_INTERVAL)
+            try:
+                await self.heartbeat_once()
+            except Exception:
+                logger.exception("Realtime heartbeat failed")
+    
+    async def heartbeat_once(self):
+        for workspace_id, connections in list(self.active_connections.items()):
+            for connection in [c for c in connections.values() if c.closed]:
+                self.disconnect(connection.connection_id)
+            if self.backplane is not None and connections:
+                await self.backplane.set_presence(
+                    workspace_id,
+                    {c: self.user_sessions[c].to_presence() for c in connections},
+                    self.SESSION_TTL
+                )
+    
+    async def get_workspace_presence(self, workspace_id: str) -> List[dict]:
+        """Online users across all workers (this process only without a backplane)"""
+        if self.backplane is not None:
+            return await self.backplane.get_presence(workspace_id)
+        return self.get_online_users(workspace_id)
+    
+    def get_connection_stats(self, workspace_id: str) -> dict:
+        """Outbound queue health for a workspace"""
+        connections = list(self.active_connections.get(workspace_id, {}).values())
+        return {
+            "connections": len(connections),
+            "queued": sum(len(c.pending) for c in connections),
+            "max_queued": max((len(c.pending) for c in connections), default=0),
+            "dropped": sum(c.dropped for c in connections),
+            "coalesced": sum(c.coalesced for c in connections),
+            "closed": sum(c.closed for c in connections),
+            "rate_limited": sum(self.user_sessions[c.connection_id].rate_limited for c in connections),
+            # Process-wide: cursor/typing updates received vs broadcast after coalescing
+            "ephemeral_received": self.ephemeral_received,
+            "ephemeral_broadcast": self.ephemeral_broadcast
+        }
     
     def get_online_users(self, workspace_id: str) -> List[dict]:
-        """Get list of online users in workspace"""
+        """Get list of online users in workspace (one entry per connection)"""
         online_users = []
-        for session_id, session in self.user_sessions.items():
-            if session["workspace_id"] == workspace_id:
-                online_users.append({
-                    "user_id": session["user_id"],
-                    "user_email": session["user_email"],
-                    "connected_at": session["connected_at"]
-                })
+        for connection_id in self.active_connections.get(workspace_id, ()):
+            session = self.user_sessions[connection_id]
+            online_users.append({
+                "user_id": session.user_id,
+                "user_email": session.user_email,
+                "connected_at": session.connected_at
+            })
         return online_users
+    
+    def count_online_users(self, workspace_id: str) -> int:
+        """Distinct users online in workspace, in O(1)"""
+        return len(self.workspace_users.get(workspace_id, ()))
 
-# Global connection manager instance
-manager = ConnectionManager()
+# Global connection manager instance (shares broadcasts and presence via Redis when configured)
+manager = ConnectionManager(backplane=create_backplane(os.getenv("REDIS_URL")))
@@ -1,3 +1,5 @@
+from contextlib import asynccontextmanager
+import logging
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 # API Routers
@@ -17,7 +19,7 @@ from app.api import reports as reports_api
 # DISABLED ADVANCED API MODULES:
 # from app.api import ai, advanced_inventory, realtime, workflows
 
-from app.core.database import engine, Base
+from app.core.database import engine, Base, SessionLocal
 # Model Imports for table creation
 from app.models import auth as auth_models
 from app.models import inventory, accounting, ledger
@@ -29,16 +31,40 @@ from app.models import journals, finance as finance_models
 from app.models import notifications as notifications_models
 from app.models import rbac, currency_tax as currency_tax_models
 from app.models import reporting
+from app.models import workflow as workflow_models  # Event-triggered workflows run from the core routers' events
 # DISABLED ADVANCED MODELS:
-# from app.models import ai_settings, advanced_inventory, workflow
+# from app.models import ai_settings, advanced_inventory
+
+from app.core.events import event_bus
+from app.services.workflow_triggers import workflow_event_dispatcher
+from app.services.tax_service import TaxService
+
+logger = logging.getLogger(__name__)
 
 # Initialize Database
 Base.metadata.create_all(bind=engine)
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Queue event-triggered workflows for document events (PO, GRN, SO, DO, cash)
+    workflow_event_dispatcher.install(event_bus)
+    # Tax transactions recorded before the monthly summary existed
+    db = SessionLocal()
+    try:
+        TaxService.backfill_monthly_summary(db)
+    except Exception:
+        db.rollback()
+        logger.exception("Tax monthly summary backfill failed; the API starts without it")
+    finally:
+        db.close()
+    yield
+    event_bus.unsubscribe(workflow_event_dispatcher.handle)
+
 app = FastAPI(
     title="NexERP API",
     description="Backend API for NexERP - Modern Manufacturing & Service ERP",
-    version="0.1.0"
+    version="0.1.0",
+    lifespan=lifespan
 )
 
 # Configure CORS
@@ -61,6 +87,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
 # Core API Routers
@@ -1,6 +1,6 @@
 import uuid
 import enum
-from sqlalchemy import Column, String, DateTime, ForeignKey, Boolean, Numeric, Date, Integer
+from sqlalchemy import Column, String, DateTime, ForeignKey, Boolean, Numeric, Date, Integer, UniqueConstraint
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.sql import func
 from decimal import Decimal
@@ -69,3 +69,20 @@ class TaxTransaction(Base):
     tax_date = Column(Date)
     is_posted = Column(Boolean, default=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+class TaxMonthlySummary(Base):
+    """Monthly tax totals per tax type and NPWP, updated as tax transactions are recorded"""
+    __tablename__ = "tax_monthly_summaries"
+    __table_args__ = (
+        UniqueConstraint("workspace_id", "period", "tax_type", "npwp", name="uq_tax_monthly_summary"),
+    )
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    workspace_id = Column(UUID(as_uuid=True), ForeignKey("workspaces.id"))
+    period = Column(Date)  # First day of the month
+    tax_type = Column(String)  # TaxType enum
+    npwp = Column(String(20), default="")  # "" when the counterparty has no NPWP
+    transaction_count = Column(Integer, default=0)
+    tax_base_total = Column(Numeric(20, 2), default=0)
+    tax_amount_total = Column(Numeric(20, 2), default=0)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
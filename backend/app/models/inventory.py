@@ -1,5 +1,5 @@
 import uuid
-from sqlalchemy import Column, String, Boolean, DateTime, ForeignKey, Numeric, Enum as SqlEnum
+from sqlalchemy import Column, String, Boolean, DateTime, ForeignKey, Integer, Numeric, Enum as SqlEnum
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
@@ -36,6 +36,7 @@ class Product(Base):
     type = Column(SqlEnum(ProductType))
     valuation_method = Column(SqlEnum(ValuationMethod), default=ValuationMethod.AVERAGE)
     base_price = Column(Numeric(18, 2), default=0)
+    lead_time_days = Column(Integer, default=0) # Purchase or production lead time, used by MRP
     account_id = Column(UUID(as_uuid=True), nullable=True) # Link to COA
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
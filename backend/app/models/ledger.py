@@ -1,5 +1,5 @@
 import uuid
-from sqlalchemy import Column, String, DateTime, ForeignKey, Numeric, Enum as SqlEnum
+from sqlalchemy import Column, String, DateTime, ForeignKey, Numeric, Enum as SqlEnum, Index, BigInteger
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.sql import func
 from app.core.database import Base
@@ -14,6 +14,10 @@ class ReferenceType(str, enum.Enum):
 
 class StockLedger(Base):
     __tablename__ = "stock_ledger"
+    __table_args__ = (
+        # Replay in posting order when rebuilding cost layers
+        Index("ix_stock_ledger_replay", "product_id", "warehouse_id", "sequence"),
+    )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     product_id = Column(UUID(as_uuid=True), ForeignKey("products.id"))
@@ -23,4 +27,47 @@ class StockLedger(Base):
     unit_cost = Column(Numeric(18, 4))
     reference_type = Column(SqlEnum(ReferenceType))
     reference_id = Column(UUID(as_uuid=True))
+    sequence = Column(BigInteger)  # Posting order within (product, warehouse); NULL for rows posted before it existed
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+class StockCostLayer(Base):
+    """Open FIFO receipt layer: what is left of one receipt and what it cost"""
+    __tablename__ = "stock_cost_layers"
+    __table_args__ = (
+        Index("ix_stock_cost_layers_open", "product_id", "warehouse_id", "sequence"),
+    )
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    product_id = Column(UUID(as_uuid=True), ForeignKey("products.id"))
+    warehouse_id = Column(UUID(as_uuid=True), ForeignKey("warehouses.id"))
+    ledger_id = Column(UUID(as_uuid=True), ForeignKey("stock_ledger.id"), nullable=True)
+    sequence = Column(BigInteger)  # Consumption order within (product, warehouse)
+    qty_remaining = Column(Numeric(18, 4))
+    unit_cost = Column(Numeric(18, 4))
+
+class StockCostPosition(Base):
+    """Running quantity and value per (product, warehouse); the average cost is value / qty"""
+    __tablename__ = "stock_cost_positions"
+
+    product_id = Column(UUID(as_uuid=True), ForeignKey("products.id"), primary_key=True)
+    warehouse_id = Column(UUID(as_uuid=True), ForeignKey("warehouses.id"), primary_key=True)
+    qty = Column(Numeric(18, 4), default=0)
+    value = Column(Numeric(18, 4), default=0)
+    last_unit_cost = Column(Numeric(18, 4), default=0)
+    next_sequence = Column(BigInteger, default=0)
+    next_movement = Column(BigInteger, default=0)  # StockLedger.sequence of the next movement posted here
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+class StockSnapshot(Base):
+    """Closing stock balance of one (product, warehouse) at a period end of its workspace"""
+    __tablename__ = "stock_snapshots"
+    __table_args__ = (
+        Index("ix_stock_snapshots_workspace_closed", "workspace_id", "closed_at"),
+    )
+
+    closed_at = Column(DateTime(timezone=True), primary_key=True)  # Covers ledger rows created up to and including it
+    product_id = Column(UUID(as_uuid=True), ForeignKey("products.id"), primary_key=True)
+    warehouse_id = Column(UUID(as_uuid=True), ForeignKey("warehouses.id"), primary_key=True)
+    workspace_id = Column(UUID(as_uuid=True), ForeignKey("workspaces.id"), nullable=False)
+    qty = Column(Numeric(18, 4))
+    value = Column(Numeric(18, 4))
@@ -1,6 +1,6 @@
 import uuid
 import enum
-from sqlalchemy import Column, String, DateTime, ForeignKey, Numeric, Enum as SqlEnum, Boolean
+from sqlalchemy import Column, String, Date, DateTime, ForeignKey, Numeric, Enum as SqlEnum, Boolean, JSON, Index, UniqueConstraint
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
@@ -38,8 +38,44 @@ class BOMItem(Base):
     qty = Column(Numeric(18, 4))
     waste_percent = Column(Numeric(5, 2), default=0)
 
+class WorkCenter(Base):
+    __tablename__ = "work_centers"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    workspace_id = Column(UUID(as_uuid=True), ForeignKey("workspaces.id"))
+    code = Column(String, index=True)
+    name = Column(String)
+    weekly_hours = Column(JSON) # Capacity hours Monday..Sunday, e.g. [8, 8, 8, 8, 8, 0, 0]
+    is_active = Column(Boolean, default=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+class WorkCenterException(Base):
+    """Capacity on one date replacing the weekly hours (holiday = 0, overtime)"""
+    __tablename__ = "work_center_exceptions"
+    __table_args__ = (
+        UniqueConstraint("work_center_id", "day", name="uq_work_center_exceptions_day"),
+    )
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    work_center_id = Column(UUID(as_uuid=True), ForeignKey("work_centers.id"))
+    day = Column(Date)
+    hours = Column(Numeric(5, 2))
+
+class ProductionSchedule(Base):
+    """How a workspace's job orders were last scheduled; rescheduling reuses it"""
+    __tablename__ = "production_schedules"
+
+    workspace_id = Column(UUID(as_uuid=True), ForeignKey("workspaces.id"), primary_key=True)
+    rule = Column(String) # 'edd' or 'cr'
+    origin = Column(DateTime) # Schedule start; critical ratios are taken at it
+    scheduled_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
 class JobOrder(Base):
     __tablename__ = "job_orders"
+    __table_args__ = (
+        # A work center's sequence, read when rescheduling one order
+        Index("ix_job_orders_assigned_start", "assigned_work_center_id", "start_date"),
+    )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     workspace_id = Column(UUID(as_uuid=True), ForeignKey("workspaces.id"))
@@ -50,10 +86,15 @@ class JobOrder(Base):
     approved_by = Column(UUID(as_uuid=True), nullable=True)
     
     product_id = Column(UUID(as_uuid=True), ForeignKey("products.id"), nullable=True) # If manufacturing
+    quantity = Column(Numeric(18, 4), default=1) # Units of product_id to build
     partner_id = Column(UUID(as_uuid=True), ForeignKey("partners.id"), nullable=True) # If service/project
     
     start_date = Column(DateTime)
     end_date = Column(DateTime)
+    due_date = Column(DateTime, nullable=True)
+    work_center_id = Column(UUID(as_uuid=True), ForeignKey("work_centers.id"), nullable=True) # Required work center, if any
+    assigned_work_center_id = Column(UUID(as_uuid=True), ForeignKey("work_centers.id"), nullable=True) # Set by the scheduler
+    processing_hours = Column(Numeric(10, 2), default=0)
     tax_rate = Column(Numeric(5, 2), default=0)
     tax_amount = Column(Numeric(18, 2), default=0)
     total_cost = Column(Numeric(18, 2), default=0)
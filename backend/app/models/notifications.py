@@ -1,6 +1,6 @@
 import uuid
 import enum
-from sqlalchemy import Column, String, DateTime, ForeignKey, Boolean, Enum as SqlEnum, Text
+from sqlalchemy import Column, String, DateTime, ForeignKey, Boolean, Integer, Enum as SqlEnum, Text, Index
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.sql import func
 from app.core.database import Base
@@ -22,6 +22,11 @@ class NotificationPriority(str, enum.Enum):
 
 class Notification(Base):
     __tablename__ = "notifications"
+    __table_args__ = (
+        # Inbox pages: newest first per user, optionally unread only (keyset on created_at, id)
+        Index("ix_notifications_user_read_created", "user_id", "is_read", "created_at", "id"),
+        Index("ix_notifications_user_created", "user_id", "created_at", "id"),
+    )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     workspace_id = Column(UUID(as_uuid=True), ForeignKey("workspaces.id"))
@@ -33,3 +38,12 @@ class Notification(Base):
     link = Column(String, nullable=True)  # URL to related item
     is_read = Column(Boolean, default=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+class NotificationCounter(Base):
+    """Unread notifications per user, kept in step with Notification writes"""
+    __tablename__ = "notification_counters"
+
+    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), primary_key=True)
+    workspace_id = Column(UUID(as_uuid=True), ForeignKey("workspaces.id"))
+    unread_count = Column(Integer, default=0, nullable=False)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
@@ -1,6 +1,6 @@
 import uuid
 import enum
-from sqlalchemy import Column, String, DateTime, ForeignKey, Boolean, Integer, JSON, Text
+from sqlalchemy import Column, String, DateTime, ForeignKey, Boolean, Integer, BigInteger, JSON, Text, Index
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.sql import func
 from app.core.database import Base
@@ -33,6 +33,7 @@ class Workflow(Base):
     
     # Visual designer data (node positions, connections)
     flow_data = Column(JSON)  # React Flow compatible format
+    version = Column(Integer, default=1)  # Bumped on every flow_data change
     
     # Status
     status = Column(String, default=WorkflowStatus.DRAFT.value)
@@ -76,15 +77,71 @@ class WorkflowExecution(Base):
     context_data = Column(JSON)  # Input data for execution
     
     # Results
-    execution_log = Column(JSON)  # Step-by-step log
+    execution_log = Column(JSON, nullable=True)  # Legacy step log; steps are in workflow_execution_steps
     error_message = Column(Text, nullable=True)
     
     started_at = Column(DateTime(timezone=True), server_default=func.now())
     completed_at = Column(DateTime(timezone=True), nullable=True)
 
+class WorkflowExecutionStep(Base):
+    """Append-only per-node log of a workflow execution (one row per executed node)"""
+    __tablename__ = "workflow_execution_steps"
+
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True, autoincrement=True)
+    execution_id = Column(UUID(as_uuid=True), ForeignKey("workflow_executions.id"), index=True)
+    attempt = Column(Integer, default=1)  # Queue attempt that ran the step; seq restarts on each retry
+    seq = Column(Integer)  # Order of execution within the attempt
+    node_id = Column(String)
+    node_type = Column(String)
+    status = Column(String(10))  # ok, error
+    result = Column(String(255), nullable=True)
+    # Monotonic-clock timings, relative to the start of the execution
+    offset_ns = Column(BigInteger)
+    duration_ns = Column(BigInteger)
+
+class WorkflowNodeStats(Base):
+    """Running latency totals per workflow node (kept when old steps are compacted)"""
+    __tablename__ = "workflow_node_stats"
+
+    workflow_id = Column(UUID(as_uuid=True), ForeignKey("workflows.id"), primary_key=True)
+    node_id = Column(String, primary_key=True)
+    node_type = Column(String)
+    run_count = Column(BigInteger, default=0)
+    error_count = Column(BigInteger, default=0)
+    total_ns = Column(BigInteger, default=0)
+    max_ns = Column(BigInteger, default=0)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+class WorkflowJob(Base):
+    """Durable queue entry for a workflow execution (drained by workflow workers)"""
+    __tablename__ = "workflow_jobs"
+    __table_args__ = (
+        Index("ix_workflow_jobs_claim", "status", "run_after"),
+    )
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    workspace_id = Column(UUID(as_uuid=True), ForeignKey("workspaces.id"))
+    workflow_id = Column(UUID(as_uuid=True), ForeignKey("workflows.id"))
+    execution_id = Column(UUID(as_uuid=True), ForeignKey("workflow_executions.id"))
+    
+    status = Column(String, default="queued")  # queued, running, done, failed
+    attempts = Column(Integer, default=0)
+    max_attempts = Column(Integer, default=3)
+    run_after = Column(DateTime(timezone=True), server_default=func.now())  # Backoff: not claimable before this
+    
+    # Claim bookkeeping (stale claims are re-queued)
+    locked_by = Column(String, nullable=True)
+    locked_at = Column(DateTime(timezone=True), nullable=True)
+    last_error = Column(Text, nullable=True)
+    
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
 class ApprovalRequest(Base):
     """Approval requests from workflows"""
     __tablename__ = "approval_requests"
+    __table_args__ = (
+        Index("ix_approval_requests_inbox", "approver_id", "status", "created_at", "id"),
+    )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     workspace_id = Column(UUID(as_uuid=True), ForeignKey("workspaces.id"))
@@ -95,6 +152,11 @@ class ApprovalRequest(Base):
     description = Column(Text)
     approver_id = Column(UUID(as_uuid=True), ForeignKey("users.id"))
     
+    # Document under approval and who asked (set by NotificationService.create_approval_request)
+    document_type = Column(String, nullable=True)
+    document_id = Column(UUID(as_uuid=True), nullable=True)
+    requested_by = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=True)
+    
     # Status
     status = Column(String, default="pending")  # pending, approved, rejected
     decision_notes = Column(Text, nullable=True)
@@ -1,11 +1,89 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import and_, func
+from sqlalchemy import and_, func, insert
+from sqlalchemy.exc import IntegrityError
 from datetime import datetime, date, timedelta
 from app.models.advanced_inventory import SerialNumber, BatchLot, BarcodeMapping, StockReorderRule
 from app.models.inventory import Product
 from app.models.ledger import StockLedger
+from collections import Counter
+import math
+import threading
+import time
 import uuid
-from typing import Optional, List
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+MAX_SERIALS_PER_REQUEST = 20_000  # Keeps the uniqueness check to one IN query
+MAX_SERIAL_WIDTH = 20  # Zero-padding digits of a generated serial counter
+
+class BarcodeEntry(NamedTuple):
+    product_id: uuid.UUID
+    code: str
+    name: str
+    type: Optional[str]
+
+def _barcode_query(db: Session, workspace_id: uuid.UUID):
+    """Barcode mappings joined to their products, as plain columns"""
+    return db.query(
+        BarcodeMapping.barcode, Product.id, Product.code, Product.name, Product.type
+    ).join(Product, BarcodeMapping.product_id == Product.id).filter(BarcodeMapping.workspace_id == workspace_id)
+
+class BarcodeIndex:
+    """
+    Per-workspace barcode -> product map for scanning, loaded with one join
+    and updated in place by register_barcode. Entries expire after max_age
+    seconds so barcodes registered or products renamed through other worker
+    processes are picked up; a miss is also checked against the database.
+    """
+    
+    def __init__(self, max_age: float = 300.0):
+        self.max_age = max_age
+        # workspace_id -> (loaded_at, barcode -> entry)
+        self._indexes: Dict[uuid.UUID, Tuple[float, Dict[str, BarcodeEntry]]] = {}
+        self._lock = threading.Lock()
+    
+    def _load(self, db: Session, workspace_id: uuid.UUID) -> Dict[str, BarcodeEntry]:
+        cached = self._indexes.get(workspace_id)
+        if cached and time.monotonic() - cached[0] < self.max_age:
+            return cached[1]
+        
+        entries = {row[0]: BarcodeEntry(*row[1:]) for row in _barcode_query(db, workspace_id)}
+        with self._lock:
+            self._indexes[workspace_id] = (time.monotonic(), entries)
+        return entries
+    
+    def lookup(self, db: Session, workspace_id: uuid.UUID, barcode: str) -> Optional[BarcodeEntry]:
+        entry = self._load(db, workspace_id).get(barcode)
+        if entry is None:
+            row = _barcode_query(db, workspace_id).filter(BarcodeMapping.barcode == barcode).first()
+            if row is not None:
+                entry = BarcodeEntry(*row[1:])
+                self.add(workspace_id, barcode, entry)
+        return entry
+    
+    def lookup_many(self, db: Session, workspace_id: uuid.UUID, barcodes: Iterable[str]) -> Dict[str, BarcodeEntry]:
+        barcodes = list(barcodes)
+        entries = self._load(db, workspace_id)
+        found = {barcode: entries[barcode] for barcode in barcodes if barcode in entries}
+        missing = [barcode for barcode in barcodes if barcode not in found]
+        if missing:
+            for barcode, entry in AdvancedInventoryService.lookup_barcodes(db, workspace_id, missing).items():
+                found[barcode] = entry
+                self.add(workspace_id, barcode, entry)
+        return found
+    
+    def add(self, workspace_id: uuid.UUID, barcode: str, entry: BarcodeEntry):
+        """Put one barcode into a loaded workspace index"""
+        with self._lock:
+            cached = self._indexes.get(workspace_id)
+            if cached is not None:
+                cached[1][barcode] = entry
+    
+    def invalidate(self, workspace_id: Optional[uuid.UUID] = None):
+        with self._lock:
+            if workspace_id is None:
+                self._indexes.clear()
+            else:
+                self._indexes.pop(workspace_id, None)
 
 class AdvancedInventoryService:
     
@@ -46,6 +124,72 @@ class AdvancedInventoryService:
             )
         ).all()
     
+    @staticmethod
+    def serial_range(prefix: str, start: int, count: int, width: int = 0) -> List[str]:
+        """prefix followed by count consecutive counters from start, zero-padded to width digits"""
+        if count <= 0 or start < 0:
+            raise ValueError("Serial range needs a positive count and a non-negative start")
+        if count > MAX_SERIALS_PER_REQUEST:
+            raise ValueError(f"At most {MAX_SERIALS_PER_REQUEST} serial numbers per request")
+        if not 0 <= width <= MAX_SERIAL_WIDTH:
+            raise ValueError(f"Serial counter width must be between 0 and {MAX_SERIAL_WIDTH}")
+        return [f"{prefix}{n:0{width}d}" for n in range(start, start + count)]
+    
+    @staticmethod
+    def create_serial_numbers(
+        db: Session,
+        workspace_id: uuid.UUID,
+        product_id: uuid.UUID,
+        serial_numbers: List[str],
+        warehouse_id: Optional[uuid.UUID] = None
+    ) -> int:
+        """
+        Register many serial numbers in one transaction: one query checks
+        them against the unique serial_number index, one executemany INSERT
+        writes them (multi-row VALUES batches on PostgreSQL drivers that
+        support insertmanyvalues). Raises ValueError naming the duplicates, or
+        if the product is not in the workspace.
+        """
+        if not serial_numbers:
+            return 0
+        if len(serial_numbers) > MAX_SERIALS_PER_REQUEST:
+            raise ValueError(f"At most {MAX_SERIALS_PER_REQUEST} serial numbers per request")
+        unique = set(serial_numbers)
+        if len(unique) != len(serial_numbers):
+            repeated = sorted(sn for sn, n in Counter(serial_numbers).items() if n > 1)
+            raise ValueError(f"Repeated serial numbers: {', '.join(repeated[:10])}")
+        
+        product = db.query(Product.id).filter(Product.id == product_id, Product.workspace_id == workspace_id).first()
+        if product is None:
+            raise ValueError("Product not found")
+        
+        existing = db.query(SerialNumber.serial_number).filter(SerialNumber.serial_number.in_(list(unique)))
+        taken = sorted(sn for sn, in existing)
+        if taken:
+            raise ValueError(f"{len(taken)} serial numbers already exist: {', '.join(taken[:10])}")
+        
+        today = date.today()
+        rows = [
+            {
+                "id": uuid.uuid4(),
+                "workspace_id": workspace_id,
+                "product_id": product_id,
+                "serial_number": sn,
+                "warehouse_id": warehouse_id,
+                "received_date": today,
+                "status": "available"
+            }
+            for sn in serial_numbers
+        ]
+        try:
+            db.connection().execute(insert(SerialNumber), rows)
+            db.commit()
+        except IntegrityError:
+            # Registered concurrently since the check
+            db.rollback()
+            raise ValueError("Some serial numbers were registered concurrently; retry the request")
+        return len(rows)
+    
     @staticmethod
     def create_batch(
         db: Session,
@@ -109,6 +253,10 @@ class AdvancedInventoryService:
         db.add(mapping)
         db.commit()
         db.refresh(mapping)
+        
+        product = db.query(Product.id, Product.code, Product.name, Product.type).filter(Product.id == product_id).first()
+        if product is not None:
+            barcode_index.add(workspace_id, barcode, BarcodeEntry(*product))
         return mapping
     
     @staticmethod
@@ -118,16 +266,25 @@ class AdvancedInventoryService:
         barcode: str
     ) -> Optional[Product]:
         """Find product by barcode"""
-        mapping = db.query(BarcodeMapping).filter(
+        return db.query(Product).join(BarcodeMapping, BarcodeMapping.product_id == Product.id).filter(
             and_(
                 BarcodeMapping.workspace_id == workspace_id,
                 BarcodeMapping.barcode == barcode
             )
         ).first()
-        
-        if mapping:
-            return db.query(Product).filter(Product.id == mapping.product_id).first()
-        return None
+    
+    @staticmethod
+    def lookup_barcodes(
+        db: Session,
+        workspace_id: uuid.UUID,
+        barcodes: Iterable[str]
+    ) -> Dict[str, BarcodeEntry]:
+        """Resolve a batch of scanned barcodes in one query; unknown ones are left out"""
+        barcodes = list(set(barcodes))
+        if not barcodes:
+            return {}
+        rows = _barcode_query(db, workspace_id).filter(BarcodeMapping.barcode.in_(barcodes))
+        return {row[0]: BarcodeEntry(*row[1:]) for row in rows}
     
     @staticmethod
     def create_reorder_rule(
@@ -154,8 +311,12 @@ class AdvancedInventoryService:
         return rule
     
     @staticmethod
-    def check_reorder_points(db: Session, workspace_id: uuid.UUID) -> List[dict]:
-        """Check which products need reordering"""
+    def check_reorder_points(db: Session, workspace_id: uuid.UUID, plan=None) -> List[dict]:
+        """
+        Check which products need reordering. With an MRPPlan, a rule also fires
+        when stock after the plan's demand and incoming supply over its horizon
+        (product-wide, across warehouses) would drop below the minimum.
+        """
         reorder_suggestions = []
         
         rules = db.query(StockReorderRule).filter(
@@ -164,20 +325,28 @@ class AdvancedInventoryService:
                 StockReorderRule.is_active == True
             )
         ).all()
+        if not rules:
+            return reorder_suggestions
+        
+        # Current stock and products for every rule in one query each
+        product_ids = {rule.product_id for rule in rules}
+        stock = {
+            (product_id, warehouse_id): qty
+            for product_id, warehouse_id, qty in db.query(
+                StockLedger.product_id, StockLedger.warehouse_id, func.sum(StockLedger.qty)
+            ).filter(StockLedger.product_id.in_(product_ids)).group_by(StockLedger.product_id, StockLedger.warehouse_id)
+        }
+        products = {p.id: p for p in db.query(Product).filter(Product.id.in_(product_ids))}
         
         for rule in rules:
-            # Calculate current stock
-            current_stock = db.query(func.sum(StockLedger.quantity)).filter(
-                and_(
-                    StockLedger.workspace_id == workspace_id,
-                    StockLedger.product_id == rule.product_id,
-                    StockLedger.warehouse_id == rule.warehouse_id
-                )
-            ).scalar() or 0
+            current_stock = float(stock.get((rule.product_id, rule.warehouse_id)) or 0)
+            projected_stock = current_stock
+            if plan is not None:
+                projected_stock += plan.incoming(rule.product_id) - plan.demand(rule.product_id)
             
-            if current_stock < rule.min_quantity:
-                product = db.query(Product).filter(Product.id == rule.product_id).first()
-                reorder_suggestions.append({
+            if projected_stock < rule.min_quantity:
+                product = products.get(rule.product_id)
+                suggestion = {
                     "product_id": str(rule.product_id),
                     "product_code": product.code if product else "N/A",
                     "product_name": product.name if product else "N/A",
@@ -185,6 +354,15 @@ class AdvancedInventoryService:
                     "min_quantity": rule.min_quantity,
                     "suggested_reorder": rule.reorder_quantity,
                     "urgency": "high" if current_stock < (rule.min_quantity * 0.5) else "medium"
-                })
+                }
+                if plan is not None:
+                    suggestion["planned_demand"] = plan.demand(rule.product_id)
+                    suggestion["projected_stock"] = projected_stock
+                    # Enough to get back to the minimum after the planned demand
+                    suggestion["suggested_reorder"] = max(rule.reorder_quantity or 0, math.ceil(rule.min_quantity - projected_stock))
+                reorder_suggestions.append(suggestion)
         
         return reorder_suggestions
+
+# Global barcode index instance
+barcode_index = BarcodeIndex()
@@ -0,0 +1,449 @@
+"""
+Migration of the legacy AIP (Visual FoxPro) tables into NexERP.
+
+Every target table has a mapper that streams its source DBF and yields row
+tuples; the loader bulk-loads them with COPY on PostgreSQL (through a temp
+table, so rows that already exist are skipped) and with batched executemany on
+other databases. Tables are loaded in waves so foreign keys always resolve, and
+the tables within a wave load in parallel, one connection each.
+
+Row ids are derived from the legacy keys (uuid5), so running the migration
+again inserts only what's new.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence
+import enum
+import logging
+import os
+import time
+import uuid
+from sqlalchemy import select
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+from app.core.database import dialect_insert
+from app.models.accounting import BankAccount, COA, COAType, Partner, PartnerCategory
+from app.models.inventory import Product, ProductType
+from app.models.journals import Journal, JournalItem, JournalStatus
+from app.models.manufacturing import BillOfMaterials, BOMItem
+from app.services.dbf_reader import DBFReader
+
+logger = logging.getLogger(__name__)
+
+# Namespace for ids derived from legacy keys
+AIP_NAMESPACE = uuid.UUID("6f3b7c1e-2a4d-5e8f-9b0a-1c2d3e4f5a6b")
+
+class MigrationStats:
+    __slots__ = ("table", "sources", "bytes", "read", "skipped", "loaded", "updated", "deleted", "unchanged", "seconds")
+    
+    def __init__(self, table: str, sources: Sequence[str]):
+        self.table = table
+        self.sources = list(sources)
+        self.bytes = 0
+        self.read = 0
+        self.skipped = 0
+        self.loaded = 0
+        self.updated = 0
+        self.deleted = 0
+        self.unchanged = False  # Incremental sync found the sources untouched
+        self.seconds = 0.0
+    
+    @property
+    def rows_per_second(self) -> float:
+        return self.read / self.seconds if self.seconds else 0.0
+
+class MigrationContext:
+    """What mappers share: the source directory, workspace and code -> id lookups"""
+    
+    def __init__(self, source_dir: str, workspace_id: uuid.UUID):
+        self.source_dir = source_dir
+        self.workspace_id = workspace_id
+        self.lookups: Dict[str, Dict[str, uuid.UUID]] = {}
+        self.bom_ids: set = set()  # BOMs have no natural key column; ids come from BOMID
+        self._files = {name.lower(): name for name in os.listdir(source_dir)}
+    
+    def path(self, filename: str) -> Optional[str]:
+        name = self._files.get(filename.lower())
+        return os.path.join(self.source_dir, name) if name else None
+    
+    def row_id(self, table: str, key: str) -> uuid.UUID:
+        return uuid.uuid5(AIP_NAMESPACE, f"{self.workspace_id}/{table}/{key}")
+    
+    def open(self, filename: str, stats: MigrationStats) -> Optional[DBFReader]:
+        path = self.path(filename)
+        if path is None:
+            logger.warning("AIP table %s not found in %s", filename, self.source_dir)
+            return None
+        reader = DBFReader(path)
+        stats.bytes += reader.size + (os.path.getsize(reader.memo.path) if reader.memo else 0)
+        return reader
+
+# ---------------------------------------------------------------------------
+# Mappers: (context, stats) -> iterator of row tuples in the job's column order
+# ---------------------------------------------------------------------------
+
+def _coa_type(kind: str, code: str, name: str) -> COAType:
+    kind = kind.upper()
+    if kind == "AKTIVA":
+        return COAType.ASSET
+    if kind == "PASSIVA":
+        return COAType.LIABILITY
+    if kind in ("MODAL", "LABA DITAHAN", "LABA PERIODE BERJALAN"):
+        return COAType.EQUITY
+    # Profit & loss ("RL"): 5x are sales, everything else costs, bar named income lines
+    if code.startswith("5") or name.lower().startswith(("pendapatan", "penjualan")):
+        return COAType.INCOME
+    return COAType.EXPENSE
+
+def _coa_parent(code: str, codes: set) -> Optional[str]:
+    """AIP codes are GG.SSS.DD: a detail's parent is GG.SSS.00, a subgroup's GG.000.00"""
+    parts = code.split(".")
+    if len(parts) != 3:
+        return None
+    group, sub, detail = parts
+    candidates = []
+    if detail.strip("0"):
+        candidates.append(f"{group}.{sub}.00")
+    if sub.strip("0"):
+        candidates.append(f"{group}.000.00")
+    return next((c for c in candidates if c in codes), None)
+
+def map_chart_of_accounts(ctx: MigrationContext, stats: MigrationStats) -> Iterator[tuple]:
+    reader = ctx.open("ACC.DBF", stats)
+    if reader is None:
+        return
+    with reader:
+        accounts = {}
+        for code, name, kind in reader.records(["ACC", "DES", "TYPECOA"]):
+            stats.read += 1
+            if not code:
+                stats.skipped += 1
+                continue
+            accounts[code] = (name, kind)  # One row per year (TH); the latest wins
+    codes = set(accounts) | set(ctx.lookups["coa"])
+    for code, (name, kind) in accounts.items():
+        parent = _coa_parent(code, codes)
+        if parent:
+            parent = ctx.lookups["coa"].get(parent) or ctx.row_id("coa", parent)
+        yield ctx.row_id("coa", code), ctx.workspace_id, code, name, _coa_type(kind, code, name), parent, True
+
+def map_partners(ctx: MigrationContext, stats: MigrationStats) -> Iterator[tuple]:
+    partners: Dict[str, list] = {}
+    for filename, key, category in (("CST.DBF", "CST", PartnerCategory.CUSTOMER),
+                                    ("SUP.DBF", "SUP", PartnerCategory.SUPPLIER)):
+        reader = ctx.open(filename, stats)
+        if reader is None:
+            continue
+        with reader:
+            for code, name, street, city, credit_limit in reader.records([key, "DES", "AL", "KT", "CT"]):
+                stats.read += 1
+                if not code:
+                    stats.skipped += 1
+                    continue
+                existing = partners.get(code)
+                if existing and existing[1] != category:
+                    existing[1] = PartnerCategory.BOTH  # Same code on both ledgers
+                    continue
+                address = "\n".join(p for p in (street, city) if p)
+                partners[code] = [name, category, credit_limit or Decimal(0), address]
+    for code, (name, category, credit_limit, address) in partners.items():
+        yield ctx.row_id("partner", code), ctx.workspace_id, code, name, category, credit_limit, address
+
+def map_products(ctx: MigrationContext, stats: MigrationStats) -> Iterator[tuple]:
+    reader = ctx.open("ITM.DBF", stats)
+    if reader is None:
+        return
+    with reader:
+        seen = set()
+        for code, name, uom, price in reader.records(["ITM", "DES", "STN", "HGJ"]):
+            stats.read += 1
+            if not code or code in seen:
+                stats.skipped += 1
+                continue
+            seen.add(code)
+            yield (
+                ctx.row_id("product", code), ctx.workspace_id, code, name, uom or "PCS",
+                ProductType.RAW, price or Decimal(0)
+            )
+
+def map_bank_accounts(ctx: MigrationContext, stats: MigrationStats) -> Iterator[tuple]:
+    reader = ctx.open("BANK.DBF", stats)
+    if reader is None:
+        return
+    accounts = ctx.lookups["coa"]
+    with reader:
+        for code, name, account in reader.records(["KODE", "NAMA", "ACC"]):
+            stats.read += 1
+            if not code or account not in accounts:
+                stats.skipped += 1
+                continue
+            yield ctx.row_id("bank", code), ctx.workspace_id, accounts[account], name, code, "IDR"
+
+def map_bill_of_materials(ctx: MigrationContext, stats: MigrationStats) -> Iterator[tuple]:
+    reader = ctx.open("BOMH.DBF", stats)
+    if reader is None:
+        return
+    products = ctx.lookups["product"]
+    with reader:
+        for bom_id, product, name in reader.records(["BOMID", "ITM", "DES"]):
+            stats.read += 1
+            if not bom_id:
+                stats.skipped += 1
+                continue
+            yield ctx.row_id("bom", bom_id), ctx.workspace_id, products.get(product), name or bom_id, True
+
+def map_bom_items(ctx: MigrationContext, stats: MigrationStats) -> Iterator[tuple]:
+    reader = ctx.open("BOML.DBF", stats)
+    if reader is None:
+        return
+    products = ctx.lookups["product"]
+    with reader:
+        for bom_id, line, component, qty in reader.records(["BOMID", "REC", "ITM", "QTY"]):
+            stats.read += 1
+            bom = ctx.row_id("bom", bom_id)
+            if bom not in ctx.bom_ids or component not in products:
+                stats.skipped += 1
+                continue
+            yield ctx.row_id("bom_item", f"{bom_id}/{line}/{component}"), bom, products[component], qty or 0, 0
+
+def map_journals(ctx: MigrationContext, stats: MigrationStats) -> Iterator[tuple]:
+    reader = ctx.open("JRN.DBF", stats)
+    if reader is None:
+        return
+    with reader:
+        # Lines of one voucher share REF; the first line carries the header fields
+        seen = set()
+        for ref, posted_on, note, line_note in reader.records(["REF", "TGL", "DES", "K01"]):
+            stats.read += 1
+            if not ref:
+                stats.skipped += 1
+                continue
+            if ref in seen:
+                continue
+            seen.add(ref)
+            yield (
+                ctx.row_id("journal", ref), ctx.workspace_id, posted_on, ref, note or line_note,
+                "AIP", JournalStatus.POSTED
+            )
+
+def map_journal_items(ctx: MigrationContext, stats: MigrationStats) -> Iterator[tuple]:
+    reader = ctx.open("JRN.DBF", stats)
+    if reader is None:
+        return
+    journals, accounts, partners = ctx.lookups["journal"], ctx.lookups["coa"], ctx.lookups["partner"]
+    with reader:
+        lines: Dict[str, int] = {}
+        for ref, account, debit, credit, partner, note in reader.records(["REF", "ACC", "DEB", "CRD", "CST", "K01"]):
+            stats.read += 1
+            if ref not in journals or account not in accounts:
+                stats.skipped += 1
+                continue
+            lines[ref] = line = lines.get(ref, 0) + 1
+            yield (
+                ctx.row_id("journal_item", f"{ref}/{line}"), journals[ref], accounts[account],
+                debit or 0, credit or 0, partners.get(partner), note or None
+            )
+
+class MigrationJob:
+    __slots__ = ("name", "model", "columns", "mapper", "sources")
+    
+    def __init__(self, name: str, model, columns: Sequence[str], mapper: Callable, sources: Sequence[str]):
+        self.name = name
+        self.model = model
+        self.columns = list(columns)
+        self.mapper = mapper
+        self.sources = list(sources)
+
+JOBS = {job.name: job for job in (
+    MigrationJob("chart_of_accounts", COA, ["id", "workspace_id", "code", "name", "type", "parent_id", "is_active"],
+                 map_chart_of_accounts, ["ACC.DBF"]),
+    MigrationJob("partners", Partner, ["id", "workspace_id", "code", "name", "category", "credit_limit", "address"],
+                 map_partners, ["CST.DBF", "SUP.DBF"]),
+    MigrationJob("products", Product, ["id", "workspace_id", "code", "name", "uom", "type", "base_price"],
+                 map_products, ["ITM.DBF"]),
+    MigrationJob("bank_accounts", BankAccount, ["id", "workspace_id", "coa_id", "bank_name", "account_number", "currency"],
+                 map_bank_accounts, ["BANK.DBF"]),
+    MigrationJob("bill_of_materials", BillOfMaterials, ["id", "workspace_id", "product_id", "name", "is_active"],
+                 map_bill_of_materials, ["BOMH.DBF"]),
+    MigrationJob("journals", Journal, ["id", "workspace_id", "date", "ref_no", "description", "source_type", "approval_status"],
+                 map_journals, ["JRN.DBF"]),
+    MigrationJob("bom_items", BOMItem, ["id", "bom_id", "component_id", "qty", "waste_percent"],
+                 map_bom_items, ["BOML.DBF"]),
+    MigrationJob("journal_items", JournalItem, ["id", "journal_id", "coa_id", "debit", "credit", "partner_id", "description"],
+                 map_journal_items, ["JRN.DBF"]),
+)}
+
+# Each wave only references tables from earlier waves
+WAVES = [
+    ["chart_of_accounts", "partners", "products"],
+    ["bank_accounts", "bill_of_materials", "journals"],
+    ["bom_items", "journal_items"],
+]
+
+# Lookups refreshed from the database after each wave: name -> (model, key column)
+LOOKUPS = {
+    "coa": (COA, COA.code),
+    "partner": (Partner, Partner.code),
+    "product": (Product, Product.code),
+    "journal": (Journal, Journal.ref_no),
+}
+
+# ---------------------------------------------------------------------------
+# Loading
+# ---------------------------------------------------------------------------
+
+# PostgreSQL drivers with COPY FROM STDIN support; others load through INSERT
+COPY_DRIVERS = ("psycopg2", "psycopg")
+COPY_CHUNK = 1 << 16
+
+def _copy_value(value) -> str:
+    """One CSV field for COPY: NULL is an unquoted empty field, strings are always quoted"""
+    if value is None:
+        return ""
+    if isinstance(value, str):
+        return '"' + value.replace('"', '""') + '"'
+    if isinstance(value, enum.Enum):
+        return value.name  # SQLAlchemy stores enum names
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return str(value)
+
+class _CopyStream:
+    """File-like object feeding rows to COPY as CSV without materialising the table"""
+    
+    def __init__(self, rows: Iterable[tuple]):
+        self._rows = iter(rows)
+        self._buffer = ""
+    
+    def read(self, size: int = -1) -> str:
+        while size < 0 or len(self._buffer) < size:
+            chunk = []
+            for row in self._rows:
+                chunk.append(",".join(map(_copy_value, row)) + "\n")
+                if len(chunk) == 1000:
+                    break
+            if not chunk:
+                break
+            self._buffer += "".join(chunk)
+        if size < 0:
+            data, self._buffer = self._buffer, ""
+        else:
+            data, self._buffer = self._buffer[:size], self._buffer[size:]
+        return data
+
+def _copy_into(engine: Engine, job: MigrationJob, rows: Iterable[tuple]) -> int:
+    table, columns = job.model.__tablename__, ", ".join(job.columns)
+    staging = f"aip_stage_{table}"
+    connection = engine.raw_connection()
+    try:
+        cursor = connection.cursor()
+        cursor.execute(f"CREATE TEMP TABLE {staging} (LIKE {table} INCLUDING DEFAULTS) ON COMMIT DROP")
+        copy_sql = f"COPY {staging} ({columns}) FROM STDIN WITH (FORMAT csv)"
+        if engine.dialect.driver == "psycopg2":
+            cursor.copy_expert(copy_sql, _CopyStream(rows))
+        else:
+            # psycopg 3 (SQLAlchemy's default PostgreSQL driver) streams through cursor.copy()
+            stream = _CopyStream(rows)
+            with cursor.copy(copy_sql) as copy:
+                while True:
+                    data = stream.read(COPY_CHUNK)
+                    if not data:
+                        break
+                    copy.write(data)
+        cursor.execute(f"INSERT INTO {table} ({columns}) SELECT {columns} FROM {staging} ON CONFLICT DO NOTHING")
+        loaded = cursor.rowcount
+        connection.commit()
+        return loaded
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        connection.close()
+
+def _insert_into(engine: Engine, job: MigrationJob, rows: Iterable[tuple], chunk_size: int = 1000) -> int:
+    loaded = 0
+    with Session(engine) as db:
+        statement = dialect_insert(db, job.model).on_conflict_do_nothing()
+        connection = db.connection()  # Core execution, for rowcount
+        chunk = []
+        for row in rows:
+            chunk.append(dict(zip(job.columns, row)))
+            if len(chunk) == chunk_size:
+                loaded += connection.execute(statement, chunk).rowcount
+                chunk = []
+        if chunk:
+            loaded += connection.execute(statement, chunk).rowcount
+        db.commit()
+    return loaded
+
+def load_rows(engine: Engine, job: MigrationJob, rows: Iterable[tuple]) -> int:
+    """Bulk-insert rows into the job's table, skipping existing ones; returns rows inserted"""
+    if engine.dialect.name == "postgresql" and engine.dialect.driver in COPY_DRIVERS:
+        return _copy_into(engine, job, rows)
+    return _insert_into(engine, job, rows)
+
+def _run_job(engine: Engine, ctx: MigrationContext, job: MigrationJob) -> MigrationStats:
+    stats = MigrationStats(job.name, job.sources)
+    start = time.perf_counter()
+    stats.loaded = load_rows(engine, job, job.mapper(ctx, stats))
+    stats.seconds = time.perf_counter() - start
+    return stats
+
+def _refresh_lookups(engine: Engine, ctx: MigrationContext):
+    with Session(engine) as db:
+        for name, (model, key) in LOOKUPS.items():
+            rows = db.execute(select(key, model.id).where(model.workspace_id == ctx.workspace_id))
+            ctx.lookups[name] = {code: row_id for code, row_id in rows}
+        ctx.bom_ids = set(db.scalars(
+            select(BillOfMaterials.id).where(BillOfMaterials.workspace_id == ctx.workspace_id)
+        ))
+
+def migrate(
+    engine: Engine,
+    source_dir: str,
+    workspace_id: uuid.UUID,
+    tables: Optional[Sequence[str]] = None,
+    jobs: int = 4
+) -> List[MigrationStats]:
+    """Load the AIP tables in source_dir into the workspace; returns per-table stats"""
+    return run_waves(engine, MigrationContext(source_dir, workspace_id), _run_job, tables, jobs)
+
+def run_waves(
+    engine: Engine,
+    ctx: MigrationContext,
+    run: Callable[[Engine, MigrationContext, MigrationJob], MigrationStats],
+    tables: Optional[Sequence[str]] = None,
+    jobs: int = 4
+) -> List[MigrationStats]:
+    """Run `run` for each selected job, wave by wave, the jobs of a wave in parallel"""
+    unknown = set(tables or ()) - set(JOBS)
+    if unknown:
+        raise ValueError(f"Unknown tables: {', '.join(sorted(unknown))}")
+    results = []
+    with ThreadPoolExecutor(max_workers=max(jobs, 1)) as pool:
+        for wave in WAVES:
+            _refresh_lookups(engine, ctx)
+            selected = [JOBS[name] for name in wave if tables is None or name in tables]
+            results += pool.map(lambda job: run(engine, ctx, job), selected)
+    return results
+
+def format_report(results: Sequence[MigrationStats], elapsed: float) -> str:
+    lines = [
+        f"{'table':<20} {'source':<16} {'read':>9} {'skipped':>8} {'loaded':>9} {'updated':>8} "
+        f"{'deleted':>8} {'MB':>8} {'sec':>7} {'rows/s':>10}"
+    ]
+    for s in results:
+        lines.append(
+            f"{s.table:<20} {'+'.join(s.sources):<16} {s.read:>9,} {s.skipped:>8,} {s.loaded:>9,} {s.updated:>8,} "
+            f"{s.deleted:>8,} {s.bytes / 1e6:>8.2f} {s.seconds:>7.2f} "
+            + ("{:>10}".format("unchanged") if s.unchanged else f"{s.rows_per_second:>10,.0f}")
+        )
+    total_read = sum(s.read for s in results)
+    lines.append(
+        f"{'total':<20} {'':<16} {total_read:>9,} {sum(s.skipped for s in results):>8,} "
+        f"{sum(s.loaded for s in results):>9,} {sum(s.updated for s in results):>8,} "
+        f"{sum(s.deleted for s in results):>8,} {sum(s.bytes for s in results) / 1e6:>8.2f} {elapsed:>7.2f} "
+        f"{(total_read / elapsed if elapsed else 0):>10,.0f}"
+    )
+    return "\n".join(lines)
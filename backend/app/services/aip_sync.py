@@ -0,0 +1,219 @@
+"""
+Incremental re-sync of the legacy AIP tables during cutover.
+
+Each target table keeps a JSON state file with a digest of its source files
+and a hash of every row it produced last time, keyed by row id (ids are
+derived from the legacy keys, see aip_migration). A sync then:
+
+1. skips the table outright when no source file's digest changed;
+2. otherwise re-maps the sources and diffs the row hashes, inserting new rows,
+   updating changed ones and removing rows that disappeared (deleted or
+   packed away in the legacy app), so only the delta reaches the database.
+
+Change detection works on the mapped rows rather than on single DBF records
+because several targets merge records (partners from CST + SUP, journal headers
+from voucher lines), so a record-level diff couldn't tell which rows changed.
+"""
+from typing import Dict, List, Optional, Sequence
+import hashlib
+import json
+import logging
+import mmap
+import os
+import time
+import uuid
+from sqlalchemy import bindparam, delete, select, update
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from app.services.aip_migration import (
+    WAVES, MigrationContext, MigrationJob, MigrationStats, load_rows, run_waves,
+)
+
+logger = logging.getLogger(__name__)
+
+STATE_VERSION = 1
+
+# Rows per UPDATE executemany / DELETE ... IN batch
+CHUNK_SIZE = 1000
+
+def _file_digest(path: str) -> str:
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return hashlib.blake2b(b"").hexdigest()
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+            return hashlib.blake2b(m).hexdigest()
+
+def _source_digests(ctx: MigrationContext, job: MigrationJob) -> Dict[str, Optional[str]]:
+    digests = {}
+    for source in job.sources:
+        path = ctx.path(source)
+        digests[source] = _file_digest(path) if path else None
+        if path and source.lower().endswith(".dbf"):
+            memo = ctx.path(source[:-4] + ".FPT")
+            if memo:
+                digests[source[:-4] + ".FPT"] = _file_digest(memo)
+    return digests
+
+def _row_hash(row: tuple) -> str:
+    return hashlib.blake2b(repr(row[1:]).encode(), digest_size=12).hexdigest()
+
+class SyncState:
+    """What the last sync of one table saw"""
+    
+    def __init__(self, path: str):
+        self.path = path
+        self.sources: Dict[str, Optional[str]] = {}
+        self.rows: Dict[str, str] = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                data = json.load(f)
+            if data.get("version") == STATE_VERSION:
+                self.sources = data["sources"]
+                self.rows = data["rows"]
+    
+    def save(self):
+        # Write then rename so an interrupted sync never leaves a truncated state
+        tmp = self.path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump({"version": STATE_VERSION, "sources": self.sources, "rows": self.rows}, f)
+        os.replace(tmp, self.path)
+
+def _existing_ids(engine: Engine, job: MigrationJob, row_ids: List[uuid.UUID]) -> set:
+    """Ids already in the table, e.g. rows deactivated or retained when they disappeared from AIP"""
+    table = job.model.__table__
+    existing = set()
+    with engine.connect() as connection:
+        for i in range(0, len(row_ids), CHUNK_SIZE):
+            existing.update(connection.execute(select(table.c.id).where(table.c.id.in_(row_ids[i:i + CHUNK_SIZE]))).scalars())
+    return existing
+
+def _update_rows(engine: Engine, job: MigrationJob, rows: List[tuple]) -> int:
+    table = job.model.__table__
+    values = {c: bindparam(c) for c in job.columns if c != "id"}
+    if "is_active" in table.c and "is_active" not in values:
+        values["is_active"] = True  # A row present in AIP is active again
+    statement = update(table).where(table.c.id == bindparam("row_id")).values(values)
+    updated = 0
+    with Session(engine) as db:
+        connection = db.connection()
+        for i in range(0, len(rows), CHUNK_SIZE):
+            params = [{"row_id": row[0], **dict(zip(job.columns[1:], row[1:]))} for row in rows[i:i + CHUNK_SIZE]]
+            updated += connection.execute(statement, params).rowcount
+        db.commit()
+    return updated
+
+def _delete_rows(engine: Engine, job: MigrationJob, row_ids: List[uuid.UUID]) -> List[uuid.UUID]:
+    """
+    Remove rows gone from the legacy tables; returns the ids that had to stay.
+    Tables with an is_active flag are deactivated, since NexERP documents may
+    reference them; the others are deleted unless something still points at them.
+    """
+    table = job.model.__table__
+    retained = []
+    with Session(engine) as db:
+        connection = db.connection()
+        if "is_active" in table.c:
+            for i in range(0, len(row_ids), CHUNK_SIZE):
+                connection.execute(update(table).where(table.c.id.in_(row_ids[i:i + CHUNK_SIZE])).values(is_active=False))
+            db.commit()
+            return retained
+        for i in range(0, len(row_ids), CHUNK_SIZE):
+            chunk = row_ids[i:i + CHUNK_SIZE]
+            try:
+                with connection.begin_nested():
+                    connection.execute(delete(table).where(table.c.id.in_(chunk)))
+            except IntegrityError:
+                # Something in the chunk is still referenced: fall back to row by row
+                for row_id in chunk:
+                    try:
+                        with connection.begin_nested():
+                            connection.execute(delete(table).where(table.c.id == row_id))
+                    except IntegrityError:
+                        retained.append(row_id)
+        db.commit()
+    if retained:
+        logger.warning("%s: %d rows removed in AIP are still referenced and were kept", job.name, len(retained))
+    return retained
+
+class _PendingRemoval:
+    """Rows of one table to remove once every table has been loaded"""
+    __slots__ = ("job", "stats", "state", "previous", "removed")
+    
+    def __init__(self, job: MigrationJob, stats: MigrationStats, state: SyncState, previous: Dict[str, str], removed: List[uuid.UUID]):
+        self.job = job
+        self.stats = stats
+        self.state = state
+        self.previous = previous
+        self.removed = removed
+
+def _sync_job(
+    engine: Engine, ctx: MigrationContext, job: MigrationJob, state_dir: str, pending: Dict[str, _PendingRemoval]
+) -> MigrationStats:
+    stats = MigrationStats(job.name, job.sources)
+    start = time.perf_counter()
+    state = SyncState(os.path.join(state_dir, f"{job.name}.json"))
+    digests = _source_digests(ctx, job)
+    if state.sources == digests:
+        stats.unchanged = True
+        stats.seconds = time.perf_counter() - start
+        return stats
+    
+    previous, current = state.rows, {}
+    new_rows, changed_rows = [], []
+    for row in job.mapper(ctx, stats):
+        key, digest = str(row[0]), _row_hash(row)
+        current[key] = digest
+        old = previous.get(key)
+        if old is None:
+            new_rows.append(row)
+        elif old != digest:
+            changed_rows.append(row)
+    
+    if new_rows and previous:
+        # A row that comes back after a removal is still there, deactivated: the load would skip it
+        existing = _existing_ids(engine, job, [row[0] for row in new_rows])
+        if existing:
+            changed_rows += [row for row in new_rows if row[0] in existing]
+            new_rows = [row for row in new_rows if row[0] not in existing]
+    stats.loaded = load_rows(engine, job, new_rows) if new_rows else 0
+    stats.updated = _update_rows(engine, job, changed_rows) if changed_rows else 0
+    state.sources, state.rows = digests, current
+    removed = [uuid.UUID(key) for key in previous.keys() - current.keys()]
+    if removed:
+        pending[job.name] = _PendingRemoval(job, stats, state, previous, removed)
+    else:
+        state.save()
+    stats.seconds = time.perf_counter() - start
+    return stats
+
+def sync(
+    engine: Engine,
+    source_dir: str,
+    workspace_id: uuid.UUID,
+    state_dir: str,
+    tables: Optional[Sequence[str]] = None,
+    jobs: int = 4
+) -> List[MigrationStats]:
+    """
+    Apply what changed in the AIP tables since the last sync. The first sync of
+    a table (no state file yet) loads it in full, like migrate().
+    """
+    os.makedirs(state_dir, exist_ok=True)
+    ctx = MigrationContext(source_dir, workspace_id)
+    pending: Dict[str, _PendingRemoval] = {}
+    results = run_waves(engine, ctx, lambda e, c, job: _sync_job(e, c, job, state_dir, pending), tables, jobs)
+    
+    # Removals run children first (journal_items before journals) so foreign keys allow them
+    for name in reversed([name for wave in WAVES for name in wave]):
+        removal = pending.get(name)
+        if removal is None:
+            continue
+        start = time.perf_counter()
+        retained = _delete_rows(engine, removal.job, removal.removed)
+        removal.stats.deleted = len(removal.removed) - len(retained)
+        for row_id in retained:
+            removal.state.rows[str(row_id)] = removal.previous[str(row_id)]  # Retried next sync
+        removal.state.save()
+        removal.stats.seconds += time.perf_counter() - start
+    return results
@@ -0,0 +1,184 @@
+from sqlalchemy.orm import Session
+from app.models.inventory import Product
+from app.models.manufacturing import BillOfMaterials, BOMItem, JobOrder
+from collections import deque
+from decimal import Decimal
+from typing import Dict, Iterable, List, Optional, Tuple
+import uuid
+
+ZERO = Decimal(0)
+HUNDRED = Decimal(100)
+
+class BOMGraph:
+    """
+    Active bills of materials of a workspace compiled into a DAG over products.
+    
+    Each manufactured product has one BOM (the newest active one) producing one
+    unit; its components' quantities already include waste_percent. Products
+    are kept in topological order (assemblies before their components) so an
+    explosion or cost roll-up visits every sub-assembly exactly once, however
+    many parents share it.
+    """
+    __slots__ = ("products", "index", "children", "order", "levels")
+    
+    def __init__(self, boms: Dict[uuid.UUID, List[Tuple[uuid.UUID, Decimal]]]):
+        """boms: product -> [(component, qty per unit incl. waste)]; raises ValueError on a cycle"""
+        products: List[uuid.UUID] = list(boms)
+        index = {product: i for i, product in enumerate(products)}
+        for components in boms.values():
+            for component, _ in components:
+                if component not in index:
+                    index[component] = len(products)
+                    products.append(component)
+        
+        children: List[List[Tuple[int, Decimal]]] = [[] for _ in products]
+        indegree = [0] * len(products)
+        for product, components in boms.items():
+            merged: Dict[int, Decimal] = {}
+            for component, qty in components:
+                position = index[component]
+                merged[position] = merged.get(position, ZERO) + qty
+            children[index[product]] = list(merged.items())
+            for position in merged:
+                indegree[position] += 1
+        
+        # Kahn's algorithm; whatever is left over sits on a cycle
+        ready = deque(i for i, d in enumerate(indegree) if d == 0)
+        order = []
+        while ready:
+            i = ready.popleft()
+            order.append(i)
+            for child, _ in children[i]:
+                indegree[child] -= 1
+                if indegree[child] == 0:
+                    ready.append(child)
+        if len(order) != len(products):
+            cycle = sorted(str(products[i]) for i, d in enumerate(indegree) if d > 0)
+            raise ValueError(f"Bill of materials cycle through products: {', '.join(cycle[:10])}")
+        
+        # Low-level code: the deepest level a product is used at (0 = top level only)
+        levels = [0] * len(products)
+        for i in order:
+            for child, _ in children[i]:
+                if levels[child] <= levels[i]:
+                    levels[child] = levels[i] + 1
+        
+        self.products = products
+        self.index = index
+        self.children = children
+        self.order = order
+        self.levels = levels
+    
+    def has_bom(self, product_id: uuid.UUID) -> bool:
+        position = self.index.get(product_id)
+        return position is not None and bool(self.children[position])
+    
+    def level(self, product_id: uuid.UUID) -> int:
+        position = self.index.get(product_id)
+        return 0 if position is None else self.levels[position]
+    
+    def explode(self, demand: Dict[uuid.UUID, Decimal]) -> Dict[uuid.UUID, Decimal]:
+        """
+        Gross quantity of every component (sub-assemblies and raw materials)
+        needed to build demand, in one pass over the topological order.
+        """
+        required = [ZERO] * len(self.products)
+        for product_id, qty in demand.items():
+            position = self.index.get(product_id)
+            if position is not None:
+                required[position] += Decimal(qty)
+        
+        components: Dict[uuid.UUID, Decimal] = {}
+        for i in self.order:
+            qty = required[i]
+            if not qty:
+                continue
+            for child, per_unit in self.children[i]:
+                required[child] += qty * per_unit
+        for i, qty in enumerate(required):
+            if qty:
+                product_id = self.products[i]
+                qty -= Decimal(demand.get(product_id, 0))  # What was demanded isn't a component requirement
+                if qty:
+                    components[product_id] = qty
+        return components
+    
+    def rollup_costs(self, prices: Dict[uuid.UUID, Decimal]) -> Dict[uuid.UUID, Decimal]:
+        """
+        Standard unit cost of every product in the graph: bought items (no BOM)
+        cost their price, assemblies the sum of their components' costs.
+        """
+        costs = [ZERO] * len(self.products)
+        for i in reversed(self.order):
+            if self.children[i]:
+                costs[i] = sum((qty * costs[child] for child, qty in self.children[i]), ZERO)
+            else:
+                costs[i] = Decimal(prices.get(self.products[i]) or 0)
+        return dict(zip(self.products, costs))
+
+class BOMService:
+    @staticmethod
+    def load_graph(db: Session, workspace_id: uuid.UUID) -> BOMGraph:
+        """Build the workspace's BOM graph in two queries; raises ValueError on a cycle"""
+        boms: Dict[uuid.UUID, uuid.UUID] = {}  # bom -> product, newest BOM per product wins
+        chosen: Dict[uuid.UUID, uuid.UUID] = {}
+        rows = db.query(BillOfMaterials.id, BillOfMaterials.product_id).filter(
+            BillOfMaterials.workspace_id == workspace_id,
+            BillOfMaterials.is_active == True,
+            BillOfMaterials.product_id.isnot(None)
+        ).order_by(BillOfMaterials.created_at.desc(), BillOfMaterials.id)
+        for bom_id, product_id in rows:
+            if product_id not in chosen:
+                chosen[product_id] = bom_id
+                boms[bom_id] = product_id
+        
+        components: Dict[uuid.UUID, List[Tuple[uuid.UUID, Decimal]]] = {product: [] for product in chosen}
+        items = db.query(BOMItem.bom_id, BOMItem.component_id, BOMItem.qty, BOMItem.waste_percent).join(
+            BillOfMaterials, BOMItem.bom_id == BillOfMaterials.id
+        ).filter(BillOfMaterials.workspace_id == workspace_id, BillOfMaterials.is_active == True)
+        for bom_id, component_id, qty, waste_percent in items:
+            product_id = boms.get(bom_id)
+            if product_id is None or component_id is None:
+                continue
+            qty = Decimal(qty or 0)
+            if waste_percent:
+                qty += qty * Decimal(waste_percent) / HUNDRED
+            components[product_id].append((component_id, qty))
+        return BOMGraph(components)
+    
+    @staticmethod
+    def explode_job_orders(
+        db: Session,
+        workspace_id: uuid.UUID,
+        job_order_ids: Iterable[uuid.UUID]
+    ) -> Dict[uuid.UUID, Decimal]:
+        """
+        Total component requirements of a workspace's job orders, exploded
+        through every BOM level. Ids of other workspaces are ignored.
+        """
+        demand: Dict[uuid.UUID, Decimal] = {}
+        orders = db.query(JobOrder.product_id, JobOrder.quantity).filter(
+            JobOrder.workspace_id == workspace_id,
+            JobOrder.id.in_(list(job_order_ids)),
+            JobOrder.product_id.isnot(None)
+        )
+        for product_id, quantity in orders:
+            demand[product_id] = demand.get(product_id, ZERO) + Decimal(quantity or 0)
+        if not demand:
+            return {}
+        return BOMService.load_graph(db, workspace_id).explode(demand)
+    
+    @staticmethod
+    def standard_costs(
+        db: Session,
+        workspace_id: uuid.UUID,
+        prices: Optional[Dict[uuid.UUID, Decimal]] = None
+    ) -> Dict[uuid.UUID, Decimal]:
+        """Standard unit cost per product, rolled up from component prices (default: base_price)"""
+        graph = BOMService.load_graph(db, workspace_id)
+        if prices is None:
+            prices = {
+                product_id: Decimal(price or 0)
+                for product_id, price in db.query(Product.id, Product.base_price).filter(Product.workspace_id == workspace_id)
+            }
+        return graph.rollup_costs(prices)
@@ -0,0 +1,258 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import bindparam, delete, func, insert, tuple_, update
+from app.core.database import dialect_insert
+from app.models.inventory import Product, ValuationMethod
+from app.models.ledger import StockLedger, StockCostLayer, StockCostPosition
+from app.services.valuation_service import ValuationService
+from collections import deque
+from decimal import Decimal
+from typing import Dict, Iterable, Optional, Tuple
+import uuid
+
+ZERO = Decimal(0)
+COST_PLACES = Decimal("0.0001")  # Numeric(18, 4)
+
+class CostState:
+    """
+    Cost position of one (product, warehouse). FIFO keeps a deque of open
+    receipt layers [sequence, qty_remaining, unit_cost]; average keeps only the
+    running qty and value. Both cost an issue in O(layers consumed).
+    
+    Issuing more than is on hand costs the shortfall at the last known unit cost
+    and leaves qty negative; the next receipt covers the deficit first.
+    """
+    __slots__ = ("fifo", "layers", "qty", "value", "last_unit_cost", "next_sequence")
+    
+    def __init__(self, fifo: bool, qty: Decimal = ZERO, value: Decimal = ZERO,
+                 last_unit_cost: Decimal = ZERO, next_sequence: int = 0):
+        self.fifo = fifo
+        self.layers = deque()
+        self.qty = qty
+        self.value = value
+        self.last_unit_cost = last_unit_cost
+        self.next_sequence = next_sequence
+    
+    def receive(self, qty: Decimal, unit_cost: Decimal) -> Optional[list]:
+        """Add a receipt; returns the new FIFO layer, if one was opened"""
+        before = self.qty
+        self.qty += qty
+        self.last_unit_cost = unit_cost
+        if before < 0:
+            # The deficit is covered first; what's left is valued at this receipt's cost
+            self.value = self.qty * unit_cost
+            qty = self.qty
+        else:
+            self.value += qty * unit_cost
+        if not self.fifo or qty <= 0:
+            return None
+        layer = [self.next_sequence, qty, unit_cost]
+        self.next_sequence += 1
+        self.layers.append(layer)
+        return layer
+    
+    def issue(self, qty: Decimal) -> Decimal:
+        """Remove qty from stock; returns its total cost"""
+        if self.fifo:
+            cost, remaining, layers = ZERO, qty, self.layers
+            while remaining > 0 and layers:
+                layer = layers[0]
+                if layer[1] <= remaining:
+                    remaining -= layer[1]
+                    cost += layer[1] * layer[2]
+                    layers.popleft()
+                else:
+                    layer[1] -= remaining
+                    cost += remaining * layer[2]
+                    remaining = ZERO
+            if remaining > 0:
+                cost += remaining * self.last_unit_cost
+        else:
+            cost = qty * (self.value / self.qty if self.qty > 0 else self.last_unit_cost)
+        self.qty -= qty
+        # Stock that ran out (or below zero) is valued at the last cost
+        self.value = self.value - cost if self.qty > 0 else self.qty * self.last_unit_cost
+        return cost
+
+class CostingService:
+    # Open layers fetched per query while consuming an issue
+    LAYER_BATCH = 50
+    # Ledger rows replayed per query by rebuild()
+    REBUILD_CHUNK = 10000
+    
+    @staticmethod
+    def _is_fifo(db: Session, product_id: uuid.UUID) -> bool:
+        product = db.get(Product, product_id)
+        return product is not None and product.valuation_method == ValuationMethod.FIFO
+    
+    @staticmethod
+    def _lock_position(db: Session, product_id: uuid.UUID, warehouse_id: uuid.UUID) -> StockCostPosition:
+        query = db.query(StockCostPosition).filter(
+            StockCostPosition.product_id == product_id,
+            StockCostPosition.warehouse_id == warehouse_id
+        ).with_for_update()
+        position = query.first()
+        if position is None:
+            db.execute(dialect_insert(db, StockCostPosition).values(
+                product_id=product_id, warehouse_id=warehouse_id,
+                qty=0, value=0, last_unit_cost=0, next_sequence=0, next_movement=0
+            ).on_conflict_do_nothing())
+            position = query.first()
+        return position
+    
+    @staticmethod
+    def post_movement(db: Session, movement: StockLedger) -> Decimal:
+        """
+        Apply one stock movement to its cost position (caller commits). Receipts
+        keep their unit_cost and open a layer; issues get unit_cost set from the
+        layers they consume (FIFO) or the running average.
+        """
+        db.add(movement)
+        db.flush()
+        qty = Decimal(movement.qty)
+        position = CostingService._lock_position(db, movement.product_id, movement.warehouse_id)
+        # Numbered under the position lock, so the sequence is the order costs were applied in
+        movement.sequence = position.next_movement or 0
+        position.next_movement = movement.sequence + 1
+        state = CostState(
+            CostingService._is_fifo(db, movement.product_id),
+            Decimal(position.qty), Decimal(position.value),
+            Decimal(position.last_unit_cost), position.next_sequence
+        )
+        
+        if qty >= 0:
+            layer = state.receive(qty, Decimal(movement.unit_cost or 0))
+            if layer is not None:
+                db.add(StockCostLayer(
+                    product_id=movement.product_id, warehouse_id=movement.warehouse_id, ledger_id=movement.id,
+                    sequence=layer[0], qty_remaining=layer[1], unit_cost=layer[2]
+                ))
+        else:
+            loaded = CostingService._load_layers(db, state, movement.product_id, movement.warehouse_id, -qty)
+            cost = state.issue(-qty)
+            movement.unit_cost = (cost / -qty).quantize(COST_PLACES)
+            # Layers consumed completely are gone from the deque; at most the front one shrank
+            open_layers = {layer[0] for layer in state.layers}
+            consumed = [row.id for sequence, row in loaded.items() if sequence not in open_layers]
+            if consumed:
+                db.execute(delete(StockCostLayer).where(StockCostLayer.id.in_(consumed)))
+            if state.layers and state.layers[0][0] in loaded:
+                loaded[state.layers[0][0]].qty_remaining = state.layers[0][1]
+        
+        position.qty = state.qty
+        position.value = state.value.quantize(COST_PLACES)
+        position.last_unit_cost = state.last_unit_cost
+        position.next_sequence = state.next_sequence
+        return Decimal(movement.unit_cost or 0)
+    
+    @staticmethod
+    def _load_layers(
+        db: Session, state: CostState, product_id: uuid.UUID, warehouse_id: uuid.UUID, qty: Decimal
+    ) -> Dict[int, StockCostLayer]:
+        """Load open layers, oldest first, until they cover qty; returns them by sequence"""
+        if not state.fifo:
+            return {}
+        loaded, covered, after = {}, ZERO, -1
+        while covered < qty:
+            batch = db.query(StockCostLayer).filter(
+                StockCostLayer.product_id == product_id,
+                StockCostLayer.warehouse_id == warehouse_id,
+                StockCostLayer.sequence > after
+            ).order_by(StockCostLayer.sequence).limit(CostingService.LAYER_BATCH).with_for_update().all()
+            for layer in batch:
+                state.layers.append([layer.sequence, Decimal(layer.qty_remaining), Decimal(layer.unit_cost)])
+                loaded[layer.sequence] = layer
+                covered += layer.qty_remaining
+            if len(batch) < CostingService.LAYER_BATCH:
+                break
+            after = batch[-1].sequence
+        return loaded
+    
+    @staticmethod
+    def rebuild(db: Session, product_ids: Optional[Iterable[uuid.UUID]] = None) -> int:
+        """
+        Recompute cost layers, positions and issue costs by replaying each
+        (product, warehouse) in posting order, in chunks (run while no
+        movements are being posted). Movements posted before the sequence
+        existed come first, by created_at.
+        Valuation snapshots taken after the first repriced issue are dropped.
+        Returns the number of issue movements whose unit_cost changed.
+        """
+        scope = set(product_ids) if product_ids is not None else None
+        fifo = {p.id: p.valuation_method == ValuationMethod.FIFO for p in db.query(Product.id, Product.valuation_method)}
+        states: Dict[Tuple[uuid.UUID, uuid.UUID], CostState] = {}
+        ledger_ids: Dict[Tuple[uuid.UUID, int], uuid.UUID] = {}  # (product, warehouse, sequence) -> receipt
+        next_movements: Dict[Tuple[uuid.UUID, uuid.UUID], int] = {}
+        sequence = func.coalesce(StockLedger.sequence, -1)
+        replay_key = (StockLedger.product_id, StockLedger.warehouse_id, sequence, StockLedger.created_at, StockLedger.id)
+        repriced, first_repriced = 0, None
+        reprice = update(StockLedger).where(StockLedger.id == bindparam("movement_id")).values(
+            unit_cost=bindparam("new_cost")
+        )
+        
+        last = None
+        while True:
+            query = db.query(
+                StockLedger.id, StockLedger.created_at, StockLedger.product_id,
+                StockLedger.warehouse_id, StockLedger.qty, StockLedger.unit_cost, sequence
+            )
+            if scope is not None:
+                query = query.filter(StockLedger.product_id.in_(scope))
+            if last is not None:
+                query = query.filter(tuple_(*replay_key) > tuple_(*last))
+            chunk = query.order_by(*replay_key).limit(CostingService.REBUILD_CHUNK).all()
+            if not chunk:
+                break
+            changes = []
+            for movement_id, created_at, product_id, warehouse_id, qty, unit_cost, movement_sequence in chunk:
+                key = (product_id, warehouse_id)
+                state = states.get(key)
+                if state is None:
+                    state = states[key] = CostState(fifo.get(product_id, False))
+                next_movements[key] = max(next_movements.get(key, 0), movement_sequence + 1)
+                qty = Decimal(qty)
+                if qty >= 0:
+                    layer = state.receive(qty, Decimal(unit_cost or 0))
+                    if layer is not None:
+                        ledger_ids[key + (layer[0],)] = movement_id
+                else:
+                    cost = (state.issue(-qty) / -qty).quantize(COST_PLACES)
+                    if unit_cost is None or Decimal(unit_cost) != cost:
+                        changes.append({"movement_id": movement_id, "new_cost": cost})
+                        if first_repriced is None or created_at < first_repriced:
+                            first_repriced = created_at
+            if changes:
+                db.connection().execute(reprice, changes)
+                repriced += len(changes)
+            tail = chunk[-1]
+            last = (tail.product_id, tail.warehouse_id, tail[-1], tail.created_at, tail.id)
+        
+        positions = db.query(StockCostPosition)
+        layers = db.query(StockCostLayer)
+        if scope is not None:
+            positions = positions.filter(StockCostPosition.product_id.in_(scope))
+            layers = layers.filter(StockCostLayer.product_id.in_(scope))
+        layers.delete(synchronize_session=False)
+        positions.delete(synchronize_session=False)
+        position_rows, layer_rows = [], []
+        for (product_id, warehouse_id), state in states.items():
+            position_rows.append({
+                "product_id": product_id, "warehouse_id": warehouse_id, "qty": state.qty,
+                "value": state.value.quantize(COST_PLACES), "last_unit_cost": state.last_unit_cost,
+                "next_sequence": state.next_sequence,
+                "next_movement": next_movements.get((product_id, warehouse_id), 0)
+            })
+            for sequence, qty, unit_cost in state.layers:
+                layer_rows.append({
+                    "id": uuid.uuid4(), "product_id": product_id, "warehouse_id": warehouse_id,
+                    "ledger_id": ledger_ids.get((product_id, warehouse_id, sequence)),
+                    "sequence": sequence, "qty_remaining": qty, "unit_cost": unit_cost
+                })
+        if position_rows:
+            db.execute(insert(StockCostPosition), position_rows)
+        if layer_rows:
+            db.execute(insert(StockCostLayer), layer_rows)
+        if first_repriced is not None:
+            # Closing values from then on included the old costs
+            ValuationService.invalidate(db, first_repriced)
+        db.commit()
+        return repriced
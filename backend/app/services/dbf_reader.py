@@ -0,0 +1,250 @@
+"""
+Streaming reader for Visual FoxPro / dBase tables (.DBF) and memo files (.FPT).
+
+The table is memory-mapped and records are cut up by one precompiled struct per
+scan: columns that weren't asked for are pad bytes, so they never become Python
+objects, and the requested ones come out of a single unpack_from call. Values
+are converted per column only when typed records are wanted.
+"""
+from datetime import date, datetime, timedelta
+from decimal import Decimal, InvalidOperation
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+import mmap
+import os
+import struct
+
+# Language driver byte (header offset 29) -> Python codec
+CODEPAGES = {
+    0x00: "cp1252", 0x01: "cp437", 0x02: "cp850", 0x03: "cp1252", 0x57: "cp1252",
+    0x64: "cp852", 0x65: "cp866", 0x7D: "cp1255", 0x7E: "cp1256", 0xC8: "cp1250",
+    0xC9: "cp1251", 0xCA: "cp1254", 0xCB: "cp1253",
+}
+
+MEMO_TYPES = "MGW"
+
+# Julian day number of 0001-01-01 (datetime ordinal 1) minus one
+_JULIAN_OFFSET = 1721425
+
+class DBFField:
+    __slots__ = ("name", "type", "offset", "length", "decimals")
+    
+    def __init__(self, name: str, type: str, offset: int, length: int, decimals: int):
+        self.name = name
+        self.type = type
+        self.offset = offset
+        self.length = length
+        self.decimals = decimals
+    
+    def __repr__(self):
+        return f"DBFField({self.name!r}, {self.type!r}, {self.length}, {self.decimals})"
+
+class MemoFile:
+    """FoxPro .FPT memo file: big-endian header and blocks of (type, length, data)"""
+    
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, "rb")
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.block_size = struct.unpack_from(">H", self._map, 6)[0] or 64
+    
+    def read(self, block: int) -> Optional[bytes]:
+        if block <= 0:
+            return None
+        offset = block * self.block_size
+        if offset + 8 > len(self._map):
+            return None
+        _, length = struct.unpack_from(">II", self._map, offset)
+        return self._map[offset + 8:offset + 8 + length]
+    
+    def close(self):
+        self._map.close()
+        self._file.close()
+
+class DBFReader:
+    """Read-only view of one DBF table"""
+    
+    def __init__(self, path: str, encoding: Optional[str] = None):
+        self.path = path
+        self._file = open(path, "rb")
+        self.size = os.fstat(self._file.fileno()).st_size
+        if self.size < 32:
+            self._file.close()
+            raise ValueError(f"{path} is not a DBF file")
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        m = self._map
+        
+        self.version = m[0]
+        # Years are stored past 1900, but FoxPro also writes two-digit years
+        try:
+            self.last_update = date(m[1] + (1900 if m[1] >= 80 else 2000), m[2], m[3])
+        except ValueError:
+            self.last_update = None
+        record_count, self.header_length, self.record_length = struct.unpack_from("<IHH", m, 4)
+        self.encoding = encoding or CODEPAGES.get(m[29], "cp1252")
+        
+        self.fields: List[DBFField] = []
+        offset, position = 32, 1  # Byte 0 of every record is the deletion flag
+        while offset + 32 <= self.header_length and m[offset] != 0x0D:
+            name = m[offset:offset + 11].split(b"\0", 1)[0].decode("ascii", "replace").upper()
+            field = DBFField(name, chr(m[offset + 11]), position, m[offset + 16], m[offset + 17])
+            self.fields.append(field)
+            position += field.length
+            offset += 32
+        self._by_name = {f.name: f for f in self.fields}
+        
+        # A table copied while the legacy app was writing can be short of its header's count
+        self.record_count = min(record_count, max(self.size - self.header_length, 0) // self.record_length)
+        
+        self.memo: Optional[MemoFile] = None
+        if any(f.type in MEMO_TYPES for f in self.fields):
+            memo_path = _sibling(path, ".fpt")
+            if memo_path:
+                self.memo = MemoFile(memo_path)
+    
+    def __len__(self):
+        return self.record_count
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc):
+        self.close()
+    
+    def close(self):
+        if self.memo is not None:
+            self.memo.close()
+        self._map.close()
+        self._file.close()
+    
+    def field(self, name: str) -> DBFField:
+        try:
+            return self._by_name[name.upper()]
+        except KeyError:
+            raise KeyError(f"{os.path.basename(self.path)} has no field {name}")
+    
+    def _unpacker(self, columns: Optional[Sequence[str]]) -> Tuple[Callable, List[DBFField]]:
+        """Struct for deletion flag + requested columns (in requested order)"""
+        if columns is None:
+            selected = list(self.fields)
+        else:
+            selected = [self.field(c) for c in columns]
+        by_position = sorted(selected, key=lambda f: f.offset)
+        fmt, position = ["<c"], 1
+        for f in by_position:
+            if f.offset > position:
+                fmt.append(f"{f.offset - position}x")
+            fmt.append(f"{f.length}s")
+            position = f.offset + f.length
+        unpack = struct.Struct("".join(fmt)).unpack_from
+        
+        if by_position == selected:
+            return unpack, selected
+        # Requested out of file order: reorder the unpacked tuple
+        order = [by_position.index(f) + 1 for f in selected]
+        def unpack_ordered(buffer, offset):
+            values = unpack(buffer, offset)
+            return (values[0],) + tuple(values[i] for i in order)
+        return unpack_ordered, selected
+    
+    def raw_records(
+        self, columns: Optional[Sequence[str]] = None, include_deleted: bool = False
+    ) -> Iterator[Tuple[bytes, ...]]:
+        """Undecoded field bytes of each live record (deletion flag first if include_deleted)"""
+        unpack, _ = self._unpacker(columns)
+        m, start, step = self._map, self.header_length, self.record_length
+        for offset in range(start, start + self.record_count * step, step):
+            values = unpack(m, offset)
+            if include_deleted:
+                yield values
+            elif values[0] != b"*":
+                yield values[1:]
+    
+    def records(self, columns: Optional[Sequence[str]] = None) -> Iterator[tuple]:
+        """Live records as tuples of Python values for the requested columns"""
+        unpack, fields = self._unpacker(columns)
+        converters = [self._converter(f) for f in fields]
+        m, start, step = self._map, self.header_length, self.record_length
+        for offset in range(start, start + self.record_count * step, step):
+            values = unpack(m, offset)
+            if values[0] != b"*":
+                yield tuple(convert(raw) for convert, raw in zip(converters, values[1:]))
+    
+    def dicts(self, columns: Optional[Sequence[str]] = None) -> Iterator[Dict[str, object]]:
+        names = [f.name for f in (self.fields if columns is None else map(self.field, columns))]
+        for values in self.records(columns):
+            yield dict(zip(names, values))
+    
+    def _converter(self, field: DBFField) -> Callable[[bytes], object]:
+        encoding, kind = self.encoding, field.type
+        if kind in "CV":
+            return lambda raw: raw.decode(encoding).rstrip(" \x00").lstrip()
+        if kind in "NF":
+            return _number if field.decimals or kind == "F" else _integer
+        if kind == "D":
+            return _date
+        if kind == "L":
+            return lambda raw: True if raw in (b"T", b"t", b"Y", b"y") else False if raw in (b"F", b"f", b"N", b"n") else None
+        if kind == "I":
+            return lambda raw: int.from_bytes(raw, "little", signed=True)
+        if kind == "B":
+            return lambda raw: struct.unpack("<d", raw)[0]
+        if kind == "Y":
+            return lambda raw: Decimal(int.from_bytes(raw, "little", signed=True)).scaleb(-4)
+        if kind in "T@":
+            return _datetime
+        if kind in MEMO_TYPES:
+            memo = self.memo
+            if memo is None:
+                return lambda raw: None
+            binary = field.length == 4  # VFP stores the block number as an int, dBase as digits
+            def read_memo(raw):
+                block = int.from_bytes(raw, "little") if binary else int(raw.strip() or b"0")
+                data = memo.read(block)
+                if data is None or kind != "M":
+                    return data
+                return data.decode(encoding).rstrip("\x00")
+            return read_memo
+        return lambda raw: raw  # _NullFlags, varbinary and anything unknown
+
+def _number(raw: bytes) -> Optional[Decimal]:
+    raw = raw.strip()
+    if not raw:
+        return None
+    try:
+        return Decimal(raw.decode("ascii"))
+    except (InvalidOperation, UnicodeDecodeError):
+        return None  # Overflowed columns are written as asterisks
+
+def _integer(raw: bytes) -> Optional[int]:
+    raw = raw.strip()
+    if not raw:
+        return None
+    try:
+        return int(raw)
+    except ValueError:
+        value = _number(raw)
+        return int(value) if value is not None else None
+
+def _date(raw: bytes) -> Optional[date]:
+    raw = raw.strip()
+    if len(raw) != 8 or raw == b"00000000":
+        return None
+    try:
+        return date(int(raw[:4]), int(raw[4:6]), int(raw[6:]))
+    except ValueError:
+        return None
+
+def _datetime(raw: bytes) -> Optional[datetime]:
+    julian, milliseconds = struct.unpack("<ii", raw)
+    if julian <= 0:
+        return None
+    return datetime.fromordinal(julian - _JULIAN_OFFSET) + timedelta(milliseconds=milliseconds)
+
+def _sibling(path: str, extension: str) -> Optional[str]:
+    """Companion file with the same stem, matching the extension case-insensitively"""
+    directory = os.path.dirname(path) or "."
+    stem = os.path.splitext(os.path.basename(path))[0].lower()
+    for name in os.listdir(directory):
+        if name.lower() == stem + extension:
+            return os.path.join(directory, name)
+    return None
@@ -0,0 +1,221 @@
+from sqlalchemy.orm import Session
+from app.models.inventory import Product
+from app.models.manufacturing import JobOrder, JobOrderStatus
+from app.models.procurement import PurchaseOrder, POLine, POStatus
+from app.services.bom_service import BOMGraph, BOMService
+from app.services.valuation_service import ValuationService
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Sequence
+import numpy as np
+import uuid
+
+# Purchase orders whose lines still count as incoming supply
+OPEN_PO_STATUSES = (POStatus.PENDING, POStatus.APPROVED)
+
+class MRPPlan:
+    """
+    Result of an MRP run: per-product arrays of time buckets (rows follow
+    product_ids). receipts are open POs and job order outputs, planned the
+    lot-for-lot orders needed to keep projected stock from going negative and
+    releases those orders offset by lead time (shift buckets earlier).
+    """
+    __slots__ = ("product_ids", "index", "start", "bucket_days", "has_bom", "shift",
+                 "on_hand", "gross", "receipts", "planned", "releases")
+    
+    def __init__(self, product_ids: List[uuid.UUID], start: date, bucket_days: int, has_bom: np.ndarray, shift: np.ndarray,
+                 on_hand: np.ndarray, gross: np.ndarray, receipts: np.ndarray, planned: np.ndarray, releases: np.ndarray):
+        self.product_ids = product_ids
+        self.index = {product_id: i for i, product_id in enumerate(product_ids)}
+        self.start = start
+        self.bucket_days = bucket_days
+        self.has_bom = has_bom
+        self.shift = shift
+        self.on_hand = on_hand
+        self.gross = gross
+        self.receipts = receipts
+        self.planned = planned
+        self.releases = releases
+    
+    def bucket_date(self, bucket: int) -> date:
+        return self.start + timedelta(days=int(bucket) * self.bucket_days)
+    
+    def demand(self, product_id: uuid.UUID) -> float:
+        """Gross requirement of a product over the horizon"""
+        i = self.index.get(product_id)
+        return 0.0 if i is None else float(self.gross[i].sum())
+    
+    def incoming(self, product_id: uuid.UUID) -> float:
+        """Scheduled receipts of a product over the horizon"""
+        i = self.index.get(product_id)
+        return 0.0 if i is None else float(self.receipts[i].sum())
+    
+    def suggestions(self) -> List[Dict]:
+        """Planned orders: purchases for bought items, production for items with a BOM"""
+        rows, buckets = np.nonzero(self.planned > 0)
+        release_buckets = np.maximum(buckets - self.shift[rows], 0)
+        dates = [self.bucket_date(t).isoformat() for t in range(self.planned.shape[1])]
+        quantities = np.round(self.planned[rows, buckets], 4).tolist()
+        names: Dict[int, str] = {}
+        suggestions = []
+        for i, t, release, qty in zip(rows.tolist(), buckets.tolist(), release_buckets.tolist(), quantities):
+            name = names.get(i)
+            if name is None:
+                name = names[i] = str(self.product_ids[i])
+            suggestions.append({
+                "product_id": name,
+                "action": "manufacture" if self.has_bom[i] else "purchase",
+                "qty": qty,
+                "release_date": dates[release],
+                "due_date": dates[t]
+            })
+        return suggestions
+
+class MRPService:
+    """
+    Batch material requirements planning.
+    
+    Inputs come from a handful of bulk queries (products, BOMs, stock balances,
+    open PO lines, job orders) into dense [product x bucket] numpy arrays.
+    Products are then netted one BOM level at a time (low-level codes), so a
+    component is netted only after every parent's planned releases have been
+    exploded into its gross requirements; each level is a few vectorized
+    operations over all of its products at once.
+    """
+    
+    @staticmethod
+    def _bucket(day: Optional[datetime], start: date, bucket_days: int) -> int:
+        """Bucket of a date; overdue dates fall into the first one"""
+        if day is None:
+            return 0
+        if isinstance(day, datetime):
+            day = day.date()
+        return max((day - start).days // bucket_days, 0)
+    
+    @staticmethod
+    def run(
+        db: Session,
+        workspace_id: uuid.UUID,
+        start: Optional[date] = None,
+        bucket_days: int = 7,
+        horizon: int = 26,
+        statuses: Sequence[JobOrderStatus] = (JobOrderStatus.SCHEDULED,)
+    ) -> MRPPlan:
+        """Plan the workspace's material requirements for horizon buckets of bucket_days"""
+        start = start or date.today()
+        products = db.query(Product.id, Product.lead_time_days).filter(Product.workspace_id == workspace_id).all()
+        product_ids = [product_id for product_id, _ in products]
+        index = {product_id: i for i, product_id in enumerate(product_ids)}
+        lead_days = np.array([lead or 0 for _, lead in products], dtype=np.int64)
+        graph = BOMService.load_graph(db, workspace_id)
+        for product_id in graph.products:
+            if product_id not in index:
+                # A component from another workspace or deleted product: still planned, no lead time
+                index[product_id] = len(product_ids)
+                product_ids.append(product_id)
+        lead_days = np.concatenate([lead_days, np.zeros(len(product_ids) - len(lead_days), dtype=np.int64)])
+        
+        on_hand = np.zeros(len(product_ids))
+        for (product_id, _), (qty, _) in ValuationService.balances_at(db, workspace_id, datetime.now()).items():
+            i = index.get(product_id)
+            if i is not None:
+                on_hand[i] += float(qty)
+        
+        receipts = np.zeros((len(product_ids), horizon))
+        lines = db.query(POLine.product_id, POLine.qty, PurchaseOrder.date).join(
+            PurchaseOrder, POLine.po_id == PurchaseOrder.id
+        ).filter(PurchaseOrder.workspace_id == workspace_id, PurchaseOrder.status.in_(OPEN_PO_STATUSES))
+        for product_id, qty, ordered in lines:
+            i = index.get(product_id)
+            if i is None:
+                continue
+            expected = (ordered or datetime.now()) + timedelta(days=int(lead_days[i]))
+            t = MRPService._bucket(expected, start, bucket_days)
+            if t < horizon:
+                receipts[i, t] += float(qty or 0)
+        
+        # A job order consumes its components at start_date and delivers its product at end_date
+        firm = np.zeros((len(product_ids), horizon))
+        orders = db.query(JobOrder.product_id, JobOrder.quantity, JobOrder.start_date, JobOrder.end_date).filter(
+            JobOrder.workspace_id == workspace_id, JobOrder.status.in_(list(statuses)), JobOrder.product_id.isnot(None)
+        )
+        for product_id, quantity, start_date, end_date in orders:
+            i = index.get(product_id)
+            if i is None:
+                continue
+            qty = float(quantity or 0)
+            t = MRPService._bucket(start_date, start, bucket_days)
+            if t < horizon:
+                firm[i, t] += qty
+            t = MRPService._bucket(end_date or start_date, start, bucket_days)
+            if t < horizon:
+                receipts[i, t] += qty
+        
+        return MRPService.compute(graph, product_ids, lead_days, on_hand, receipts, firm, start, bucket_days)
+    
+    @staticmethod
+    def compute(
+        graph: BOMGraph,
+        product_ids: List[uuid.UUID],
+        lead_days: np.ndarray,
+        on_hand: np.ndarray,
+        receipts: np.ndarray,
+        firm: np.ndarray,
+        start: date,
+        bucket_days: int
+    ) -> MRPPlan:
+        """
+        Net and explode level by level. firm holds releases already decided
+        (job orders), exploded into components but not netted themselves.
+        Every product in graph must be in product_ids.
+        """
+        count, horizon = receipts.shape
+        index = {product_id: i for i, product_id in enumerate(product_ids)}
+        levels = np.zeros(count, dtype=np.int64)
+        has_bom = np.zeros(count, dtype=bool)
+        parents, children, quantities = [], [], []
+        for g, product_id in enumerate(graph.products):
+            i = index[product_id]
+            levels[i] = graph.levels[g]
+            for child, qty in graph.children[g]:
+                parents.append(i)
+                children.append(index[graph.products[child]])
+                quantities.append(float(qty))
+            has_bom[i] = bool(graph.children[g])
+        parents = np.array(parents, dtype=np.int64)
+        children = np.array(children, dtype=np.int64)
+        quantities = np.array(quantities)
+        edge_levels = levels[parents] if len(parents) else parents
+        shift = -(-np.asarray(lead_days, dtype=np.int64) // bucket_days)  # Lead time in whole buckets
+        
+        gross = np.zeros((count, horizon))
+        planned = np.zeros((count, horizon))
+        releases = np.zeros((count, horizon))
+        for level in range(int(levels.max()) + 1 if count else 0):
+            rows = np.nonzero(levels == level)[0]
+            if len(rows):
+                # Lot-for-lot: cumulative orders must cover the worst cumulative shortage so far
+                shortage = np.cumsum(gross[rows] - receipts[rows], axis=1) - on_hand[rows, None]
+                covered = np.round(np.maximum.accumulate(np.maximum(shortage, 0), axis=1), 4)
+                orders = np.diff(covered, axis=1, prepend=0)
+                planned[rows] = orders
+                released = np.zeros_like(orders)
+                row_shift = shift[rows]
+                for lead in np.unique(row_shift):
+                    selected = row_shift == lead
+                    lead = min(int(lead), horizon - 1)
+                    # Orders due within the lead time should have been released already
+                    released[selected, 0] = orders[selected, :lead + 1].sum(axis=1)
+                    released[selected, 1:horizon - lead] = orders[selected, lead + 1:]
+                releases[rows] = released
+            
+            edges = np.nonzero(edge_levels == level)[0]
+            if len(edges):
+                source = parents[edges]
+                demand = (releases[source] + firm[source]) * quantities[edges, None]
+                # Sum per component, then add each component's row once
+                order = np.argsort(children[edges], kind="stable")
+                targets = children[edges][order]
+                starts = np.flatnonzero(np.r_[True, targets[1:] != targets[:-1]])
+                gross[targets[starts]] += np.add.reduceat(demand[order], starts, axis=0)
+        
+        return MRPPlan(product_ids, start, bucket_days, has_bom, shift, on_hand, gross, receipts, planned, releases)
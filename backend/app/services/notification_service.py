@@ -1,10 +1,21 @@
 from sqlalchemy.orm import Session
-from app.models.notifications import Notification, NotificationType, NotificationPriority
+from sqlalchemy import func, insert, select, update
+from app.core.database import dialect_insert
+from app.core.pagination import keyset_page
+from app.core.websocket import manager
+from app.models.auth import User
+from app.models.hr import Employee
+from app.models.notifications import Notification, NotificationCounter, NotificationType, NotificationPriority
+from app.models.rbac import Role, user_roles
 from app.models.workflow import ApprovalRequest
 from datetime import datetime
+from typing import Iterable, List, Optional, Tuple
 import uuid
 
 class NotificationService:
+    # Rows per multi-row INSERT / IN list in bulk fan-out
+    CHUNK_SIZE = 1000
+    
     @staticmethod
     def create_notification(
         db: Session,
@@ -27,10 +38,203 @@ class NotificationService:
             link=link
         )
         db.add(notification)
+        unread = NotificationService._adjust_unread(db, user_id, 1)
         db.commit()
         db.refresh(notification)
+        
+        # Push to the recipient's open sessions instead of having clients poll
+        manager.send_to_user(workspace_id, user_id, {
+            "type": "notification",
+            "notification": NotificationService._to_push(notification),
+            "unread_count": unread,
+            "unread_delta": 1
+        })
         return notification
     
+    @staticmethod
+    def resolve_recipients(
+        db: Session,
+        workspace_id: uuid.UUID,
+        user_ids: Optional[Iterable[uuid.UUID]] = None,
+        role: Optional[str] = None,
+        department_id: Optional[uuid.UUID] = None
+    ) -> List[uuid.UUID]:
+        """Active users of the workspace matching any of the selectors, de-duplicated, in a stable order"""
+        recipients = dict.fromkeys(user_ids or [])
+        if recipients:
+            # Explicit ids are checked like the others: unknown, inactive or foreign users are dropped
+            explicit = list(recipients)
+            valid = set()
+            for start in range(0, len(explicit), NotificationService.CHUNK_SIZE):
+                rows = db.query(User.id).filter(
+                    User.id.in_(explicit[start:start + NotificationService.CHUNK_SIZE]),
+                    User.workspace_id == workspace_id,
+                    User.is_active == True
+                )
+                valid.update(r.id for r in rows)
+            recipients = {user_id: None for user_id in explicit if user_id in valid}
+        if role is not None:
+            rows = db.query(user_roles.c.user_id).join(Role, Role.id == user_roles.c.role_id).join(
+                User, User.id == user_roles.c.user_id
+            ).filter(
+                Role.workspace_id == workspace_id,
+                Role.name == role,
+                User.workspace_id == workspace_id,
+                User.is_active == True
+            )
+            recipients.update(dict.fromkeys(r.user_id for r in rows))
+        if department_id is not None:
+            # Employees link to login accounts by email
+            rows = db.query(User.id).join(Employee, func.lower(Employee.email) == func.lower(User.email)).filter(
+                Employee.workspace_id == workspace_id,
+                Employee.department_id == department_id,
+                Employee.is_active == True,
+                User.workspace_id == workspace_id,
+                User.is_active == True
+            )
+            recipients.update(dict.fromkeys(r.id for r in rows))
+        return list(recipients)
+    
+    @staticmethod
+    def create_notifications(
+        db: Session,
+        workspace_id: uuid.UUID,
+        user_ids: List[uuid.UUID],
+        type: NotificationType,
+        title: str,
+        message: str,
+        priority: NotificationPriority = NotificationPriority.MEDIUM,
+        link: str = None
+    ) -> int:
+        """
+        Send the same notification to many users: multi-row INSERTs, one counter
+        UPDATE per chunk and one commit. Each recipient is pushed their own row
+        id so clients can mark it read and deduplicate it. Returns the number
+        of notifications written.
+        """
+        user_ids = list(dict.fromkeys(user_ids))  # One row (and one counter bump) per user
+        if not user_ids:
+            return 0
+        # Database clock, as the server default stamps the rows (on PostgreSQL the same transaction time)
+        created_at = db.execute(select(func.now())).scalar()
+        rows = [
+            {
+                "id": uuid.uuid4(),
+                "workspace_id": workspace_id,
+                "user_id": user_id,
+                "type": type,
+                "priority": priority,
+                "title": title,
+                "message": message,
+                "link": link,
+                "is_read": False
+            }
+            for user_id in user_ids
+        ]
+        for start in range(0, len(rows), NotificationService.CHUNK_SIZE):
+            chunk = rows[start:start + NotificationService.CHUNK_SIZE]
+            # executemany form: batched into multi-row VALUES with a cached statement
+            db.execute(insert(Notification), chunk)
+            db.execute(
+                update(NotificationCounter)
+                .where(NotificationCounter.user_id.in_([r["user_id"] for r in chunk]))
+                .values(unread_count=NotificationCounter.unread_count + 1, updated_at=func.now())
+            )
+        db.commit()
+        
+        content = {
+            "type": type.value,
+            "priority": priority.value,
+            "title": title,
+            "message": message,
+            "link": link,
+            "created_at": created_at.isoformat()
+        }
+        for row in rows:
+            manager.send_to_user(workspace_id, row["user_id"], {
+                "type": "notification",
+                "notification": {"id": str(row["id"]), **content},
+                "unread_delta": 1
+            })
+        return len(rows)
+    
+    @staticmethod
+    def _to_push(notification: Notification) -> dict:
+        return {
+            "id": str(notification.id),
+            "type": notification.type.value if notification.type else None,
+            "priority": notification.priority.value if notification.priority else None,
+            "title": notification.title,
+            "message": notification.message,
+            "link": notification.link,
+            "created_at": notification.created_at.isoformat() if notification.created_at else None
+        }
+    
+    @staticmethod
+    def _adjust_unread(db: Session, user_id: uuid.UUID, delta: int) -> Optional[int]:
+        """
+        Move a user's unread counter by delta; returns the new count, or None
+        if the counter hasn't been initialised yet (get_unread_count does that
+        from the rows themselves, so nothing is lost).
+        """
+        return db.execute(
+            update(NotificationCounter)
+            .where(NotificationCounter.user_id == user_id)
+            .values(unread_count=NotificationCounter.unread_count + delta, updated_at=func.now())
+            .returning(NotificationCounter.unread_count)
+        ).scalar()
+    
+    @staticmethod
+    def get_unread_count(db: Session, workspace_id: uuid.UUID, user_id: uuid.UUID) -> int:
+        """Unread notifications for a user: a primary-key read of the counter"""
+        counter = db.get(NotificationCounter, user_id)
+        if counter is not None:
+            return counter.unread_count
+        
+        # First read for this user: count once, then keep the counter incrementally.
+        # A concurrent first read may have created the row already; its value wins.
+        count = db.query(func.count(Notification.id)).filter(
+            Notification.user_id == user_id,
+            Notification.is_read == False
+        ).scalar()
+        db.execute(
+            dialect_insert(db, NotificationCounter)
+            .values(user_id=user_id, workspace_id=workspace_id, unread_count=count)
+            .on_conflict_do_nothing(index_elements=["user_id"])
+        )
+        db.commit()
+        return db.query(NotificationCounter.unread_count).filter(NotificationCounter.user_id == user_id).scalar()
+    
+    @staticmethod
+    def list_notifications(
+        db: Session,
+        user_id: uuid.UUID,
+        limit: int = 50,
+        cursor: Optional[str] = None,
+        unread_only: bool = False,
+        since: Optional[datetime] = None
+    ) -> Tuple[List[Notification], Optional[str]]:
+        """A page of the user's inbox, newest first, plus the cursor for the next page"""
+        query = db.query(Notification).filter(Notification.user_id == user_id)
+        if unread_only:
+            query = query.filter(Notification.is_read == False)
+        return keyset_page(query, Notification.created_at, Notification.id, limit, cursor, since)
+    
+    @staticmethod
+    def list_pending_approvals(
+        db: Session,
+        approver_id: uuid.UUID,
+        limit: int = 50,
+        cursor: Optional[str] = None,
+        since: Optional[datetime] = None
+    ) -> Tuple[List[ApprovalRequest], Optional[str]]:
+        """A page of approvals waiting on the approver, newest first"""
+        query = db.query(ApprovalRequest).filter(
+            ApprovalRequest.approver_id == approver_id,
+            ApprovalRequest.status == "pending"
+        )
+        return keyset_page(query, ApprovalRequest.created_at, ApprovalRequest.id, limit, cursor, since)
+    
     @staticmethod
     def create_approval_request(
         db: Session,
@@ -66,6 +270,30 @@ class NotificationService:
         db.commit()
         return approval
     
+    @staticmethod
+    def _notify_requester(
+        db: Session,
+        approval: ApprovalRequest,
+        type: NotificationType,
+        outcome: str,
+        message: str,
+        priority: NotificationPriority
+    ):
+        """Tell the requester about a decision; approvals from before requested_by was recorded have nobody to tell"""
+        if approval.requested_by is None:
+            return
+        document_type = approval.document_type or "Document"
+        NotificationService.create_notification(
+            db,
+            approval.workspace_id,
+            approval.requested_by,
+            type,
+            f"{document_type} {outcome}",
+            f"Your {document_type} {message}",
+            priority,
+            f"/{approval.document_type.lower()}/{approval.document_id}" if approval.document_type else None
+        )
+    
     @staticmethod
     def approve_request(db: Session, approval_id: uuid.UUID, approver_id: uuid.UUID, comments: str = None):
         """Approve a request"""
@@ -74,19 +302,11 @@ class NotificationService:
             raise ValueError("Approval request not found")
         
         approval.status = "approved"
-        approval.comments = comments
-        approval.responded_at = datetime.utcnow()
+        approval.decision_notes = comments
+        approval.decided_at = datetime.utcnow()
         
-        # Notify requester
-        NotificationService.create_notification(
-            db,
-            approval.workspace_id,
-            approval.requested_by,
-            NotificationType.APPROVAL_APPROVED,
-            f"{approval.document_type} Approved",
-            f"Your {approval.document_type} has been approved.",
-            NotificationPriority.MEDIUM,
-            f"/{approval.document_type.lower()}/{approval.document_id}"
+        NotificationService._notify_requester(
+            db, approval, NotificationType.APPROVAL_APPROVED, "Approved", "has been approved.", NotificationPriority.MEDIUM
         )
         
         db.commit()
@@ -100,29 +320,57 @@ class NotificationService:
             raise ValueError("Approval request not found")
         
         approval.status = "rejected"
-        approval.comments = comments
-        approval.responded_at = datetime.utcnow()
+        approval.decision_notes = comments
+        approval.decided_at = datetime.utcnow()
         
-        # Notify requester
-        NotificationService.create_notification(
-            db,
-            approval.workspace_id,
-            approval.requested_by,
-            NotificationType.APPROVAL_REJECTED,
-            f"{approval.document_type} Rejected",
-            f"Your {approval.document_type} has been rejected. Reason: {comments}",
-            NotificationPriority.HIGH,
-            f"/{approval.document_type.lower()}/{approval.document_id}"
+        NotificationService._notify_requester(
+            db, approval, NotificationType.APPROVAL_REJECTED, "Rejected",
+            f"has been rejected. Reason: {comments}", NotificationPriority.HIGH
         )
         
         db.commit()
         return approval
     
     @staticmethod
-    def mark_as_read(db: Session, notification_id: uuid.UUID):
-        """Mark notification as read"""
-        notification = db.query(Notification).filter(Notification.id == notification_id).first()
+    def mark_as_read(db: Session, notification_id: uuid.UUID, user_id: uuid.UUID) -> Optional[Notification]:
+        """Mark one of the user's notifications as read; None if the user has no such notification"""
+        notification = db.query(Notification).filter(
+            Notification.id == notification_id,
+            Notification.user_id == user_id
+        ).first()
         if notification:
-            notification.is_read = True
+            # Conditional update so concurrent reads of one notification decrement once
+            marked = db.query(Notification).filter(
+                Notification.id == notification_id,
+                Notification.is_read == False
+            ).update({Notification.is_read: True}, synchronize_session=False)
+            unread = NotificationService._adjust_unread(db, notification.user_id, -1) if marked else None
             db.commit()
+            db.refresh(notification)
+            if marked:
+                manager.send_to_user(notification.workspace_id, notification.user_id, {
+                    "type": "notifications_read",
+                    "notification_ids": [str(notification.id)],
+                    "unread_count": unread
+                })
         return notification
+    
+    @staticmethod
+    def mark_all_as_read(db: Session, workspace_id: uuid.UUID, user_id: uuid.UUID) -> int:
+        """Mark all of a user's notifications as read; returns how many changed"""
+        marked = db.query(Notification).filter(
+            Notification.user_id == user_id,
+            Notification.is_read == False
+        ).update({Notification.is_read: True}, synchronize_session=False)
+        db.execute(
+            update(NotificationCounter)
+            .where(NotificationCounter.user_id == user_id)
+            .values(unread_count=0, updated_at=func.now())
+        )
+        db.commit()
+        manager.send_to_user(workspace_id, user_id, {
+            "type": "notifications_read",
+            "notification_ids": "all",
+            "unread_count": 0
+        })
+        return marked
@@ -1,6 +1,8 @@
 from sqlalchemy.orm import Session
 from sqlalchemy import text
 from app.models.reporting import CustomReport, ScheduledReport, ReportExecution
+from app.services.valuation_service import ValuationService
+from datetime import datetime, timezone
 from typing import List, Dict, Optional
 import uuid
 import pandas as pd
@@ -49,6 +51,19 @@ class ReportingService:
         
         # Build query based on report config
         query_config = report.query_config
+        if query_config.get("source") == "inventory_valuation":
+            parameters = parameters or {}
+            as_of = parameters.get("as_of")
+            warehouse_id = parameters.get("warehouse_id")
+            try:
+                as_of = datetime.fromisoformat(str(as_of)) if as_of else datetime.now(timezone.utc)
+            except ValueError:
+                raise ValueError("as_of must be an ISO date or datetime")
+            try:
+                warehouse_id = uuid.UUID(str(warehouse_id)) if warehouse_id else None
+            except ValueError:
+                raise ValueError("warehouse_id must be a UUID")
+            return ValuationService.inventory_valuation(db, report.workspace_id, as_of, warehouse_id)
         table = query_config.get("table")
         fields = query_config.get("fields", ["*"])
         conditions = query_config.get("conditions", [])
@@ -140,11 +155,11 @@ class ReportingService:
                 "id": "inventory_valuation",
                 "name": "Inventory Valuation",
                 "category": "inventory",
-                "description": "Stock value by product",
+                "description": "Stock quantity and value by product at a date",
                 "query_config": {
-                    "table": "products",
-                    "fields": ["code", "name", "type"],
-                    "conditions": []
+                    # Computed by ValuationService; parameters: as_of (ISO datetime), warehouse_id
+                    "source": "inventory_valuation",
+                    "parameters": ["as_of", "warehouse_id"]
                 },
                 "columns": [
                     {"key": "code", "label": "Product Code", "type": "string"},
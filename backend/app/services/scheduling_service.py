@@ -0,0 +1,359 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import bindparam, func, update
+from app.core.database import dialect_insert
+from app.models.manufacturing import JobOrder, JobOrderStatus, ProductionSchedule, WorkCenter, WorkCenterException
+from bisect import bisect_right
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Sequence
+import heapq
+import math
+import numpy as np
+import uuid
+
+DAY_START = timedelta(hours=8)  # Shifts start at 08:00; a day's capacity runs on from there
+DEFAULT_WEEK = [8, 8, 8, 8, 8, 0, 0]
+MAX_HORIZON_DAYS = 366 * 20
+RULES = ("edd", "cr")
+
+class CapacityCalendar:
+    """
+    Working time of one work center as a single axis of capacity hours
+    counted from origin (the start of a day). Scheduling a job is then plain
+    addition on that axis; converting back to a date is a binary search over
+    the cumulative daily capacity.
+    """
+    __slots__ = ("weekly", "exceptions", "origin", "cumulative")
+    
+    def __init__(self, weekly_hours: Optional[Sequence[float]], exceptions: Dict[date, float], origin: date):
+        week = [float(hours or 0) for hours in (weekly_hours or DEFAULT_WEEK)][:7]
+        self.weekly = np.array(week + [0.0] * (7 - len(week)))
+        self.exceptions = exceptions
+        self.origin = origin
+        self.cumulative = np.zeros(1)
+        if not self.weekly.any() and not any(hours > 0 for day, hours in exceptions.items() if day >= origin):
+            raise ValueError("Work center has no capacity")
+        self._extend(366)
+    
+    def _extend(self, days: int):
+        if days > MAX_HORIZON_DAYS:
+            raise ValueError("Work center capacity runs out within the scheduling horizon")
+        capacity = self.weekly[(self.origin.weekday() + np.arange(days)) % 7]
+        for day, hours in self.exceptions.items():
+            position = (day - self.origin).days
+            if 0 <= position < days:
+                capacity[position] = hours
+        self.cumulative = np.concatenate(([0.0], np.cumsum(capacity)))
+    
+    def to_offset(self, moment: datetime) -> float:
+        """Capacity hours between origin and moment"""
+        day = (moment.date() - self.origin).days
+        if day < 0:
+            return 0.0
+        while day + 1 >= len(self.cumulative):
+            self._extend(2 * (len(self.cumulative) - 1))
+        within = (moment - datetime.combine(moment.date(), datetime.min.time()) - DAY_START).total_seconds() / 3600
+        capacity = self.cumulative[day + 1] - self.cumulative[day]
+        return float(self.cumulative[day] + min(max(within, 0.0), capacity))
+    
+    def to_datetime(self, offset: float, end: bool = False) -> datetime:
+        """
+        The moment offset capacity hours after origin. A start lands at the
+        beginning of the next working day when a day is used up; an end stays at
+        the close of the day it finished.
+        """
+        while self.cumulative[-1] <= offset:
+            self._extend(2 * (len(self.cumulative) - 1))
+        day = int(np.searchsorted(self.cumulative, offset, side="left" if end else "right")) - 1
+        day = max(day, 0)
+        hours = offset - self.cumulative[day]
+        return datetime.combine(self.origin + timedelta(days=day), datetime.min.time()) + DAY_START + timedelta(hours=float(hours))
+
+class ScheduledJob:
+    __slots__ = ("job_id", "fixed_center", "hours", "due", "key", "center", "start_offset", "end_offset", "start", "end")
+    
+    def __init__(self, job_id: uuid.UUID, hours: float, due: Optional[datetime], fixed_center: Optional[uuid.UUID] = None):
+        self.job_id = job_id
+        self.fixed_center = fixed_center
+        self.hours = hours
+        self.due = due
+        self.key = (math.inf,)
+        self.center: Optional[uuid.UUID] = None
+        self.start_offset = self.end_offset = 0.0
+        self.start: Optional[datetime] = None
+        self.end: Optional[datetime] = None
+
+class Schedule:
+    """
+    Job orders sequenced on work centers by a priority rule: earliest due
+    date ("edd") or critical ratio ("cr", time to due date over processing
+    time, taken at the schedule start). Jobs are dispatched from a heap in
+    priority order, each to its fixed work center or to whichever eligible one
+    finishes it first, so every work center's sequence stays sorted by priority.
+    That is what lets update() re-sequence one changed job in place and only
+    recompute the jobs behind it.
+    """
+    
+    def __init__(self, calendars: Dict[uuid.UUID, CapacityCalendar], origin: datetime, rule: str = "edd",
+                 available: Optional[Dict[uuid.UUID, datetime]] = None):
+        if rule not in RULES:
+            raise ValueError(f"Unknown scheduling rule '{rule}'")
+        self.calendars = calendars
+        self.origin = origin
+        self.rule = rule
+        # Where each work center's sequence starts on its capacity axis
+        self.starts = {
+            center: calendar.to_offset(max(origin, (available or {}).get(center) or origin))
+            for center, calendar in calendars.items()
+        }
+        self.sequences: Dict[uuid.UUID, List[ScheduledJob]] = {center: [] for center in calendars}
+        self.jobs: Dict[uuid.UUID, ScheduledJob] = {}
+    
+    def _key(self, job: ScheduledJob, tie: int) -> tuple:
+        if job.due is None:
+            return (math.inf, tie)
+        if self.rule == "edd":
+            return (job.due.timestamp(), tie)
+        slack = (job.due - self.origin).total_seconds() / 3600
+        return (slack / job.hours if job.hours > 0 else slack, tie)
+    
+    def _place(self, job: ScheduledJob, center: uuid.UUID, start_offset: float):
+        calendar = self.calendars[center]
+        job.center = center
+        job.start_offset = start_offset
+        job.end_offset = start_offset + job.hours
+        job.start = calendar.to_datetime(job.start_offset)
+        job.end = calendar.to_datetime(job.end_offset, end=True)
+    
+    def build(self, jobs: Iterable[ScheduledJob]):
+        """Schedule jobs from scratch"""
+        queue = []
+        for tie, job in enumerate(jobs):
+            if job.fixed_center is not None and job.fixed_center not in self.calendars:
+                raise ValueError(f"Job order {job.job_id} is fixed to an unknown or inactive work center")
+            job.key = self._key(job, tie)
+            self.jobs[job.job_id] = job
+            queue.append((job.key, job))
+        heapq.heapify(queue)
+        if not self.calendars and queue:
+            raise ValueError("No active work centers to schedule on")
+        free = dict(self.starts)
+        centers = list(self.calendars)
+        while queue:
+            _, job = heapq.heappop(queue)
+            if job.fixed_center is not None:
+                center = job.fixed_center
+            else:
+                # Earliest finish; only evaluated across eligible centers, which are few
+                center = min(centers, key=lambda c: self.calendars[c].to_datetime(free[c] + job.hours, end=True))
+            self._place(job, center, free[center])
+            free[center] = job.end_offset
+            self.sequences[center].append(job)
+    
+    def load(self, center: uuid.UUID, jobs: List[ScheduledJob]):
+        """Adopt an existing sequence (jobs with start set, in order) without recomputing it"""
+        calendar = self.calendars[center]
+        for tie, job in enumerate(jobs):
+            job.key = self._key(job, tie)
+            job.center = center
+            job.start_offset = calendar.to_offset(job.start)
+            job.end_offset = job.start_offset + job.hours
+            self.jobs[job.job_id] = job
+        if jobs:
+            self.starts[center] = jobs[0].start_offset
+        self.sequences[center] = list(jobs)
+    
+    def _recompute(self, center: uuid.UUID, position: int, changed: set):
+        sequence = self.sequences[center]
+        cursor = sequence[position - 1].end_offset if position > 0 else self.starts[center]
+        for job in sequence[position:]:
+            if job.center == center and abs(job.start_offset - cursor) < 1e-6 and job.job_id not in changed:
+                break  # Everything behind an unmoved job stays where it is
+            self._place(job, center, cursor)
+            changed.add(job.job_id)
+            cursor = job.end_offset
+    
+    def update(self, job_id: uuid.UUID, hours: Optional[float] = None, due: Optional[datetime] = None,
+               fixed_center: Optional[uuid.UUID] = None) -> List[ScheduledJob]:
+        """
+        Apply a change to one scheduled job and re-sequence it on its work
+        center (or its new fixed one). Only jobs behind the old and new
+        positions are recomputed; returns every job whose times changed.
+        """
+        job = self.jobs[job_id]
+        old_center = job.center
+        old_sequence = self.sequences[old_center]
+        old_position = old_sequence.index(job)
+        del old_sequence[old_position]
+        if hours is not None:
+            job.hours = hours
+        if due is not None:
+            job.due = due
+        if fixed_center is not None:
+            if fixed_center not in self.calendars:
+                raise ValueError(f"Work center {fixed_center} is not loaded")
+            job.fixed_center = fixed_center
+        job.key = (self._key(job, 0)[0], job.key[1])
+        
+        center = job.fixed_center or old_center
+        sequence = self.sequences[center]
+        position = bisect_right([other.key for other in sequence], job.key)
+        sequence.insert(position, job)
+        job.center = None  # Forces it to be placed
+        changed = {job_id}
+        if center == old_center:
+            self._recompute(center, min(position, old_position), changed)
+        else:
+            self._recompute(old_center, old_position, changed)
+            self._recompute(center, position, changed)
+        return [self.jobs[i] for i in changed]
+    
+    def metrics(self) -> Dict:
+        jobs = [job for job in self.jobs.values() if job.end is not None]
+        return SchedulingService._metrics(
+            min((job.start for job in jobs), default=None), max((job.end for job in jobs), default=None),
+            len(jobs), sum(1 for job in jobs if job.due is not None), sum(1 for job in jobs if job.due is not None and job.end <= job.due)
+        )
+
+class SchedulingService:
+    @staticmethod
+    def _metrics(first_start, last_end, scheduled: int, with_due: int, on_time: int) -> Dict:
+        return {
+            "scheduled": scheduled,
+            "makespan_hours": round((last_end - first_start).total_seconds() / 3600, 2) if scheduled else 0.0,
+            "finish": last_end.isoformat() if last_end else None,
+            "on_time": on_time,
+            "late": with_due - on_time,
+            "on_time_rate": round(on_time / with_due, 4) if with_due else None
+        }
+    
+    @staticmethod
+    def _calendars(db: Session, centers: List[WorkCenter], origin: date) -> Dict[uuid.UUID, CapacityCalendar]:
+        exceptions: Dict[uuid.UUID, Dict[date, float]] = {center.id: {} for center in centers}
+        if centers:
+            for center_id, day, hours in db.query(
+                WorkCenterException.work_center_id, WorkCenterException.day, WorkCenterException.hours
+            ).filter(WorkCenterException.work_center_id.in_(list(exceptions)), WorkCenterException.day >= origin):
+                exceptions[center_id][day] = float(hours or 0)
+        calendars = {}
+        for center in centers:
+            try:
+                calendars[center.id] = CapacityCalendar(center.weekly_hours, exceptions[center.id], origin)
+            except ValueError as e:
+                raise ValueError(f"{center.code}: {e}")
+        return calendars
+    
+    @staticmethod
+    def _save(db: Session, jobs: Iterable[ScheduledJob]):
+        statement = update(JobOrder).where(JobOrder.id == bindparam("job_id")).values(
+            start_date=bindparam("new_start"), end_date=bindparam("new_end"),
+            assigned_work_center_id=bindparam("center"), status=JobOrderStatus.SCHEDULED
+        )
+        params = [{"job_id": j.job_id, "new_start": j.start, "new_end": j.end, "center": j.center} for j in jobs]
+        if params:
+            db.connection().execute(statement, params)
+    
+    @staticmethod
+    def schedule(db: Session, workspace_id: uuid.UUID, start: Optional[datetime] = None, rule: str = "edd") -> Dict:
+        """
+        Schedule every draft or scheduled job order with processing hours from
+        start (default now). Orders with a work_center_id only go there;
+        in-progress orders hold their work center until their end_date.
+        Returns makespan and on-time metrics.
+        """
+        start = start or datetime.now().replace(second=0, microsecond=0)
+        centers = db.query(WorkCenter).filter(
+            WorkCenter.workspace_id == workspace_id, WorkCenter.is_active == True
+        ).order_by(WorkCenter.code).all()
+        calendars = SchedulingService._calendars(db, centers, start.date())
+        busy = dict(db.query(JobOrder.assigned_work_center_id, func.max(JobOrder.end_date)).filter(
+            JobOrder.workspace_id == workspace_id, JobOrder.status == JobOrderStatus.IN_PROGRESS,
+            JobOrder.assigned_work_center_id.isnot(None)
+        ).group_by(JobOrder.assigned_work_center_id).all())
+        
+        rows = db.query(JobOrder.id, JobOrder.processing_hours, JobOrder.due_date, JobOrder.work_center_id).filter(
+            JobOrder.workspace_id == workspace_id,
+            JobOrder.status.in_([JobOrderStatus.DRAFT, JobOrderStatus.SCHEDULED]),
+            JobOrder.processing_hours > 0
+        ).order_by(JobOrder.created_at, JobOrder.id)
+        jobs = []
+        for job_id, hours, due, center in rows:
+            if center is not None and center not in calendars:
+                raise ValueError(f"Job order {job_id} requires an unknown or inactive work center")
+            jobs.append(ScheduledJob(job_id, float(hours), due, center))
+        
+        schedule = Schedule(calendars, start, rule, busy)
+        schedule.build(jobs)
+        SchedulingService._save(db, jobs)
+        # Rescheduling must key jobs exactly as this build did to keep the sequences sorted
+        db.execute(dialect_insert(db, ProductionSchedule).values(workspace_id=workspace_id, rule=rule, origin=start)
+                   .on_conflict_do_update(index_elements=["workspace_id"], set_={"rule": rule, "origin": start}))
+        db.commit()
+        return {"rule": rule, "start": start.isoformat(), **schedule.metrics()}
+    
+    @staticmethod
+    def reschedule(
+        db: Session,
+        job_order_id: uuid.UUID,
+        processing_hours: Optional[float] = None,
+        due_date: Optional[datetime] = None,
+        work_center_id: Optional[uuid.UUID] = None
+    ) -> Dict:
+        """
+        Change one scheduled job order and update the schedule incrementally:
+        only the sequences of its old and new work centers are loaded, and only
+        the jobs queued behind it move. Jobs are keyed by the rule and start of
+        the last full schedule, which is what their sequences are sorted by.
+        """
+        job_order = db.get(JobOrder, job_order_id)
+        if job_order is None or job_order.status != JobOrderStatus.SCHEDULED or job_order.assigned_work_center_id is None:
+            raise ValueError("Job order is not scheduled")
+        header = db.get(ProductionSchedule, job_order.workspace_id)
+        if header is None:
+            raise ValueError("Workspace has no schedule to update; run a full schedule first")
+        center_ids = {job_order.assigned_work_center_id} | ({work_center_id} if work_center_id else set())
+        centers = db.query(WorkCenter).filter(
+            WorkCenter.workspace_id == job_order.workspace_id, WorkCenter.id.in_(center_ids), WorkCenter.is_active == True
+        ).all()
+        if len(centers) != len(center_ids):
+            raise ValueError("Work center not found or inactive")
+        
+        rows = db.query(
+            JobOrder.id, JobOrder.assigned_work_center_id, JobOrder.work_center_id, JobOrder.processing_hours,
+            JobOrder.due_date, JobOrder.start_date, JobOrder.end_date
+        ).filter(
+            JobOrder.workspace_id == job_order.workspace_id,
+            JobOrder.assigned_work_center_id.in_(center_ids),
+            JobOrder.status == JobOrderStatus.SCHEDULED
+        ).order_by(JobOrder.start_date, JobOrder.id).all()
+        now = datetime.now().replace(second=0, microsecond=0)
+        # The calendars reach back to the earliest loaded job; empty centers start now
+        origin = min([now] + [row.start_date for row in rows])
+        calendars = SchedulingService._calendars(db, centers, origin.date())
+        schedule = Schedule(calendars, header.origin, header.rule, {center_id: now for center_id in center_ids})
+        sequences: Dict[uuid.UUID, List[ScheduledJob]] = {center_id: [] for center_id in center_ids}
+        for job_id, center, required, hours, due, start_date, end_date in rows:
+            job = ScheduledJob(job_id, float(hours or 0), due, required)
+            job.start, job.end = start_date, end_date
+            sequences[center].append(job)
+        for center, sequence in sequences.items():
+            schedule.load(center, sequence)
+        
+        changed = schedule.update(
+            job_order_id, float(processing_hours) if processing_hours is not None else None, due_date, work_center_id
+        )
+        SchedulingService._save(db, changed)
+        for key, value in (("processing_hours", processing_hours), ("due_date", due_date), ("work_center_id", work_center_id)):
+            if value is not None:
+                setattr(job_order, key, value)
+        db.commit()
+        return {"moved": len(changed), **SchedulingService.report(db, job_order.workspace_id)}
+    
+    @staticmethod
+    def report(db: Session, workspace_id: uuid.UUID) -> Dict:
+        """Makespan and on-time rate of the workspace's current schedule"""
+        scheduled = JobOrder.status == JobOrderStatus.SCHEDULED
+        first_start, last_end, count, with_due, on_time = db.query(
+            func.min(JobOrder.start_date), func.max(JobOrder.end_date), func.count(JobOrder.id),
+            func.count(JobOrder.due_date), func.count(JobOrder.id).filter(JobOrder.end_date <= JobOrder.due_date)
+        ).filter(JobOrder.workspace_id == workspace_id, scheduled).one()
+        return SchedulingService._metrics(first_start, last_end, count, with_due, on_time)
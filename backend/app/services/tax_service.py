@@ -1,10 +1,109 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import and_
-from decimal import Decimal
-from datetime import date
-from app.models.currency_tax import TaxRate, TaxTransaction, TaxType
+from sqlalchemy import and_, extract, insert, func
+from decimal import Decimal, ROUND_HALF_UP
+from datetime import date, timedelta
+from app.core.database import dialect_insert
+from app.models.currency_tax import TaxRate, TaxTransaction, TaxType, TaxMonthlySummary
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+from bisect import bisect_right
+from math import gcd
+import numpy as np
+import threading
+import time
 import uuid
 
+class TaxRateIndex:
+    """
+    Effective-dated tax rates of one workspace, indexed by tax type. The
+    intervals of a type are flattened into a sorted timeline of disjoint
+    segments, each holding the rate of the latest-starting interval that
+    covers it (None in gaps), so an expired newer rate falls back to an
+    older open-ended one.
+    """
+    
+    def __init__(self, rates: Iterable[TaxRate]):
+        intervals: Dict[str, List[Tuple[date, Optional[date], Decimal]]] = {}
+        for rate in rates:
+            if rate.effective_from is None:
+                continue
+            intervals.setdefault(rate.tax_type, []).append(
+                (rate.effective_from, rate.effective_to, rate.rate_percentage)
+            )
+        
+        # tax_type -> (sorted segment start dates, rate in force from each start)
+        self._by_type: Dict[str, Tuple[List[date], List[Optional[Decimal]]]] = {}
+        for tax_type, entries in intervals.items():
+            entries.sort(key=lambda e: e[0])
+            boundaries = sorted({e[0] for e in entries} | {
+                e[1] + timedelta(days=1) for e in entries if e[1] is not None and e[1] < date.max
+            })
+            starts, segment_rates = [], []
+            for start in boundaries:
+                covering = [e for e in entries if e[0] <= start and (e[1] is None or start <= e[1])]
+                starts.append(start)
+                segment_rates.append(covering[-1][2] if covering else None)
+            self._by_type[tax_type] = (starts, segment_rates)
+    
+    def rate_for(self, tax_type: str, on_date: date) -> Optional[Decimal]:
+        """Rate percentage in force for tax_type on on_date (O(log n))"""
+        indexed = self._by_type.get(tax_type)
+        if not indexed:
+            return None
+        
+        starts, segment_rates = indexed
+        i = bisect_right(starts, on_date) - 1
+        return segment_rates[i] if i >= 0 else None
+
+class TaxRateCache:
+    """
+    Per-workspace TaxRateIndex, loaded with one query and kept until the
+    workspace's rates change. Entries also expire after max_age seconds so
+    changes made by other worker processes are eventually picked up.
+    """
+    
+    def __init__(self, max_age: float = 300.0):
+        self.max_age = max_age
+        # workspace_id -> (loaded_at, index)
+        self._indexes: Dict[uuid.UUID, Tuple[float, TaxRateIndex]] = {}
+        self._lock = threading.Lock()
+    
+    def get_index(self, db: Session, workspace_id: uuid.UUID) -> TaxRateIndex:
+        cached = self._indexes.get(workspace_id)
+        if cached and time.monotonic() - cached[0] < self.max_age:
+            return cached[1]
+        
+        rates = db.query(TaxRate).filter(
+            and_(
+                TaxRate.workspace_id == workspace_id,
+                TaxRate.is_active == True
+            )
+        ).all()
+        index = TaxRateIndex(rates)
+        
+        with self._lock:
+            self._indexes[workspace_id] = (time.monotonic(), index)
+        return index
+    
+    def get_rate(
+        self,
+        db: Session,
+        workspace_id: uuid.UUID,
+        tax_type: str,
+        on_date: Optional[date] = None
+    ) -> Optional[Decimal]:
+        return self.get_index(db, workspace_id).rate_for(tax_type, on_date or date.today())
+    
+    def invalidate(self, workspace_id: Optional[uuid.UUID] = None):
+        """Drop cached rates for one workspace (or all) after tax rates change"""
+        with self._lock:
+            if workspace_id is None:
+                self._indexes.clear()
+            else:
+                self._indexes.pop(workspace_id, None)
+
+# Global tax rate cache instance
+tax_rate_cache = TaxRateCache()
+
 class TaxService:
     """Indonesian tax calculation service"""
     
@@ -17,6 +116,25 @@ class TaxService:
         (float('inf'), 0.35) # Above 5B: 35%
     ]
     
+    # PTKP (Tax-free threshold) - Single with no dependents
+    PPH_21_PTKP = Decimal("54000000")  # 54M IDR per year
+    
+    # Integer versions of the rates above for the batch (fixed-point) engine.
+    # Amounts are int64 cents; rates are whole percent / per-mille so every
+    # intermediate stays an exact integer.
+    PPH_21_BRACKETS_CENTS = [
+        (0, 6000000000, 5),
+        (6000000000, 25000000000, 15),
+        (25000000000, 50000000000, 25),
+        (50000000000, 500000000000, 30),
+        (500000000000, None, 35),
+    ]
+    PPH_4_2_RATES_PERMILLE = {"construction": 25, "rent": 100, "other": 100}
+    
+    # Largest absolute amount (in cents) the batch engine accepts: 10T IDR.
+    # Keeps the PPh 21 numerator (cents * 35% * 120%) inside int64.
+    MAX_BATCH_CENTS = 10 ** 15
+    
     @staticmethod
     def seed_tax_rates(db: Session, workspace_id: uuid.UUID):
         """Seed Indonesian tax rates"""
@@ -57,11 +175,22 @@ class TaxService:
                 db.add(tax_rate)
         
         db.commit()
+        tax_rate_cache.invalidate(workspace_id)
+    
+    @staticmethod
+    def get_tax_rate(
+        db: Session,
+        workspace_id: uuid.UUID,
+        tax_type: str,
+        on_date: Optional[date] = None
+    ) -> Optional[Decimal]:
+        """Rate percentage in force for a tax type on a date (cached per workspace)"""
+        return tax_rate_cache.get_rate(db, workspace_id, tax_type, on_date)
     
     @staticmethod
-    def calculate_ppn(amount: Decimal, include_tax: bool = False) -> dict:
-        """Calculate PPN (VAT) 11%"""
-        ppn_rate = Decimal("0.11")
+    def calculate_ppn(amount: Decimal, include_tax: bool = False, rate_percentage: Optional[Decimal] = None) -> dict:
+        """Calculate PPN (VAT) 11%, or the given workspace rate"""
+        ppn_rate = Decimal("0.11") if rate_percentage is None else rate_percentage / 100
         
         if include_tax:
             # Amount already includes PPN, extract it
@@ -80,11 +209,10 @@ class TaxService:
         }
     
     @staticmethod
-    def calculate_pph_21(annual_income: Decimal, has_npwp: bool = True) -> dict:
+    def calculate_pph_21(annual_income: Decimal, has_npwp: bool = True, ptkp: Optional[Decimal] = None) -> dict:
         """Calculate PPh 21 (Income Tax) - Progressive brackets"""
         
-        # PTKP (Tax-free threshold) - Single with no dependents
-        ptkp = Decimal("54000000")  # 54M IDR per year
+        ptkp = TaxService.PPH_21_PTKP if ptkp is None else ptkp
         
         # Taxable income
         taxable_income = max(annual_income - ptkp, Decimal("0"))
@@ -129,13 +257,13 @@ class TaxService:
         }
     
     @staticmethod
-    def calculate_pph_23(amount: Decimal, has_npwp: bool = True) -> dict:
-        """Calculate PPh 23 (Withholding Tax) 2%"""
-        rate = Decimal("0.02")
+    def calculate_pph_23(amount: Decimal, has_npwp: bool = True, rate_percentage: Optional[Decimal] = None) -> dict:
+        """Calculate PPh 23 (Withholding Tax) 2%, or the given workspace rate"""
+        rate = Decimal("0.02") if rate_percentage is None else rate_percentage / 100
         
         # Non-NPWP: double rate (4%)
         if not has_npwp:
-            rate = Decimal("0.04")
+            rate *= 2
         
         tax_amount = amount * rate
         net_amount = amount - tax_amount
@@ -170,6 +298,186 @@ class TaxService:
             "net_amount": net_amount
         }
     
+    # ===== BATCH (VECTORIZED) CALCULATIONS =====
+    # Same rules as the scalar calculators above, evaluated over int64 arrays of
+    # cents. Results are the scalar results rounded to the cent (ROUND_HALF_UP),
+    # which is also what tax_transactions stores (Numeric(20, 2)). Net amounts
+    # are gross minus the rounded tax so that gross = tax + net always balances.
+    
+    @staticmethod
+    def to_cents(amounts: Iterable) -> np.ndarray:
+        """Convert Decimal/str/int amounts to an int64 array of cents"""
+        cents = []
+        for amount in amounts:
+            scaled = Decimal(str(amount)) * 100
+            if scaled != scaled.to_integral_value():
+                raise ValueError(f"Amount {amount} has more than 2 decimal places")
+            cents.append(int(scaled))
+        
+        result = np.array(cents, dtype=np.int64)
+        TaxService._check_batch_range(result)
+        return result
+    
+    @staticmethod
+    def from_cents(cents: np.ndarray) -> list:
+        """Convert an int64 array of cents back to Decimals"""
+        return [Decimal(int(c)).scaleb(-2) for c in cents]
+    
+    @staticmethod
+    def _check_batch_range(cents: np.ndarray):
+        if cents.size and int(np.abs(cents).max()) > TaxService.MAX_BATCH_CENTS:
+            raise ValueError("Amount exceeds the batch tax engine range (10T IDR)")
+    
+    @staticmethod
+    def _round_half_up_div(numerator: np.ndarray, divisor: int) -> np.ndarray:
+        """Integer division rounded half away from zero (Decimal ROUND_HALF_UP)"""
+        magnitude = (2 * np.abs(numerator) + divisor) // (2 * divisor)
+        return np.where(numerator < 0, -magnitude, magnitude)
+    
+    @staticmethod
+    def _as_flags(values, size: int, default: bool = True) -> np.ndarray:
+        if values is None:
+            return np.full(size, default, dtype=bool)
+        flags = np.asarray(values, dtype=bool)
+        if flags.shape != (size,):
+            raise ValueError("Attribute array length must match amounts")
+        return flags
+    
+    @staticmethod
+    def _scaled_round(cents: np.ndarray, numerator: int, divisor: int) -> np.ndarray:
+        """cents * numerator / divisor rounded half-up, without int64 overflow"""
+        common = gcd(numerator, divisor)
+        numerator, divisor = numerator // common, divisor // common
+        if 2 * (TaxService.MAX_BATCH_CENTS * numerator + divisor) >= 2 ** 63:
+            # Unusual rates: fall back to Python integers (still exact)
+            cents = cents.astype(object)
+        return TaxService._round_half_up_div(cents * numerator, divisor).astype(np.int64)
+    
+    @staticmethod
+    def calculate_ppn_batch(
+        amounts_cents: np.ndarray,
+        include_tax: bool = False,
+        rate_percentage: Optional[Decimal] = None
+    ) -> dict:
+        """Calculate PPN (VAT) 11%, or the given rate, for an array of amounts in cents"""
+        cents = np.asarray(amounts_cents, dtype=np.int64)
+        TaxService._check_batch_range(cents)
+        
+        rate = Decimal("11.00") if rate_percentage is None else Decimal(rate_percentage)
+        rate_bp = int(rate * 100)  # Numeric(5, 2) percentage -> basis points
+        
+        if include_tax:
+            base = TaxService._scaled_round(cents, 10000, 10000 + rate_bp)
+            ppn = cents - base
+        else:
+            base = cents
+            ppn = TaxService._scaled_round(cents, rate_bp, 10000)
+        
+        return {
+            "base_amount_cents": base,
+            "ppn_amount_cents": ppn,
+            "total_amount_cents": base + ppn,
+            "ppn_rate": rate
+        }
+    
+    @staticmethod
+    def calculate_pph_21_batch(
+        annual_incomes_cents: np.ndarray,
+        has_npwp: Optional[Sequence[bool]] = None,
+        ptkp_cents: Optional[np.ndarray] = None
+    ) -> dict:
+        """Calculate PPh 21 for a whole payroll run (one entry per employee)"""
+        income = np.asarray(annual_incomes_cents, dtype=np.int64)
+        TaxService._check_batch_range(income)
+        npwp = TaxService._as_flags(has_npwp, income.size)
+        
+        if ptkp_cents is None:
+            ptkp = np.full(income.size, int(TaxService.PPH_21_PTKP * 100), dtype=np.int64)
+        else:
+            ptkp = np.asarray(ptkp_cents, dtype=np.int64)
+        
+        taxable = np.maximum(income - ptkp, 0)
+        
+        # Sum of (bracket portion * whole-percent rate), in 1/100 cent
+        tax_numerator = np.zeros(income.size, dtype=np.int64)
+        for lower, upper, percent in TaxService.PPH_21_BRACKETS_CENTS:
+            portion = taxable - lower
+            if upper is not None:
+                portion = np.minimum(portion, upper - lower)
+            tax_numerator += np.maximum(portion, 0) * percent
+        
+        # Non-NPWP penalty: 20% higher
+        tax_numerator *= np.where(npwp, 100, 120)
+        tax = TaxService._round_half_up_div(tax_numerator, 10000)
+        
+        with np.errstate(divide="ignore", invalid="ignore"):
+            effective_rate = np.where(income > 0, tax * 100.0 / income, 0.0)
+        
+        return {
+            "annual_income_cents": income,
+            "ptkp_cents": ptkp,
+            "taxable_income_cents": taxable,
+            "tax_amount_cents": tax,
+            "effective_rate": effective_rate,
+            "has_npwp": npwp
+        }
+    
+    @staticmethod
+    def calculate_pph_23_batch(
+        amounts_cents: np.ndarray,
+        has_npwp: Optional[Sequence[bool]] = None,
+        rate_percentage: Optional[Decimal] = None
+    ) -> dict:
+        """Calculate PPh 23 (2%, 4% without NPWP), or the given rate, for an array of amounts in cents"""
+        cents = np.asarray(amounts_cents, dtype=np.int64)
+        TaxService._check_batch_range(cents)
+        npwp = TaxService._as_flags(has_npwp, cents.size)
+        
+        rate = Decimal("2.00") if rate_percentage is None else Decimal(rate_percentage)
+        rate_bp = int(rate * 100)  # Numeric(5, 2) percentage -> basis points
+        # Non-NPWP: double rate
+        tax = np.where(
+            npwp,
+            TaxService._scaled_round(cents, rate_bp, 10000),
+            TaxService._scaled_round(cents, 2 * rate_bp, 10000)
+        )
+        
+        return {
+            "gross_amount_cents": cents,
+            "tax_rate": np.where(npwp, rate_bp, 2 * rate_bp) / 100,
+            "tax_amount_cents": tax,
+            "net_amount_cents": cents - tax,
+            "has_npwp": npwp
+        }
+    
+    @staticmethod
+    def calculate_pph_4_2_batch(
+        amounts_cents: np.ndarray,
+        service_types: Optional[Sequence[str]] = None
+    ) -> dict:
+        """Calculate PPh 4(2) (Final Tax) for an array of amounts in cents"""
+        cents = np.asarray(amounts_cents, dtype=np.int64)
+        TaxService._check_batch_range(cents)
+        
+        if service_types is None:
+            service_types = ["construction"] * cents.size
+        if len(service_types) != cents.size:
+            raise ValueError("Attribute array length must match amounts")
+        
+        rates = TaxService.PPH_4_2_RATES_PERMILLE
+        permille = np.fromiter(
+            (rates.get(t, 100) for t in service_types), dtype=np.int64, count=cents.size
+        )
+        tax = TaxService._round_half_up_div(cents * permille, 1000)
+        
+        return {
+            "gross_amount_cents": cents,
+            "service_type": list(service_types),
+            "tax_rate": permille / 10,
+            "tax_amount_cents": tax,
+            "net_amount_cents": cents - tax
+        }
+    
     @staticmethod
     def create_tax_transaction(
         db: Session,
@@ -178,23 +486,228 @@ class TaxService:
         document_id: uuid.UUID,
         tax_type: str,
         tax_base: Decimal,
-        tax_rate: Decimal,
-        tax_amount: Decimal,
-        npwp: str = None
+        tax_rate: Decimal = None,
+        tax_amount: Decimal = None,
+        npwp: str = None,
+        tax_date: date = None
     ) -> TaxTransaction:
-        """Record tax transaction"""
-        tax_transaction = TaxTransaction(
-            workspace_id=workspace_id,
-            document_type=document_type,
-            document_id=document_id,
-            tax_type=tax_type,
-            tax_base=tax_base,
-            tax_rate=tax_rate,
-            tax_amount=tax_amount,
-            npwp=npwp,
-            tax_date=date.today()
+        """Record one tax transaction through the batch recorder (rate resolved from the workspace's tax rates if omitted)"""
+        with TaxService.batch_recorder(db, workspace_id) as taxes:
+            row = taxes.add(document_type, document_id, tax_type, tax_base, tax_rate, tax_amount, npwp, tax_date)
+        db.commit()
+        return db.get(TaxTransaction, row["id"])
+    
+    @staticmethod
+    def batch_recorder(db: Session, workspace_id: uuid.UUID) -> "TaxTransactionBatch":
+        """Start a batch of tax transactions for a posting run"""
+        return TaxTransactionBatch(db, workspace_id)
+    
+    @staticmethod
+    def _increment_monthly_summary(db: Session, workspace_id: uuid.UUID, transactions: List[dict]):
+        """Add tax transactions to the monthly summary with one upsert"""
+        totals: Dict[tuple, list] = {}
+        for tx in transactions:
+            key = (tx["tax_date"].replace(day=1), tx["tax_type"], tx["npwp"] or "")
+            entry = totals.setdefault(key, [0, Decimal("0"), Decimal("0")])
+            entry[0] += 1
+            entry[1] += Decimal(str(tx["tax_base"]))
+            entry[2] += Decimal(str(tx["tax_amount"]))
+        
+        if not totals:
+            return
+        
+        stmt = dialect_insert(db, TaxMonthlySummary).values([
+            {
+                "workspace_id": workspace_id,
+                "period": period,
+                "tax_type": tax_type,
+                "npwp": npwp,
+                "transaction_count": count,
+                "tax_base_total": base_total,
+                "tax_amount_total": amount_total
+            }
+            for (period, tax_type, npwp), (count, base_total, amount_total) in totals.items()
+        ])
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["workspace_id", "period", "tax_type", "npwp"],
+            set_={
+                "transaction_count": TaxMonthlySummary.transaction_count + stmt.excluded.transaction_count,
+                "tax_base_total": TaxMonthlySummary.tax_base_total + stmt.excluded.tax_base_total,
+                "tax_amount_total": TaxMonthlySummary.tax_amount_total + stmt.excluded.tax_amount_total,
+                "updated_at": func.now()
+            }
         )
-        db.add(tax_transaction)
+        db.execute(stmt)
+    
+    @staticmethod
+    def rebuild_monthly_summary(db: Session, workspace_id: Optional[uuid.UUID] = None) -> int:
+        """
+        Recompute the monthly summary of one workspace (or all) from
+        tax_transactions; returns the number of summary rows written. Totals
+        are upserted as absolute values, so concurrent rebuilds agree.
+        Does not commit.
+        """
+        year, month = extract("year", TaxTransaction.tax_date), extract("month", TaxTransaction.tax_date)
+        npwp = func.coalesce(TaxTransaction.npwp, "")
+        query = db.query(
+            TaxTransaction.workspace_id, year, month, TaxTransaction.tax_type, npwp,
+            func.count(TaxTransaction.id), func.sum(TaxTransaction.tax_base), func.sum(TaxTransaction.tax_amount)
+        )
+        stale = db.query(TaxMonthlySummary)
+        if workspace_id is not None:
+            query = query.filter(TaxTransaction.workspace_id == workspace_id)
+            stale = stale.filter(TaxMonthlySummary.workspace_id == workspace_id)
+        rows = [
+            {
+                "workspace_id": ws,
+                "period": date(int(y), int(m), 1),
+                "tax_type": tax_type,
+                "npwp": tax_npwp,
+                "transaction_count": count,
+                "tax_base_total": Decimal(str(base_total or 0)),
+                "tax_amount_total": Decimal(str(amount_total or 0))
+            }
+            for ws, y, m, tax_type, tax_npwp, count, base_total, amount_total
+            in query.group_by(TaxTransaction.workspace_id, year, month, TaxTransaction.tax_type, npwp).all()
+        ]
+        stale.delete(synchronize_session=False)
+        
+        for start in range(0, len(rows), TaxTransactionBatch.CHUNK_SIZE):
+            stmt = dialect_insert(db, TaxMonthlySummary).values(rows[start:start + TaxTransactionBatch.CHUNK_SIZE])
+            db.execute(stmt.on_conflict_do_update(
+                index_elements=["workspace_id", "period", "tax_type", "npwp"],
+                set_={
+                    "transaction_count": stmt.excluded.transaction_count,
+                    "tax_base_total": stmt.excluded.tax_base_total,
+                    "tax_amount_total": stmt.excluded.tax_amount_total,
+                    "updated_at": func.now()
+                }
+            ))
+        return len(rows)
+    
+    @staticmethod
+    def backfill_monthly_summary(db: Session) -> int:
+        """Build the monthly summary from existing tax transactions the first time it is empty"""
+        if db.query(TaxMonthlySummary.id).first() is not None or db.query(TaxTransaction.id).first() is None:
+            return 0
+        written = TaxService.rebuild_monthly_summary(db)
         db.commit()
-        db.refresh(tax_transaction)
-        return tax_transaction
+        return written
+    
+    @staticmethod
+    def get_monthly_tax_summary(db: Session, workspace_id: uuid.UUID, year: int, month: int) -> List[dict]:
+        """Monthly tax report per tax type and NPWP (reads the maintained summary)"""
+        rows = db.query(TaxMonthlySummary).filter(
+            and_(
+                TaxMonthlySummary.workspace_id == workspace_id,
+                TaxMonthlySummary.period == date(year, month, 1)
+            )
+        ).order_by(TaxMonthlySummary.tax_type, TaxMonthlySummary.npwp).all()
+        
+        return [
+            {
+                "tax_type": r.tax_type,
+                "npwp": r.npwp or None,
+                "transaction_count": r.transaction_count,
+                "tax_base_total": r.tax_base_total,
+                "tax_amount_total": r.tax_amount_total
+            }
+            for r in rows
+        ]
+
+class TaxTransactionBatch:
+    """
+    Accumulates the tax transactions of a posting run and writes them with
+    multi-row INSERTs plus one monthly-summary upsert. flush() does not
+    commit: the rows become part of the caller's posting transaction.
+    
+        with TaxService.batch_recorder(db, workspace_id) as taxes:
+            for invoice in invoices:
+                taxes.add_document_taxes("INVOICE", invoice.id, {"ppn": invoice.subtotal})
+        db.commit()
+    """
+    
+    # Rows per INSERT statement (keeps bind parameters well under PostgreSQL's limit)
+    CHUNK_SIZE = 1000
+    
+    def __init__(self, db: Session, workspace_id: uuid.UUID):
+        self.db = db
+        self.workspace_id = workspace_id
+        self._pending: List[dict] = []
+    
+    def __len__(self):
+        return len(self._pending)
+    
+    def add(
+        self,
+        document_type: str,
+        document_id: uuid.UUID,
+        tax_type: str,
+        tax_base: Decimal,
+        tax_rate: Decimal = None,
+        tax_amount: Decimal = None,
+        npwp: str = None,
+        tax_date: date = None
+    ) -> dict:
+        """Queue one tax transaction (rate resolved from the cached workspace rates if omitted)"""
+        tax_date = tax_date or date.today()
+        tax_base = Decimal(str(tax_base))
+        
+        if tax_rate is None:
+            tax_rate = tax_rate_cache.get_rate(self.db, self.workspace_id, tax_type, tax_date)
+            if tax_rate is None:
+                raise ValueError(f"No {tax_type} rate in force on {tax_date}")
+        
+        if tax_amount is None:
+            tax_amount = (tax_base * tax_rate / 100).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
+        
+        row = {
+            "id": uuid.uuid4(),
+            "workspace_id": self.workspace_id,
+            "document_type": document_type,
+            "document_id": document_id,
+            "tax_type": tax_type,
+            "tax_base": tax_base,
+            "tax_rate": tax_rate,
+            "tax_amount": tax_amount,
+            "npwp": npwp,
+            "tax_date": tax_date,
+            "is_posted": False
+        }
+        self._pending.append(row)
+        return row
+    
+    def add_document_taxes(
+        self,
+        document_type: str,
+        document_id: uuid.UUID,
+        tax_bases: Dict[str, Decimal],
+        npwp: str = None,
+        tax_date: date = None
+    ) -> List[dict]:
+        """Queue one tax transaction per tax type for a document"""
+        return [
+            self.add(document_type, document_id, tax_type, tax_base, npwp=npwp, tax_date=tax_date)
+            for tax_type, tax_base in tax_bases.items()
+        ]
+    
+    def flush(self) -> int:
+        """Write queued transactions and update the monthly summary"""
+        pending, self._pending = self._pending, []
+        if not pending:
+            return 0
+        
+        for start in range(0, len(pending), self.CHUNK_SIZE):
+            self.db.execute(insert(TaxTransaction).values(pending[start:start + self.CHUNK_SIZE]))
+        TaxService._increment_monthly_summary(self.db, self.workspace_id, pending)
+        return len(pending)
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.flush()
+        else:
+            self._pending = []
+        return False
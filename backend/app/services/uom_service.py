@@ -0,0 +1,112 @@
+from sqlalchemy.orm import Session
+from app.models.inventory import Product, UOMConversion
+from collections import deque
+from decimal import Decimal
+from fractions import Fraction
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+import uuid
+
+def _unit(uom: Optional[str]) -> Optional[str]:
+    return uom.strip().upper() if uom and uom.strip() else None
+
+def _decimal(value: Fraction) -> Decimal:
+    return Decimal(value.numerator) / Decimal(value.denominator)
+
+class UOMGraph:
+    """
+    Unit conversions of a set of products. Every UOMConversion row (1 from_uom
+    = ratio to_uom) is an edge usable in both directions, so box -> pack ->
+    pcs resolves without a direct box -> pcs row. A product's graph is
+    walked once, from its base UOM, the first time it is needed; the ratio
+    of every unit reachable from there is memoized. Ratios are exact
+    fractions, so a round trip through 1/12 comes back whole.
+    """
+    
+    def __init__(self, base_uoms: Dict[uuid.UUID, Optional[str]],
+                 conversions: Iterable[Tuple[uuid.UUID, str, str, Decimal]]):
+        self.base_uoms = {product_id: _unit(uom) for product_id, uom in base_uoms.items()}
+        self.edges: Dict[uuid.UUID, Dict[str, List[Tuple[str, Fraction]]]] = {}
+        for product_id, from_uom, to_uom, ratio in conversions:
+            from_uom, to_uom = _unit(from_uom), _unit(to_uom)
+            if not from_uom or not to_uom or not ratio:
+                continue
+            ratio = Fraction(Decimal(ratio))
+            units = self.edges.setdefault(product_id, {})
+            units.setdefault(from_uom, []).append((to_uom, ratio))
+            units.setdefault(to_uom, []).append((from_uom, 1 / ratio))
+        self._ratios: Dict[uuid.UUID, Dict[str, Fraction]] = {}
+    
+    def _resolve(self, product_id: uuid.UUID) -> Dict[str, Fraction]:
+        """Base-UOM quantity of one of each unit reachable from the base UOM"""
+        base = self.base_uoms.get(product_id)
+        ratios = {base: Fraction(1)}
+        units = self.edges.get(product_id, {})
+        queue = deque([base])
+        while queue:
+            unit = queue.popleft()
+            for other, ratio in units.get(unit, ()):
+                if other not in ratios:
+                    # 1 other = ratios[unit] / ratio base units
+                    ratios[other] = ratios[unit] / ratio
+                    queue.append(other)
+        self._ratios[product_id] = ratios
+        return ratios
+    
+    def ratio(self, product_id: uuid.UUID, uom: Optional[str]) -> Fraction:
+        """Base units in one uom of the product"""
+        unit = _unit(uom)
+        base = self.base_uoms.get(product_id)
+        if unit is None or base is None or unit == base:
+            return Fraction(1)
+        ratios = self._ratios.get(product_id)
+        if ratios is None:
+            ratios = self._resolve(product_id)
+        ratio = ratios.get(unit)
+        if ratio is None:
+            raise ValueError(f"No conversion from {unit} to {base} for product {product_id}")
+        return ratio
+    
+    def convert(self, product_id: uuid.UUID, qty: Decimal, from_uom: Optional[str], to_uom: Optional[str]) -> Decimal:
+        ratio = self.ratio(product_id, from_uom) / self.ratio(product_id, to_uom)
+        return _decimal(Fraction(Decimal(qty)) * ratio)
+
+class UOMService:
+    @staticmethod
+    def load_graph(db: Session, product_ids: Iterable[uuid.UUID]) -> UOMGraph:
+        """Base UOMs and conversions of the given products, in two queries"""
+        product_ids = list(set(product_ids))
+        if not product_ids:
+            return UOMGraph({}, [])
+        base_uoms = dict(db.query(Product.id, Product.uom).filter(Product.id.in_(product_ids)).all())
+        conversions = db.query(
+            UOMConversion.product_id, UOMConversion.from_uom, UOMConversion.to_uom, UOMConversion.ratio
+        ).filter(UOMConversion.product_id.in_(product_ids)).all()
+        return UOMGraph(base_uoms, conversions)
+    
+    @staticmethod
+    def to_base(db: Session, lines: Sequence, graph: Optional[UOMGraph] = None) -> List[Tuple[Decimal, Decimal]]:
+        """
+        Convert document lines (objects with product_id, qty, uom and
+        unit_price) to (qty, unit price) in each product's base UOM. Raises
+        ValueError for a unit the product has no conversion path for.
+        """
+        if graph is None:
+            graph = UOMService.load_graph(db, (line.product_id for line in lines))
+        # Ratios as exact Decimal numerator/denominator pairs; one correctly rounded division per value
+        terms: Dict[Tuple[uuid.UUID, Optional[str]], Optional[Tuple[Decimal, Decimal]]] = {}
+        converted = []
+        for line in lines:
+            key = (line.product_id, line.uom)
+            if key in terms:
+                term = terms[key]
+            else:
+                ratio = graph.ratio(line.product_id, line.uom)
+                term = terms[key] = None if ratio == 1 else (Decimal(ratio.numerator), Decimal(ratio.denominator))
+            qty = Decimal(line.qty or 0)
+            price = Decimal(line.unit_price or 0)
+            if term is None:
+                converted.append((qty, price))
+            else:
+                numerator, denominator = term
+                converted.append((qty * numerator / denominator, price * denominator / numerator))
+        return converted
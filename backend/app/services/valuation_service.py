@@ -0,0 +1,121 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import func, insert
+from app.models.inventory import Product
+from app.models.ledger import StockLedger, StockSnapshot
+from datetime import datetime, timezone
+from decimal import Decimal
+from typing import Dict, List, Optional, Tuple
+import uuid
+
+ZERO = Decimal(0)
+COST_PLACES = Decimal("0.0001")
+
+Balances = Dict[Tuple[uuid.UUID, uuid.UUID], List[Decimal]]
+
+class ValuationService:
+    """
+    Inventory quantity and value at any date: the nearest closing snapshot at
+    or before the date plus the ledger movements since, so a valuation costs
+    O(products + movements since the snapshot) rather than a full ledger replay.
+    Values come from the ledger unit costs set by CostingService.
+    """
+    
+    @staticmethod
+    def _latest_snapshot(db: Session, workspace_id: uuid.UUID, as_of: datetime) -> Optional[datetime]:
+        return db.query(func.max(StockSnapshot.closed_at)).filter(
+            StockSnapshot.workspace_id == workspace_id, StockSnapshot.closed_at <= as_of
+        ).scalar()
+    
+    @staticmethod
+    def balances_at(
+        db: Session,
+        workspace_id: uuid.UUID,
+        as_of: datetime,
+        warehouse_id: Optional[uuid.UUID] = None
+    ) -> Balances:
+        """[qty, value] per (product, warehouse) of a workspace's products as of the end of as_of"""
+        balances: Balances = {}
+        snapshot_at = ValuationService._latest_snapshot(db, workspace_id, as_of)
+        if snapshot_at is not None:
+            query = db.query(
+                StockSnapshot.product_id, StockSnapshot.warehouse_id, StockSnapshot.qty, StockSnapshot.value
+            ).filter(StockSnapshot.workspace_id == workspace_id, StockSnapshot.closed_at == snapshot_at)
+            if warehouse_id is not None:
+                query = query.filter(StockSnapshot.warehouse_id == warehouse_id)
+            for product_id, warehouse, qty, value in query:
+                balances[(product_id, warehouse)] = [Decimal(qty), Decimal(value)]
+        
+        delta = db.query(
+            StockLedger.product_id, StockLedger.warehouse_id,
+            func.sum(StockLedger.qty), func.sum(StockLedger.qty * func.coalesce(StockLedger.unit_cost, 0))
+        ).join(Product, Product.id == StockLedger.product_id).filter(
+            Product.workspace_id == workspace_id, StockLedger.created_at <= as_of
+        )
+        if snapshot_at is not None:
+            delta = delta.filter(StockLedger.created_at > snapshot_at)
+        if warehouse_id is not None:
+            delta = delta.filter(StockLedger.warehouse_id == warehouse_id)
+        for product_id, warehouse, qty, value in delta.group_by(StockLedger.product_id, StockLedger.warehouse_id):
+            balance = balances.setdefault((product_id, warehouse), [ZERO, ZERO])
+            balance[0] += Decimal(qty)
+            balance[1] += Decimal(value)
+        return balances
+    
+    @staticmethod
+    def close_period(db: Session, workspace_id: uuid.UUID, closed_at: datetime) -> int:
+        """
+        Store a workspace's closing balances at closed_at (replacing any
+        snapshot it already took then); each close only reads the movements
+        since the previous one. Returns the number of balances stored.
+        closed_at may not lie in the future: the snapshot would miss every
+        movement posted until then.
+        """
+        now = datetime.now(timezone.utc) if closed_at.tzinfo else datetime.now()
+        if closed_at > now:
+            raise ValueError("Cannot close a period that ends in the future")
+        balances = ValuationService.balances_at(db, workspace_id, closed_at)
+        db.query(StockSnapshot).filter(
+            StockSnapshot.workspace_id == workspace_id, StockSnapshot.closed_at == closed_at
+        ).delete(synchronize_session=False)
+        rows = [
+            {
+                "closed_at": closed_at, "product_id": product_id, "warehouse_id": warehouse_id,
+                "workspace_id": workspace_id, "qty": qty, "value": value.quantize(COST_PLACES)
+            }
+            for (product_id, warehouse_id), (qty, value) in balances.items()
+            if qty or value
+        ]
+        if rows:
+            db.execute(insert(StockSnapshot), rows)
+        db.commit()
+        return len(rows)
+    
+    @staticmethod
+    def invalidate(db: Session, since: datetime) -> int:
+        """Drop snapshots that include movements from since onwards, e.g. after a cost rebuild (caller commits)"""
+        return db.query(StockSnapshot).filter(StockSnapshot.closed_at >= since).delete(synchronize_session=False)
+    
+    @staticmethod
+    def inventory_valuation(
+        db: Session,
+        workspace_id: uuid.UUID,
+        as_of: datetime,
+        warehouse_id: Optional[uuid.UUID] = None
+    ) -> List[Dict]:
+        """Quantity and value per product of a workspace as of a date"""
+        totals: Dict[uuid.UUID, List[Decimal]] = {}
+        for (product_id, _), (qty, value) in ValuationService.balances_at(db, workspace_id, as_of, warehouse_id).items():
+            total = totals.setdefault(product_id, [ZERO, ZERO])
+            total[0] += qty
+            total[1] += value
+        
+        products = db.query(Product.id, Product.code, Product.name).filter(Product.workspace_id == workspace_id)
+        rows = []
+        for product_id, code, name in products.order_by(Product.code):
+            qty, value = totals.get(product_id, (ZERO, ZERO))
+            if qty or value:
+                rows.append({
+                    "product_id": str(product_id), "code": code, "name": name,
+                    "quantity": float(qty), "value": float(value.quantize(COST_PLACES))
+                })
+        return rows
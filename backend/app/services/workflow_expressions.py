@@ -0,0 +1,188 @@
+"""
+Safe expression compiler for workflow condition nodes.
+
+A condition such as ``amount > 10M and status == "approved"`` is parsed once
+(with Python's ast module, restricted to a whitelist of node types) and turned
+into a tree of closures that evaluate directly against an execution's
+context_data. Nothing is eval'd, and there are no calls, attribute access on
+objects, imports or comprehensions.
+"""
+from typing import Any, Callable, Dict
+import ast
+import numbers
+import operator
+import re
+
+class ExpressionError(ValueError):
+    """Condition expression could not be compiled"""
+
+Evaluator = Callable[[Dict[str, Any]], Any]
+
+MAX_EXPRESSION_LENGTH = 1000
+# Largest integer a product may produce; str/list repetition is not allowed at all
+MAX_PRODUCT_BITS = 256
+
+# Amount shorthands used in node labels: 10K, 10M (juta), 2B / 2M (miliar), 1T
+_SUFFIXES = {"k": 10 ** 3, "m": 10 ** 6, "b": 10 ** 9, "t": 10 ** 12}
+_SUFFIX_PATTERN = re.compile(r"(?<![\w.])(\d+(?:\.\d+)?)\s*([kKmMbBtT])\b")
+_STRING_PATTERN = re.compile(r"(\"(?:[^\"\\]|\\.)*\"|'(?:[^'\\]|\\.)*')")
+
+def _numbers(symbol: str, left, right):
+    if not isinstance(left, numbers.Real) or not isinstance(right, numbers.Real):
+        raise ExpressionError(f"'{symbol}' needs two numbers")
+
+def _multiply(left, right):
+    _numbers("*", left, right)
+    if isinstance(left, int) and isinstance(right, int) and left.bit_length() + right.bit_length() > MAX_PRODUCT_BITS:
+        raise ExpressionError("Product is too large")
+    return left * right
+
+def _modulo(left, right):
+    # Numbers only: on a string, % is printf formatting ("%099999999d" % 1)
+    _numbers("%", left, right)
+    return left % right
+
+_BINARY_OPS = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: _multiply,
+    ast.Div: operator.truediv,
+    ast.FloorDiv: operator.floordiv,
+    ast.Mod: _modulo,
+}
+
+_COMPARE_OPS = {
+    ast.Eq: operator.eq,
+    ast.NotEq: operator.ne,
+    ast.Lt: operator.lt,
+    ast.LtE: operator.le,
+    ast.Gt: operator.gt,
+    ast.GtE: operator.ge,
+    ast.In: lambda a, b: a in b,
+    ast.NotIn: lambda a, b: a not in b,
+}
+
+def _expand_suffixes(source: str) -> str:
+    def expand(match):
+        value = match.group(1)
+        multiplier = _SUFFIXES[match.group(2).lower()]
+        return str(int(value) * multiplier) if "." not in value else repr(float(value) * multiplier)
+    
+    # Only outside string literals (odd split parts are the quoted strings)
+    parts = _STRING_PATTERN.split(source)
+    return "".join(part if i % 2 else _SUFFIX_PATTERN.sub(expand, part) for i, part in enumerate(parts))
+
+def _lookup(context: Dict[str, Any], name: str, lowered: str) -> Any:
+    if name in context:
+        return context[name]
+    return context.get(lowered)
+
+def _safe_compare(op, left, right) -> bool:
+    # Missing values (None) or mismatched types make ordering comparisons false
+    try:
+        return op(left, right)
+    except TypeError:
+        return False
+
+def _compile_node(node: ast.AST) -> Evaluator:
+    if isinstance(node, ast.Constant):
+        value = node.value
+        return lambda context: value
+    
+    if isinstance(node, ast.Name):
+        name, lowered = node.id, node.id.lower()
+        return lambda context: _lookup(context, name, lowered)
+    
+    if isinstance(node, ast.Attribute):
+        # Dotted paths into nested context dicts: po.partner.name
+        if node.attr.startswith("_"):
+            raise ExpressionError(f"Private field '{node.attr}' is not allowed")
+        base, attr = _compile_node(node.value), node.attr
+        def get_attr(context):
+            value = base(context)
+            return value.get(attr) if isinstance(value, dict) else None
+        return get_attr
+    
+    if isinstance(node, (ast.List, ast.Tuple, ast.Set)):
+        items = [_compile_node(e) for e in node.elts]
+        if all(isinstance(e, ast.Constant) for e in node.elts):
+            constant = tuple(e.value for e in node.elts)
+            return lambda context: constant
+        return lambda context: tuple(item(context) for item in items)
+    
+    if isinstance(node, ast.BoolOp):
+        operands = [_compile_node(v) for v in node.values]
+        if isinstance(node.op, ast.And):
+            def and_(context):
+                result = True
+                for operand in operands:
+                    result = operand(context)
+                    if not result:
+                        return result
+                return result
+            return and_
+        def or_(context):
+            result = False
+            for operand in operands:
+                result = operand(context)
+                if result:
+                    return result
+            return result
+        return or_
+    
+    if isinstance(node, ast.UnaryOp):
+        operand = _compile_node(node.operand)
+        if isinstance(node.op, ast.Not):
+            return lambda context: not operand(context)
+        if isinstance(node.op, ast.USub):
+            return lambda context: -operand(context)
+        if isinstance(node.op, ast.UAdd):
+            return operand
+    
+    if isinstance(node, ast.BinOp) and type(node.op) in _BINARY_OPS:
+        op = _BINARY_OPS[type(node.op)]
+        left, right = _compile_node(node.left), _compile_node(node.right)
+        return lambda context: op(left(context), right(context))
+    
+    if isinstance(node, ast.Compare) and all(type(o) in _COMPARE_OPS for o in node.ops):
+        left = _compile_node(node.left)
+        ops = [_COMPARE_OPS[type(o)] for o in node.ops]
+        rights = [_compile_node(c) for c in node.comparators]
+        if len(ops) == 1:
+            op, right = ops[0], rights[0]
+            return lambda context: _safe_compare(op, left(context), right(context))
+        def chained(context):
+            current = left(context)
+            for op, right in zip(ops, rights):
+                value = right(context)
+                if not _safe_compare(op, current, value):
+                    return False
+                current = value
+            return True
+        return chained
+    
+    raise ExpressionError(f"Unsupported expression element: {type(node).__name__}")
+
+def compile_expression(source: str, require_predicate: bool = False) -> Evaluator:
+    """
+    Compile a condition into a function of the context dict. With
+    require_predicate, only comparisons / and / or / not are accepted (used for
+    free-text node labels, where a bare word is not meant as a condition).
+    """
+    source = (source or "").strip().rstrip("?").strip()
+    if not source:
+        return lambda context: True
+    if len(source) > MAX_EXPRESSION_LENGTH:
+        raise ExpressionError("Condition expression is too long")
+    
+    try:
+        tree = ast.parse(_expand_suffixes(source), mode="eval")
+    except SyntaxError as e:
+        raise ExpressionError(f"Invalid condition '{source}': {e.msg}")
+    
+    if require_predicate and not (
+        isinstance(tree.body, (ast.Compare, ast.BoolOp))
+        or (isinstance(tree.body, ast.UnaryOp) and isinstance(tree.body.op, ast.Not))
+    ):
+        raise ExpressionError(f"'{source}' is not a condition")
+    return _compile_node(tree.body)
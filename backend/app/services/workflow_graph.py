@@ -0,0 +1,172 @@
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import heapq
+import threading
+import time
+import uuid
+
+# Edge labels / source handles that select a condition node's branch
+TRUE_BRANCHES = {"yes", "true", "y", "1"}
+FALSE_BRANCHES = {"no", "false", "n", "0"}
+
+NodeHandler = Callable[[Any, dict, dict], Any]
+
+class CompiledNode:
+    """A workflow node with its handler and outgoing edges resolved"""
+    __slots__ = ("index", "node_id", "node_type", "data", "handler",
+                 "always", "on_true", "on_false")
+    
+    def __init__(self, index: int, node_id: str, node_type: str, data: dict, handler: Optional[NodeHandler]):
+        self.index = index
+        self.node_id = node_id
+        self.node_type = node_type
+        self.data = data
+        self.handler = handler
+        # Successor positions (in topological order) per branch
+        self.always: List[int] = []
+        self.on_true: List[int] = []
+        self.on_false: List[int] = []
+
+class CompiledWorkflow:
+    """
+    React Flow `flow_data` compiled into an adjacency-list DAG.
+    
+    Nodes are stored in topological order so execution can follow edges with a
+    small priority queue: a node runs once, after every activated predecessor,
+    and only nodes reachable through taken edges are visited.
+    """
+    
+    def __init__(self, workflow_id: uuid.UUID, version: int, nodes: List[CompiledNode], entries: List[int]):
+        self.workflow_id = workflow_id
+        self.version = version
+        self.nodes = nodes
+        self.entries = entries
+    
+    def run(self, db, context: dict, on_step: Callable[[CompiledNode, Any, int, Optional[Exception]], None] = None):
+        """
+        Execute the graph. on_step(node, result, duration_ns, error) is called
+        after each handled node, including the one that raised (then re-raised).
+        """
+        queue = list(self.entries)
+        heapq.heapify(queue)
+        visited = set()
+        
+        while queue:
+            position = heapq.heappop(queue)
+            if position in visited:
+                continue
+            visited.add(position)
+            node = self.nodes[position]
+            
+            result = None
+            if node.handler is not None:
+                started = time.monotonic_ns()
+                try:
+                    result = node.handler(db, node.data, context)
+                except Exception as e:
+                    if on_step is not None:
+                        on_step(node, None, time.monotonic_ns() - started, e)
+                    raise
+                if on_step is not None:
+                    on_step(node, result, time.monotonic_ns() - started, None)
+            
+            successors = node.always
+            if node.node_type == "condition":
+                successors = successors + (node.on_true if result else node.on_false)
+            elif node.on_true or node.on_false:
+                # Labelled edges out of a non-condition node are plain fan-out
+                successors = successors + node.on_true + node.on_false
+            
+            for successor in successors:
+                if successor not in visited:
+                    heapq.heappush(queue, successor)
+
+def compile_flow(
+    workflow_id: uuid.UUID,
+    version: int,
+    flow_data: dict,
+    handlers: Dict[str, NodeHandler],
+    factories: Dict[str, Callable[[dict], NodeHandler]] = None
+) -> CompiledWorkflow:
+    """
+    Compile flow_data into a CompiledWorkflow; raises ValueError on bad graphs.
+    factories build a node-specific handler from the node's data at compile
+    time (e.g. a pre-compiled condition) and take precedence over handlers.
+    """
+    factories = factories or {}
+    raw_nodes = (flow_data or {}).get("nodes", [])
+    raw_edges = (flow_data or {}).get("edges", [])
+    
+    ids = [str(n.get("id")) for n in raw_nodes]
+    if len(set(ids)) != len(ids):
+        raise ValueError("Workflow has duplicate node ids")
+    by_id = {node_id: i for i, node_id in enumerate(ids)}
+    
+    # (source, target, branch) with branch in {None, True, False}
+    edges: List[Tuple[int, int, Optional[bool]]] = []
+    for edge in raw_edges:
+        source, target = str(edge.get("source")), str(edge.get("target"))
+        if source not in by_id or target not in by_id:
+            raise ValueError(f"Edge {edge.get('id')} references an unknown node")
+        branch_label = str(edge.get("sourceHandle") or edge.get("label") or "").strip().lower()
+        branch = True if branch_label in TRUE_BRANCHES else False if branch_label in FALSE_BRANCHES else None
+        edges.append((by_id[source], by_id[target], branch))
+    
+    # Kahn's algorithm; ties keep the designer's node order for stable runs
+    indegree = [0] * len(raw_nodes)
+    outgoing: List[List[int]] = [[] for _ in raw_nodes]
+    for source, target, _ in edges:
+        indegree[target] += 1
+        outgoing[source].append(target)
+    
+    ready = [i for i, d in enumerate(indegree) if d == 0]
+    heapq.heapify(ready)
+    order = []
+    while ready:
+        i = heapq.heappop(ready)
+        order.append(i)
+        for target in outgoing[i]:
+            indegree[target] -= 1
+            if indegree[target] == 0:
+                heapq.heappush(ready, target)
+    if len(order) != len(raw_nodes):
+        raise ValueError("Workflow graph contains a cycle")
+    
+    position = {original: pos for pos, original in enumerate(order)}
+    nodes = []
+    for pos, original in enumerate(order):
+        raw = raw_nodes[original]
+        node_type = raw.get("type")
+        data = raw.get("data", {}) or {}
+        handler = factories[node_type](data) if node_type in factories else handlers.get(node_type)
+        nodes.append(CompiledNode(pos, ids[original], node_type, data, handler))
+    
+    has_incoming = set()
+    for source, target, branch in edges:
+        node = nodes[position[source]]
+        bucket = node.always if branch is None else node.on_true if branch else node.on_false
+        bucket.append(position[target])
+        has_incoming.add(position[target])
+    
+    entries = [pos for pos in range(len(nodes)) if pos not in has_incoming]
+    return CompiledWorkflow(workflow_id, version, nodes, entries)
+
+class WorkflowGraphCache:
+    """Compiled workflows keyed by workflow id, valid for one workflow version"""
+    
+    def __init__(self):
+        self._compiled: Dict[uuid.UUID, CompiledWorkflow] = {}
+        self._lock = threading.Lock()
+    
+    def get(self, workflow_id: uuid.UUID, version: int) -> Optional[CompiledWorkflow]:
+        compiled = self._compiled.get(workflow_id)
+        if compiled is not None and compiled.version == version:
+            return compiled
+        return None
+    
+    def put(self, compiled: CompiledWorkflow):
+        with self._lock:
+            self._compiled[compiled.workflow_id] = compiled
+    
+    def invalidate(self, workflow_id: uuid.UUID):
+        with self._lock:
+            self._compiled.pop(workflow_id, None)
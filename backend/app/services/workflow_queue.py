@@ -0,0 +1,443 @@
+"""
+Durable, table-backed queue for workflow executions.
+
+API requests call WorkflowEngine.enqueue_workflow, which writes a pending
+WorkflowExecution plus a WorkflowJob row in the request's transaction. A
+WorkflowWorkerPool (run with `python -m app.services.workflow_queue`) claims
+jobs with SELECT ... FOR UPDATE SKIP LOCKED, so any number of worker
+processes can drain the same table without handing a job out twice.
+"""
+from sqlalchemy.orm import Session
+from sqlalchemy import and_, func, insert, select
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from app.core.database import SessionLocal
+from app.models.workflow import Workflow, WorkflowExecution, WorkflowJob
+from typing import Dict, List, Optional
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+class WorkflowQueue:
+    """Queue operations on the workflow_jobs table"""
+    
+    # Retry backoff: BACKOFF_BASE * 2^(attempt-1) seconds, capped
+    BACKOFF_BASE = 5
+    BACKOFF_MAX = 15 * 60
+    # Running jobs whose claim is older than this are assumed lost (worker died)
+    VISIBILITY_TIMEOUT = timedelta(minutes=10)
+    # Rows per multi-row INSERT in enqueue_many
+    CHUNK_SIZE = 1000
+    
+    @staticmethod
+    def enqueue(
+        db: Session,
+        workflow: Workflow,
+        triggered_by: str,
+        context_data: Dict = None,
+        max_attempts: int = 3
+    ) -> WorkflowExecution:
+        """Add a pending execution and its job to the session (caller commits)"""
+        execution = WorkflowExecution(
+            id=uuid.uuid4(),
+            workflow_id=workflow.id,
+            workspace_id=workflow.workspace_id,
+            status="pending",
+            triggered_by=triggered_by,
+            context_data=context_data or {},
+            started_at=datetime.now()
+        )
+        db.add(execution)
+        db.add(WorkflowJob(
+            workspace_id=workflow.workspace_id,
+            workflow_id=workflow.id,
+            execution_id=execution.id,
+            status="queued",
+            max_attempts=max_attempts,
+            run_after=datetime.now()
+        ))
+        return execution
+    
+    @staticmethod
+    def enqueue_many(db: Session, runs: List[dict], max_attempts: int = 3) -> List[uuid.UUID]:
+        """
+        Queue many executions with one multi-row INSERT per table (caller commits).
+        Each run is {"workspace_id", "workflow_id", "triggered_by", "context_data"}.
+        """
+        if not runs:
+            return []
+        now = datetime.now()
+        executions, jobs = [], []
+        for run in runs:
+            execution_id = uuid.uuid4()
+            executions.append({
+                "id": execution_id,
+                "workflow_id": run["workflow_id"],
+                "workspace_id": run["workspace_id"],
+                "status": "pending",
+                "triggered_by": run["triggered_by"],
+                "context_data": run.get("context_data") or {},
+                "started_at": now
+            })
+            jobs.append({
+                "id": uuid.uuid4(),
+                "workspace_id": run["workspace_id"],
+                "workflow_id": run["workflow_id"],
+                "execution_id": execution_id,
+                "status": "queued",
+                "attempts": 0,
+                "max_attempts": max_attempts,
+                "run_after": now,
+                "created_at": now
+            })
+        
+        for start in range(0, len(runs), WorkflowQueue.CHUNK_SIZE):
+            db.execute(insert(WorkflowExecution).values(executions[start:start + WorkflowQueue.CHUNK_SIZE]))
+            db.execute(insert(WorkflowJob).values(jobs[start:start + WorkflowQueue.CHUNK_SIZE]))
+        return [e["id"] for e in executions]
+    
+    @staticmethod
+    def _advisory_key(workspace_id: uuid.UUID) -> int:
+        """Signed 64-bit advisory lock key of a workspace"""
+        key = uuid.UUID(str(workspace_id)).int >> 64
+        return key - (1 << 64) if key >= 1 << 63 else key
+    
+    @staticmethod
+    def _lock_workspaces(db: Session, workspace_ids) -> set:
+        """
+        Take a transaction-level advisory lock per workspace on PostgreSQL so
+        two workers never count and claim the same workspace at once; returns
+        the workspaces locked (all of them on other dialects).
+        """
+        if db.get_bind().dialect.name != "postgresql":
+            return set(workspace_ids)
+        return {
+            ws for ws in workspace_ids
+            if db.execute(select(func.pg_try_advisory_xact_lock(WorkflowQueue._advisory_key(ws)))).scalar()
+        }
+    
+    @staticmethod
+    def claim(
+        db: Session,
+        worker_id: str,
+        limit: int,
+        per_workspace_limit: Optional[int] = None
+    ) -> List[WorkflowJob]:
+        """
+        Claim up to `limit` due jobs and commit the claim. per_workspace_limit
+        caps the running jobs of one workspace across every worker: running
+        jobs are counted in the claiming transaction, under a per-workspace
+        advisory lock, and workspaces another worker is claiming for are
+        skipped this round.
+        """
+        if limit <= 0:
+            return []
+        
+        # Over-fetch a little so one busy workspace doesn't starve the batch
+        candidates = db.query(WorkflowJob).filter(
+            and_(
+                WorkflowJob.status == "queued",
+                WorkflowJob.run_after <= datetime.now()
+            )
+        ).order_by(WorkflowJob.run_after, WorkflowJob.created_at).with_for_update(
+            skip_locked=True
+        ).limit(limit * 2).all()
+        
+        workspace_slots: Dict[uuid.UUID, int] = {}
+        if per_workspace_limit is not None and candidates:
+            workspace_ids = {job.workspace_id for job in candidates}
+            locked = WorkflowQueue._lock_workspaces(db, workspace_ids)
+            running = dict(db.query(WorkflowJob.workspace_id, func.count(WorkflowJob.id)).filter(
+                and_(
+                    WorkflowJob.status == "running",
+                    WorkflowJob.workspace_id.in_(locked)
+                )
+            ).group_by(WorkflowJob.workspace_id).all()) if locked else {}
+            workspace_slots = {
+                ws: per_workspace_limit - running.get(ws, 0) if ws in locked else 0 for ws in workspace_ids
+            }
+        
+        claimed = []
+        now = datetime.now()
+        for job in candidates:
+            if len(claimed) >= limit:
+                break
+            slots = workspace_slots.get(job.workspace_id)
+            if slots is not None:
+                if slots <= 0:
+                    continue
+                workspace_slots[job.workspace_id] = slots - 1
+            
+            job.status = "running"
+            job.attempts = (job.attempts or 0) + 1
+            job.locked_by = worker_id
+            job.locked_at = now
+            claimed.append(job)
+        
+        db.commit()
+        return claimed
+    
+    @staticmethod
+    def backoff_seconds(attempt: int) -> float:
+        return min(WorkflowQueue.BACKOFF_BASE * 2 ** max(attempt - 1, 0), WorkflowQueue.BACKOFF_MAX)
+    
+    @staticmethod
+    def complete(db: Session, job: WorkflowJob):
+        job.status = "done"
+        job.locked_by = None
+        job.last_error = None
+    
+    @staticmethod
+    def fail(db: Session, job: WorkflowJob, error: str) -> bool:
+        """Record a failed attempt; returns True if the job was re-queued"""
+        job.last_error = error
+        job.locked_by = None
+        if (job.attempts or 0) < (job.max_attempts or 1):
+            job.status = "queued"
+            job.run_after = datetime.now() + timedelta(seconds=WorkflowQueue.backoff_seconds(job.attempts))
+            return True
+        job.status = "failed"
+        return False
+    
+    @staticmethod
+    def requeue_stale(db: Session) -> int:
+        """Put back jobs claimed by workers that stopped before finishing"""
+        cutoff = datetime.now() - WorkflowQueue.VISIBILITY_TIMEOUT
+        count = db.query(WorkflowJob).filter(
+            and_(
+                WorkflowJob.status == "running",
+                WorkflowJob.locked_at < cutoff
+            )
+        ).update({"status": "queued", "locked_by": None, "run_after": datetime.now()}, synchronize_session=False)
+        db.commit()
+        return count
+    
+    @staticmethod
+    def get_queue_depth(db: Session, workspace_id: Optional[uuid.UUID] = None) -> Dict[str, int]:
+        """Job counts per status"""
+        query = db.query(WorkflowJob.status, func.count(WorkflowJob.id))
+        if workspace_id is not None:
+            query = query.filter(WorkflowJob.workspace_id == workspace_id)
+        return {status: count for status, count in query.group_by(WorkflowJob.status).all()}
+
+    @staticmethod
+    def get_running_by_worker(db: Session, workspace_id: Optional[uuid.UUID] = None) -> Dict[str, int]:
+        """Running jobs per claiming worker, across every worker process"""
+        query = db.query(WorkflowJob.locked_by, func.count(WorkflowJob.id)).filter(WorkflowJob.status == "running")
+        if workspace_id is not None:
+            query = query.filter(WorkflowJob.workspace_id == workspace_id)
+        return {worker: count for worker, count in query.group_by(WorkflowJob.locked_by).all()}
+
+class QueueMetrics:
+    """Throughput and latency counters for a worker pool"""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started = time.monotonic()
+        self.claimed = 0
+        self.completed = 0
+        self.retried = 0
+        self.failed = 0
+        self.run_seconds = 0.0
+        self.wait_seconds = 0.0
+    
+    def record(self, outcome: str, run_seconds: float, wait_seconds: float):
+        with self._lock:
+            setattr(self, outcome, getattr(self, outcome) + 1)
+            self.run_seconds += run_seconds
+            self.wait_seconds += wait_seconds
+    
+    def add_claimed(self, count: int):
+        with self._lock:
+            self.claimed += count
+    
+    def snapshot(self) -> dict:
+        with self._lock:
+            finished = self.completed + self.retried + self.failed
+            uptime = time.monotonic() - self.started
+            return {
+                "uptime_seconds": round(uptime, 1),
+                "claimed": self.claimed,
+                "completed": self.completed,
+                "retried": self.retried,
+                "failed": self.failed,
+                "throughput_per_second": round(finished / uptime, 2) if uptime > 0 else 0.0,
+                "avg_run_ms": round(self.run_seconds / finished * 1000, 2) if finished else 0.0,
+                "avg_queue_wait_ms": round(self.wait_seconds / finished * 1000, 2) if finished else 0.0
+            }
+
+class WorkflowWorkerPool:
+    """
+    Drains workflow_jobs with a thread pool. A dispatcher thread claims only as
+    many jobs as there are free threads, honouring a per-workspace concurrency
+    limit (enforced by WorkflowQueue.claim across all worker processes) so one
+    tenant's burst can't occupy every worker.
+    """
+    
+    # Step rows of executions older than this are compacted away hourly
+    LOG_RETENTION_DAYS = int(os.getenv("WORKFLOW_LOG_RETENTION_DAYS", "30"))
+    COMPACTION_INTERVAL = 60 * 60
+    
+    def __init__(
+        self,
+        concurrency: int = 8,
+        per_workspace_limit: int = 4,
+        poll_interval: float = 0.5,
+        session_factory=SessionLocal
+    ):
+        self.concurrency = concurrency
+        self.per_workspace_limit = per_workspace_limit
+        self.poll_interval = poll_interval
+        self.session_factory = session_factory
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self.metrics = QueueMetrics()
+        
+        self._executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="workflow-worker")
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._stop = threading.Event()
+        self._dispatcher: Optional[threading.Thread] = None
+    
+    def start(self):
+        self._dispatcher = threading.Thread(target=self._dispatch_loop, name="workflow-dispatcher", daemon=True)
+        self._dispatcher.start()
+    
+    def stop(self, wait: bool = True):
+        self._stop.set()
+        if self._dispatcher is not None:
+            self._dispatcher.join()
+        self._executor.shutdown(wait=wait)
+    
+    def _dispatch_loop(self):
+        from app.services.workflow_service import WorkflowEngine
+        
+        last_requeue = 0.0
+        last_compaction = 0.0
+        while not self._stop.is_set():
+            try:
+                claimed = self.dispatch_once()
+                if time.monotonic() - last_requeue > 60:
+                    db = self.session_factory()
+                    try:
+                        WorkflowQueue.requeue_stale(db)
+                        if time.monotonic() - last_compaction > self.COMPACTION_INTERVAL:
+                            WorkflowEngine.compact_execution_history(db, self.LOG_RETENTION_DAYS)
+                            last_compaction = time.monotonic()
+                    finally:
+                        db.close()
+                    last_requeue = time.monotonic()
+            except Exception:
+                logger.exception("Workflow dispatcher error")
+                claimed = 0
+            if not claimed:
+                self._stop.wait(self.poll_interval)
+    
+    def dispatch_once(self) -> int:
+        """Claim jobs for free threads and submit them; returns number claimed"""
+        with self._lock:
+            free = self.concurrency - self._in_flight
+        if free <= 0:
+            return 0
+        
+        db = self.session_factory()
+        try:
+            jobs = WorkflowQueue.claim(db, self.worker_id, free, self.per_workspace_limit)
+            claimed = [job.id for job in jobs]
+        finally:
+            db.close()
+        
+        self.metrics.add_claimed(len(claimed))
+        for job_id in claimed:
+            with self._lock:
+                self._in_flight += 1
+            self._executor.submit(self._run_job, job_id)
+        return len(claimed)
+    
+    def _run_job(self, job_id: uuid.UUID):
+        try:
+            self.process_job(job_id)
+        except Exception:
+            logger.exception("Workflow job %s crashed", job_id)
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+    
+    def process_job(self, job_id: uuid.UUID) -> str:
+        """Run one claimed job; returns 'completed', 'retried' or 'failed'"""
+        from app.services.workflow_service import WorkflowEngine, ExecutionStepLog
+        
+        db = self.session_factory()
+        start = time.monotonic()
+        try:
+            job = db.query(WorkflowJob).filter(WorkflowJob.id == job_id).first()
+            execution = db.query(WorkflowExecution).filter(WorkflowExecution.id == job.execution_id).first()
+            # Time the job sat claimable in the queue before this attempt
+            wait_seconds = max((datetime.now() - job.run_after.replace(tzinfo=None)).total_seconds(), 0.0) \
+                if job.run_after else 0.0
+            
+            error = None
+            step_log = None
+            try:
+                workflow = WorkflowEngine._load_active_workflow(db, job.workflow_id)
+                execution.status = "running"
+                execution.started_at = datetime.now()
+                step_log = ExecutionStepLog(execution.id, workflow.id, job.attempts or 1)
+                if WorkflowEngine.run_execution(db, workflow, execution, step_log):
+                    step_log.flush(db)
+                    WorkflowQueue.complete(db, job)
+                    db.commit()
+                    outcome = "completed"
+                else:
+                    error = execution.error_message
+            except Exception as e:
+                error = str(e)
+            
+            if error is not None:
+                # Discard partial writes from the failed run before recording the failure
+                db.rollback()
+                job = db.query(WorkflowJob).filter(WorkflowJob.id == job_id).first()
+                execution = db.query(WorkflowExecution).filter(WorkflowExecution.id == job.execution_id).first()
+                execution.error_message = error
+                if step_log is not None:
+                    step_log.flush(db)
+                if WorkflowQueue.fail(db, job, error):
+                    execution.status = "pending"
+                    outcome = "retried"
+                else:
+                    execution.status = "failed"
+                    execution.completed_at = datetime.now()
+                    outcome = "failed"
+                db.commit()
+            
+            self.metrics.record(outcome, time.monotonic() - start, wait_seconds)
+            return outcome
+        finally:
+            db.close()
+
+# Most recently started pool in this process
+worker_pool: Optional[WorkflowWorkerPool] = None
+
+def start_worker_pool(concurrency: int = 8, per_workspace_limit: int = 4) -> WorkflowWorkerPool:
+    global worker_pool
+    worker_pool = WorkflowWorkerPool(concurrency, per_workspace_limit)
+    worker_pool.start()
+    return worker_pool
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    pool = start_worker_pool(
+        int(os.getenv("WORKFLOW_WORKERS", "8")),
+        int(os.getenv("WORKFLOW_WORKSPACE_CONCURRENCY", "4"))
+    )
+    logger.info("Workflow worker %s started", pool.worker_id)
+    try:
+        while True:
+            time.sleep(60)
+            logger.info("Workflow queue metrics: %s", pool.metrics.snapshot())
+    except KeyboardInterrupt:
+        pool.stop()
@@ -1,10 +1,91 @@
-from sqlalchemy.orm import Session
-from sqlalchemy import and_
-from datetime import datetime
-from app.models.workflow import Workflow, WorkflowNode, WorkflowExecution, ApprovalRequest
+from sqlalchemy.orm import Session, defer
+from sqlalchemy import and_, insert, func
+from datetime import datetime, timedelta
+from app.core.database import dialect_insert
+from app.models.workflow import (
+    Workflow, WorkflowNode, WorkflowExecution, WorkflowExecutionStep, WorkflowNodeStats, WorkflowJob, ApprovalRequest
+)
+from app.services.workflow_graph import CompiledWorkflow, WorkflowGraphCache, compile_flow
+from app.services.workflow_triggers import workflow_trigger_index
+from app.services.workflow_expressions import ExpressionError, compile_expression
 from typing import Dict, List, Optional
 import uuid
 import json
+import time
+
+# Global cache of compiled workflow graphs
+compiled_workflows = WorkflowGraphCache()
+
+class ExecutionStepLog:
+    """
+    Collects the steps of one execution in memory and appends them with one
+    multi-row INSERT, plus one upsert into the per-node latency totals.
+    """
+    
+    def __init__(self, execution_id: uuid.UUID, workflow_id: uuid.UUID, attempt: int = 1):
+        self.execution_id = execution_id
+        self.workflow_id = workflow_id
+        self.attempt = attempt
+        self.started_ns = time.monotonic_ns()
+        self.steps: List[dict] = []
+    
+    def record(self, node, result, duration_ns: int, error: Optional[Exception]):
+        self.steps.append({
+            "execution_id": self.execution_id,
+            "attempt": self.attempt,
+            "seq": len(self.steps),
+            "node_id": node.node_id,
+            "node_type": node.node_type,
+            "status": "error" if error is not None else "ok",
+            "result": self._summarize(error if error is not None else result),
+            "offset_ns": time.monotonic_ns() - self.started_ns - duration_ns,
+            "duration_ns": duration_ns
+        })
+    
+    @staticmethod
+    def _summarize(value) -> Optional[str]:
+        return None if value is None else str(value)[:255]
+    
+    def flush(self, db: Session):
+        """Append the steps (does not commit)"""
+        if not self.steps:
+            return
+        db.execute(insert(WorkflowExecutionStep).values(self.steps))
+        
+        totals: Dict[str, list] = {}
+        for step in self.steps:
+            entry = totals.setdefault(step["node_id"], [step["node_type"], 0, 0, 0, 0])
+            entry[1] += 1
+            entry[2] += step["status"] == "error"
+            entry[3] += step["duration_ns"]
+            entry[4] = max(entry[4], step["duration_ns"])
+        
+        stmt = dialect_insert(db, WorkflowNodeStats).values([
+            {
+                "workflow_id": self.workflow_id,
+                "node_id": node_id,
+                "node_type": node_type,
+                "run_count": runs,
+                "error_count": errors,
+                "total_ns": total_ns,
+                "max_ns": max_ns
+            }
+            for node_id, (node_type, runs, errors, total_ns, max_ns) in totals.items()
+        ])
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["workflow_id", "node_id"],
+            set_={
+                "node_type": stmt.excluded.node_type,
+                "run_count": WorkflowNodeStats.run_count + stmt.excluded.run_count,
+                "error_count": WorkflowNodeStats.error_count + stmt.excluded.error_count,
+                "total_ns": WorkflowNodeStats.total_ns + stmt.excluded.total_ns,
+                "max_ns": func.max(WorkflowNodeStats.max_ns, stmt.excluded.max_ns)
+                    if db.get_bind().dialect.name == "sqlite"
+                    else func.greatest(WorkflowNodeStats.max_ns, stmt.excluded.max_ns),
+                "updated_at": func.now()
+            }
+        )
+        db.execute(stmt)
 
 class WorkflowEngine:
     """Workflow execution engine"""
@@ -16,7 +97,8 @@ class WorkflowEngine:
         name: str,
         description: str,
         trigger_type: str,
-        created_by: uuid.UUID
+        created_by: uuid.UUID,
+        trigger_config: dict = None
     ) -> Workflow:
         """Create new workflow"""
         workflow = Workflow(
@@ -24,7 +106,7 @@ class WorkflowEngine:
             name=name,
             description=description,
             trigger_type=trigger_type,
-            trigger_config={},
+            trigger_config=trigger_config or {},
             flow_data={"nodes": [], "edges": []},
             created_by=created_by,
             status="draft"
@@ -44,7 +126,9 @@ class WorkflowEngine:
         workflow = db.query(Workflow).filter(Workflow.id == workflow_id).first()
         if workflow:
             workflow.flow_data = flow_data
+            workflow.version = (workflow.version or 1) + 1
             db.commit()
+            compiled_workflows.invalidate(workflow_id)
             return True
         return False
     
@@ -53,24 +137,83 @@ class WorkflowEngine:
         """Activate workflow for execution"""
         workflow = db.query(Workflow).filter(Workflow.id == workflow_id).first()
         if workflow:
+            # Compile first so a broken graph (cycle, dangling edge) is never activated
+            WorkflowEngine.compile_workflow(workflow)
             workflow.status = "active"
             workflow.is_active = True
             db.commit()
+            workflow_trigger_index.refresh_workflow(workflow)
             return True
         return False
     
     @staticmethod
-    async def execute_workflow(
+    def compile_workflow(workflow: Workflow) -> CompiledWorkflow:
+        """Compile flow_data into an executable graph and cache it for this version"""
+        compiled = compile_flow(
+            workflow.id, workflow.version or 1, workflow.flow_data,
+            WorkflowEngine.node_handlers(), WorkflowEngine.node_factories()
+        )
+        compiled_workflows.put(compiled)
+        return compiled
+    
+    @staticmethod
+    def get_compiled_workflow(workflow: Workflow) -> CompiledWorkflow:
+        """Cached graph for the workflow's current version (compiled on a miss)"""
+        compiled = compiled_workflows.get(workflow.id, workflow.version or 1)
+        if compiled is None:
+            compiled = WorkflowEngine.compile_workflow(workflow)
+        return compiled
+    
+    @staticmethod
+    def node_handlers() -> Dict[str, callable]:
+        """Handler per node type: (db, node_data, context) -> result"""
+        return {
+            "action": WorkflowEngine._execute_action,
+            "notification": WorkflowEngine._notification_handler,
+        }
+    
+    @staticmethod
+    def node_factories() -> Dict[str, callable]:
+        """Per-node handler builders run once at compile time"""
+        return {
+            "condition": WorkflowEngine._compile_condition,
+        }
+    
+    @staticmethod
+    def _load_active_workflow(db: Session, workflow_id: uuid.UUID) -> Workflow:
+        # flow_data is only loaded if the compiled graph is not cached yet
+        workflow = db.query(Workflow).options(defer(Workflow.flow_data)).filter(
+            Workflow.id == workflow_id
+        ).first()
+        
+        if not workflow or not workflow.is_active:
+            raise ValueError("Workflow not found or inactive")
+        return workflow
+    
+    @staticmethod
+    def enqueue_workflow(
         db: Session,
         workflow_id: uuid.UUID,
         triggered_by: str,
         context_data: Dict = None
     ) -> WorkflowExecution:
-        """Execute workflow (simplified version)"""
-        workflow = db.query(Workflow).filter(Workflow.id == workflow_id).first()
+        """Queue workflow for a background worker (see workflow_queue)"""
+        from app.services.workflow_queue import WorkflowQueue
         
-        if not workflow or not workflow.is_active:
-            raise ValueError("Workflow not found or inactive")
+        workflow = WorkflowEngine._load_active_workflow(db, workflow_id)
+        execution = WorkflowQueue.enqueue(db, workflow, triggered_by, context_data)
+        db.commit()
+        return execution
+    
+    @staticmethod
+    async def execute_workflow(
+        db: Session,
+        workflow_id: uuid.UUID,
+        triggered_by: str,
+        context_data: Dict = None
+    ) -> WorkflowExecution:
+        """Execute workflow inline (API requests should use enqueue_workflow)"""
+        workflow = WorkflowEngine._load_active_workflow(db, workflow_id)
         
         # Create execution record
         execution = WorkflowExecution(
@@ -78,66 +221,98 @@ class WorkflowEngine:
             workspace_id=workflow.workspace_id,
             status="running",
             triggered_by=triggered_by,
-            context_data=context_data or {}
+            context_data=context_data or {},
+            started_at=datetime.now()
         )
         db.add(execution)
-        db.commit()
         
-        # Execute nodes (simplified - in production use Celery/background tasks)
-        execution_log = []
-        flow_data = workflow.flow_data
-        nodes = flow_data.get("nodes", [])
+        WorkflowEngine.run_execution(db, workflow, execution)
+        db.commit()
+        db.refresh(execution)
+        return execution
+    
+    @staticmethod
+    def run_execution(
+        db: Session,
+        workflow: Workflow,
+        execution: WorkflowExecution,
+        step_log: Optional[ExecutionStepLog] = None
+    ) -> bool:
+        """
+        Run the workflow graph for an execution record and set its outcome.
+        Steps are recorded in step_log and written unless the caller passes its
+        own log (to write it after a rollback). Does not commit; returns False
+        when a node raised.
+        """
+        compiled = WorkflowEngine.get_compiled_workflow(workflow)
+        context_data = execution.context_data or {}
+        owns_log = step_log is None
+        if owns_log:
+            if execution.id is None:
+                db.flush()  # Assign the execution id the step rows reference
+            step_log = ExecutionStepLog(execution.id, workflow.id)
         
         try:
-            for node in nodes:
-                node_type = node.get("type")
-                node_data = node.get("data", {})
-                
-                # Execute based on node type
-                if node_type == "action":
-                    action_result = WorkflowEngine._execute_action(db, node_data, context_data)
-                    execution_log.append({
-                        "node_id": node.get("id"),
-                        "type": "action",
-                        "result": action_result,
-                        "timestamp": datetime.now().isoformat()
-                    })
-                
-                elif node_type == "condition":
-                    condition_result = WorkflowEngine._evaluate_condition(node_data, context_data)
-                    execution_log.append({
-                        "node_id": node.get("id"),
-                        "type": "condition",
-                        "result": condition_result,
-                        "timestamp": datetime.now().isoformat()
-                    })
-                
-                elif node_type == "notification":
-                    WorkflowEngine._send_notification(db, node_data)
-                    execution_log.append({
-                        "node_id": node.get("id"),
-                        "type": "notification",
-                        "result": "sent",
-                        "timestamp": datetime.now().isoformat()
-                    })
+            compiled.run(db, context_data, step_log.record)
             
             # Mark as completed
             execution.status = "completed"
-            execution.execution_log = execution_log
+            execution.error_message = None
             execution.completed_at = datetime.now()
             
             # Update workflow stats
-            workflow.execution_count += 1
+            workflow.execution_count = (workflow.execution_count or 0) + 1
             workflow.last_executed = datetime.now()
-            
+            success = True
+        
         except Exception as e:
             execution.status = "failed"
             execution.error_message = str(e)
             execution.completed_at = datetime.now()
+            success = False
         
+        if owns_log:
+            step_log.flush(db)
+        return success
+    
+    @staticmethod
+    def get_node_stats(db: Session, workflow_id: uuid.UUID) -> List[dict]:
+        """Per-node run counts and latency for a workflow"""
+        rows = db.query(WorkflowNodeStats).filter(WorkflowNodeStats.workflow_id == workflow_id).all()
+        return [
+            {
+                "node_id": r.node_id,
+                "node_type": r.node_type,
+                "run_count": r.run_count,
+                "error_count": r.error_count,
+                "avg_ms": round(r.total_ns / r.run_count / 1e6, 3) if r.run_count else 0.0,
+                "max_ms": round(r.max_ns / 1e6, 3)
+            }
+            for r in sorted(rows, key=lambda r: r.total_ns or 0, reverse=True)
+        ]
+    
+    @staticmethod
+    def compact_execution_history(db: Session, keep_days: int = 30) -> dict:
+        """
+        Drop step rows and finished queue jobs of executions that completed more
+        than keep_days ago. Execution headers and per-node totals are kept.
+        """
+        cutoff = datetime.now() - timedelta(days=keep_days)
+        old_executions = db.query(WorkflowExecution.id).filter(
+            WorkflowExecution.completed_at < cutoff
+        ).scalar_subquery()
+        
+        steps = db.query(WorkflowExecutionStep).filter(
+            WorkflowExecutionStep.execution_id.in_(old_executions)
+        ).delete(synchronize_session=False)
+        jobs = db.query(WorkflowJob).filter(
+            and_(
+                WorkflowJob.status.in_(["done", "failed"]),
+                WorkflowJob.execution_id.in_(old_executions)
+            )
+        ).delete(synchronize_session=False)
         db.commit()
-        db.refresh(execution)
-        return execution
+        return {"steps_deleted": steps, "jobs_deleted": jobs}
     
     @staticmethod
     def _execute_action(db: Session, node_data: dict, context: dict) -> str:
@@ -156,12 +331,32 @@ class WorkflowEngine:
         
         return "action_executed"
     
+    @staticmethod
+    def _compile_condition(node_data: dict):
+        """
+        Build the handler of a condition node. An explicit "condition" expression
+        must compile; a label like "Amount > 10M?" is used when it reads as a
+        condition, otherwise the node passes (the previous behaviour).
+        """
+        if node_data.get("condition"):
+            evaluate = compile_expression(node_data["condition"])
+        else:
+            try:
+                evaluate = compile_expression(node_data.get("label", ""), require_predicate=True)
+            except ExpressionError:
+                evaluate = lambda context: True
+        
+        return lambda db, data, context: bool(evaluate(context))
+    
     @staticmethod
     def _evaluate_condition(node_data: dict, context: dict) -> bool:
-        """Evaluate condition node (mock)"""
-        condition = node_data.get("condition")
-        # Simple condition evaluation
-        return True  # Mock
+        """Evaluate condition node (compiles on every call; executions use the cached graph)"""
+        return WorkflowEngine._compile_condition(node_data)(None, node_data, context or {})
+    
+    @staticmethod
+    def _notification_handler(db: Session, node_data: dict, context: dict) -> str:
+        WorkflowEngine._send_notification(db, node_data)
+        return "sent"
     
     @staticmethod
     def _send_notification(db: Session, node_data: dict):
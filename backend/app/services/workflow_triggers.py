@@ -0,0 +1,167 @@
+"""
+Fires event-triggered workflows from domain events.
+
+WorkflowTriggerIndex keeps, per workspace, the active workflows listening to
+each event type, so matching an event is a dict lookup instead of a query.
+WorkflowEventDispatcher buffers events from the bus and a background thread
+turns them into queued executions in batches (WorkflowQueue.enqueue_many).
+"""
+from sqlalchemy.orm import Session
+from sqlalchemy import and_
+from collections import deque
+from app.core.database import SessionLocal
+from app.core.events import DomainEvent, EventBus
+from app.models.workflow import Workflow, WorkflowTrigger
+from app.services.workflow_queue import WorkflowQueue
+from typing import Dict, List, Optional, Tuple
+import logging
+import threading
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+def workflow_event_types(workflow: Workflow) -> List[str]:
+    """Event types an event-triggered workflow listens to (trigger_config "event"/"events")"""
+    if workflow.trigger_type != WorkflowTrigger.EVENT.value:
+        return []
+    config = workflow.trigger_config or {}
+    events = config.get("events") or []
+    if config.get("event"):
+        events = events + [config["event"]]
+    return list(dict.fromkeys(events))
+
+class WorkflowTriggerIndex:
+    """Active event workflows per (workspace, event type), loaded once per workspace"""
+    
+    def __init__(self, max_age: float = 300.0):
+        self.max_age = max_age
+        # workspace_id -> (loaded_at, event_type -> workflow ids)
+        self._by_workspace: Dict[uuid.UUID, Tuple[float, Dict[str, List[uuid.UUID]]]] = {}
+        self._lock = threading.Lock()
+    
+    def _load(self, db: Session, workspace_id: uuid.UUID) -> Dict[str, List[uuid.UUID]]:
+        workflows = db.query(Workflow.id, Workflow.trigger_type, Workflow.trigger_config).filter(
+            and_(
+                Workflow.workspace_id == workspace_id,
+                Workflow.is_active == True,
+                Workflow.trigger_type == WorkflowTrigger.EVENT.value
+            )
+        ).all()
+        
+        by_event: Dict[str, List[uuid.UUID]] = {}
+        for workflow in workflows:
+            for event_type in workflow_event_types(workflow):
+                by_event.setdefault(event_type, []).append(workflow.id)
+        return by_event
+    
+    def match(self, db: Session, workspace_id: uuid.UUID, event_type: str) -> List[uuid.UUID]:
+        cached = self._by_workspace.get(workspace_id)
+        if cached is None or time.monotonic() - cached[0] >= self.max_age:
+            by_event = self._load(db, workspace_id)
+            with self._lock:
+                self._by_workspace[workspace_id] = (time.monotonic(), by_event)
+        else:
+            by_event = cached[1]
+        return by_event.get(event_type, [])
+    
+    def refresh_workflow(self, workflow: Workflow):
+        """Apply one workflow's activation/trigger change to a loaded workspace index"""
+        with self._lock:
+            cached = self._by_workspace.get(workflow.workspace_id)
+            if cached is None:
+                return  # Not loaded yet; the first match will read it from the DB
+            
+            loaded_at, by_event = cached
+            updated = {
+                event_type: [wid for wid in ids if wid != workflow.id]
+                for event_type, ids in by_event.items()
+            }
+            if workflow.is_active:
+                for event_type in workflow_event_types(workflow):
+                    updated.setdefault(event_type, []).append(workflow.id)
+            self._by_workspace[workflow.workspace_id] = (loaded_at, updated)
+    
+    def invalidate(self, workspace_id: Optional[uuid.UUID] = None):
+        with self._lock:
+            if workspace_id is None:
+                self._by_workspace.clear()
+            else:
+                self._by_workspace.pop(workspace_id, None)
+
+class WorkflowEventDispatcher:
+    """Buffers domain events and enqueues matching workflows in batches"""
+    
+    def __init__(
+        self,
+        index: WorkflowTriggerIndex,
+        max_batch: int = 500,
+        max_delay: float = 0.1,
+        session_factory=SessionLocal,
+        background: bool = True
+    ):
+        self.index = index
+        self.background = background
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.session_factory = session_factory
+        self._buffer: deque = deque()
+        self._wakeup = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._flush_lock = threading.Lock()
+    
+    def handle(self, event: DomainEvent):
+        """Event bus subscriber: O(1) on the request path"""
+        self._buffer.append(event)
+        if self._thread is None and self.background:
+            self._start()
+        if len(self._buffer) >= self.max_batch:
+            self._wakeup.set()
+    
+    def install(self, bus: EventBus):
+        bus.subscribe(self.handle)
+    
+    def _start(self):
+        with self._flush_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="workflow-event-dispatcher", daemon=True)
+                self._thread.start()
+    
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.max_delay)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Failed to enqueue event-triggered workflows")
+    
+    def flush(self) -> int:
+        """Enqueue executions for all buffered events; returns executions queued"""
+        with self._flush_lock:
+            events = []
+            while self._buffer and len(events) < self.max_batch * 10:
+                events.append(self._buffer.popleft())
+            if not events:
+                return 0
+            
+            db = self.session_factory()
+            try:
+                runs = []
+                for event in events:
+                    for workflow_id in self.index.match(db, event.workspace_id, event.event_type):
+                        runs.append({
+                            "workspace_id": event.workspace_id,
+                            "workflow_id": workflow_id,
+                            "triggered_by": f"event:{event.event_type}",
+                            "context_data": {"event": event.event_type, **event.payload}
+                        })
+                WorkflowQueue.enqueue_many(db, runs)
+                db.commit()
+                return len(runs)
+            finally:
+                db.close()
+
+# Global trigger index and dispatcher
+workflow_trigger_index = WorkflowTriggerIndex()
+workflow_event_dispatcher = WorkflowEventDispatcher(workflow_trigger_index)
@@ -0,0 +1,88 @@
+"""
+Benchmark: multi-level BOM explosion and standard cost roll-up.
+
+A 10-level BOM forest of 50k products (each assembly uses three components
+from deeper levels, so sub-assemblies are heavily shared) is exploded for a
+batch of job orders. BOMGraph visits each product once in topological order;
+the usual recursive explosion re-walks a shared sub-assembly on every path
+that reaches it, per job order.
+
+Run from backend/:  python -m benchmarks.bench_bom_explosion [job_orders] [naive_job_orders]
+"""
+import random
+import sys
+import time
+import uuid
+from decimal import Decimal
+from app.services.bom_service import BOMGraph
+
+# Products per level, top level first (50k in total)
+LEVELS = [1000, 1500, 2500, 3500, 4500, 5500, 6500, 7500, 8500, 9000]
+
+def build(seed: int = 3):
+    rng = random.Random(seed)
+    levels = [[uuid.uuid4() for _ in range(size)] for size in LEVELS]
+    boms, prices = {}, {}
+    for depth, products in enumerate(levels[:-1]):
+        deeper = [p for level in levels[depth + 1:] for p in level]
+        for product in products:
+            components = rng.sample(levels[depth + 1], 2) + [rng.choice(deeper)]
+            boms[product] = [(c, Decimal(rng.randint(1, 4)) * Decimal("1.05")) for c in components]
+    for level in levels:
+        for product in level:
+            if product not in boms:
+                prices[product] = Decimal(rng.randint(100, 10000)) / 100
+    return levels, boms, prices
+
+def recursive_explode(boms, demand):
+    """Depth-first explosion of each demanded product, no memoization"""
+    required = {}
+    def walk(product, qty):
+        for component, per_unit in boms.get(product, ()):
+            need = qty * per_unit
+            required[component] = required.get(component, 0) + need
+            walk(component, need)
+    for product, qty in demand:
+        walk(product, qty)
+    return required
+
+def recursive_cost(boms, prices, product):
+    if product not in boms:
+        return prices[product]
+    return sum(qty * recursive_cost(boms, prices, c) for c, qty in boms[product])
+
+def main(job_orders: int = 5000, naive_job_orders: int = 20):
+    levels, boms, prices = build()
+    rng = random.Random(5)
+    demand = [(rng.choice(levels[0]), Decimal(rng.randint(1, 100))) for _ in range(job_orders)]
+    lines = sum(len(c) for c in boms.values())
+    print(f"{sum(LEVELS):,} products over {len(LEVELS)} levels, {len(boms):,} BOMs, {lines:,} BOM lines")
+    
+    start = time.perf_counter()
+    graph = BOMGraph(boms)
+    print(f"compile graph            {time.perf_counter() - start:8.3f} s")
+    
+    totals = {}
+    for product, qty in demand:
+        totals[product] = totals.get(product, 0) + qty
+    start = time.perf_counter()
+    graph.explode(totals)
+    elapsed = time.perf_counter() - start
+    print(f"explode (one pass)       {elapsed:8.3f} s for {job_orders:,} job orders")
+    
+    start = time.perf_counter()
+    recursive_explode(boms, demand[:naive_job_orders])
+    naive = (time.perf_counter() - start) / naive_job_orders
+    print(f"explode (recursive)      {naive:8.3f} s per job order -> ~{naive * job_orders:,.0f} s for {job_orders:,}")
+    
+    start = time.perf_counter()
+    graph.rollup_costs(prices)
+    print(f"cost roll-up (all)       {time.perf_counter() - start:8.3f} s for {len(graph.products):,} products")
+    start = time.perf_counter()
+    for product in levels[0][:naive_job_orders]:
+        recursive_cost(boms, prices, product)
+    naive = (time.perf_counter() - start) / naive_job_orders
+    print(f"cost roll-up (recursive) {naive:8.3f} s per top-level product")
+
+if __name__ == "__main__":
+    main(*(int(a) for a in sys.argv[1:3]))
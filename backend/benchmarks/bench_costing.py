@@ -0,0 +1,70 @@
+"""
+Benchmark: costing stock issues under FIFO and moving average.
+
+Compares CostState, which keeps per-(product, warehouse) layers and running
+totals and costs an issue in O(layers consumed), with re-deriving the cost of
+each issue by rescanning the product's movement history (what a valuation
+computed on demand from the ledger does).
+
+Run from backend/:  python -m benchmarks.bench_costing [movements] [naive_movements]
+"""
+import random
+import sys
+import time
+from decimal import Decimal
+from app.services.costing_service import CostState
+
+PRODUCTS = 1000
+
+def movements(count: int, seed: int = 7):
+    """Receipts of 1-100 units at 1.00-50.00, issues of 1-60 units, spread over PRODUCTS"""
+    rng = random.Random(seed)
+    costs = [Decimal(c) / 100 for c in range(100, 5001)]
+    quantities = [Decimal(q) for q in range(1, 101)]
+    for _ in range(count):
+        product = rng.randrange(PRODUCTS)
+        if rng.random() < 0.5:
+            yield product, quantities[rng.randrange(100)], costs[rng.randrange(len(costs))]
+        else:
+            yield product, -quantities[rng.randrange(60)], None
+
+def layered(stream, fifo: bool) -> Decimal:
+    states, total = {}, Decimal(0)
+    for product, qty, unit_cost in stream:
+        state = states.get(product)
+        if state is None:
+            state = states[product] = CostState(fifo)
+        if qty >= 0:
+            state.receive(qty, unit_cost)
+        else:
+            total += state.issue(-qty)
+    return total
+
+def rescan(stream, fifo: bool) -> Decimal:
+    """Cost each issue by replaying the product's history up to it"""
+    history, total = {}, Decimal(0)
+    for product, qty, unit_cost in stream:
+        past = history.setdefault(product, [])
+        if qty < 0:
+            state = CostState(fifo)
+            for q, c in past:
+                if q >= 0:
+                    state.receive(q, c)
+                else:
+                    state.issue(-q)
+            total += state.issue(-qty)
+        past.append((qty, unit_cost))
+    return total
+
+def main(count: int = 10_000_000, naive_count: int = 200_000):
+    print(f"{PRODUCTS:,} products")
+    for fifo in (True, False):
+        method = "FIFO" if fifo else "average"
+        for label, engine, n in (("rescan", rescan, naive_count), ("cost layers", layered, naive_count), ("cost layers", layered, count)):
+            start = time.perf_counter()
+            engine(movements(n), fifo)
+            elapsed = time.perf_counter() - start
+            print(f"{method:<8} {label:<12} {n:>12,} movements {elapsed:8.2f} s  {n / elapsed:>12,.0f} movements/s")
+
+if __name__ == "__main__":
+    main(*(int(a) for a in sys.argv[1:3]))
@@ -0,0 +1,84 @@
+"""
+Benchmark: decoding a large AIP journal table (JRN.DBF layout).
+
+Compares the usual record-at-a-time approach (read each record, slice and
+decode every field into a dict) with DBFReader's memory-mapped scan that
+unpacks only the columns the migration uses.
+
+Run from backend/:  python -m benchmarks.bench_dbf_reader [records]
+"""
+import os
+import struct
+import sys
+import tempfile
+import time
+from decimal import Decimal
+from app.services.dbf_reader import DBFReader
+
+# The JRN.DBF layout from the AIP system (479-byte records)
+FIELDS = [
+    ("TYP", "C", 1, 0), ("REF", "C", 20, 0), ("TGL", "D", 8, 0), ("TGB", "D", 8, 0), ("ACC", "C", 10, 0),
+    ("REC", "C", 3, 0), ("ACV", "C", 10, 0), ("JUM", "N", 14, 2), ("K01", "C", 60, 0), ("K02", "C", 60, 0),
+    ("CREF", "C", 20, 0), ("KDR", "C", 1, 0), ("DEB", "N", 14, 2), ("CRD", "N", 14, 2), ("DEV", "C", 1, 0),
+    ("MM", "C", 1, 0), ("KG", "N", 12, 2), ("TGL_J", "D", 8, 0), ("CST", "C", 15, 0), ("REF2", "C", 20, 0),
+    ("JUM2", "N", 14, 2), ("SELI", "N", 14, 2), ("AKH", "N", 14, 2), ("AWL", "N", 14, 2), ("DEPT", "C", 10, 0),
+    ("VAL_", "N", 10, 0), ("DES", "C", 40, 0), ("D_C", "C", 2, 0), ("USERLOGIN", "C", 30, 0), ("USERDES", "C", 30, 0),
+]
+USED = ["REF", "ACC", "DEB", "CRD", "CST", "K01"]
+
+def build(path: str, count: int):
+    record_length = 1 + sum(f[2] for f in FIELDS)
+    header_length = 32 + 32 * len(FIELDS) + 1
+    with open(path, "wb") as f:
+        f.write(struct.pack("<BBBBIHH", 0x30, 125, 1, 5, count, header_length, record_length).ljust(29, b"\0") + b"\x03\0\0")
+        for name, kind, length, decimals in FIELDS:
+            f.write(name.encode().ljust(11, b"\0") + kind.encode() + b"\0" * 4 + bytes([length, decimals]) + b"\0" * 14)
+        f.write(b"\x0d")
+        template = []
+        for name, kind, length, decimals in FIELDS:
+            sample = {"C": "X" * min(length, 8), "D": "20250105", "N": "1250000.00" if decimals else "1"}[kind]
+            template.append(sample.rjust(length) if kind == "N" else sample.ljust(length))
+        record = (" " + "".join(template)).encode()
+        f.write(record * count)
+
+def naive(path: str) -> int:
+    """Per-record read, every field decoded (what a generic DBF library does)"""
+    rows = 0
+    with open(path, "rb") as f:
+        header = f.read(32)
+        count, header_length, record_length = struct.unpack("<IHH", header[4:12])
+        f.seek(header_length)
+        for _ in range(count):
+            record = f.read(record_length)
+            if record[:1] == b"*":
+                continue
+            row, position = {}, 1
+            for name, kind, length, decimals in FIELDS:
+                raw = record[position:position + length].decode("cp1252").strip()
+                row[name] = Decimal(raw) if kind == "N" and raw else raw
+                position += length
+            rows += 1
+    return rows
+
+def mapped(path: str) -> int:
+    with DBFReader(path) as reader:
+        return sum(1 for _ in reader.records(USED))
+
+def raw(path: str) -> int:
+    with DBFReader(path) as reader:
+        return sum(1 for _ in reader.raw_records(USED))
+
+def main(count: int = 500_000):
+    with tempfile.TemporaryDirectory() as scratch:
+        path = os.path.join(scratch, "JRN.DBF")
+        build(path, count)
+        size = os.path.getsize(path) / 1e6
+        print(f"{count:,} records, {size:.0f} MB, {len(FIELDS)} fields ({len(USED)} used by the migration)")
+        for label, scan in (("naive", naive), ("mmap typed", mapped), ("mmap raw", raw)):
+            start = time.perf_counter()
+            rows = scan(path)
+            elapsed = time.perf_counter() - start
+            print(f"{label:<12} {elapsed:6.2f} s  {rows / elapsed:>12,.0f} rows/s  {size / elapsed:8.1f} MB/s")
+
+if __name__ == "__main__":
+    main(*(int(a) for a in sys.argv[1:2]))
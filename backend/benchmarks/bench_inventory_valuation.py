@@ -0,0 +1,85 @@
+"""
+Benchmark: inventory valuation at a date over a year of stock movements.
+
+Compares aggregating the whole stock_ledger up to the date with
+ValuationService, which starts from the nearest monthly closing snapshot and
+only reads the movements since.
+
+Run from backend/:  python -m benchmarks.bench_inventory_valuation [movements]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+from decimal import Decimal
+from sqlalchemy import create_engine, func, insert
+from sqlalchemy.orm import Session
+from app.core.database import Base
+from app.models.auth import Workspace
+from app.models.inventory import Product, Warehouse
+from app.models.ledger import StockLedger, StockSnapshot, ReferenceType
+from app.services.valuation_service import ValuationService
+
+PRODUCTS = 1000
+WAREHOUSES = 5
+START = datetime(2025, 1, 1)
+
+def build(db: Session, count: int, workspace_id: uuid.UUID):
+    rng = random.Random(11)
+    products = [{"id": uuid.uuid4(), "workspace_id": workspace_id, "code": f"P{i:05d}", "name": f"Product {i}"} for i in range(PRODUCTS)]
+    warehouses = [{"id": uuid.uuid4(), "code": f"WH{i}", "name": f"Warehouse {i}"} for i in range(WAREHOUSES)]
+    db.execute(insert(Product), products)
+    db.execute(insert(Warehouse), warehouses)
+    step = timedelta(days=365) / count
+    batch = []
+    for i in range(count):
+        qty = rng.randint(1, 50) * (1 if rng.random() < 0.55 else -1)
+        batch.append({
+            "id": uuid.uuid4(), "product_id": rng.choice(products)["id"], "warehouse_id": rng.choice(warehouses)["id"],
+            "qty": qty, "uom_used": "PCS", "unit_cost": Decimal(rng.randint(100, 5000)) / 100,
+            "reference_type": ReferenceType.ADJUSTMENT, "created_at": START + step * i
+        })
+        if len(batch) == 50_000:
+            db.execute(insert(StockLedger), batch)
+            batch = []
+    if batch:
+        db.execute(insert(StockLedger), batch)
+    db.commit()
+
+def full_scan(db: Session, as_of: datetime) -> int:
+    """Aggregate every movement up to as_of"""
+    return len(db.query(
+        StockLedger.product_id, StockLedger.warehouse_id,
+        func.sum(StockLedger.qty), func.sum(StockLedger.qty * StockLedger.unit_cost)
+    ).filter(StockLedger.created_at <= as_of).group_by(StockLedger.product_id, StockLedger.warehouse_id).all())
+
+def main(count: int = 2_000_000):
+    with tempfile.TemporaryDirectory() as scratch:
+        engine = create_engine(f"sqlite:///{os.path.join(scratch, 'bench.db')}")
+        Base.metadata.create_all(engine, tables=[Workspace.__table__, Product.__table__, Warehouse.__table__,
+                                                 StockLedger.__table__, StockSnapshot.__table__])
+        workspace_id = uuid.uuid4()
+        with Session(engine) as db:
+            build(db, count, workspace_id)
+            start = time.perf_counter()
+            for month in range(1, 12):
+                ValuationService.close_period(db, workspace_id, datetime(2025, month + 1, 1) - timedelta(microseconds=1))
+            print(f"{count:,} movements, {PRODUCTS:,} products x {WAREHOUSES} warehouses; "
+                  f"11 month-end closes took {time.perf_counter() - start:.2f} s")
+            
+            dates = [datetime(2025, month, 20) for month in range(2, 13)]
+            for label, value in (
+                ("full ledger", lambda as_of: full_scan(db, as_of)),
+                ("snapshot + delta", lambda as_of: len(ValuationService.balances_at(db, workspace_id, as_of))),
+            ):
+                start = time.perf_counter()
+                for as_of in dates:
+                    value(as_of)
+                elapsed = (time.perf_counter() - start) / len(dates)
+                print(f"{label:<17} {elapsed * 1000:9.1f} ms per valuation")
+
+if __name__ == "__main__":
+    main(*(int(a) for a in sys.argv[1:2]))
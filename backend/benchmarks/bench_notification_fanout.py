@@ -0,0 +1,55 @@
+"""
+Benchmark: notifying 10k recipients, one create_notification per user vs
+NotificationService.create_notifications.
+
+Uses a file-backed SQLite database so per-call commits pay a real sync.
+Run from backend/:  python -m benchmarks.bench_notification_fanout [recipients]
+"""
+import os
+import sys
+import tempfile
+import time
+import uuid
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app.core.database import Base
+from app.models.auth import Workspace, User
+from app.models.notifications import Notification, NotificationCounter, NotificationType
+from app.services.notification_service import NotificationService
+
+def _session(path: str):
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(engine, tables=[
+        Workspace.__table__, User.__table__, Notification.__table__, NotificationCounter.__table__
+    ])
+    return sessionmaker(bind=engine)()
+
+def main(n: int = 10000):
+    workspace_id = uuid.uuid4()
+    recipients = [uuid.uuid4() for _ in range(n)]
+    with tempfile.TemporaryDirectory() as tmp:
+        db = _session(os.path.join(tmp, "loop.db"))
+        # The per-call loop is slow; time a slice of it and extrapolate
+        sample = recipients[:min(n, 1000)]
+        start = time.perf_counter()
+        for user_id in sample:
+            NotificationService.create_notification(db, workspace_id, user_id, NotificationType.SYSTEM_ALERT, "Stocktake", "Friday")
+        loop_per_user = (time.perf_counter() - start) / len(sample)
+        
+        db = _session(os.path.join(tmp, "bulk.db"))
+        # Some recipients already have counters, so the counter UPDATE has rows to touch
+        for user_id in recipients[:100]:
+            NotificationService.get_unread_count(db, workspace_id, user_id)
+        start = time.perf_counter()
+        NotificationService.create_notifications(db, workspace_id, recipients, NotificationType.SYSTEM_ALERT, "Stocktake", "Friday")
+        bulk = time.perf_counter() - start
+        assert db.query(Notification).count() == n
+    
+    print(f"{n:,} recipients")
+    print(f"  per-user create_notification  {loop_per_user * n:8.2f} s  (extrapolated from {len(sample):,}, "
+          f"{loop_per_user * 1e3:.2f} ms/user)")
+    print(f"  create_notifications          {bulk:8.2f} s  ({bulk / n * 1e6:.1f} us/user, "
+          f"{loop_per_user * n / bulk:,.0f}x)")
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 10000)
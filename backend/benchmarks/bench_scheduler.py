@@ -0,0 +1,68 @@
+"""
+Benchmark: scheduling 10k job orders on 20 work centers.
+
+Schedule.build dispatches every job from a priority heap onto the work center
+that finishes it first. A change to one job (new processing time or due date)
+is applied with Schedule.update, which re-sequences just that job and moves
+the jobs queued behind it; the comparison is rebuilding the whole schedule.
+
+Run from backend/:  python -m benchmarks.bench_scheduler [jobs]
+"""
+import random
+import sys
+import time
+import uuid
+from datetime import date, datetime, timedelta
+from app.services.scheduling_service import CapacityCalendar, Schedule, ScheduledJob
+
+CENTERS = 20
+ORIGIN = datetime(2025, 1, 6, 8)
+
+def build(jobs: int, seed: int = 5):
+    rng = random.Random(seed)
+    calendars = {}
+    for _ in range(CENTERS):
+        shift = rng.choice((8, 16, 24))
+        week = [shift] * 5 + [rng.choice((0, 0, 8)), 0]
+        holidays = {date(2025, 1, 1) + timedelta(days=rng.randrange(365)): 0 for _ in range(10)}
+        calendars[uuid.uuid4()] = CapacityCalendar(week, holidays, ORIGIN.date())
+    centers = list(calendars)
+    
+    def make():
+        return [
+            ScheduledJob(uuid.UUID(int=i + 1), float(rng.randint(1, 12)), ORIGIN + timedelta(days=rng.randint(5, 365)),
+                         rng.choice(centers) if rng.random() < 0.2 else None)
+            for i in range(jobs)
+        ]
+    
+    return calendars, make
+
+def main(jobs: int = 10_000):
+    calendars, make = build(jobs)
+    print(f"{jobs:,} job orders on {CENTERS} work centers")
+    for rule in ("edd", "cr"):
+        batch = make()
+        start = time.perf_counter()
+        schedule = Schedule(calendars, ORIGIN, rule)
+        schedule.build(batch)
+        built = time.perf_counter() - start
+        metrics = schedule.metrics()
+        print(f"{rule}: full build     {built:7.3f} s  makespan {metrics['makespan_hours']:,.0f} h, "
+              f"on time {metrics['on_time_rate']:.1%}")
+        
+        rng = random.Random(1)
+        elapsed, moved = 0.0, 0
+        for _ in range(100):
+            job = batch[rng.randrange(jobs)]
+            start = time.perf_counter()
+            changed = schedule.update(job.job_id, hours=job.hours * rng.choice((0.5, 2)),
+                                      due=job.due + timedelta(days=rng.randint(-30, 30)))
+            elapsed += time.perf_counter() - start
+            moved += len(changed)
+        for sequence in schedule.sequences.values():
+            assert all(abs(a.end_offset - b.start_offset) < 1e-6 for a, b in zip(sequence, sequence[1:]))
+            assert all(a.key <= b.key for a, b in zip(sequence, sequence[1:]))
+        print(f"{rule}: single update  {elapsed / 100:7.4f} s  (mean of 100, {moved / 100:,.0f} jobs moved)")
+
+if __name__ == "__main__":
+    main(*(int(a) for a in sys.argv[1:2]))
@@ -0,0 +1,51 @@
+"""
+Benchmark: receiving a pallet of 5,000 serialized units.
+
+Registers the same number of serials once through create_serial_number (an
+INSERT and a commit per unit) and once through create_serial_numbers (one
+uniqueness query, one multi-row INSERT, one commit), on a file-backed SQLite
+database so commits cost what they do on disk.
+
+Run from backend/:  python -m benchmarks.bench_serial_registration [units]
+"""
+import os
+import sys
+import tempfile
+import time
+import uuid
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app.core.database import Base
+from app.models.auth import Workspace
+from app.models.inventory import Product, Warehouse
+from app.models.advanced_inventory import SerialNumber
+from app.services.advanced_inventory_service import AdvancedInventoryService
+
+def main(units: int = 5_000):
+    with tempfile.TemporaryDirectory() as directory:
+        engine = create_engine(f"sqlite:///{os.path.join(directory, 'serials.db')}")
+        Base.metadata.create_all(engine, tables=[Workspace.__table__, Product.__table__, Warehouse.__table__,
+                                                 SerialNumber.__table__])
+        db = sessionmaker(bind=engine)()
+        ws = uuid.uuid4()
+        product = Product(code="BENCH", name="Bench product", workspace_id=ws)
+        db.add(product)
+        db.commit()
+        product_id = product.id
+        print(f"{units:,} serial numbers")
+        
+        start = time.perf_counter()
+        for serial in AdvancedInventoryService.serial_range("ONE-", 1, units, width=6):
+            AdvancedInventoryService.create_serial_number(db, ws, product_id, serial)
+        print(f"one per call   {time.perf_counter() - start:7.2f} s")
+        
+        start = time.perf_counter()
+        serials = AdvancedInventoryService.serial_range("BULK-", 1, units, width=6)
+        created = AdvancedInventoryService.create_serial_numbers(db, ws, product_id, serials)
+        print(f"bulk range     {time.perf_counter() - start:7.2f} s  {created:,} created")
+        assert db.query(SerialNumber).count() == 2 * units
+        db.close()
+        engine.dispose()
+
+if __name__ == "__main__":
+    main(*(int(a) for a in sys.argv[1:2]))
@@ -0,0 +1,36 @@
+"""
+Throughput benchmark: scalar Decimal tax calculators vs the batch engine.
+
+Run from backend/:  python -m benchmarks.bench_tax_batch [n]
+"""
+import random
+import sys
+import time
+from decimal import Decimal
+import numpy as np
+from app.services.tax_service import TaxService
+
+def _bench(label: str, n: int, fn):
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<28} {elapsed * 1000:10.1f} ms  {n / elapsed:14,.0f} items/s")
+    return elapsed
+
+def main(n: int = 20000):
+    rng = random.Random(0)
+    cents = np.array([rng.randint(3000000000, 200000000000) for _ in range(n)], dtype=np.int64)
+    decimals = TaxService.from_cents(cents)
+    npwp = [rng.random() < 0.9 for _ in range(n)]
+    
+    print(f"{n:,} amounts")
+    scalar = _bench("PPN scalar", n, lambda: [TaxService.calculate_ppn(a) for a in decimals])
+    batch = _bench("PPN batch", n, lambda: TaxService.calculate_ppn_batch(cents))
+    print(f"{'speedup':<28} {scalar / batch:10.1f}x")
+    
+    scalar = _bench("PPh 21 scalar", n, lambda: [TaxService.calculate_pph_21(a, f) for a, f in zip(decimals, npwp)])
+    batch = _bench("PPh 21 batch", n, lambda: TaxService.calculate_pph_21_batch(cents, npwp))
+    print(f"{'speedup':<28} {scalar / batch:10.1f}x")
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20000)
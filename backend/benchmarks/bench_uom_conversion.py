@@ -0,0 +1,55 @@
+"""
+Benchmark: converting 200k document lines to base UOM.
+
+5k products, each with a chain of four packaging units (pallet -> case ->
+box -> pack -> pcs) stored as single-hop conversions, plus an unrelated
+unit. UOMService.to_base walks each product's conversion graph once and
+reuses the memoized ratios for every later line; the comparison searches the
+conversion path again for every line.
+
+Run from backend/:  python -m benchmarks.bench_uom_conversion [lines]
+"""
+import random
+import sys
+import time
+import uuid
+from decimal import Decimal
+from types import SimpleNamespace
+from app.services.uom_service import UOMGraph, UOMService
+
+UNITS = ["PCS", "PACK", "BOX", "CASE", "PALLET"]
+
+def build(lines: int, products: int = 5_000, seed: int = 3):
+    rng = random.Random(seed)
+    ids = [uuid.uuid4() for _ in range(products)]
+    conversions = []
+    for product_id in ids:
+        for smaller, larger in zip(UNITS, UNITS[1:]):
+            conversions.append((product_id, larger, smaller, Decimal(rng.choice((2, 4, 6, 10, 12)))))
+        conversions.append((product_id, "KG", "G", Decimal(1000)))
+    base_uoms = {product_id: "PCS" for product_id in ids}
+    rows = [SimpleNamespace(product_id=rng.choice(ids), qty=Decimal(rng.randint(1, 50)), uom=rng.choice(UNITS),
+                            unit_price=Decimal(rng.randint(100, 10_000)) / 100) for _ in range(lines)]
+    return base_uoms, conversions, rows
+
+def per_line(base_uoms, conversions, rows):
+    """Path search on every line, nothing memoized"""
+    graph = UOMGraph(base_uoms, conversions)
+    return [graph._resolve(row.product_id)[row.uom] for row in rows]
+
+def main(lines: int = 200_000):
+    base_uoms, conversions, rows = build(lines)
+    print(f"{lines:,} lines, {len(base_uoms):,} products, {len(conversions):,} conversions")
+    
+    start = time.perf_counter()
+    graph = UOMGraph(base_uoms, conversions)
+    converted = UOMService.to_base(None, rows, graph)
+    print(f"memoized graph   {time.perf_counter() - start:7.2f} s")
+    
+    start = time.perf_counter()
+    ratios = per_line(base_uoms, conversions, rows)
+    print(f"path per line    {time.perf_counter() - start:7.2f} s")
+    assert all(qty == Decimal(row.qty) * Decimal(ratio.numerator) for (qty, _), row, ratio in zip(converted, rows, ratios))
+
+if __name__ == "__main__":
+    main(*(int(a) for a in sys.argv[1:2]))
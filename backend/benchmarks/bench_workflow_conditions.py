@@ -0,0 +1,51 @@
+"""
+Microbenchmark: per-evaluation cost of compiled workflow conditions.
+
+Run from backend/:  python -m benchmarks.bench_workflow_conditions [n]
+"""
+import random
+import sys
+import time
+from app.services.workflow_expressions import compile_expression
+
+CONDITIONS = [
+    "Amount > 10M?",
+    "amount >= 1.5M and status == 'approved' and warehouse in ('WH1', 'WH2')",
+    "not (qty < 0) and (qty * price > 5M or po.partner.tier == 'gold')",
+]
+
+def main(n: int = 200000):
+    rng = random.Random(0)
+    contexts = [
+        {
+            "amount": rng.randint(0, 20000000),
+            "status": rng.choice(["approved", "draft"]),
+            "warehouse": rng.choice(["WH1", "WH2", "WH3"]),
+            "qty": rng.randint(-5, 500),
+            "price": rng.randint(1000, 100000),
+            "po": {"partner": {"tier": rng.choice(["gold", "silver"])}}
+        }
+        for _ in range(1000)
+    ]
+    
+    for source in CONDITIONS:
+        start = time.perf_counter()
+        evaluate = compile_expression(source)
+        compile_us = (time.perf_counter() - start) * 1e6
+        
+        start = time.perf_counter()
+        for i in range(n):
+            evaluate(contexts[i % 1000])
+        per_eval_us = (time.perf_counter() - start) / n * 1e6
+        
+        start = time.perf_counter()
+        for i in range(n // 100):
+            compile_expression(source)(contexts[i % 1000])
+        reparse_us = (time.perf_counter() - start) / (n // 100) * 1e6
+        
+        print(source)
+        print(f"  compile once {compile_us:8.1f} us | compiled eval {per_eval_us:6.2f} us "
+              f"({1e6 / per_eval_us:,.0f}/s) | parse+eval {reparse_us:6.1f} us")
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200000)
@@ -0,0 +1,103 @@
+"""
+Load test: workspace broadcast fan-out to simulated WebSocket clients.
+
+Compares the old pattern (await send_json per connection, in order) with
+ConnectionManager's serialize-once, per-connection queue fan-out, with a
+share of slow clients that take 250 ms per frame.
+
+Run from backend/:  python -m benchmarks.bench_ws_broadcast [sockets] [messages]
+"""
+import asyncio
+import json
+import statistics
+import sys
+import time
+from app.core.websocket import ClientConnection, ConnectionManager
+
+SLOW_EVERY = 100  # 1% of clients are slow readers
+SLOW_DELAY = 0.25
+
+class SimulatedSocket:
+    # Fast clients still waiting for the current broadcast
+    outstanding = 0
+    all_received: asyncio.Event = None
+    
+    def __init__(self, slow: bool):
+        self.slow = slow
+        self.latencies = []
+        self.sent_at = 0.0
+    
+    async def accept(self):
+        pass
+    
+    async def _write(self):
+        # A real socket write yields to the loop; slow readers hold it much longer
+        await asyncio.sleep(SLOW_DELAY if self.slow else 0)
+        self.latencies.append(time.perf_counter() - self.sent_at)
+        if not self.slow:
+            SimulatedSocket.outstanding -= 1
+            if SimulatedSocket.outstanding == 0:
+                SimulatedSocket.all_received.set()
+    
+    async def send_text(self, text: str):
+        await self._write()
+    
+    async def send_json(self, message: dict):
+        json.dumps(message)
+        await self._write()
+
+def _report(label: str, sockets, elapsed: float):
+    fast = [l for s in sockets if not s.slow for l in s.latencies]
+    fast.sort()
+    p = lambda q: fast[min(int(q * len(fast)), len(fast) - 1)] * 1000
+    print(f"{label:<12} total {elapsed * 1000:9.1f} ms | fast clients p50 {p(0.5):8.2f} ms "
+          f"p99 {p(0.99):8.2f} ms max {p(1.0):8.2f} ms | frames {len(fast):,}")
+
+async def sequential(n: int, messages: int):
+    sockets = [SimulatedSocket(i % SLOW_EVERY == 0) for i in range(n)]
+    start = time.perf_counter()
+    for m in range(messages):
+        sent_at = time.perf_counter()
+        for s in sockets:
+            s.sent_at = sent_at
+            await s.send_json({"type": "document_updated", "n": m})
+    _report("sequential", sockets, time.perf_counter() - start)
+
+async def queued(n: int, messages: int):
+    manager = ConnectionManager(max_queue=8)
+    sockets = [SimulatedSocket(i % SLOW_EVERY == 0) for i in range(n)]
+    # Register the sockets directly: a 5k join storm would itself be 12.5M presence frames
+    for i, s in enumerate(sockets):
+        connection = ClientConnection(f"c{i}", s, manager.max_queue, manager.send_timeout)
+        connection.start()
+        manager.active_connections.setdefault("ws", {})[connection.connection_id] = connection
+    connections = list(manager.active_connections["ws"].values())
+    fast = sum(not s.slow for s in sockets)
+    
+    start = time.perf_counter()
+    enqueue_us = []
+    for m in range(messages):
+        SimulatedSocket.outstanding = fast
+        SimulatedSocket.all_received = asyncio.Event()
+        sent_at = time.perf_counter()
+        for s in sockets:
+            s.sent_at = sent_at
+        await manager.broadcast_to_workspace("ws", {"type": "document_updated", "n": m})
+        enqueue_us.append((time.perf_counter() - sent_at) * 1e6)
+        await SimulatedSocket.all_received.wait()
+    elapsed = time.perf_counter() - start
+    
+    _report("queued", sockets, elapsed)
+    stats = manager.get_connection_stats("ws")
+    print(f"{'':<12} broadcast call {statistics.median(enqueue_us) / 1000:.2f} ms median (sharded; sends interleave) | "
+          f"slow clients backlog {stats['max_queued']} dropped {stats['dropped']:,}")
+    for connection in connections:
+        connection.close()
+
+def main(n: int = 5000, messages: int = 20):
+    print(f"{n:,} sockets in one workspace, {messages} broadcasts, {len(range(0, n, SLOW_EVERY))} slow clients")
+    asyncio.run(queued(n, messages))
+    asyncio.run(sequential(n, max(messages // 10, 1)))
+
+if __name__ == "__main__":
+    main(*(int(a) for a in sys.argv[1:3]))
@@ -0,0 +1,86 @@
+"""
+Benchmark: session bookkeeping with 50k WebSocket sessions.
+
+Compares ConnectionManager's indexed sessions with the previous layout (one
+list of sockets per workspace plus a flat session dict scanned for presence).
+Join/leave broadcasts are left out; the indexed connect still starts a writer
+task per socket.
+
+Run from backend/:  python -m benchmarks.bench_ws_presence [sessions] [workspaces]
+"""
+import asyncio
+import random
+import sys
+import time
+from app.core.websocket import ConnectionManager
+
+class NullSocket:
+    async def accept(self):
+        pass
+    
+    async def send_text(self, text: str):
+        pass
+
+class ListManager:
+    """The pre-index layout: list.remove on disconnect, full scan for presence"""
+    
+    def __init__(self):
+        self.active_connections = {}
+        self.user_sessions = {}
+    
+    def connect(self, connection_id, websocket, workspace_id, user_id):
+        self.active_connections.setdefault(workspace_id, []).append(websocket)
+        self.user_sessions[connection_id] = {"websocket": websocket, "workspace_id": workspace_id, "user_id": user_id}
+    
+    def disconnect(self, connection_id):
+        session = self.user_sessions.pop(connection_id)
+        self.active_connections[session["workspace_id"]].remove(session["websocket"])
+    
+    def get_online_users(self, workspace_id):
+        return [s for s in self.user_sessions.values() if s["workspace_id"] == workspace_id]
+
+def _timed(label: str, count: int, fn):
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    print(f"  {label:<28} {elapsed * 1000:9.1f} ms  ({elapsed / count * 1e6:8.2f} us/op)")
+
+async def indexed(sessions, workspaces, queries):
+    manager = ConnectionManager()
+    # Time the bookkeeping only: join/leave notices are fan-out (see bench_ws_broadcast)
+    async def no_broadcast(*args, **kwargs):
+        return 0
+    manager.broadcast_to_workspace = no_broadcast
+    manager.broadcast_to_workspace_sync = lambda *args, **kwargs: 0
+    
+    start = time.perf_counter()
+    ids = [await manager.connect(NullSocket(), ws, user, user) for ws, user in sessions]
+    elapsed = time.perf_counter() - start
+    print(f"  {'connect':<28} {elapsed * 1000:9.1f} ms  ({elapsed / len(ids) * 1e6:8.2f} us/op)")
+    
+    _timed("get_online_users", len(queries), lambda: [manager.get_online_users(ws) for ws in queries])
+    _timed("count_online_users", len(queries), lambda: [manager.count_online_users(ws) for ws in queries])
+    order = ids[:]
+    random.Random(1).shuffle(order)
+    _timed("disconnect", len(order), lambda: [manager.disconnect(c) for c in order])
+
+def main(n: int = 50000, workspaces: int = 500):
+    rng = random.Random(0)
+    sessions = [(f"ws{rng.randrange(workspaces)}", f"user{i % (n // 2)}") for i in range(n)]
+    queries = [f"ws{rng.randrange(workspaces)}" for _ in range(1000)]
+    print(f"{n:,} sessions across {workspaces} workspaces")
+    
+    print("list + scan")
+    legacy = ListManager()
+    ids = [str(i) for i in range(n)]
+    _timed("connect", n, lambda: [legacy.connect(c, NullSocket(), ws, user) for c, (ws, user) in zip(ids, sessions)])
+    _timed("get_online_users", len(queries), lambda: [legacy.get_online_users(ws) for ws in queries])
+    order = ids[:]
+    random.Random(1).shuffle(order)
+    _timed("disconnect", n, lambda: [legacy.disconnect(c) for c in order])
+    
+    print("indexed")
+    asyncio.run(indexed(sessions, workspaces, queries))
+
+if __name__ == "__main__":
+    main(*(int(a) for a in sys.argv[1:3]))
@@ -0,0 +1,60 @@
+"""
+Migrate legacy AIP (FoxPro) data into NexERP.
+    
+    python migrate_aip.py ../erpaip/AIP_2025R1X3.zip --workspace 11111111-1111-1111-1111-111111111111
+    python migrate_aip.py ../erpaip/AIPX/AIPX/tabel --workspace <id> --tables chart_of_accounts,partners --jobs 8
+    python migrate_aip.py //legacy-share/aip/tabel --workspace <id> --sync --state-dir /var/lib/nexerp/aip-sync
+
+The source is either the AIP `tabel` directory or the distribution zip (its
+tables are extracted to a temporary directory first, since they're read
+memory-mapped). --sync applies only what changed since the previous --sync run
+(see app/services/aip_sync.py); run it nightly during the cutover.
+"""
+import argparse
+import logging
+import os
+import tempfile
+import time
+import uuid
+import zipfile
+from app.core.database import Base, engine
+from app.models import auth as auth_models  # Registers workspaces/users for the foreign keys
+from app.services.aip_migration import JOBS, format_report, migrate
+from app.services.aip_sync import sync
+
+def _table_dir(root: str) -> str:
+    """The directory holding ACC.DBF (the AIP `tabel` folder) under root"""
+    for directory, _, files in os.walk(root):
+        if any(f.lower() == "acc.dbf" for f in files):
+            return directory
+    raise SystemExit(f"No AIP tables (ACC.DBF) found under {root}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("source", help="AIP tabel directory or AIP zip")
+    parser.add_argument("--workspace", required=True, type=uuid.UUID, help="Target workspace id")
+    parser.add_argument("--tables", help=f"Comma-separated subset of: {', '.join(JOBS)}")
+    parser.add_argument("--jobs", type=int, default=4, help="Tables loaded in parallel")
+    parser.add_argument("--sync", action="store_true", help="Apply only the changes since the last --sync")
+    parser.add_argument("--state-dir", default="aip_sync_state", help="Where --sync keeps its per-table state")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s %(message)s")
+    tables = args.tables.split(",") if args.tables else None
+    
+    Base.metadata.create_all(bind=engine)
+    with tempfile.TemporaryDirectory() as scratch:
+        source = args.source
+        if zipfile.is_zipfile(source):
+            with zipfile.ZipFile(source) as archive:
+                members = [m for m in archive.namelist() if m.lower().endswith((".dbf", ".fpt"))]
+                archive.extractall(scratch, members)
+            source = scratch
+        start = time.perf_counter()
+        if args.sync:
+            results = sync(engine, _table_dir(source), args.workspace, args.state_dir, tables, args.jobs)
+        else:
+            results = migrate(engine, _table_dir(source), args.workspace, tables, args.jobs)
+        print(format_report(results, time.perf_counter() - start))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,230 @@
+import os
+import struct
+import uuid
+from datetime import date, datetime
+from decimal import Decimal
+from types import SimpleNamespace
+import pytest
+from sqlalchemy import create_engine, func, select
+from app.core.database import Base
+from app.models.auth import Workspace
+from app.models.accounting import BankAccount, COA, COAType, Partner, PartnerCategory
+from app.models.inventory import Product
+from app.models.journals import Journal, JournalItem
+from app.models.manufacturing import BillOfMaterials, BOMItem
+from app.services.aip_migration import JOBS, load_rows, migrate
+from app.services.aip_sync import sync
+from app.services.dbf_reader import DBFReader
+
+LEGACY_TABLES = os.path.join(os.path.dirname(__file__), "..", "..", "erpaip", "AIPX", "AIPX", "tabel")
+
+def write_dbf(path, fields, records, memos=None):
+    """Minimal Visual FoxPro table writer; fields are (name, type, length, decimals)"""
+    record_length = 1 + sum(f[2] for f in fields)
+    header_length = 32 + 32 * len(fields) + 1 + 263
+    header = struct.pack("<BBBBIHH", 0x30, 124, 10, 19, len(records), header_length, record_length)
+    header = header.ljust(29, b"\0") + b"\x03" + b"\0\0"
+    for name, kind, length, decimals in fields:
+        header += name.encode().ljust(11, b"\0") + kind.encode() + b"\0" * 4 + bytes([length, decimals]) + b"\0" * 14
+    header += b"\x0d" + b"\0" * 263
+    body = b""
+    for record in records:
+        deleted = record.get("_deleted", False)
+        body += b"*" if deleted else b" "
+        for name, kind, length, decimals in fields:
+            value = record.get(name)
+            if kind == "M":
+                body += struct.pack("<I", value or 0)
+            elif kind == "I":
+                body += struct.pack("<i", value or 0)
+            elif kind == "T":
+                body += struct.pack("<ii", value.toordinal() + 1721425, 0) if value else b"\0" * 8
+            elif kind == "D":
+                body += value.strftime("%Y%m%d").encode() if value else b" " * 8
+            elif kind == "N":
+                body += (f"{value:.{decimals}f}" if value is not None else "").rjust(length).encode()
+            else:
+                body += str(value or "").encode("cp1252").ljust(length)
+    with open(path, "wb") as f:
+        f.write(header + body + b"\x1a")
+    if memos:
+        # Block size 64; block 0 holds the header
+        data = bytearray(struct.pack(">IHH", 0, 0, 64).ljust(512, b"\0"))
+        for block, text in memos.items():
+            offset = block * 64
+            data.extend(b"\0" * (offset - len(data)))
+            data[offset:] = struct.pack(">II", 1, len(text)) + text.encode("cp1252")
+        with open(os.path.splitext(path)[0] + ".FPT", "wb") as f:
+            f.write(bytes(data))
+
+def test_reader_decodes_fixed_width_records_and_memos(tmp_path):
+    path = str(tmp_path / "itm.dbf")
+    fields = [("ITM", "C", 10, 0), ("QTY", "N", 10, 2), ("TGL", "D", 8, 0), ("NO", "I", 4, 0),
+              ("KET", "M", 4, 0), ("TGL_C", "T", 8, 0)]
+    write_dbf(path, fields, [
+        {"ITM": "A-1", "QTY": Decimal("2.5"), "TGL": date(2024, 2, 29), "NO": -7, "KET": 8, "TGL_C": date(2024, 1, 1)},
+        {"ITM": "gone", "_deleted": True},
+        {"ITM": "Café"},
+    ], memos={8: "long description"})
+    
+    with DBFReader(path) as reader:
+        assert len(reader) == 3 and reader.last_update == date(2024, 10, 19)
+        first, last = reader.records()
+        assert first == ("A-1", Decimal("2.50"), date(2024, 2, 29), -7, "long description", datetime(2024, 1, 1))
+        assert last[:3] == ("Café", None, None) and last[4:] == (None, None)
+        # Columns come back in the requested order; others are skipped undecoded
+        assert list(reader.records(["TGL", "ITM"])) == [(date(2024, 2, 29), "A-1"), (None, "Café")]
+        assert [r[0] for r in reader.raw_records(["ITM"], include_deleted=True)] == [b" ", b"*", b" "]
+
+@pytest.mark.skipif(not os.path.isdir(LEGACY_TABLES), reason="legacy AIP tables not checked out")
+def test_reader_handles_the_shipped_aip_chart_of_accounts():
+    with DBFReader(os.path.join(LEGACY_TABLES, "ACC.DBF")) as reader:
+        rows = list(reader.dicts(["ACC", "DES", "TYPECOA"]))
+    assert len(rows) == 187  # One of the 188 records is deleted
+    assert rows[0] == {"ACC": "10.100.00", "DES": "Kas Besar", "TYPECOA": "AKTIVA"}
+
+def test_migration_maps_legacy_tables_and_is_rerunnable(tmp_path):
+    source = tmp_path / "tabel"
+    source.mkdir()
+    write_dbf(str(source / "ACC.DBF"), [("ACC", "C", 10, 0), ("DES", "C", 40, 0), ("TYPECOA", "C", 25, 0)], [
+        {"ACC": "11.000.00", "DES": "BANK", "TYPECOA": "AKTIVA"},
+        {"ACC": "11.100.00", "DES": "BCA (IDR)", "TYPECOA": "AKTIVA"},
+        {"ACC": "13.100.00", "DES": "Piutang Dagang", "TYPECOA": "AKTIVA"},
+        {"ACC": "50.000.00", "DES": "Penjualan", "TYPECOA": "RL"},
+    ])
+    partner_fields = [("DES", "C", 40, 0), ("AL", "C", 40, 0), ("KT", "C", 40, 0), ("CT", "N", 14, 2)]
+    write_dbf(str(source / "cst.dbf"), [("CST", "C", 15, 0)] + partner_fields, [
+        {"CST": "C-01", "DES": "Toko Maju", "AL": "Jl. Merdeka 1", "KT": "Bandung", "CT": Decimal(5000)},
+        {"CST": "X-01", "DES": "Both Ways"},
+    ])
+    write_dbf(str(source / "sup.DBF"), [("SUP", "C", 15, 0)] + partner_fields, [{"SUP": "X-01", "DES": "Both Ways"}])
+    write_dbf(str(source / "bank.dbf"), [("KODE", "C", 10, 0), ("NAMA", "C", 40, 0), ("ACC", "C", 10, 0)],
+              [{"KODE": "BCA1", "NAMA": "BCA", "ACC": "11.100.00"}])
+    write_dbf(str(source / "ITM.DBF"), [("ITM", "C", 16, 0), ("DES", "C", 150, 0), ("STN", "C", 4, 0), ("HGJ", "N", 12, 2)],
+              [{"ITM": "FG", "DES": "Finished", "STN": "PCS"}, {"ITM": "RM", "DES": "Raw", "STN": "KG"}])
+    write_dbf(str(source / "bomh.dbf"), [("BOMID", "C", 16, 0), ("ITM", "C", 16, 0), ("DES", "C", 60, 0)],
+              [{"BOMID": "B1", "ITM": "FG", "DES": "FG recipe"}])
+    write_dbf(str(source / "boml.dbf"), [("BOMID", "C", 16, 0), ("REC", "C", 3, 0), ("ITM", "C", 16, 0), ("QTY", "N", 14, 4)],
+              [{"BOMID": "B1", "REC": "001", "ITM": "RM", "QTY": Decimal("1.5")},
+               {"BOMID": "B1", "REC": "002", "ITM": "MISSING", "QTY": Decimal(1)}])
+    jrn_fields = [("REF", "C", 20, 0), ("TGL", "D", 8, 0), ("ACC", "C", 10, 0), ("DEB", "N", 14, 2),
+                  ("CRD", "N", 14, 2), ("CST", "C", 15, 0), ("DES", "C", 40, 0), ("K01", "C", 60, 0)]
+    write_dbf(str(source / "JRN.DBF"), jrn_fields, [
+        {"REF": "FP001", "TGL": date(2024, 1, 5), "ACC": "13.100.00", "DEB": Decimal(100), "CST": "C-01", "K01": "Sale"},
+        {"REF": "FP001", "TGL": date(2024, 1, 5), "ACC": "50.000.00", "CRD": Decimal(100), "K01": "Sale"},
+        {"REF": "FP002", "TGL": date(2024, 1, 6), "ACC": "13.100.00", "DEB": Decimal(1), "_deleted": True},
+    ])
+    
+    engine = create_engine(f"sqlite:///{tmp_path / 'nexerp.db'}")
+    Base.metadata.create_all(engine, tables=[
+        Workspace.__table__, COA.__table__, Partner.__table__, Product.__table__, BankAccount.__table__,
+        BillOfMaterials.__table__, BOMItem.__table__, Journal.__table__, JournalItem.__table__
+    ])
+    ws = uuid.uuid4()
+    results = {s.table: s for s in migrate(engine, str(source), ws, jobs=3)}
+    assert results["journal_items"].loaded == 2 and results["bom_items"].skipped == 1
+    
+    with engine.connect() as db:
+        accounts = {row.code: row for row in db.execute(select(COA))}
+        assert accounts["11.100.00"].parent_id == accounts["11.000.00"].id
+        assert accounts["50.000.00"].type == COAType.INCOME
+        partners = {row.code: row for row in db.execute(select(Partner))}
+        assert partners["X-01"].category == PartnerCategory.BOTH
+        assert partners["C-01"].address == "Jl. Merdeka 1\nBandung" and partners["C-01"].credit_limit == 5000
+        assert db.execute(select(BankAccount.coa_id)).scalar() == accounts["11.100.00"].id
+        items = db.execute(select(JournalItem)).all()
+        assert sum(i.debit for i in items) == sum(i.credit for i in items) == 100
+        assert {i.partner_id for i in items} == {partners["C-01"].id, None}
+    
+    # A second run finds everything already there
+    assert sum(s.loaded for s in migrate(engine, str(source), ws)) == 0
+    with engine.connect() as db:
+        assert db.execute(select(func.count()).select_from(JournalItem)).scalar() == 2
+
+def test_sync_applies_only_the_delta(tmp_path):
+    source, state = tmp_path / "tabel", str(tmp_path / "state")
+    source.mkdir()
+    acc_fields = [("ACC", "C", 10, 0), ("DES", "C", 40, 0), ("TYPECOA", "C", 25, 0)]
+    jrn_fields = [("REF", "C", 20, 0), ("TGL", "D", 8, 0), ("ACC", "C", 10, 0), ("DEB", "N", 14, 2),
+                  ("CRD", "N", 14, 2), ("CST", "C", 15, 0), ("DES", "C", 40, 0), ("K01", "C", 60, 0)]
+    accounts = [{"ACC": "11.100.00", "DES": "BCA", "TYPECOA": "AKTIVA"},
+                {"ACC": "50.000.00", "DES": "Penjualan", "TYPECOA": "RL"}]
+    def voucher(ref, amount):
+        return [{"REF": ref, "TGL": date(2024, 1, 5), "ACC": "11.100.00", "DEB": Decimal(amount)},
+                {"REF": ref, "TGL": date(2024, 1, 5), "ACC": "50.000.00", "CRD": Decimal(amount)}]
+    write_dbf(str(source / "ACC.DBF"), acc_fields, accounts)
+    write_dbf(str(source / "JRN.DBF"), jrn_fields, voucher("V1", 10) + voucher("V2", 20))
+    
+    engine = create_engine(f"sqlite:///{tmp_path / 'nexerp.db'}")
+    Base.metadata.create_all(engine, tables=[Workspace.__table__, COA.__table__, Partner.__table__, Product.__table__,
+                                             BillOfMaterials.__table__, Journal.__table__, JournalItem.__table__])
+    ws, tables = uuid.uuid4(), ["chart_of_accounts", "partners", "products", "journals", "journal_items"]
+    first = {s.table: s for s in sync(engine, str(source), ws, state, tables)}
+    assert first["journal_items"].loaded == 4
+    
+    # The legacy app renames an account, posts V3 and deletes V2
+    accounts[0]["DES"] = "BCA (IDR)"
+    write_dbf(str(source / "ACC.DBF"), acc_fields, accounts)
+    write_dbf(str(source / "JRN.DBF"), jrn_fields, voucher("V1", 10) + [
+        dict(line, _deleted=True) for line in voucher("V2", 20)] + voucher("V3", 30))
+    second = {s.table: s for s in sync(engine, str(source), ws, state, tables)}
+    assert (second["chart_of_accounts"].loaded, second["chart_of_accounts"].updated) == (0, 1)
+    assert (second["journals"].loaded, second["journals"].deleted) == (1, 1)
+    assert (second["journal_items"].loaded, second["journal_items"].deleted) == (2, 2)
+    assert second["partners"].unchanged and not second["journals"].unchanged
+    
+    with engine.connect() as db:
+        assert db.execute(select(COA.name).where(COA.code == "11.100.00")).scalar() == "BCA (IDR)"
+        assert sorted(db.execute(select(Journal.ref_no)).scalars()) == ["V1", "V3"]
+        assert db.execute(select(func.sum(JournalItem.debit))).scalar() == 40
+    
+    assert all(s.unchanged for s in sync(engine, str(source), ws, state, tables))
+    
+    # An account removed in AIP is deactivated; when it comes back it is active again
+    write_dbf(str(source / "ACC.DBF"), acc_fields, accounts[:1])
+    assert sync(engine, str(source), ws, state, ["chart_of_accounts"])[0].deleted == 1
+    accounts[1]["DES"] = "Penjualan Lokal"
+    write_dbf(str(source / "ACC.DBF"), acc_fields, accounts)
+    back = sync(engine, str(source), ws, state, ["chart_of_accounts"])[0]
+    assert (back.loaded, back.updated) == (0, 1)
+    with engine.connect() as db:
+        assert db.execute(select(COA.is_active, COA.name).where(COA.code == "50.000.00")).one() == (True, "Penjualan Lokal")
+
+class _FakeCursor:
+    """Records what each PostgreSQL driver's COPY API receives"""
+    
+    def __init__(self):
+        self.copied, self.rowcount = [], 0
+    
+    def execute(self, sql):
+        self.rowcount = 2
+    
+    def copy_expert(self, sql, stream):  # psycopg2
+        self.copied.append(stream.read())
+    
+    def copy(self, sql):  # psycopg 3
+        cursor = self
+        
+        class Copy:
+            def __enter__(self):
+                return self
+            
+            def __exit__(self, *exc):
+                return False
+            
+            def write(self, data):
+                cursor.copied.append(data)
+        return Copy()
+
+@pytest.mark.parametrize("driver", ["psycopg2", "psycopg"])
+def test_copy_load_works_with_either_psycopg_driver(driver):
+    cursor = _FakeCursor()
+    connection = SimpleNamespace(cursor=lambda: cursor, commit=lambda: None, rollback=lambda: None, close=lambda: None)
+    engine = SimpleNamespace(dialect=SimpleNamespace(name="postgresql", driver=driver), raw_connection=lambda: connection)
+    rows = [(uuid.UUID(int=1), None, "FG", "Finished", "PCS", None, 0), (uuid.UUID(int=2), None, "RM", 'Raw "x"', "KG", None, 0)]
+    assert load_rows(engine, JOBS["products"], rows) == 2
+    assert "".join(cursor.copied) == (
+        '00000000-0000-0000-0000-000000000001,,"FG","Finished","PCS",,0\n'
+        '00000000-0000-0000-0000-000000000002,,"RM","Raw ""x""","KG",,0\n'
+    )
+
@@ -0,0 +1,41 @@
+import uuid
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from app.core.database import Base
+from app.models.auth import Workspace
+from app.models.inventory import Product
+from app.models.advanced_inventory import BarcodeMapping
+from app.services.advanced_inventory_service import AdvancedInventoryService, barcode_index
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine, tables=[Workspace.__table__, Product.__table__, BarcodeMapping.__table__])
+    return sessionmaker(bind=engine)()
+
+def test_batch_lookup_and_index_refresh_on_register(db):
+    ws, other = uuid.uuid4(), uuid.uuid4()
+    products = [Product(workspace_id=ws, code=f"P{i}", name=f"Product {i}") for i in range(3)]
+    db.add_all(products)
+    db.commit()
+    for i, product in enumerate(products[:2]):
+        AdvancedInventoryService.register_barcode(db, ws, product.id, f"899000000000{i}")
+    AdvancedInventoryService.register_barcode(db, other, products[2].id, "8990000000099")
+    barcode_index.invalidate()
+    
+    assert AdvancedInventoryService.lookup_by_barcode(db, ws, "8990000000001").code == "P1"
+    found = AdvancedInventoryService.lookup_barcodes(db, ws, ["8990000000000", "8990000000001", "8990000000099", "nope"])
+    assert {barcode: entry.code for barcode, entry in found.items()} == {"8990000000000": "P0", "8990000000001": "P1"}
+    
+    statements = []
+    event.listen(db.get_bind(), "before_cursor_execute", lambda *args: statements.append(args[2]))
+    assert barcode_index.lookup(db, ws, "8990000000000").code == "P0"  # Loads the workspace index
+    assert barcode_index.lookup(db, ws, "8990000000001").product_id == products[1].id
+    assert len(statements) == 1
+    
+    # Registering puts the barcode straight into the loaded index
+    AdvancedInventoryService.register_barcode(db, ws, products[2].id, "8990000000002")
+    statements.clear()
+    assert barcode_index.lookup_many(db, ws, ["8990000000002", "8990000000000"])["8990000000002"].code == "P2"
+    assert statements == []
@@ -0,0 +1,66 @@
+import uuid
+from datetime import datetime, timedelta
+from decimal import Decimal
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app.core.database import Base
+from app.models.auth import Workspace
+from app.models.accounting import Partner
+from app.models.inventory import Product
+from app.models.manufacturing import BillOfMaterials, BOMItem, JobOrder
+from app.services.bom_service import BOMGraph, BOMService
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://")
+    tables = [Workspace.__table__, Partner.__table__, Product.__table__, BillOfMaterials.__table__,
+              BOMItem.__table__, JobOrder.__table__]
+    Base.metadata.create_all(engine, tables=tables)
+    return sessionmaker(bind=engine)()
+
+def test_explosion_and_cost_rollup_through_shared_sub_assemblies(db):
+    ws = uuid.uuid4()
+    names = ["table", "chair", "frame", "leg", "screw", "board", "old-frame"]
+    prices = {"leg": 4, "screw": Decimal("0.10"), "board": 15}
+    products = {n: Product(workspace_id=ws, code=n, name=n, base_price=prices.get(n, 0)) for n in names}
+    db.add_all(products.values())
+    db.flush()
+    
+    def bom(product, created, items, active=True):
+        header = BillOfMaterials(workspace_id=ws, product_id=products[product].id, name=product, is_active=active,
+                                 created_at=datetime(2025, 1, 1) + timedelta(days=created))
+        db.add(header)
+        db.flush()
+        db.add_all(BOMItem(bom_id=header.id, component_id=products[c].id, qty=q, waste_percent=w) for c, q, w in items)
+    
+    bom("frame", 0, [("leg", 1, 0), ("screw", 8, 0)])  # Superseded below
+    bom("frame", 1, [("leg", 4, 0), ("screw", 16, 25)])
+    bom("table", 0, [("frame", 1, 0), ("board", 1, 0)])
+    bom("chair", 0, [("frame", 1, 0), ("leg", 2, 0)])
+    bom("old-frame", 0, [("table", 1, 0)], active=False)
+    db.add_all([
+        JobOrder(workspace_id=ws, jo_number="JO-1", product_id=products["table"].id, quantity=2),
+        JobOrder(workspace_id=ws, jo_number="JO-2", product_id=products["chair"].id, quantity=3),
+        JobOrder(workspace_id=ws, jo_number="JO-3", product_id=products["table"].id, quantity=1),
+    ])
+    db.commit()
+    
+    ids = [jo.id for jo in db.query(JobOrder)]
+    requirements = BOMService.explode_job_orders(db, ws, ids)
+    assert BOMService.explode_job_orders(db, uuid.uuid4(), ids) == {}
+    by_name = {p.name: requirements[p.id] for p in products.values() if p.id in requirements}
+    # 6 frames (3 tables + 3 chairs), each 4 legs and 16 screws + 25% waste; 2 more legs per chair
+    assert by_name == {"frame": 6, "board": 3, "leg": 30, "screw": 120}
+    
+    costs = BOMService.standard_costs(db, ws)
+    assert costs[products["frame"].id] == Decimal(18)  # 4 x 4 + 20 x 0.10
+    assert costs[products["table"].id] == Decimal(33)
+    assert costs[products["chair"].id] == Decimal(26)
+    graph = BOMService.load_graph(db, ws)
+    assert [graph.level(products[n].id) for n in ("table", "frame", "leg")] == [0, 1, 2]
+
+def test_cycle_is_rejected():
+    a, b, c = uuid.uuid4(), uuid.uuid4(), uuid.uuid4()
+    with pytest.raises(ValueError, match="cycle"):
+        BOMGraph({a: [(b, Decimal(1))], b: [(c, Decimal(1))], c: [(a, Decimal(1))]})
@@ -0,0 +1,120 @@
+import uuid
+from datetime import datetime, timedelta
+from decimal import Decimal
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app.core.database import Base
+from app.models.auth import Workspace
+from app.models.inventory import Product, Warehouse, ValuationMethod
+from app.models.ledger import StockLedger, StockCostLayer, StockCostPosition, ReferenceType
+from app.services.costing_service import CostingService
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://")
+    tables = [Workspace.__table__, Product.__table__, Warehouse.__table__, StockLedger.__table__,
+              StockCostLayer.__table__, StockCostPosition.__table__]
+    Base.metadata.create_all(engine, tables=tables)
+    return sessionmaker(bind=engine)()
+
+START = datetime(2025, 1, 1)
+
+def _setup(db, method):
+    product = Product(code=f"P-{method.value}", name="Widget", uom="PCS", valuation_method=method)
+    warehouse = Warehouse(code=f"WH-{method.value}", name="Main")
+    db.add_all([product, warehouse])
+    db.commit()
+    return product, warehouse
+
+def _post(db, product, warehouse, step, qty, unit_cost=None):
+    movement = StockLedger(
+        product_id=product.id, warehouse_id=warehouse.id, qty=Decimal(qty), uom_used="PCS",
+        unit_cost=None if unit_cost is None else Decimal(unit_cost),
+        reference_type=ReferenceType.ADJUSTMENT, reference_id=uuid.uuid4(),
+        created_at=START + timedelta(minutes=step)
+    )
+    cost = CostingService.post_movement(db, movement)
+    db.commit()
+    return cost
+
+def _position(db, product, warehouse):
+    return db.get(StockCostPosition, (product.id, warehouse.id))
+
+def test_fifo_issues_consume_oldest_layers(db):
+    product, warehouse = _setup(db, ValuationMethod.FIFO)
+    _post(db, product, warehouse, 1, 10, 5)
+    _post(db, product, warehouse, 2, 10, 8)
+    
+    assert _post(db, product, warehouse, 3, -15) == Decimal("6.0000")  # 10 @ 5 + 5 @ 8
+    layers = db.query(StockCostLayer).filter(StockCostLayer.product_id == product.id).all()
+    assert [(layer.qty_remaining, layer.unit_cost) for layer in layers] == [(Decimal(5), Decimal(8))]
+    position = _position(db, product, warehouse)
+    assert (position.qty, position.value) == (Decimal(5), Decimal(40))
+
+def test_average_issues_use_running_average(db):
+    product, warehouse = _setup(db, ValuationMethod.AVERAGE)
+    _post(db, product, warehouse, 1, 10, 5)
+    _post(db, product, warehouse, 2, 10, 8)
+    
+    assert _post(db, product, warehouse, 3, -15) == Decimal("6.5000")
+    assert db.query(StockCostLayer).count() == 0
+    position = _position(db, product, warehouse)
+    assert (position.qty, position.value) == (Decimal(5), Decimal("32.5"))
+
+def test_negative_stock_is_costed_at_last_cost_and_covered_by_next_receipt(db):
+    product, warehouse = _setup(db, ValuationMethod.FIFO)
+    _post(db, product, warehouse, 1, 4, 10)
+    
+    assert _post(db, product, warehouse, 2, -6) == Decimal("10.0000")
+    assert _position(db, product, warehouse).qty == Decimal(-2)
+    _post(db, product, warehouse, 3, 5, 12)
+    layers = db.query(StockCostLayer).all()
+    assert [(layer.qty_remaining, layer.unit_cost) for layer in layers] == [(Decimal(3), Decimal(12))]
+    assert _position(db, product, warehouse).value == Decimal(36)
+
+def test_rebuild_matches_incremental_posting(db):
+    fifo, warehouse = _setup(db, ValuationMethod.FIFO)
+    average, _ = _setup(db, ValuationMethod.AVERAGE)
+    movements = [(10, 5), (-3, None), (6, 7), (-9, None), (-2, None), (8, 4), (-4, None)]
+    for step, (qty, cost) in enumerate(movements):
+        _post(db, fifo, warehouse, step, qty, cost)
+        _post(db, average, warehouse, step, qty, cost)
+    
+    def snapshot():
+        issues = db.query(StockLedger.id, StockLedger.unit_cost).filter(StockLedger.qty < 0).order_by(StockLedger.id).all()
+        layers = sorted(
+            (str(layer.product_id), layer.sequence, layer.qty_remaining, layer.unit_cost)
+            for layer in db.query(StockCostLayer)
+        )
+        positions = sorted(
+            (str(p.product_id), p.qty, p.value, p.last_unit_cost, p.next_sequence, p.next_movement)
+            for p in db.query(StockCostPosition)
+        )
+        return issues, layers, positions
+    
+    incremental = snapshot()
+    CostingService.REBUILD_CHUNK = 3  # Force several replay chunks
+    try:
+        assert CostingService.rebuild(db) == 0
+    finally:
+        CostingService.REBUILD_CHUNK = 10000
+    db.expire_all()
+    assert snapshot() == incremental
+
+def test_rebuild_replays_movements_of_one_transaction_in_posting_order(db):
+    product, warehouse = _setup(db, ValuationMethod.FIFO)
+    # One posting run: every row gets the same created_at and a random id
+    costs = [_post(db, product, warehouse, 0, qty, cost) for qty, cost in
+             [(5, 1), (5, 2), (-6, None), (5, 3), (-6, None), (5, 4), (-6, None)]]
+    assert [m.sequence for m in db.query(StockLedger).order_by(StockLedger.sequence)] == list(range(7))
+    assert costs[2::2] == [Decimal("1.1667"), Decimal("2.3333"), Decimal("3.5")]
+    
+    CostingService.REBUILD_CHUNK = 2
+    try:
+        assert CostingService.rebuild(db) == 0
+    finally:
+        CostingService.REBUILD_CHUNK = 10000
+    db.expire_all()
+    position = _position(db, product, warehouse)
+    assert (position.qty, position.next_movement) == (2, 7)
@@ -0,0 +1,81 @@
+import uuid
+from datetime import date, datetime
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app.core.database import Base
+from app.models.auth import Workspace
+from app.models.accounting import Partner
+from app.models.advanced_inventory import StockReorderRule
+from app.models.inventory import Product, Warehouse
+from app.models.ledger import StockLedger, StockSnapshot, ReferenceType
+from app.models.manufacturing import BillOfMaterials, BOMItem, JobOrder, JobOrderStatus
+from app.models.procurement import PurchaseOrder, POLine, POStatus
+from app.services.advanced_inventory_service import AdvancedInventoryService
+from app.services.mrp_service import MRPService
+from app.services.valuation_service import ValuationService
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://")
+    tables = [Workspace.__table__, Partner.__table__, Product.__table__, Warehouse.__table__, StockLedger.__table__,
+              StockSnapshot.__table__, BillOfMaterials.__table__, BOMItem.__table__, JobOrder.__table__,
+              PurchaseOrder.__table__, POLine.__table__, StockReorderRule.__table__]
+    Base.metadata.create_all(engine, tables=tables)
+    return sessionmaker(bind=engine)()
+
+def test_mrp_nets_each_level_before_exploding_into_the_next(db):
+    ws = uuid.uuid4()
+    assembly = Product(workspace_id=ws, code="A", name="Assembly")
+    sub = Product(workspace_id=ws, code="B", name="Sub-assembly")
+    part = Product(workspace_id=ws, code="C", name="Part", lead_time_days=7)
+    warehouse = Warehouse(code="MAIN", name="Main")
+    db.add_all([assembly, sub, part, warehouse])
+    db.flush()
+    for product, components in ((assembly, [(sub, 2), (part, 1)]), (sub, [(part, 3)])):
+        bom = BillOfMaterials(workspace_id=ws, product_id=product.id, name=product.code)
+        db.add(bom)
+        db.flush()
+        db.add_all(BOMItem(bom_id=bom.id, component_id=c.id, qty=q) for c, q in components)
+    for product, qty in ((sub, 1), (part, 5)):
+        db.add(StockLedger(product_id=product.id, warehouse_id=warehouse.id, qty=qty, unit_cost=1,
+                           reference_type=ReferenceType.ADJUSTMENT, created_at=datetime(2025, 1, 1)))
+    for status, qty in ((POStatus.APPROVED, 5), (POStatus.DRAFT, 100)):  # Drafts are not supply yet
+        po = PurchaseOrder(workspace_id=ws, po_number=f"PO-{status.value}", status=status, date=datetime(2025, 3, 3))
+        db.add(po)
+        db.flush()
+        db.add(POLine(po_id=po.id, product_id=part.id, qty=qty, unit_price=1, uom="PCS"))
+    db.add(JobOrder(workspace_id=ws, jo_number="JO-1", product_id=assembly.id, quantity=2, status=JobOrderStatus.SCHEDULED,
+                    start_date=datetime(2025, 3, 10), end_date=datetime(2025, 3, 17)))
+    db.add(StockReorderRule(workspace_id=ws, product_id=part.id, warehouse_id=warehouse.id,
+                            min_quantity=3, max_quantity=20, reorder_quantity=2))
+    db.commit()
+    
+    plan = MRPService.run(db, ws, start=date(2025, 3, 3), bucket_days=7, horizon=4)
+    # 2 A need 4 B (1 on hand -> make 3) and 2 C; the 3 B need 9 C: 11 C against 5 on hand + 5 on order
+    assert sorted(plan.suggestions(), key=lambda s: s["action"]) == [
+        {"product_id": str(sub.id), "action": "manufacture", "qty": 3.0,
+         "release_date": "2025-03-10", "due_date": "2025-03-10"},
+        {"product_id": str(part.id), "action": "purchase", "qty": 1.0,
+         "release_date": "2025-03-03", "due_date": "2025-03-10"},
+    ]
+    assert plan.demand(part.id) == 11 and plan.incoming(assembly.id) == 2
+    
+    assert AdvancedInventoryService.check_reorder_points(db, ws) == []
+    [suggestion] = AdvancedInventoryService.check_reorder_points(db, ws, plan)
+    assert (suggestion["projected_stock"], suggestion["suggested_reorder"]) == (-1, 4)
+
+def test_mrp_reads_only_the_workspace_stock(db):
+    ws, other = uuid.uuid4(), uuid.uuid4()
+    mine, theirs = Product(workspace_id=ws, code="P", name="Mine"), Product(workspace_id=other, code="Q", name="Theirs")
+    warehouse = Warehouse(code="MAIN", name="Main")
+    db.add_all([mine, theirs, warehouse])
+    db.flush()
+    for product in (mine, theirs):
+        db.add(StockLedger(product_id=product.id, warehouse_id=warehouse.id, qty=4, unit_cost=1,
+                           reference_type=ReferenceType.ADJUSTMENT, created_at=datetime(2025, 1, 1)))
+    db.commit()
+    
+    balances = ValuationService.balances_at(db, ws, datetime(2025, 2, 1))
+    assert list(balances) == [(mine.id, warehouse.id)]
+    assert MRPService.run(db, ws, start=date(2025, 3, 3)).suggestions() == []
@@ -0,0 +1,196 @@
+import asyncio
+import json
+import uuid
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from app.api import notifications as notifications_api
+from app.core.database import Base, get_db
+from app.core.dependencies import AuthUser, get_current_user
+from app.core.websocket import manager
+from app.models.auth import Workspace, User
+from app.models.hr import Department, Employee
+from app.models.rbac import Role, user_roles
+from app.models.notifications import Notification, NotificationCounter, NotificationType
+from app.models.workflow import WorkflowExecution, ApprovalRequest
+from app.services.notification_service import NotificationService
+from tests.test_websocket import FakeSocket
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    tables = [Workspace.__table__, User.__table__, WorkflowExecution.__table__, ApprovalRequest.__table__,
+              Notification.__table__, NotificationCounter.__table__, Role.__table__, user_roles,
+              Department.__table__, Employee.__table__]
+    Base.metadata.create_all(engine, tables=tables)
+    return sessionmaker(bind=engine)()
+
+def _notify(db, workspace_id, user_id, title="t"):
+    return NotificationService.create_notification(db, workspace_id, user_id, NotificationType.SYSTEM_ALERT, title, "m")
+
+def _client(db, user):
+    """The notifications router, signed in as user"""
+    app = FastAPI()
+    app.include_router(notifications_api.router)
+    app.dependency_overrides[get_db] = lambda: db
+    app.dependency_overrides[get_current_user] = lambda: AuthUser(user.id, user.workspace_id, user.email)
+    return TestClient(app)
+
+def test_unread_counter_is_initialised_once_then_maintained(db):
+    ws, user, other = uuid.uuid4(), uuid.uuid4(), uuid.uuid4()
+    first = _notify(db, ws, user)
+    _notify(db, ws, user)
+    _notify(db, ws, other)
+    
+    assert NotificationService.get_unread_count(db, ws, user) == 2
+    third = _notify(db, ws, user)
+    assert NotificationService.mark_as_read(db, first.id, other) is None  # Not theirs
+    NotificationService.mark_as_read(db, first.id, user)
+    NotificationService.mark_as_read(db, first.id, user)  # Already read: no second decrement
+    assert db.get(NotificationCounter, user).unread_count == 2
+    assert NotificationService.get_unread_count(db, ws, user) == 2
+    
+    assert NotificationService.mark_all_as_read(db, ws, user) == 2
+    assert NotificationService.get_unread_count(db, ws, user) == 0
+    assert db.get(Notification, third.id).is_read
+
+def test_concurrent_first_read_keeps_the_counter_already_created(db, monkeypatch):
+    ws, user = uuid.uuid4(), uuid.uuid4()
+    _notify(db, ws, user)
+    # Another request created the counter between this one's lookup and its insert
+    db.add(NotificationCounter(user_id=user, workspace_id=ws, unread_count=3))
+    db.commit()
+    monkeypatch.setattr(db, "get", lambda *args, **kwargs: None)
+    
+    assert NotificationService.get_unread_count(db, ws, user) == 3
+    assert db.query(NotificationCounter).count() == 1
+
+def test_notifications_and_decisions_are_pushed_to_the_target_user(db):
+    ws, requester, approver = uuid.uuid4(), uuid.uuid4(), uuid.uuid4()
+    NotificationService.get_unread_count(db, ws, requester)
+    
+    async def scenario():
+        requester_socket, approver_socket = FakeSocket(), FakeSocket()
+        requester_conn = await manager.connect(requester_socket, str(ws), str(requester), "r@x")
+        approver_conn = await manager.connect(approver_socket, str(ws), str(approver), "a@x")
+        try:
+            approval = NotificationService.create_approval_request(db, ws, "PurchaseOrder", uuid.uuid4(), requester, approver)
+            NotificationService.approve_request(db, approval.id, approver, "ok")
+            for connection_id in (requester_conn, approver_conn):
+                await manager.user_sessions[connection_id].connection.drain()
+        finally:
+            manager.disconnect(requester_conn)
+            manager.disconnect(approver_conn)
+        
+        pushed = lambda sock: [m for m in map(json.loads, sock.received) if m["type"] == "notification"]
+        (to_approver,) = pushed(approver_socket)
+        (to_requester,) = pushed(requester_socket)
+        assert to_approver["notification"]["type"] == "approval_request"
+        assert to_approver["unread_count"] is None  # Counter not initialised for this user yet
+        assert to_requester["notification"]["title"] == "PurchaseOrder Approved"
+        assert to_requester["unread_count"] == 1
+    asyncio.run(scenario())
+
+def test_bulk_fan_out_to_role_and_department(db):
+    ws = uuid.uuid4()
+    users = [User(workspace_id=ws, email=f"u{i}@x", hashed_password="-") for i in range(6)]
+    approver_role, finance = Role(workspace_id=ws, name="approver"), Department(workspace_id=ws, code="FIN", name="Finance")
+    db.add_all(users + [approver_role, finance])
+    db.flush()
+    db.execute(user_roles.insert(), [{"user_id": u.id, "role_id": approver_role.id} for u in users[:3]])
+    db.add_all([Employee(workspace_id=ws, email=f"U{i}@X", department_id=finance.id) for i in (2, 3, 4)])
+    db.commit()
+    NotificationService.get_unread_count(db, ws, users[0].id)
+    
+    inactive = User(workspace_id=ws, email="gone@x", hashed_password="-", is_active=False)
+    foreign = User(workspace_id=uuid.uuid4(), email="other@y", hashed_password="-")
+    db.add_all([inactive, foreign])
+    db.commit()
+    explicit = [users[5].id, inactive.id, foreign.id, uuid.uuid4()]  # Only users[5] may be notified
+    recipients = NotificationService.resolve_recipients(db, ws, explicit, role="approver", department_id=finance.id)
+    assert set(recipients) == {u.id for u in users}
+    
+    async def scenario():
+        socket = FakeSocket()
+        connection_id = await manager.connect(socket, str(ws), str(users[4].id), "u4@x")
+        try:
+            count = NotificationService.create_notifications(
+                db, ws, recipients + recipients[:2], NotificationType.SYSTEM_ALERT, "Stocktake", "Friday"
+            )
+            await manager.user_sessions[connection_id].connection.drain()
+        finally:
+            manager.disconnect(connection_id)
+        (pushed,) = [m for m in map(json.loads, socket.received) if m["type"] == "notification"]
+        assert pushed["notification"]["title"] == "Stocktake" and pushed["unread_delta"] == 1
+        assert pushed["notification"]["id"] == str(db.query(Notification.id).filter_by(user_id=users[4].id).scalar())
+        return count
+    
+    assert asyncio.run(scenario()) == 6
+    assert db.query(Notification).count() == 6
+    assert NotificationService.get_unread_count(db, ws, users[0].id) == 1
+
+def test_only_admins_broadcast(db):
+    ws = uuid.uuid4()
+    admin = User(workspace_id=ws, email="admin@x", hashed_password="-", is_admin=True)
+    member = User(workspace_id=ws, email="member@x", hashed_password="-")
+    db.add_all([admin, member])
+    db.commit()
+    broadcast = {"user_ids": [str(admin.id), str(member.id)], "title": "Stocktake", "message": "Friday"}
+    
+    assert _client(db, member).post("/notifications/broadcast", json=broadcast).status_code == 403
+    assert db.query(Notification).count() == 0
+    response = _client(db, admin).post("/notifications/broadcast", json=broadcast)
+    assert response.status_code == 200 and response.json()["count"] == 2
+
+def test_decisions_on_legacy_approvals_notify_nobody(db):
+    ws, approver = uuid.uuid4(), uuid.uuid4()
+    legacy = ApprovalRequest(workspace_id=ws, document_type=None, document_id=uuid.uuid4(), approver_id=approver)
+    db.add(legacy)
+    db.commit()
+    
+    assert NotificationService.approve_request(db, legacy.id, approver, "ok").status == "approved"
+    assert NotificationService.reject_request(db, legacy.id, approver, "no").status == "rejected"
+    assert db.query(Notification).count() == 0
+
+def test_users_mark_only_their_own_notifications_read(db):
+    ws = uuid.uuid4()
+    owner = User(workspace_id=ws, email="owner@x", hashed_password="-")
+    intruder = User(workspace_id=ws, email="intruder@x", hashed_password="-")
+    db.add_all([owner, intruder])
+    db.commit()
+    notification = _notify(db, ws, owner.id)
+    
+    assert _client(db, intruder).post(f"/notifications/{notification.id}/mark-read").status_code == 404
+    assert not db.get(Notification, notification.id).is_read
+    assert _client(db, owner).post(f"/notifications/{notification.id}/mark-read").status_code == 200
+    db.expire_all()
+    assert db.get(Notification, notification.id).is_read
+
+def test_inbox_pages_by_keyset_cursor(db):
+    from datetime import datetime, timedelta
+    ws, user, other = uuid.uuid4(), uuid.uuid4(), uuid.uuid4()
+    base = datetime(2026, 1, 1)
+    # Pairs share a timestamp so the id tie-breaker matters
+    db.add_all([Notification(workspace_id=ws, user_id=user, title=str(i), message="m", is_read=i % 3 == 0,
+                             created_at=base + timedelta(seconds=i // 2)) for i in range(25)])
+    db.add(Notification(workspace_id=ws, user_id=other, title="x", message="m", created_at=base))
+    db.commit()
+    
+    seen, cursor = [], None
+    while True:
+        page, cursor = NotificationService.list_notifications(db, user, limit=4, cursor=cursor)
+        seen += page
+        if cursor is None:
+            break
+    assert len(seen) == 25 and len({n.id for n in seen}) == 25
+    assert [(n.created_at, n.id) for n in seen] == sorted(((n.created_at, n.id) for n in seen), reverse=True)
+    
+    unread, _ = NotificationService.list_notifications(db, user, limit=100, unread_only=True)
+    assert len(unread) == 16 and not any(n.is_read for n in unread)
+    newer, cursor = NotificationService.list_notifications(db, user, since=base + timedelta(seconds=10))
+    assert {n.title for n in newer} == {"22", "23", "24"} and cursor is None
+    with pytest.raises(ValueError):
+        NotificationService.list_notifications(db, user, cursor="not-a-cursor")
@@ -0,0 +1,103 @@
+import uuid
+from datetime import date, datetime
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app.core.database import Base
+from app.models.auth import Workspace
+from app.models.accounting import Partner
+from app.models.inventory import Product
+from app.models.manufacturing import JobOrder, JobOrderStatus, ProductionSchedule, WorkCenter, WorkCenterException
+from app.services.scheduling_service import CapacityCalendar, SchedulingService
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://")
+    tables = [Workspace.__table__, Partner.__table__, Product.__table__, WorkCenter.__table__,
+              WorkCenterException.__table__, ProductionSchedule.__table__, JobOrder.__table__]
+    Base.metadata.create_all(engine, tables=tables)
+    return sessionmaker(bind=engine)()
+
+MONDAY = datetime(2025, 3, 3, 8)
+
+def test_calendar_skips_weekends_and_holidays():
+    calendar = CapacityCalendar([8, 8, 8, 8, 8, 0, 0], {date(2025, 3, 10): 0}, date(2025, 3, 7))  # A Friday
+    assert calendar.to_datetime(8) == datetime(2025, 3, 11, 8)  # Friday used up; Monday is a holiday
+    assert calendar.to_datetime(8, end=True) == datetime(2025, 3, 7, 16)
+    assert calendar.to_offset(datetime(2025, 3, 11, 10, 30)) == 10.5
+
+def test_schedule_then_reschedule_one_order(db):
+    ws = uuid.uuid4()
+    a = WorkCenter(workspace_id=ws, code="A", name="Lathe", weekly_hours=[8, 8, 8, 8, 8, 0, 0])
+    b = WorkCenter(workspace_id=ws, code="B", name="Mill", weekly_hours=[4, 4, 4, 4, 4, 0, 0])
+    db.add_all([a, b])
+    db.flush()
+    db.add(WorkCenterException(work_center_id=b.id, day=date(2025, 3, 4), hours=0))
+    
+    def job(number, hours, due, center=None):
+        order = JobOrder(workspace_id=ws, jo_number=number, processing_hours=hours, due_date=due, work_center_id=center)
+        db.add(order)
+        return order
+    
+    j1 = job("J1", 8, datetime(2025, 3, 4, 17))
+    j2 = job("J2", 4, datetime(2025, 3, 3, 17))
+    j3 = job("J3", 6, datetime(2025, 3, 10, 17), b.id)
+    j4 = job("J4", 10, datetime(2025, 3, 5, 12))
+    db.commit()
+    
+    report = SchedulingService.schedule(db, ws, start=MONDAY)
+    assert (report["scheduled"], report["makespan_hours"], report["late"], report["on_time_rate"]) == (4, 54.0, 1, 0.75)
+    timeline = lambda order: (order.assigned_work_center_id, order.start_date, order.end_date)
+    # EDD: J2, J1 and J4 all finish first on A; J3 is pinned to B, whose Tuesday is a holiday
+    assert timeline(j2) == (a.id, MONDAY, datetime(2025, 3, 3, 12))
+    assert timeline(j1) == (a.id, datetime(2025, 3, 3, 12), datetime(2025, 3, 4, 12))
+    assert timeline(j4) == (a.id, datetime(2025, 3, 4, 12), datetime(2025, 3, 5, 14))
+    assert timeline(j3) == (b.id, MONDAY, datetime(2025, 3, 5, 10))
+    assert j1.status == JobOrderStatus.SCHEDULED
+    
+    # J2 shrinks: everything behind it on A moves up, B is untouched, J4 is now on time
+    report = SchedulingService.reschedule(db, j2.id, processing_hours=2)
+    assert (report["moved"], report["late"], report["on_time_rate"]) == (3, 0, 1.0)
+    db.expire_all()
+    assert timeline(j4) == (a.id, datetime(2025, 3, 4, 10), datetime(2025, 3, 5, 12))
+    assert timeline(j3) == (b.id, MONDAY, datetime(2025, 3, 5, 10))
+    
+    # A later due date moves J2 to the back of A's sequence
+    SchedulingService.reschedule(db, j2.id, due_date=datetime(2025, 3, 6, 17))
+    db.expire_all()
+    assert timeline(j1) == (a.id, MONDAY, datetime(2025, 3, 3, 16))
+    assert timeline(j2) == (a.id, datetime(2025, 3, 5, 10), datetime(2025, 3, 5, 12))
+
+def test_reschedule_keeps_the_rule_and_start_of_the_schedule(db):
+    ws = uuid.uuid4()
+    center = WorkCenter(workspace_id=ws, code="A", name="Lathe", weekly_hours=[8, 8, 8, 8, 8, 0, 0])
+    short = JobOrder(workspace_id=ws, jo_number="S", processing_hours=2, due_date=datetime(2025, 3, 4, 17))
+    long = JobOrder(workspace_id=ws, jo_number="L", processing_hours=20, due_date=datetime(2025, 3, 6, 17))
+    db.add_all([center, short, long])
+    db.commit()
+    
+    # Critical ratio at Monday 08:00: L has 81 h for 20 h of work, S 33 h for 2 h, so L runs first
+    SchedulingService.schedule(db, ws, start=MONDAY, rule="cr")
+    assert db.get(ProductionSchedule, ws).rule == "cr"
+    SchedulingService.reschedule(db, short.id, processing_hours=3)
+    db.expire_all()
+    timeline = [(order.start_date, order.end_date) for order in (long, short)]
+    assert timeline == [(MONDAY, datetime(2025, 3, 5, 12)), (datetime(2025, 3, 5, 12), datetime(2025, 3, 5, 15))]
+    SchedulingService.schedule(db, ws, start=MONDAY, rule="cr")
+    db.expire_all()
+    assert [(order.start_date, order.end_date) for order in (long, short)] == timeline
+
+def test_reschedule_refuses_another_workspaces_work_center(db):
+    ws = uuid.uuid4()
+    own = WorkCenter(workspace_id=ws, code="A", name="Lathe", weekly_hours=[8, 8, 8, 8, 8, 0, 0])
+    foreign = WorkCenter(workspace_id=uuid.uuid4(), code="B", name="Mill", weekly_hours=[8, 8, 8, 8, 8, 0, 0])
+    order = JobOrder(workspace_id=ws, jo_number="J", processing_hours=4, due_date=datetime(2025, 3, 4, 17))
+    db.add_all([own, foreign, order])
+    db.commit()
+    SchedulingService.schedule(db, ws, start=MONDAY)
+    
+    with pytest.raises(ValueError, match="Work center not found"):
+        SchedulingService.reschedule(db, order.id, work_center_id=foreign.id)
+    db.rollback()
+    assert db.get(JobOrder, order.id).assigned_work_center_id == own.id
+
@@ -0,0 +1,51 @@
+import uuid
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from app.core.database import Base
+from app.models.auth import Workspace
+from app.models.inventory import Product, Warehouse
+from app.models.advanced_inventory import SerialNumber
+from app.services.advanced_inventory_service import AdvancedInventoryService
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://")
+    tables = [Workspace.__table__, Product.__table__, Warehouse.__table__, SerialNumber.__table__]
+    Base.metadata.create_all(engine, tables=tables)
+    return sessionmaker(bind=engine)()
+
+def test_bulk_registration_checks_uniqueness_once(db):
+    ws = uuid.uuid4()
+    product = Product(code="PHONE", name="Phone", workspace_id=ws)
+    db.add(product)
+    db.commit()
+    assert AdvancedInventoryService.serial_range("SN-", 998, 3, width=4) == ["SN-0998", "SN-0999", "SN-1000"]
+    for count, width in ((10 ** 9, 0), (3, 10 ** 6)):
+        with pytest.raises(ValueError):
+            AdvancedInventoryService.serial_range("SN-", 1, count, width)  # Refused before any list is built
+    AdvancedInventoryService.create_serial_number(db, ws, product.id, "SN-0500")
+    product_id = product.id
+    
+    statements = []
+    event.listen(db.get_bind(), "before_cursor_execute", lambda *args: statements.append(args[2]))
+    serials = AdvancedInventoryService.serial_range("SN-", 1, 600, width=4)
+    with pytest.raises(ValueError, match="1 serial numbers already exist: SN-0500"):
+        AdvancedInventoryService.create_serial_numbers(db, ws, product_id, serials)
+    assert sum("FROM serial_numbers" in s for s in statements) == 1
+    with pytest.raises(ValueError, match="Repeated serial numbers: A"):
+        AdvancedInventoryService.create_serial_numbers(db, ws, product_id, ["A", "B", "A"])
+    
+    statements.clear()
+    assert AdvancedInventoryService.create_serial_numbers(db, ws, product_id, serials[:299] + ["X-1"]) == 300
+    assert sum(s.startswith("INSERT") for s in statements) == 1  # One executemany call, not one INSERT per serial
+    available = AdvancedInventoryService.get_available_serials(db, ws, product_id)
+    assert len(available) == 301 and {sn.status for sn in available} == {"available"}
+
+def test_bulk_registration_refuses_another_workspaces_product(db):
+    product = Product(code="PHONE", name="Phone", workspace_id=uuid.uuid4())
+    db.add(product)
+    db.commit()
+    with pytest.raises(ValueError, match="Product not found"):
+        AdvancedInventoryService.create_serial_numbers(db, uuid.uuid4(), product.id, ["SN-1", "SN-2"])
+    assert db.query(SerialNumber).count() == 0
@@ -0,0 +1,204 @@
+import random
+from datetime import date
+from decimal import Decimal, ROUND_HALF_UP
+import numpy as np
+import pytest
+import uuid
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app.core.database import Base
+from app.models.auth import Workspace
+from app.models.currency_tax import TaxRate, TaxTransaction, TaxMonthlySummary
+from app.services.tax_service import TaxService, TaxRateIndex
+
+CENT = Decimal("0.01")
+SAMPLES = 2000
+
+def _q(value: Decimal) -> int:
+    """Scalar result rounded to cents, as an integer"""
+    return int(value.quantize(CENT, rounding=ROUND_HALF_UP) * 100)
+
+def _random_amounts(seed: int, upper: int = 10 ** 12):
+    """Random cent amounts, biased towards bracket edges and small values"""
+    rng = random.Random(seed)
+    edges = [0, 1, 5400000000, 6000000000, 11400000000, 25000000000, 30400000000, 554000000000]
+    amounts = []
+    for _ in range(SAMPLES):
+        pick = rng.random()
+        if pick < 0.2:
+            amounts.append(rng.choice(edges) + rng.randint(-3, 3))
+        elif pick < 0.5:
+            amounts.append(rng.randint(0, 100000))
+        else:
+            amounts.append(rng.randint(0, upper))
+    return [max(a, 0) for a in amounts]
+
+@pytest.mark.parametrize("include_tax", [False, True])
+def test_ppn_batch_matches_scalar(include_tax):
+    cents = _random_amounts(1) + [-12345, -1]
+    result = TaxService.calculate_ppn_batch(np.array(cents), include_tax)
+    
+    for i, c in enumerate(cents):
+        scalar = TaxService.calculate_ppn(Decimal(c).scaleb(-2), include_tax)
+        assert result["base_amount_cents"][i] == _q(scalar["base_amount"])
+        assert result["ppn_amount_cents"][i] == _q(scalar["ppn_amount"])
+        assert result["total_amount_cents"][i] == _q(scalar["total_amount"])
+
+def test_pph_21_batch_matches_scalar():
+    rng = random.Random(2)
+    cents = _random_amounts(2, upper=10 ** 13)
+    npwp = [rng.random() < 0.8 for _ in cents]
+    result = TaxService.calculate_pph_21_batch(np.array(cents), npwp)
+    
+    for i, c in enumerate(cents):
+        scalar = TaxService.calculate_pph_21(Decimal(c).scaleb(-2), npwp[i])
+        assert result["taxable_income_cents"][i] == _q(scalar["taxable_income"])
+        assert result["tax_amount_cents"][i] == _q(scalar["tax_amount"])
+
+def test_pph_21_batch_custom_ptkp():
+    incomes = np.array([10000000000, 10000000000])
+    ptkp = np.array([5400000000, 5850000000])
+    result = TaxService.calculate_pph_21_batch(incomes, ptkp_cents=ptkp)
+    
+    for i in range(2):
+        scalar = TaxService.calculate_pph_21(Decimal("100000000"), True, Decimal(int(ptkp[i])).scaleb(-2))
+        assert result["tax_amount_cents"][i] == _q(scalar["tax_amount"])
+
+def test_pph_23_batch_matches_scalar():
+    rng = random.Random(3)
+    cents = _random_amounts(3)
+    npwp = [rng.random() < 0.5 for _ in cents]
+    result = TaxService.calculate_pph_23_batch(np.array(cents), npwp)
+    
+    for i, c in enumerate(cents):
+        scalar = TaxService.calculate_pph_23(Decimal(c).scaleb(-2), npwp[i])
+        assert result["tax_amount_cents"][i] == _q(scalar["tax_amount"])
+        # Net is gross minus the rounded tax so posted amounts always balance
+        assert result["net_amount_cents"][i] == c - _q(scalar["tax_amount"])
+
+def test_pph_4_2_batch_matches_scalar():
+    rng = random.Random(4)
+    cents = _random_amounts(4)
+    types = [rng.choice(["construction", "rent", "other", "unknown"]) for _ in cents]
+    result = TaxService.calculate_pph_4_2_batch(np.array(cents), types)
+    
+    for i, c in enumerate(cents):
+        scalar = TaxService.calculate_pph_4_2(Decimal(c).scaleb(-2), types[i])
+        assert result["tax_amount_cents"][i] == _q(scalar["tax_amount"])
+        # Net is gross minus the rounded tax so posted amounts always balance
+        assert result["net_amount_cents"][i] == c - _q(scalar["tax_amount"])
+
+def test_to_cents_rejects_sub_cent_amounts():
+    assert TaxService.to_cents([Decimal("1.25"), "3", 4]).tolist() == [125, 300, 400]
+    with pytest.raises(ValueError):
+        TaxService.to_cents([Decimal("1.005")])
+
+def test_batch_rejects_out_of_range_amounts():
+    with pytest.raises(ValueError):
+        TaxService.calculate_ppn_batch(np.array([TaxService.MAX_BATCH_CENTS + 1]))
+
+def test_ppn_batch_with_custom_rate_matches_scalar():
+    cents = _random_amounts(5)
+    rate = Decimal("12.00")
+    result = TaxService.calculate_ppn_batch(np.array(cents), False, rate)
+    
+    for i, c in enumerate(cents):
+        scalar = TaxService.calculate_ppn(Decimal(c).scaleb(-2), False, rate)
+        assert result["ppn_amount_cents"][i] == _q(scalar["ppn_amount"])
+
+def test_pph_23_batch_with_custom_rate_matches_scalar():
+    cents = _random_amounts(6)
+    npwp = [i % 2 == 0 for i in range(len(cents))]
+    rate = Decimal("1.75")
+    result = TaxService.calculate_pph_23_batch(np.array(cents), npwp, rate)
+    
+    for i, c in enumerate(cents):
+        scalar = TaxService.calculate_pph_23(Decimal(c).scaleb(-2), npwp[i], rate)
+        assert result["tax_amount_cents"][i] == _q(scalar["tax_amount"])
+
+def test_tax_rate_index_resolves_effective_dated_rates():
+    index = TaxRateIndex([
+        TaxRate(tax_type="ppn", rate_percentage=Decimal("10.00"),
+                effective_from=date(2010, 1, 1), effective_to=date(2022, 3, 31)),
+        TaxRate(tax_type="ppn", rate_percentage=Decimal("11.00"),
+                effective_from=date(2022, 4, 1)),
+        TaxRate(tax_type="pph_23", rate_percentage=Decimal("2.00"),
+                effective_from=date(2020, 1, 1), effective_to=date(2020, 12, 31)),
+    ])
+    
+    assert index.rate_for("ppn", date(2009, 12, 31)) is None
+    assert index.rate_for("ppn", date(2022, 3, 31)) == Decimal("10.00")
+    assert index.rate_for("ppn", date(2022, 4, 1)) == Decimal("11.00")
+    assert index.rate_for("ppn", date(2030, 1, 1)) == Decimal("11.00")
+    assert index.rate_for("pph_23", date(2021, 1, 1)) is None
+    assert index.rate_for("pph_21", date(2021, 1, 1)) is None
+
+def test_tax_rate_index_falls_back_when_the_newest_rate_expired():
+    index = TaxRateIndex([
+        TaxRate(tax_type="ppn", rate_percentage=Decimal("11.00"), effective_from=date(2022, 4, 1)),
+        TaxRate(tax_type="ppn", rate_percentage=Decimal("12.00"),
+                effective_from=date(2025, 1, 1), effective_to=date(2025, 1, 31)),
+    ])
+    
+    assert index.rate_for("ppn", date(2025, 1, 15)) == Decimal("12.00")
+    assert index.rate_for("ppn", date(2025, 2, 1)) == Decimal("11.00")
+    assert index.rate_for("ppn", date(2022, 3, 31)) is None
+
+@pytest.fixture
+def tax_db():
+    """In-memory database with just the tax tables"""
+    engine = create_engine("sqlite://")
+    tables = [Workspace.__table__, TaxRate.__table__, TaxTransaction.__table__, TaxMonthlySummary.__table__]
+    Base.metadata.create_all(engine, tables=tables)
+    db = sessionmaker(bind=engine)()
+    try:
+        yield db
+    finally:
+        db.close()
+
+def test_batch_recorder_inserts_rows_and_maintains_monthly_summary(tax_db):
+    workspace_id = uuid.uuid4()
+    TaxService.seed_tax_rates(tax_db, workspace_id)
+    tax_date = date(2025, 3, 15)
+    
+    TaxService.create_tax_transaction(
+        tax_db, workspace_id, "SO", uuid.uuid4(), "ppn", Decimal("1000.00"), npwp="0123", tax_date=tax_date
+    )
+    with TaxService.batch_recorder(tax_db, workspace_id) as taxes:
+        for i in range(1500):
+            taxes.add_document_taxes(
+                "INVOICE", uuid.uuid4(), {"ppn": Decimal("100.00"), "pph_23": Decimal("50.00")},
+                npwp="0123" if i % 2 else None, tax_date=tax_date
+            )
+    tax_db.commit()
+    
+    assert tax_db.query(TaxTransaction).count() == 3001
+    summary = {
+        (r["tax_type"], r["npwp"]): r
+        for r in TaxService.get_monthly_tax_summary(tax_db, workspace_id, 2025, 3)
+    }
+    assert summary[("ppn", "0123")]["transaction_count"] == 751
+    assert summary[("ppn", "0123")]["tax_amount_total"] == Decimal("8360.00")
+    assert summary[("pph_23", None)]["tax_amount_total"] == Decimal("750.00")
+    assert TaxService.get_monthly_tax_summary(tax_db, workspace_id, 2025, 4) == []
+
+def test_monthly_summary_rebuilds_from_existing_transactions(tax_db):
+    workspace_id = uuid.uuid4()
+    TaxService.seed_tax_rates(tax_db, workspace_id)
+    for day, npwp in [(3, "0123"), (20, "0123"), (28, None)]:
+        TaxService.create_tax_transaction(
+            tax_db, workspace_id, "SO", uuid.uuid4(), "ppn", Decimal("1000.00"), npwp=npwp, tax_date=date(2025, 3, day)
+        )
+    TaxService.create_tax_transaction(
+        tax_db, workspace_id, "PO", uuid.uuid4(), "pph_23", Decimal("500.00"), tax_date=date(2025, 4, 1)
+    )
+    expected = [TaxService.get_monthly_tax_summary(tax_db, workspace_id, 2025, m) for m in (3, 4)]
+    assert [r["transaction_count"] for r in expected[0]] == [1, 2]  # No NPWP, then 0123
+    
+    # Summary rows lost (or never written, as for transactions recorded before it existed)
+    tax_db.query(TaxMonthlySummary).delete()
+    tax_db.commit()
+    assert TaxService.backfill_monthly_summary(tax_db) == 3
+    assert [TaxService.get_monthly_tax_summary(tax_db, workspace_id, 2025, m) for m in (3, 4)] == expected
+    assert TaxService.backfill_monthly_summary(tax_db) == 0
+    assert TaxService.rebuild_monthly_summary(tax_db, workspace_id) == 3
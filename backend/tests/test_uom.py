@@ -0,0 +1,45 @@
+import uuid
+from decimal import Decimal
+from types import SimpleNamespace
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app.core.database import Base
+from app.models.auth import Workspace
+from app.models.inventory import Product, UOMConversion
+from app.services.uom_service import UOMGraph, UOMService
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine, tables=[Workspace.__table__, Product.__table__, UOMConversion.__table__])
+    return sessionmaker(bind=engine)()
+
+def test_multi_hop_conversions_resolve_in_both_directions():
+    product = uuid.uuid4()
+    # No direct BOX -> PCS row, and PAIR is only defined towards the base unit
+    graph = UOMGraph({product: "pcs"}, [
+        (product, "BOX", "PACK", Decimal("4")), (product, "PACK", "PCS", Decimal("3")),
+        (product, "PAIR", "PCS", Decimal("2")), (product, "KG", "G", Decimal("1000"))
+    ])
+    assert graph.ratio(product, "box") == 12 and graph.ratio(product, "PAIR") == 2
+    assert graph.ratio(product, None) == 1 and graph.ratio(uuid.uuid4(), "BOX") == 1  # Unknown product: no base UOM
+    assert graph.convert(product, Decimal("1"), "PCS", "BOX") * 12 == 1
+    assert graph.convert(product, Decimal("3"), "BOX", "PAIR") == 18
+    with pytest.raises(ValueError, match="No conversion from KG to PCS"):
+        graph.ratio(product, "KG")
+
+def test_document_lines_convert_to_base_uom_in_one_call(db):
+    bolt = Product(code="BOLT", name="Bolt", uom="PCS")
+    oil = Product(code="OIL", name="Oil", uom="L")
+    db.add_all([bolt, oil])
+    db.flush()
+    db.add_all([UOMConversion(product_id=bolt.id, from_uom="BOX", to_uom="PACK", ratio=10),
+                UOMConversion(product_id=bolt.id, from_uom="PACK", to_uom="PCS", ratio=12),
+                UOMConversion(product_id=oil.id, from_uom="L", to_uom="ML", ratio=1000)])
+    db.commit()
+    
+    lines = [SimpleNamespace(product_id=bolt.id, qty=Decimal(2), uom="BOX", unit_price=Decimal(60)),
+             SimpleNamespace(product_id=oil.id, qty=Decimal(500), uom="ML", unit_price=Decimal("0.01")),
+             SimpleNamespace(product_id=bolt.id, qty=Decimal(7), uom="PCS", unit_price=Decimal("0.5"))]
+    assert UOMService.to_base(db, lines) == [(240, Decimal("0.5")), (Decimal("0.5"), 10), (7, Decimal("0.5"))]
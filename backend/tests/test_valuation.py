@@ -0,0 +1,68 @@
+import uuid
+from datetime import datetime, timedelta
+from decimal import Decimal
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app.core.database import Base
+from app.models.auth import Workspace
+from app.models.inventory import Product, Warehouse, ValuationMethod
+from app.models.ledger import StockLedger, StockCostLayer, StockCostPosition, StockSnapshot, ReferenceType
+from app.services.costing_service import CostingService
+from app.services.valuation_service import ValuationService
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://")
+    tables = [Workspace.__table__, Product.__table__, Warehouse.__table__, StockLedger.__table__,
+              StockCostLayer.__table__, StockCostPosition.__table__, StockSnapshot.__table__]
+    Base.metadata.create_all(engine, tables=tables)
+    return sessionmaker(bind=engine)()
+
+START = datetime(2025, 1, 1)
+
+def _post(db, product, warehouse, day, qty, unit_cost=None):
+    CostingService.post_movement(db, StockLedger(
+        product_id=product.id, warehouse_id=warehouse.id, qty=Decimal(qty), uom_used="PCS",
+        unit_cost=None if unit_cost is None else Decimal(unit_cost),
+        reference_type=ReferenceType.ADJUSTMENT, reference_id=uuid.uuid4(),
+        created_at=START + timedelta(days=day)
+    ))
+    db.commit()
+
+def test_valuation_from_snapshots_matches_full_ledger(db):
+    workspace = uuid.uuid4()
+    bolt = Product(workspace_id=workspace, code="BOLT", name="Bolt", uom="PCS", valuation_method=ValuationMethod.FIFO)
+    nut = Product(workspace_id=workspace, code="NUT", name="Nut", uom="PCS", valuation_method=ValuationMethod.AVERAGE)
+    main, spare = Warehouse(code="MAIN", name="Main"), Warehouse(code="SPARE", name="Spare")
+    db.add_all([bolt, nut, main, spare])
+    db.commit()
+    for day, product, warehouse, qty, cost in [
+        (1, bolt, main, 10, 2), (2, nut, main, 20, 1), (5, bolt, main, -4, None), (9, bolt, spare, 5, 3),
+        (12, nut, main, -20, None), (15, bolt, main, 6, 4), (18, bolt, main, -8, None), (25, nut, spare, 7, 2)
+    ]:
+        _post(db, product, warehouse, day, qty, cost)
+    
+    dates = [START + timedelta(days=d, hours=12) for d in (0, 4, 10, 16, 30)]
+    full = [ValuationService.inventory_valuation(db, workspace, as_of) for as_of in dates]
+    assert full[0] == []
+    assert ValuationService.close_period(db, workspace, START + timedelta(days=7)) == 2
+    assert ValuationService.close_period(db, workspace, START + timedelta(days=14)) == 2  # Nut in MAIN ran out
+    # Another workspace closing the same instant leaves these snapshots alone
+    assert ValuationService.close_period(db, uuid.uuid4(), START + timedelta(days=14)) == 0
+    assert db.query(StockSnapshot).filter_by(workspace_id=workspace).count() == 4
+    with pytest.raises(ValueError, match="future"):
+        ValuationService.close_period(db, workspace, datetime.now() + timedelta(days=1))
+    assert [ValuationService.inventory_valuation(db, workspace, as_of) for as_of in dates] == full
+    assert full[-1] == [
+        {"product_id": str(bolt.id), "code": "BOLT", "name": "Bolt", "quantity": 9.0, "value": 31.0},
+        {"product_id": str(nut.id), "code": "NUT", "name": "Nut", "quantity": 7.0, "value": 14.0},
+    ]
+    by_warehouse = ValuationService.inventory_valuation(db, workspace, dates[-1], spare.id)
+    assert [(r["code"], r["quantity"]) for r in by_warehouse] == [("BOLT", 5.0), ("NUT", 7.0)]
+    
+    # A rebuild that reprices an issue drops the snapshots it made stale
+    db.query(StockLedger).filter(StockLedger.qty < 0).update({"unit_cost": 0})
+    db.commit()
+    assert CostingService.rebuild(db) == 3
+    assert db.query(StockSnapshot).count() == 0
@@ -0,0 +1,154 @@
+import asyncio
+import json
+from app.core.pubsub import InMemoryBackplane
+from app.core.websocket import ConnectionManager
+
+class FakeSocket:
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.received = []
+        self.blocked = asyncio.Event()
+        self.blocked.set()
+    
+    async def accept(self):
+        pass
+    
+    async def send_text(self, text: str):
+        await self.blocked.wait()
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        self.received.append(text)
+
+async def _connect(manager, count, workspace_id="ws1"):
+    sockets = [FakeSocket() for _ in range(count)]
+    ids = [await manager.connect(s, workspace_id, f"u{i}", f"u{i}@x") for i, s in enumerate(sockets)]
+    return sockets, ids
+
+def test_broadcast_serializes_once_and_reaches_everyone():
+    async def scenario():
+        manager = ConnectionManager()
+        sockets, ids = await _connect(manager, 50)
+        await asyncio.sleep(0.01)
+        for s in sockets:
+            s.received.clear()
+        
+        assert manager.broadcast_to_workspace_sync("ws1", {"type": "doc", "n": 1}) == 50
+        for conn in manager.active_connections["ws1"].values():
+            await conn.drain()
+        payloads = [s.received[-1] for s in sockets]
+        assert json.loads(payloads[0]) == {"type": "doc", "n": 1}
+        assert len({id(p) for p in payloads}) == 1  # One shared serialized frame
+        for connection_id in ids:
+            manager.disconnect(connection_id)
+        assert manager.active_connections == {}
+    asyncio.run(scenario())
+
+def test_session_indexes_follow_connect_and_disconnect():
+    async def scenario():
+        manager = ConnectionManager()
+        tabs = [FakeSocket(), FakeSocket()]
+        first, second = [await manager.connect(s, "ws1", "u1", "u1@x") for s in tabs]
+        other = await manager.connect(FakeSocket(), "ws2", "u2", "u2@x")
+        
+        assert manager.count_online_users("ws1") == 1  # Two tabs, one user
+        assert len(manager.get_online_users("ws1")) == 2
+        await manager.send_personal_message({"type": "hi"}, tabs[1])
+        await manager.user_sessions[second].connection.drain()
+        assert json.loads(tabs[1].received[-1]) == {"type": "hi"}
+        
+        manager.disconnect(first)
+        assert manager.count_online_users("ws1") == 1
+        manager.disconnect(second)
+        manager.disconnect(second)  # Repeated disconnect is a no-op
+        assert manager.count_online_users("ws1") == 0 and manager.get_online_users("ws1") == []
+        assert list(manager.user_sessions) == [other]
+        assert list(manager.sessions_by_websocket.values()) == [manager.user_sessions[other]]
+        manager.disconnect(other)
+        assert manager.workspace_users == {} and manager.active_connections == {}
+    asyncio.run(scenario())
+
+def test_slow_client_does_not_stall_others_and_is_coalesced():
+    async def scenario():
+        manager = ConnectionManager(max_queue=4)
+        (fast, slow), (fast_id, slow_id) = await _connect(manager, 2)
+        await asyncio.sleep(0.01)
+        slow.blocked.clear()  # Client stops reading
+        
+        for i in range(100):
+            await manager.broadcast_to_workspace("ws1", {"type": "cursor_moved", "x": i}, coalesce_key=("cursor", "a"))
+            await manager.broadcast_to_workspace("ws1", {"type": "doc", "n": i})
+            await asyncio.sleep(0)
+        await manager.active_connections["ws1"][fast_id].drain()
+        
+        slow_conn = manager.active_connections["ws1"][slow_id]
+        assert len([m for m in fast.received if '"doc"' in m]) == 100
+        assert len(slow_conn.pending) <= 4
+        assert slow_conn.dropped > 0 and slow_conn.coalesced > 0
+        
+        slow.blocked.set()
+        await slow_conn.drain()
+        # After catching up the slow client holds the newest state, not a backlog
+        assert json.loads(slow.received[-1])["n"] == 99
+        stats = manager.get_connection_stats("ws1")
+        assert stats["connections"] == 2 and stats["queued"] == 0
+    asyncio.run(scenario())
+
+def test_cursor_updates_coalesce_per_tick_and_inbound_is_rate_limited():
+    async def scenario():
+        manager = ConnectionManager()
+        sockets, (mover, watcher) = await _connect(manager, 2)
+        await asyncio.sleep(0)
+        
+        # 20 users x 60 Hz mouse moves for 0.2 s
+        for frame in range(12):
+            for user in range(20):
+                manager.broadcast_ephemeral("ws1", {"type": "cursor_moved", "user": user, "x": frame},
+                                            ("cursor", user), exclude_websocket=sockets[0])
+            await asyncio.sleep(1 / 60)
+        await asyncio.sleep(manager.EPHEMERAL_TICK * 2)
+        await manager.user_sessions[watcher].connection.drain()
+        
+        assert manager.ephemeral_received == 240
+        assert manager.ephemeral_broadcast * 2 <= manager.ephemeral_received
+        latest = {}
+        for frame in map(json.loads, sockets[1].received):
+            if frame["type"] == "cursor_moved":
+                latest[frame["user"]] = frame["x"]
+        assert latest == {user: 11 for user in range(20)}  # Everyone ends on the newest position
+        assert not any('"cursor_moved"' in m for m in sockets[0].received)
+        
+        allowed = sum(manager.allow_inbound(mover) for _ in range(200))
+        assert allowed == manager.INBOUND_BURST
+        assert manager.get_connection_stats("ws1")["rate_limited"] == 200 - allowed
+    asyncio.run(scenario())
+
+def test_backplane_reaches_other_workers_and_shares_presence():
+    async def scenario():
+        backplane = InMemoryBackplane()
+        worker_a, worker_b = ConnectionManager(backplane=backplane), ConnectionManager(backplane=backplane)
+        await worker_a.start()
+        await worker_b.start()
+        (on_a,), (a_id,) = await _connect(worker_a, 1)
+        on_b = FakeSocket()
+        b_id = await worker_b.connect(on_b, "ws1", "u9", "u9@x")
+        await asyncio.sleep(0)
+        
+        await worker_a.broadcast_to_workspace("ws1", {"type": "cursor_moved", "x": 1}, coalesce_key=("cursor", "u0@x"))
+        await worker_b.active_connections["ws1"][b_id].drain()
+        assert json.loads(on_b.received[-1]) == {"type": "cursor_moved", "x": 1}
+        assert [json.loads(m)["type"] for m in on_a.received] == ["user_connected", "cursor_moved"]
+        
+        users = await worker_b.get_workspace_presence("ws1")
+        assert sorted(u["user_email"] for u in users) == ["u0@x", "u9@x"]
+        
+        # A worker that stops heartbeating loses its sessions once the TTL passes
+        worker_a.SESSION_TTL = 0.0
+        await worker_a.heartbeat_once()
+        assert [u["user_email"] for u in await worker_b.get_workspace_presence("ws1")] == ["u9@x"]
+        
+        worker_b.disconnect(b_id)
+        await asyncio.sleep(0)
+        assert await worker_a.get_workspace_presence("ws1") == []
+        await worker_a.stop()
+        await worker_b.stop()
+    asyncio.run(scenario())
@@ -0,0 +1,63 @@
+import uuid
+import pytest
+from app.services.workflow_expressions import ExpressionError, compile_expression
+from app.services.workflow_graph import compile_flow
+from app.services.workflow_service import WorkflowEngine
+
+@pytest.mark.parametrize("source, context, expected", [
+    ("Amount > 10M?", {"amount": 15000000}, True),
+    ("Amount > 10M?", {"amount": 10000000}, False),
+    ("amount >= 1.5k and status == 'approved'", {"amount": 1500, "status": "approved"}, True),
+    ("amount >= 1.5k and status == 'approved'", {"amount": 1500, "status": "draft"}, False),
+    ("not (qty < 0) or urgent", {"qty": -1, "urgent": True}, True),
+    ("0 < qty * price <= 100", {"qty": 4, "price": 25}, True),
+    ("warehouse in ('WH1', 'WH2')", {"warehouse": "WH3"}, False),
+    ("po.partner.code == 'S-10M'", {"po": {"partner": {"code": "S-10M"}}}, True),
+    ("amount > 100", {}, False),
+    ("", {}, True),
+])
+def test_expressions_evaluate_against_context(source, context, expected):
+    assert bool(compile_expression(source)(context)) is expected
+
+@pytest.mark.parametrize("source", [
+    "__import__('os').system('true')",
+    "amount.__class__",
+    "[x for x in items]",
+    "amount ** 1000000",
+    "lambda: 1",
+    "amount >",
+])
+def test_unsafe_or_invalid_expressions_are_rejected(source):
+    with pytest.raises(ExpressionError):
+        compile_expression(source)
+
+@pytest.mark.parametrize("source, context", [
+    ("'x' * 1T == ''", {}),
+    ("name * count > 0", {"name": "x", "count": 10 ** 12}),
+    ("items * 10M", {"items": [1]}),
+    ("'%099999999d' % 1", {}),
+    ("amount * amount * amount > 0", {"amount": 10 ** 90}),
+])
+def test_repetition_and_oversized_products_are_refused(source, context):
+    with pytest.raises(ExpressionError):
+        compile_expression(source)(context)
+
+def test_template_condition_branches_on_amount():
+    template = WorkflowEngine.get_workflow_templates()[0]["template_data"]
+    
+    def run(amount):
+        steps = []
+        compiled = compile_flow(
+            uuid.uuid4(), 1, template, {"approval": lambda db, d, c: "requested", "action": lambda db, d, c: "done"},
+            WorkflowEngine.node_factories()
+        )
+        compiled.run(None, {"amount": amount}, lambda node, *_: steps.append(node.data["label"]))
+        return steps
+    
+    assert run(25000000) == ["Amount > 10M?", "Manager Approval"]
+    assert run(500000) == ["Amount > 10M?", "Auto-approve"]
+
+def test_plain_labels_keep_passing_explicit_conditions_must_compile():
+    assert WorkflowEngine._compile_condition({"label": "Check stock"})(None, {}, {}) is True
+    with pytest.raises(ExpressionError):
+        WorkflowEngine._compile_condition({"condition": "open("})
@@ -0,0 +1,66 @@
+import uuid
+import pytest
+from app.services.workflow_graph import compile_flow
+from app.services.workflow_service import WorkflowEngine
+
+def _recording_handlers(condition_result=True):
+    calls = []
+    
+    def record(db, data, context):
+        calls.append(data["label"])
+        return data["label"]
+    
+    def condition(db, data, context):
+        calls.append(data["label"])
+        return condition_result
+    
+    return calls, {"trigger": record, "action": record, "approval": record, "condition": condition}
+
+def _node(node_id, node_type, label):
+    return {"id": node_id, "type": node_type, "data": {"label": label}}
+
+def test_condition_follows_matching_branch():
+    template = WorkflowEngine.get_workflow_templates()[0]["template_data"]
+    
+    calls, handlers = _recording_handlers(condition_result=True)
+    compile_flow(uuid.uuid4(), 1, template, handlers).run(None, {})
+    assert calls == ["PO Created", "Amount > 10M?", "Manager Approval"]
+    
+    calls, handlers = _recording_handlers(condition_result=False)
+    compile_flow(uuid.uuid4(), 1, template, handlers).run(None, {})
+    assert calls == ["PO Created", "Amount > 10M?", "Auto-approve"]
+
+def test_fan_out_runs_every_branch_and_join_runs_once():
+    flow = {
+        "nodes": [_node("join", "action", "join"), _node("a", "action", "a"),
+                  _node("start", "trigger", "start"), _node("b", "action", "b")],
+        "edges": [{"source": "start", "target": "a"}, {"source": "start", "target": "b"},
+                  {"source": "a", "target": "join"}, {"source": "b", "target": "join"}]
+    }
+    calls, handlers = _recording_handlers()
+    compile_flow(uuid.uuid4(), 1, flow, handlers).run(None, {})
+    assert calls == ["start", "a", "b", "join"]
+
+def test_nodes_without_handler_are_passed_through():
+    flow = {
+        "nodes": [_node("1", "trigger", "t"), _node("2", "unknown", "u"), _node("3", "action", "x")],
+        "edges": [{"source": "1", "target": "2"}, {"source": "2", "target": "3"}]
+    }
+    calls, handlers = _recording_handlers()
+    del handlers["trigger"]
+    steps = []
+    compile_flow(uuid.uuid4(), 1, flow, handlers).run(None, {}, lambda node, *_: steps.append(node.node_id))
+    assert calls == ["x"]
+    assert steps == ["3"]
+
+def test_cycles_and_dangling_edges_are_rejected():
+    cyclic = {
+        "nodes": [_node("1", "action", "a"), _node("2", "action", "b")],
+        "edges": [{"source": "1", "target": "2"}, {"source": "2", "target": "1"}]
+    }
+    with pytest.raises(ValueError):
+        compile_flow(uuid.uuid4(), 1, cyclic, {})
+    
+    dangling = {"nodes": [_node("1", "action", "a")], "edges": [{"source": "1", "target": "9"}]}
+    with pytest.raises(ValueError):
+        compile_flow(uuid.uuid4(), 1, dangling, {})
@@ -0,0 +1,118 @@
+import asyncio
+import uuid
+from datetime import datetime, timedelta
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from app.core.database import Base
+from app.models.auth import Workspace, User
+from app.models.workflow import Workflow, WorkflowExecution, WorkflowExecutionStep, WorkflowNodeStats, WorkflowJob
+from app.services.workflow_service import WorkflowEngine
+from app.services.workflow_queue import WorkflowQueue, WorkflowWorkerPool
+
+FLOW = {
+    "nodes": [
+        {"id": "1", "type": "trigger", "data": {"label": "Start"}},
+        {"id": "2", "type": "action", "data": {"label": "Do", "action_type": "update_field"}}
+    ],
+    "edges": [{"id": "e1-2", "source": "1", "target": "2"}]
+}
+
+@pytest.fixture
+def session_factory():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    tables = [Workspace.__table__, User.__table__, Workflow.__table__,
+              WorkflowExecution.__table__, WorkflowExecutionStep.__table__,
+              WorkflowNodeStats.__table__, WorkflowJob.__table__]
+    Base.metadata.create_all(engine, tables=tables)
+    return sessionmaker(bind=engine)
+
+def _active_workflow(db, workspace_id=None):
+    workflow = WorkflowEngine.create_workflow(db, workspace_id or uuid.uuid4(), "wf", "", "manual", uuid.uuid4())
+    WorkflowEngine.update_flow_data(db, workflow.id, FLOW)
+    WorkflowEngine.activate_workflow(db, workflow.id)
+    return workflow
+
+def test_workspace_limit_holds_across_workers(session_factory):
+    db = session_factory()
+    busy, quiet = _active_workflow(db), _active_workflow(db)
+    for _ in range(5):
+        WorkflowEngine.enqueue_workflow(db, busy.id, "user")
+    WorkflowEngine.enqueue_workflow(db, quiet.id, "user")
+    
+    first = WorkflowQueue.claim(db, "w1", 1, per_workspace_limit=2)
+    assert [job.workspace_id for job in first] == [busy.workspace_id]
+    # A second worker sees the first one's running job and takes only the remaining slot
+    jobs = WorkflowQueue.claim(db, "w2", 4, per_workspace_limit=2)
+    by_workspace = [job.workspace_id for job in jobs]
+    assert by_workspace.count(busy.workspace_id) == 1
+    assert by_workspace.count(quiet.workspace_id) == 1
+    assert all(job.status == "running" and job.attempts == 1 for job in first + jobs)
+    assert WorkflowQueue.get_running_by_worker(db, busy.workspace_id) == {"w1": 1, "w2": 1}
+
+def test_worker_completes_jobs(session_factory):
+    db = session_factory()
+    workflow = _active_workflow(db)
+    for i in range(10):
+        WorkflowEngine.enqueue_workflow(db, workflow.id, "user", {"i": i})
+    
+    pool = WorkflowWorkerPool(concurrency=1, session_factory=session_factory)
+    job_ids = [job.id for job in WorkflowQueue.claim(db, pool.worker_id, 10)]
+    outcomes = [pool.process_job(job_id) for job_id in job_ids]
+    pool.stop()
+    
+    db.expire_all()
+    assert outcomes == ["completed"] * 10
+    assert WorkflowQueue.get_queue_depth(db) == {"done": 10}
+    assert db.get(Workflow, workflow.id).execution_count == 10
+    assert pool.metrics.snapshot()["completed"] == 10
+    assert db.query(WorkflowExecutionStep).count() == 10  # Trigger nodes have no handler
+    stats = {s["node_id"]: s for s in WorkflowEngine.get_node_stats(db, workflow.id)}
+    assert stats["2"]["run_count"] == 10 and stats["2"]["error_count"] == 0
+
+def test_compaction_drops_old_steps_and_jobs(session_factory):
+    db = session_factory()
+    workflow = _active_workflow(db)
+    old = asyncio.run(WorkflowEngine.execute_workflow(db, workflow.id, "user"))
+    recent = asyncio.run(WorkflowEngine.execute_workflow(db, workflow.id, "user"))
+    old.completed_at = datetime.now() - timedelta(days=45)
+    db.commit()
+    
+    assert WorkflowEngine.compact_execution_history(db, keep_days=30)["steps_deleted"] == 1
+    remaining = {s.execution_id for s in db.query(WorkflowExecutionStep).all()}
+    assert remaining == {recent.id}
+    assert db.query(WorkflowExecution).count() == 2
+    assert db.query(WorkflowNodeStats).filter_by(node_id="2").one().run_count == 2
+
+def test_failed_job_is_retried_with_backoff_then_failed(session_factory, monkeypatch):
+    def explode(db, node_data, context):
+        raise RuntimeError("boom")
+    monkeypatch.setattr(WorkflowEngine, "_execute_action", explode)
+    
+    db = session_factory()
+    workflow = _active_workflow(db)
+    WorkflowEngine.enqueue_workflow(db, workflow.id, "user")
+    pool = WorkflowWorkerPool(concurrency=1, session_factory=session_factory)
+    
+    outcomes = []
+    for attempt in range(3):
+        job = db.query(WorkflowJob).one()
+        job.run_after = datetime.now()  # Skip the backoff wait
+        db.commit()
+        (claimed,) = WorkflowQueue.claim(db, pool.worker_id, 1)
+        outcomes.append(pool.process_job(claimed.id))
+        db.expire_all()
+        if attempt == 0:
+            assert db.query(WorkflowJob).one().run_after > datetime.now()
+    pool.stop()
+    
+    assert outcomes == ["retried", "retried", "failed"]
+    execution = db.query(WorkflowExecution).one()
+    assert execution.status == "failed"
+    assert execution.error_message == "boom"
+    # Each attempt's trace survives the rollback of its partial writes
+    failed_steps = db.query(WorkflowExecutionStep).filter_by(status="error").all()
+    assert [s.node_id for s in failed_steps] == ["2"] * 3
+    assert sorted(s.attempt for s in failed_steps) == [1, 2, 3]  # Told apart although seq restarts
+    assert db.query(WorkflowNodeStats).filter_by(node_id="2").one().error_count == 3
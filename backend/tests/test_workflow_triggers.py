@@ -0,0 +1,62 @@
+import uuid
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from app.core.database import Base
+from app.core.events import EventBus, PURCHASE_ORDER_CREATED, SALES_ORDER_CREATED
+from app.models.auth import Workspace, User
+from app.models.workflow import Workflow, WorkflowExecution, WorkflowJob
+from app.services.workflow_service import WorkflowEngine
+from app.services.workflow_triggers import WorkflowEventDispatcher, workflow_trigger_index
+
+FLOW = {"nodes": [{"id": "1", "type": "trigger", "data": {"label": "PO Created"}}], "edges": []}
+
+@pytest.fixture
+def session_factory():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    tables = [Workspace.__table__, User.__table__, Workflow.__table__,
+              WorkflowExecution.__table__, WorkflowJob.__table__]
+    Base.metadata.create_all(engine, tables=tables)
+    return sessionmaker(bind=engine)
+
+def _event_workflow(db, workspace_id, events, activate=True):
+    workflow = WorkflowEngine.create_workflow(
+        db, workspace_id, "wf", "", "event", uuid.uuid4(), {"events": events}
+    )
+    WorkflowEngine.update_flow_data(db, workflow.id, FLOW)
+    if activate:
+        WorkflowEngine.activate_workflow(db, workflow.id)
+    return workflow
+
+def test_events_enqueue_matching_workflows_in_one_batch(session_factory):
+    db = session_factory()
+    workspace_id, other_workspace = uuid.uuid4(), uuid.uuid4()
+    po_flow = _event_workflow(db, workspace_id, [PURCHASE_ORDER_CREATED])
+    _event_workflow(db, workspace_id, [SALES_ORDER_CREATED])
+    _event_workflow(db, other_workspace, [PURCHASE_ORDER_CREATED])
+    
+    bus = EventBus()
+    dispatcher = WorkflowEventDispatcher(workflow_trigger_index, session_factory=session_factory, background=False)
+    dispatcher.install(bus)
+    
+    for i in range(3):
+        bus.publish(PURCHASE_ORDER_CREATED, workspace_id, {"amount": 1000 * i})
+    assert dispatcher.flush() == 3
+    
+    jobs = db.query(WorkflowJob).all()
+    assert {job.workflow_id for job in jobs} == {po_flow.id}
+    executions = db.query(WorkflowExecution).all()
+    assert sorted(e.context_data["amount"] for e in executions) == [0, 1000, 2000]
+    assert all(e.triggered_by == f"event:{PURCHASE_ORDER_CREATED}" for e in executions)
+
+def test_activation_updates_loaded_index(session_factory):
+    db = session_factory()
+    workspace_id = uuid.uuid4()
+    assert workflow_trigger_index.match(db, workspace_id, PURCHASE_ORDER_CREATED) == []
+    
+    workflow = _event_workflow(db, workspace_id, [PURCHASE_ORDER_CREATED], activate=False)
+    assert workflow_trigger_index.match(db, workspace_id, PURCHASE_ORDER_CREATED) == []
+    
+    WorkflowEngine.activate_workflow(db, workflow.id)
+    assert workflow_trigger_index.match(db, workspace_id, PURCHASE_ORDER_CREATED) == [workflow.id]